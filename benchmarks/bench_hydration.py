@@ -0,0 +1,84 @@
+"""Benchmark validated versus trusted row hydration for idea fragments.
+
+Usage:
+    python benchmarks/bench_hydration.py [--rows N] [--repeat R]
+
+Prints rows per second for ``row_to_fragment`` (full Pydantic validation) and
+``hydrate_fragment`` (``model_construct`` on trusted rows).
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import TYPE_CHECKING
+
+from branch.models import BranchSession, Document, IdeaFragment
+from branch.models.idea_fragment import TextAnchor
+from branch.storage import SQLiteRepository
+from branch.storage.mapping import FRAGMENT_COLUMNS, hydrate_fragment, row_to_fragment
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+    from typing import Any
+
+
+def _rows(count: int) -> list[tuple[Any, ...]]:
+    repo = SQLiteRepository.open(":memory:")
+    document = Document(title="Benchmark corpus")
+    session = BranchSession(document_id=document.id)
+    repo.upsert_document(document)
+    repo.upsert_session(session)
+    repo.upsert_fragments_many(
+        IdeaFragment(
+            content=f"Idea number {i}",
+            document_id=document.id,
+            session_id=session.id,
+            anchor=TextAnchor(page_number=i % 300 + 1, selected_text="quoted text")
+            if i % 2
+            else None,
+        )
+        for i in range(count)
+    )
+    cursor = repo.connection.execute(
+        f"SELECT {', '.join(FRAGMENT_COLUMNS)} FROM idea_fragments;"  # noqa: S608
+    )
+    rows = [tuple(row) for row in cursor]
+    repo.close()
+    return rows
+
+
+def _rate(
+    hydrate: Callable[[Sequence[Any]], IdeaFragment],
+    rows: list[tuple[Any, ...]],
+    repeat: int,
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for row in rows:
+            hydrate(row)
+        best = min(best, time.perf_counter() - started)
+    return len(rows) / best
+
+
+def main() -> None:
+    """Run the benchmark and print rows per second for each path."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = _rows(args.rows)
+    validated = _rate(row_to_fragment, rows, args.repeat)
+    trusted = _rate(hydrate_fragment, rows, args.repeat)
+
+    print(f"rows: {len(rows)} (best of {args.repeat})")
+    print(f"validated  row_to_fragment : {validated:>12,.0f} rows/s")
+    print(f"trusted    hydrate_fragment: {trusted:>12,.0f} rows/s")
+    print(f"speedup: {trusted / validated:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
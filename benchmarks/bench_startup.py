@@ -0,0 +1,107 @@
+"""Benchmark ``branch`` console-script start-up against a time budget.
+
+Usage:
+    python benchmarks/bench_startup.py [--budget-ms MS] [--repeat R] [--top N]
+
+Runs ``python -X importtime -c "import branch.cli"`` in fresh interpreters and
+reports the best cumulative import time of ``branch.cli``, the slowest
+modules it pulled in, and the wall time of ``branch --help`` over a bare
+interpreter start. Exits with status 1 if the import exceeds the budget or
+if a heavy dependency (Pydantic, PyMuPDF, SQLite, ...) is imported eagerly.
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+
+
+DEFAULT_BUDGET_MS = 100.0
+ENTRY_MODULE = "branch.cli"
+
+# Top-level packages that only subcommands may import.
+HEAVY_MODULES = frozenset(
+    {
+        "dotenv",
+        "numpy",
+        "ollama",
+        "pydantic",
+        "pymupdf",
+        "rich",
+        "sqlalchemy",
+        "sqlite3",
+        "whisper",
+    }
+)
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Return cumulative import time in microseconds per module, fresh process."""
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def wall_seconds(args: list[str], repeat: int) -> float:
+    """Best wall-clock time of running ``python <args>``."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(  # noqa: S603
+            [sys.executable, *args], capture_output=True, check=True
+        )
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark and return the process exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [import_times(ENTRY_MODULE) for _ in range(args.repeat)]
+    best = min(runs, key=lambda times: times[ENTRY_MODULE])
+    total_ms = best[ENTRY_MODULE] / 1000
+
+    print(f"import {ENTRY_MODULE}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"slowest of {len(best)} modules (cumulative):")
+    slowest = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    for name, micros in slowest[1 : args.top + 1]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    baseline = wall_seconds(["-c", "pass"], args.repeat)
+    help_run = wall_seconds(["-m", ENTRY_MODULE, "--help"], args.repeat)
+    print(
+        f"branch --help: {help_run * 1000:.1f} ms wall "
+        f"({(help_run - baseline) * 1000:.1f} ms over interpreter start)"
+    )
+
+    status = 0
+    heavy = sorted({name.split(".")[0] for name in best} & HEAVY_MODULES)
+    if heavy:
+        print(f"FAIL: heavy modules imported at start-up: {', '.join(heavy)}")
+        status = 1
+    if total_ms > args.budget_ms:
+        over = total_ms - args.budget_ms
+        print(f"FAIL: start-up import exceeds budget by {over:.1f} ms")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
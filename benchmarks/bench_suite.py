@@ -0,0 +1,480 @@
+"""Benchmark storage, model and capture hot paths on a synthetic corpus.
+
+Usage:
+    python benchmarks/bench_suite.py [--size {1k,100k,1m}] [--repeat R]
+        [--only NAME ...] [--output FILE] [--baseline FILE] [--tolerance F]
+
+Generates a reproducible corpus of documents, sessions and fragments, then
+times schema application, single and batch upserts, listing and keyset
+pagination, FTS search, write-behind capture, row hydration, JSON round
+trips and NDJSON/columnar backups against a file-backed database using the
+default SQLite profile. Each case reports the best of ``--repeat`` runs as
+operations per second; fixture setup such as seeding documents is not timed.
+
+Results are printed and, with ``--output``, written as JSON. With
+``--baseline`` the run is compared against a previous ``--output`` file and
+the script exits with status 1 if any case is slower than the baseline by more
+than ``--tolerance`` (a fraction; 0.25 means 25% fewer operations per second).
+A baseline is only meaningful on the machine that recorded it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, TypeVar
+
+from branch import __version__
+from branch.capture import CaptureQueue
+from branch.models import BranchSession, Document, IdeaFragment
+from branch.models.idea_fragment import TextAnchor
+from branch.storage import SQLiteRepository, apply_schema
+from branch.storage.export import export_columnar, export_ndjson
+from branch.storage.mapping import FRAGMENT_COLUMNS, hydrate_fragment, row_to_fragment
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+
+T = TypeVar("T")
+
+
+CORPUS_SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+FRAGMENTS_PER_DOCUMENT = 500
+FRAGMENTS_PER_SESSION = 50
+SINGLE_UPSERTS = 500
+CAPTURES = 5_000
+SEARCH_TERMS = ("entropy", "belief propagation", "surprise", "gradient")
+DEFAULT_TOLERANCE = 0.25
+
+VOCABULARY = (
+    "entropy",
+    "surprise",
+    "gradient",
+    "belief",
+    "propagation",
+    "attention",
+    "memory",
+    "signal",
+    "noise",
+    "prior",
+    "posterior",
+    "sample",
+    "estimate",
+    "variance",
+    "bias",
+    "model",
+    "theory",
+    "proof",
+    "lemma",
+    "example",
+    "counterexample",
+    "analogy",
+    "metaphor",
+    "argument",
+    "claim",
+    "evidence",
+)
+
+
+@dataclass(frozen=True)
+class Corpus:
+    """Synthetic documents, sessions and fragments for one benchmark size."""
+
+    documents: list[Document]
+    sessions: list[BranchSession]
+    fragments: list[IdeaFragment]
+
+
+@dataclass(frozen=True)
+class CaseResult:
+    """Best-of-N timing for one benchmark case."""
+
+    operations: int
+    seconds: float
+
+    @property
+    def ops_per_second(self) -> float:
+        """Throughput of the best run."""
+        return self.operations / self.seconds if self.seconds else float("inf")
+
+
+def generate_corpus(fragments: int, seed: int = 0) -> Corpus:
+    """Build a reproducible corpus with ``fragments`` idea fragments.
+
+    Fragments are spread over documents of ``FRAGMENTS_PER_DOCUMENT`` and
+    sessions of ``FRAGMENTS_PER_SESSION``, with capture times a minute apart,
+    a page anchor on two thirds of them and a few words from a small
+    vocabulary so FTS queries have realistic hit rates.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    document_count = max(1, fragments // FRAGMENTS_PER_DOCUMENT)
+    documents = [
+        Document(title=f"Document {n}", page_count=300) for n in range(document_count)
+    ]
+    sessions: list[BranchSession] = []
+    items: list[IdeaFragment] = []
+    started = datetime(2024, 1, 1)
+    for n in range(fragments):
+        document = documents[n // FRAGMENTS_PER_DOCUMENT % document_count]
+        if n % FRAGMENTS_PER_SESSION == 0:
+            sessions.append(BranchSession(document_id=document.id))
+        words = " ".join(rng.choices(VOCABULARY, k=rng.randint(4, 16)))
+        anchor = None
+        if n % 3:
+            anchor = TextAnchor(
+                page_number=rng.randint(1, 300), selected_text=f"quoted {words[:40]}"
+            )
+        items.append(
+            IdeaFragment(
+                content=f"Idea {n}: {words}",
+                document_id=document.id,
+                session_id=sessions[-1].id,
+                anchor=anchor,
+                captured_at=started + timedelta(minutes=n),
+            )
+        )
+    return Corpus(documents, sessions, items)
+
+
+def best_of(repeat: int, run: Callable[[], int]) -> CaseResult:
+    """Time ``run`` (which returns its operation count) and keep the best."""
+    return best_of_fixture(repeat, lambda: None, lambda _: run(), lambda _: None)
+
+
+def best_of_fixture(
+    repeat: int,
+    setup: Callable[[], T],
+    run: Callable[[T], int],
+    teardown: Callable[[T], object],
+) -> CaseResult:
+    """Time ``run(setup())`` and keep the fastest of ``repeat`` runs.
+
+    ``setup`` and ``teardown`` run outside the timed region.
+    """
+    best = CaseResult(0, float("inf"))
+    for _ in range(repeat):
+        state = setup()
+        started = time.perf_counter()
+        operations = run(state)
+        elapsed = time.perf_counter() - started
+        teardown(state)
+        if elapsed < best.seconds:
+            best = CaseResult(operations, elapsed)
+    return best
+
+
+class Suite:
+    """Benchmark cases sharing one corpus and a scratch directory."""
+
+    def __init__(self, corpus: Corpus, workdir: Path, repeat: int) -> None:
+        self.corpus = corpus
+        self.workdir = workdir
+        self.repeat = repeat
+        self._databases = 0
+        self._loaded: SQLiteRepository | None = None
+
+    def cases(self) -> dict[str, Callable[[], CaseResult]]:
+        """Benchmark cases by name, in run order."""
+        return {
+            "apply_schema": self.apply_schema,
+            "upsert_single": self.upsert_single,
+            "upsert_batch": self.upsert_batch,
+            "capture_queue": self.capture_queue,
+            "list_document": self.list_document,
+            "paginate": self.paginate,
+            "search": self.search,
+            "hydrate_trusted": self.hydrate_trusted,
+            "hydrate_validated": self.hydrate_validated,
+            "json_dump": self.json_dump,
+            "json_load": self.json_load,
+            "export_ndjson": self.export_ndjson,
+            "export_columnar": self.export_columnar,
+        }
+
+    def close(self) -> None:
+        """Close the shared loaded database."""
+        if self._loaded is not None:
+            self._loaded.close()
+
+    # Cases
+
+    def apply_schema(self) -> CaseResult:
+        """Apply every migration to a fresh file database."""
+
+        def run(connection: sqlite3.Connection) -> int:
+            apply_schema(connection)
+            return 1
+
+        return best_of_fixture(
+            self.repeat,
+            lambda: sqlite3.connect(self._new_path()),
+            run,
+            sqlite3.Connection.close,
+        )
+
+    def upsert_single(self) -> CaseResult:
+        """Upsert fragments one committed transaction at a time."""
+        sample = self.corpus.fragments[:SINGLE_UPSERTS]
+
+        def run(repository: SQLiteRepository) -> int:
+            for fragment in sample:
+                repository.upsert_fragment(fragment)
+            return len(sample)
+
+        return best_of_fixture(
+            self.repeat, self._seeded_repository, run, SQLiteRepository.close
+        )
+
+    def upsert_batch(self) -> CaseResult:
+        """Upsert the whole corpus in one transaction."""
+
+        def run(repository: SQLiteRepository) -> int:
+            repository.upsert_fragments_many(self.corpus.fragments)
+            return len(self.corpus.fragments)
+
+        # Loading 1M fragments takes minutes; one run is representative.
+        repeat = 1 if len(self.corpus.fragments) > 100_000 else self.repeat
+        return best_of_fixture(
+            repeat, self._seeded_repository, run, SQLiteRepository.close
+        )
+
+    def capture_queue(self) -> CaseResult:
+        """Accept captures through the write-behind queue with a spill file.
+
+        Only ``capture()`` calls are timed; the background commits they
+        trigger overlap with the loop, as they would in the reader.
+        """
+        sample = self.corpus.fragments[:CAPTURES]
+
+        def setup() -> tuple[SQLiteRepository, CaptureQueue]:
+            repository = self._seeded_repository()
+            spill_dir = self.workdir / f"spill-{self._databases}"
+            return repository, CaptureQueue(repository, spill_dir).start()
+
+        def run(state: tuple[SQLiteRepository, CaptureQueue]) -> int:
+            for fragment in sample:
+                state[1].capture(fragment)
+            return len(sample)
+
+        def teardown(state: tuple[SQLiteRepository, CaptureQueue]) -> None:
+            state[1].close()
+            state[0].close()
+
+        return best_of_fixture(self.repeat, setup, run, teardown)
+
+    def list_document(self) -> CaseResult:
+        """Fetch every fragment of each of up to 20 documents."""
+        repository = self._loaded_repository()
+        documents = self.corpus.documents[:20]
+
+        def run() -> int:
+            return sum(
+                len(repository.list_fragments_for_document(document.id))
+                for document in documents
+            )
+
+        return best_of(self.repeat, run)
+
+    def paginate(self) -> CaseResult:
+        """Stream one document with keyset pagination, 100 rows per page."""
+        repository = self._loaded_repository()
+        document = self.corpus.documents[0]
+
+        def run() -> int:
+            return sum(1 for _ in repository.iter_fragments(document.id, page_size=100))
+
+        return best_of(self.repeat, run)
+
+    def search(self) -> CaseResult:
+        """Run ranked FTS queries across the whole buffer."""
+        repository = self._loaded_repository()
+
+        def run() -> int:
+            for term in SEARCH_TERMS:
+                repository.search_fragments(term, limit=20)
+            return len(SEARCH_TERMS)
+
+        return best_of(self.repeat, run)
+
+    def hydrate_trusted(self) -> CaseResult:
+        """Build fragments from rows with trusted hydration."""
+        rows = self._rows()
+        return best_of(self.repeat, lambda: _count(hydrate_fragment(r) for r in rows))
+
+    def hydrate_validated(self) -> CaseResult:
+        """Build fragments from rows with full Pydantic validation."""
+        rows = self._rows()
+        return best_of(self.repeat, lambda: _count(row_to_fragment(r) for r in rows))
+
+    def json_dump(self) -> CaseResult:
+        """Serialize fragments to JSON, as the capture spill file does."""
+        fragments = self._sample()
+        return best_of(
+            self.repeat, lambda: _count(f.model_dump_json() for f in fragments)
+        )
+
+    def json_load(self) -> CaseResult:
+        """Parse and validate fragments from JSON, as spill recovery does."""
+        lines = [fragment.model_dump_json() for fragment in self._sample()]
+        return best_of(
+            self.repeat,
+            lambda: _count(IdeaFragment.model_validate_json(line) for line in lines),
+        )
+
+    def export_ndjson(self) -> CaseResult:
+        """Back up the whole buffer to an NDJSON file, counting rows."""
+        connection = self._loaded_repository().connection
+        path = self.workdir / "backup.ndjson"
+        return best_of(
+            self.repeat, lambda: sum(export_ndjson(connection, path).values())
+        )
+
+    def export_columnar(self) -> CaseResult:
+        """Back up the whole buffer to columnar files, counting rows."""
+        connection = self._loaded_repository().connection
+        directory = self.workdir / "backup"
+        return best_of(
+            self.repeat, lambda: sum(export_columnar(connection, directory).values())
+        )
+
+    # Fixtures
+
+    def _new_path(self) -> Path:
+        self._databases += 1
+        return self.workdir / f"bench-{self._databases}.db"
+
+    def _seeded_repository(self) -> SQLiteRepository:
+        repository = SQLiteRepository.open(self._new_path())
+        repository.upsert_documents_many(self.corpus.documents)
+        for session in self.corpus.sessions:
+            repository.upsert_session(session)
+        return repository
+
+    def _loaded_repository(self) -> SQLiteRepository:
+        if self._loaded is None:
+            self._loaded = self._seeded_repository()
+            self._loaded.upsert_fragments_many(self.corpus.fragments)
+        return self._loaded
+
+    def _sample(self) -> list[IdeaFragment]:
+        return self.corpus.fragments[:100_000]
+
+    def _rows(self) -> list[tuple[object, ...]]:
+        connection = self._loaded_repository().connection
+        cursor = connection.execute(
+            f"SELECT {', '.join(FRAGMENT_COLUMNS)} FROM idea_fragments "  # noqa: S608
+            "LIMIT 100000;"
+        )
+        return [tuple(row) for row in cursor]
+
+
+def _count(items: Iterator[object]) -> int:
+    return sum(1 for _ in items)
+
+
+def compare(
+    results: dict[str, CaseResult],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    """Return a message for each case slower than the baseline allows."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        floor = previous["ops_per_second"] * (1 - tolerance)
+        if result.ops_per_second < floor:
+            change = result.ops_per_second / previous["ops_per_second"] - 1
+            regressions.append(
+                f"{name}: {result.ops_per_second:,.0f} ops/s vs baseline "
+                f"{previous['ops_per_second']:,.0f} ({change:+.0%})"
+            )
+    return regressions
+
+
+def report(size: str, results: dict[str, CaseResult]) -> dict[str, object]:
+    """Build the JSON document written by ``--output``."""
+    return {
+        "meta": {
+            "branch": __version__,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "size": size,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": {
+            name: {**asdict(result), "ops_per_second": result.ops_per_second}
+            for name, result in results.items()
+        },
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the suite and return the process exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=CORPUS_SIZES, default="1k")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="Cases to run.")
+    parser.add_argument("--output", type=Path, help="Write results as JSON.")
+    parser.add_argument("--baseline", type=Path, help="Compare with a saved run.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    corpus = generate_corpus(CORPUS_SIZES[args.size])
+    print(
+        f"corpus {args.size}: {len(corpus.fragments):,} fragments, "
+        f"{len(corpus.documents):,} documents "
+        f"({time.perf_counter() - started:.1f}s to generate)"
+    )
+
+    results: dict[str, CaseResult] = {}
+    with tempfile.TemporaryDirectory(prefix="branch-bench-") as workdir:
+        suite = Suite(corpus, Path(workdir), args.repeat)
+        try:
+            for name, case in suite.cases().items():
+                if args.only and name not in args.only:
+                    continue
+                results[name] = result = case()
+                print(
+                    f"  {name:<18} {result.ops_per_second:>14,.0f} ops/s  "
+                    f"({result.operations:,} ops in {result.seconds * 1000:.1f} ms)"
+                )
+        finally:
+            suite.close()
+
+    document = report(args.size, results)
+    if args.output is not None:
+        args.output.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+        print(f"wrote {args.output}")
+
+    if args.baseline is None:
+        return 0
+    saved = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if saved["meta"]["size"] != args.size:
+        print(f"FAIL: baseline is for size {saved['meta']['size']}, not {args.size}")
+        return 1
+    regressions = compare(results, saved["results"], args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        return 1
+    print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
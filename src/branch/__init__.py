@@ -4,13 +4,30 @@ A reading-first system that helps users safely capture, defer,
 and later develop ideas generated during reading.
 """
 
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from branch._lazy import lazy_exports
+
+
 __version__ = "0.1.0"
 __author__ = "Your Name"
 
-from branch.models.document import Document
-from branch.models.idea_fragment import IdeaFragment
-from branch.models.session import BranchSession
+if TYPE_CHECKING:
+    from branch.models.document import Document
+    from branch.models.idea_fragment import IdeaFragment
+    from branch.models.session import BranchSession
+
 
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "BranchSession": "branch.models.session",
+        "Document": "branch.models.document",
+        "IdeaFragment": "branch.models.idea_fragment",
+    },
+)
 
 __all__ = [
     "BranchSession",
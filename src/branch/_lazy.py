@@ -0,0 +1,46 @@
+"""Lazy package exports.
+
+Package ``__init__`` modules re-export names from their submodules. Importing
+those submodules eagerly would make ``import branch`` (and the ``branch``
+console script) pay for Pydantic, PyMuPDF and SQLite up front, so packages
+install a module-level ``__getattr__`` that imports each export on first use.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping
+
+
+def lazy_exports(
+    package: str, exports: Mapping[str, str]
+) -> tuple[Callable[[str], Any], Callable[[], list[str]]]:
+    """Build ``__getattr__`` and ``__dir__`` for a package.
+
+    Args:
+        package: The package's ``__name__``.
+        exports: Exported name -> module that defines it.
+
+    Returns:
+        The ``(__getattr__, __dir__)`` pair to assign at module level.
+    """
+
+    def __getattr__(name: str) -> Any:
+        module = exports.get(name)
+        if module is None:
+            msg = f"module {package!r} has no attribute {name!r}"
+            raise AttributeError(msg)
+        value = getattr(importlib.import_module(module), name)
+        # Cache on the package so later lookups skip __getattr__ entirely.
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted({*vars(sys.modules[package]), *exports})
+
+    return __getattr__, __dir__
@@ -0,0 +1,51 @@
+"""Optional AI features for Branch: semantic similarity and light resolution."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from branch._lazy import lazy_exports
+
+
+if TYPE_CHECKING:
+    from branch.ai.embedders import Embedder, HashEmbedder, OllamaEmbedder
+    from branch.ai.resolver import (
+        Resolution,
+        ResolutionCache,
+        ResolveError,
+        Resolver,
+        ResolveRequest,
+    )
+    from branch.ai.semantic_index import SemanticIndex, SimilarFragment, SyncReport
+
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "Embedder": "branch.ai.embedders",
+        "HashEmbedder": "branch.ai.embedders",
+        "OllamaEmbedder": "branch.ai.embedders",
+        "Resolution": "branch.ai.resolver",
+        "ResolutionCache": "branch.ai.resolver",
+        "ResolveError": "branch.ai.resolver",
+        "ResolveRequest": "branch.ai.resolver",
+        "Resolver": "branch.ai.resolver",
+        "SemanticIndex": "branch.ai.semantic_index",
+        "SimilarFragment": "branch.ai.semantic_index",
+        "SyncReport": "branch.ai.semantic_index",
+    },
+)
+
+__all__ = [
+    "Embedder",
+    "HashEmbedder",
+    "OllamaEmbedder",
+    "Resolution",
+    "ResolutionCache",
+    "ResolveError",
+    "ResolveRequest",
+    "Resolver",
+    "SemanticIndex",
+    "SimilarFragment",
+    "SyncReport",
+]
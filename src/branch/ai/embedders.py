@@ -0,0 +1,152 @@
+"""Text embedders for the semantic fragment index.
+
+An :class:`Embedder` turns a batch of texts into fixed-length vectors. Two are
+provided:
+
+- :class:`HashEmbedder` needs nothing but the standard library. It hashes
+  words and word pairs into signed buckets (the "hashing trick"), so texts
+  that share vocabulary land close together. It is deterministic and offline,
+  which makes it the default and the embedder used in tests.
+- :class:`OllamaEmbedder` calls a local Ollama server (the ``ai`` extra) for
+  real semantic embeddings, one request per batch.
+
+Vectors are L2-normalized, so a dot product is the cosine similarity.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import math
+import re
+from typing import TYPE_CHECKING, Any, Protocol
+
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+
+DEFAULT_HASH_DIMENSIONS = 256
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class Embedder(Protocol):
+    """Batch text embedder."""
+
+    @property
+    def name(self) -> str:
+        """Stable identifier; indexes built by different embedders are separate."""
+        ...
+
+    @property
+    def dimensions(self) -> int:
+        """Length of every vector :meth:`embed` returns."""
+        ...
+
+    def embed(self, texts: Sequence[str]) -> list[list[float]]:
+        """Return one L2-normalized vector per text, in order."""
+        ...
+
+
+class HashEmbedder:
+    """Offline embedder based on feature hashing of words and word pairs."""
+
+    def __init__(self, dimensions: int = DEFAULT_HASH_DIMENSIONS) -> None:
+        if dimensions < 1:
+            msg = f"dimensions must be positive, got {dimensions}"
+            raise ValueError(msg)
+        self._dimensions = dimensions
+        self._buckets: dict[str, tuple[int, float]] = {}
+
+    @property
+    def name(self) -> str:
+        """Identifier including the dimension count."""
+        return f"hash-{self._dimensions}"
+
+    @property
+    def dimensions(self) -> int:
+        """Vector length."""
+        return self._dimensions
+
+    def embed(self, texts: Sequence[str]) -> list[list[float]]:
+        """Embed each text as normalized counts of its hashed features."""
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text: str) -> list[float]:
+        vector = [0.0] * self._dimensions
+        words = WORD_PATTERN.findall(text.lower())
+        features = [*words, *(f"{a} {b}" for a, b in itertools.pairwise(words))]
+        for feature in features:
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+        norm = math.sqrt(sum(value * value for value in vector))
+        if norm:
+            vector = [value / norm for value in vector]
+        return vector
+
+    def _bucket(self, feature: str) -> tuple[int, float]:
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            number = int.from_bytes(digest, "little")
+            bucket = (number >> 1) % self._dimensions, 1.0 if number & 1 else -1.0
+            if len(self._buckets) < 1 << 16:
+                self._buckets[feature] = bucket
+        return bucket
+
+
+class OllamaEmbedder:
+    """Embed texts with a model served by Ollama."""
+
+    def __init__(self, model: str, host: str) -> None:
+        self.model = model
+        self.host = host
+        self._client: Any = None
+        self._dimensions: int | None = None
+
+    @property
+    def name(self) -> str:
+        """Identifier derived from the model name."""
+        return "ollama-" + re.sub(r"[^\w.-]", "_", self.model)
+
+    @property
+    def dimensions(self) -> int:
+        """Vector length, probed from the model on first use."""
+        if self._dimensions is None:
+            self._dimensions = len(self.embed(["dimension probe"])[0])
+        return self._dimensions
+
+    def embed(self, texts: Sequence[str]) -> list[list[float]]:
+        """Embed a batch of texts in one request.
+
+        Raises:
+            ImportError: The ``ollama`` package (``ai`` extra) is missing.
+        """
+        if not texts:
+            return []
+        if self._client is None:
+            import ollama  # noqa: PLC0415
+
+            self._client = ollama.Client(host=self.host)
+        response = self._client.embed(model=self.model, input=list(texts))
+        vectors = [_normalized(vector) for vector in response["embeddings"]]
+        self._dimensions = len(vectors[0])
+        return vectors
+
+
+def embedder_from_config() -> Embedder:
+    """Build the embedder named by ``EMBEDDING_MODEL``.
+
+    ``hash`` selects :class:`HashEmbedder`; any other value is an Ollama model
+    served at ``OLLAMA_API_URL``.
+    """
+    from branch.config import Config  # noqa: PLC0415
+
+    if Config.EMBEDDING_MODEL == "hash":
+        return HashEmbedder()
+    return OllamaEmbedder(Config.EMBEDDING_MODEL, Config.OLLAMA_API_URL)
+
+
+def _normalized(vector: Sequence[float]) -> list[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
@@ -0,0 +1,305 @@
+"""Batched, cached "Resolve Lightly" answers from a local model server.
+
+A review session can ask for light resolutions of dozens of fragments at once.
+:class:`Resolver` sends them to Ollama's ``/api/generate`` concurrently through
+``ollama.AsyncClient`` (``ai`` extra), with at most ``concurrency`` requests in
+flight; the client's httpx pool keeps those connections alive between calls.
+
+Every request has a deadline of ``timeout`` seconds that covers waiting for a
+slot as well as the model call, so a batch finishes within roughly one
+timeout however many fragments it holds; requests that miss it fail on their
+own without holding up the rest.
+
+Answers are cached in SQLite under a key derived from the model, the prompt
+and the anchor text. Both texts are normalized first (case, whitespace and
+trailing punctuation), so asking the same question again, or a trivially
+reworded copy of it, costs nothing. Identical requests within one batch share
+a single call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from branch.storage.sqlite import connect
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from pathlib import Path
+
+    from branch.models import IdeaFragment
+
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 30.0
+PROMPT_TEMPLATE = (
+    "A reader jotted down this idea while reading. Resolve it lightly: answer "
+    "or clarify it in at most three sentences, without going deep.\n\n"
+    "{passage}Idea: {idea}"
+)
+PASSAGE_TEMPLATE = 'Passage they were reading: "{anchor}"\n\n'
+
+CACHE_STATEMENTS: Sequence[str] = (
+    """
+    CREATE TABLE IF NOT EXISTS responses (
+        key BLOB PRIMARY KEY,
+        model TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    ) WITHOUT ROWID;
+    """,
+)
+
+_SPACES = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s?!.,;:]+$")
+
+
+class ResolveError(Exception):
+    """A resolution request failed or missed its deadline."""
+
+
+@dataclass(frozen=True)
+class Resolution:
+    """An answer and where it came from."""
+
+    text: str
+    cached: bool
+    seconds: float
+
+
+@dataclass(frozen=True)
+class ResolveRequest:
+    """One idea to resolve, with the passage that prompted it."""
+
+    prompt: str
+    anchor_text: str | None = None
+
+
+def normalize(text: str | None) -> str:
+    """Fold case, collapse whitespace and drop trailing punctuation."""
+    if not text:
+        return ""
+    return _TRAILING.sub("", _SPACES.sub(" ", text.casefold()).strip())
+
+
+def cache_key(model: str, prompt: str, anchor_text: str | None) -> bytes:
+    """Cache key for a request: model plus normalized prompt and anchor."""
+    material = "\x00".join((model, normalize(prompt), normalize(anchor_text)))
+    return hashlib.blake2b(material.encode(), digest_size=16).digest()
+
+
+class ResolutionCache:
+    """SQLite table of model responses keyed by :func:`cache_key`."""
+
+    def __init__(self, path: Path | str) -> None:
+        self._connection = connect(path, check_same_thread=False)
+        for statement in CACHE_STATEMENTS:
+            self._connection.execute(statement)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> str | None:
+        """Return the cached response for ``key``, if any."""
+        row = self._connection.execute(
+            "SELECT response FROM responses WHERE key = ?;", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return str(row[0])
+
+    def put(self, key: bytes, model: str, response: str) -> None:
+        """Store a response, replacing any previous one for ``key``."""
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at) "
+                "VALUES (?, ?, ?, ?);",
+                (key, model, response, datetime.utcnow().isoformat()),
+            )
+
+    def __len__(self) -> int:
+        """Number of cached responses."""
+        return int(
+            self._connection.execute("SELECT count(*) FROM responses;").fetchone()[0]
+        )
+
+    def close(self) -> None:
+        """Close the cache database."""
+        self._connection.close()
+
+
+class Resolver:
+    """Concurrent, cached client for light resolutions."""
+
+    def __init__(
+        self,
+        model: str,
+        host: str,
+        cache: ResolutionCache | None = None,
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        """Create a resolver; use it as an ``async with`` context manager.
+
+        Args:
+            model: Ollama model name.
+            host: Base URL of the model server, e.g. ``http://localhost:11434``.
+            cache: Response cache; without one every request calls the model.
+            concurrency: Most requests in flight at once.
+            timeout: Deadline in seconds for each request, queueing included.
+        """
+        self.model = model
+        self.host = host
+        self.cache = cache
+        self.timeout = timeout
+        self._client: Any = None
+        self._slots = asyncio.Semaphore(concurrency)
+        self._inflight: dict[bytes, asyncio.Future[str]] = {}
+
+    @classmethod
+    def from_config(cls, cache: ResolutionCache | None = None) -> Resolver:
+        """Build a resolver from the ``OLLAMA_*`` and ``RESOLVE_*`` settings."""
+        from branch.config import Config  # noqa: PLC0415
+
+        return cls(
+            Config.OLLAMA_MODEL,
+            Config.OLLAMA_API_URL,
+            cache,
+            concurrency=Config.RESOLVE_CONCURRENCY,
+            timeout=Config.RESOLVE_TIMEOUT_S,
+        )
+
+    async def __aenter__(self) -> Resolver:
+        """Return the resolver; connections open on demand."""
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Close pooled connections."""
+        await self.close()
+
+    async def close(self) -> None:
+        """Close pooled connections."""
+        client, self._client = self._client, None
+        if client is not None:
+            await client.close()
+
+    async def resolve(self, prompt: str, anchor_text: str | None = None) -> Resolution:
+        """Resolve one idea, from the cache when possible.
+
+        Raises:
+            ResolveError: The server failed or the deadline passed.
+        """
+        started = time.perf_counter()
+        key = cache_key(self.model, prompt, anchor_text)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return Resolution(cached, True, time.perf_counter() - started)
+        shared = self._inflight.get(key)
+        if shared is not None:
+            text = await asyncio.shield(shared)
+            return Resolution(text, True, time.perf_counter() - started)
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await self._generate(build_prompt(prompt, anchor_text))
+        except BaseException as exc:
+            future.set_exception(
+                exc if isinstance(exc, ResolveError) else ResolveError(str(exc))
+            )
+            future.exception()  # followers may not exist; avoid an unretrieved warning
+            raise
+        finally:
+            del self._inflight[key]
+        future.set_result(text)
+        if self.cache is not None:
+            self.cache.put(key, self.model, text)
+        return Resolution(text, False, time.perf_counter() - started)
+
+    async def resolve_many(
+        self, requests: Iterable[ResolveRequest]
+    ) -> list[Resolution | ResolveError]:
+        """Resolve a batch concurrently; failures are returned, not raised."""
+        results = await asyncio.gather(
+            *(
+                self.resolve(request.prompt, request.anchor_text)
+                for request in requests
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(
+                result, ResolveError
+            ):
+                raise result
+        return results  # type: ignore[return-value]
+
+    async def resolve_fragments(
+        self, fragments: Sequence[IdeaFragment]
+    ) -> list[IdeaFragment]:
+        """Attach light resolution notes to fragments.
+
+        Returns:
+            The fragments that received a note, updated in place through
+            :meth:`IdeaFragment.resolve_lightly`; the caller persists them.
+        """
+        results = await self.resolve_many(
+            ResolveRequest(
+                fragment.content,
+                fragment.anchor.selected_text if fragment.anchor else None,
+            )
+            for fragment in fragments
+        )
+        resolved = []
+        for fragment, result in zip(fragments, results, strict=True):
+            if isinstance(result, Resolution):
+                fragment.resolve_lightly(result.text)
+                resolved.append(fragment)
+        return resolved
+
+    async def _generate(self, prompt: str) -> str:
+        """Call the model once, within the deadline and the concurrency cap.
+
+        Raises:
+            ImportError: The ``ollama`` package (``ai`` extra) is missing.
+        """
+        import httpx  # noqa: PLC0415
+        import ollama  # noqa: PLC0415
+
+        if self._client is None:
+            self._client = ollama.AsyncClient(host=self.host)
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self._slots:
+                    response = await self._client.generate(
+                        model=self.model, prompt=prompt
+                    )
+        except TimeoutError as exc:
+            msg = f"No answer from {self.model} within {self.timeout:g}s"
+            raise ResolveError(msg) from exc
+        except ConnectionError as exc:
+            msg = f"Cannot reach the model server at {self.host}: {exc}"
+            raise ResolveError(msg) from exc
+        except (ollama.ResponseError, httpx.HTTPError, OSError) as exc:
+            msg = f"Model server request failed: {exc}"
+            raise ResolveError(msg) from exc
+        try:
+            return str(response["response"]).strip()
+        except (KeyError, TypeError) as exc:
+            msg = f"Unexpected response from the model server: {response!r:.200}"
+            raise ResolveError(msg) from exc
+
+
+def build_prompt(idea: str, anchor_text: str | None) -> str:
+    """Prompt sent to the model for one idea."""
+    passage = PASSAGE_TEMPLATE.format(anchor=anchor_text) if anchor_text else ""
+    return PROMPT_TEMPLATE.format(passage=passage, idea=idea)
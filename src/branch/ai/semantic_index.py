@@ -0,0 +1,490 @@
+"""Local semantic index of idea fragments.
+
+Each fragment's ``content`` plus its ``anchor_selected_text`` is embedded once
+and stored as a row of a float32 matrix file that is memory-mapped for
+queries. Top-k similarity is a dot product of the query against the whole
+matrix; with NumPy installed (the ``ai`` extra) that is one vectorized
+``matrix @ query`` over the mapping, otherwise a pure-Python scan that is
+fine for small buffers.
+
+The index lives next to the database, one directory per embedder::
+
+    branch.db.vectors/<embedder name>/vectors.f32   slots x dimensions, <f4
+    branch.db.vectors/<embedder name>/slots.db      fragment id -> slot, digest
+
+:meth:`SemanticIndex.sync` is incremental. It walks fragments and the slot
+manifest in id order side by side and only embeds fragments that are new or
+whose text digest changed; slots of deleted fragments are zeroed and reused.
+Vectors are written before the manifest commits, so an interrupted sync at
+worst re-embeds a batch.
+
+For large corpora, ``approximate=True`` uses an in-memory inverted-file index
+(NumPy only): rows are grouped under about ``sqrt(rows)`` spherical k-means
+centroids trained on a sample, and a query scores exactly only the rows of its
+:data:`APPROXIMATE_PROBES` nearest clusters. The clusters are rebuilt on the
+first approximate query after a sync changes the index.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import mmap
+import operator
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+from uuid import UUID
+
+from branch.storage.sqlite import connect
+
+
+if TYPE_CHECKING:
+    import sqlite3
+    from collections.abc import Iterator, Sequence
+    from pathlib import Path
+
+    from branch.ai.embedders import Embedder
+
+
+DEFAULT_BATCH_SIZE = 64
+# Approximate search probes this many of the sqrt(rows) k-means clusters.
+APPROXIMATE_PROBES = 16
+APPROXIMATE_SAMPLE_PER_CLUSTER = 64
+APPROXIMATE_TRAINING_ROUNDS = 8
+# Below this many rows an exact scan is as fast as probing clusters.
+APPROXIMATE_MIN_ROWS = 50_000
+VECTORS_FILE = "vectors.f32"
+MANIFEST_FILE = "slots.db"
+
+SELECT_FRAGMENT_TEXT_SQL = (
+    "SELECT id, content, anchor_selected_text FROM idea_fragments ORDER BY id;"
+)
+
+MANIFEST_STATEMENTS: Sequence[str] = (
+    """
+    CREATE TABLE IF NOT EXISTS slots (
+        fragment_id TEXT PRIMARY KEY,
+        slot INTEGER NOT NULL UNIQUE,
+        digest BLOB NOT NULL
+    ) WITHOUT ROWID;
+    """,
+    "CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY);",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);",
+)
+UPSERT_SLOT_SQL = (
+    "INSERT INTO slots (fragment_id, slot, digest) VALUES (?, ?, ?) "
+    "ON CONFLICT(fragment_id) DO UPDATE SET digest = excluded.digest;"
+)
+SELECT_SLOTS_SQL = "SELECT fragment_id, slot, digest FROM slots ORDER BY fragment_id;"
+NEXT_SLOT_SQL = (
+    "SELECT max(coalesce((SELECT max(slot) FROM slots), -1), "
+    "coalesce((SELECT max(slot) FROM free_slots), -1)) + 1;"
+)
+
+REUSE_SLOT_SQL = (
+    "DELETE FROM free_slots WHERE slot = (SELECT min(slot) FROM free_slots) "
+    "RETURNING slot;"
+)
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+@dataclass(frozen=True)
+class SimilarFragment:
+    """One similarity hit; ``score`` is the cosine similarity."""
+
+    fragment_id: UUID
+    score: float
+
+
+@dataclass(frozen=True)
+class SyncReport:
+    """What :meth:`SemanticIndex.sync` changed."""
+
+    embedded: int
+    removed: int
+    indexed: int
+
+
+class SemanticIndex:
+    """Incrementally maintained embedding index over a fragment database."""
+
+    def __init__(
+        self,
+        directory: Path,
+        embedder: Embedder,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """Open (or create) the index for ``embedder`` under ``directory``.
+
+        Args:
+            directory: Root for per-embedder index directories.
+            embedder: Produces the vectors; its ``name`` picks the directory.
+            batch_size: Texts embedded per :meth:`Embedder.embed` call.
+        """
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.path = directory / embedder.name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.path / VECTORS_FILE
+        self._vectors_path.touch()
+        self._manifest = connect(self.path / MANIFEST_FILE, check_same_thread=False)
+        # sync() reads the manifest on a second connection while writing it.
+        self._manifest.execute("PRAGMA journal_mode = WAL;")
+        for statement in MANIFEST_STATEMENTS:
+            self._manifest.execute(statement)
+        self.dimensions = self._check_dimensions()
+        self._row_bytes = 4 * self.dimensions
+        self._mapped: mmap.mmap | None = None
+        self._clusters: _Clusters | None = None
+
+    @classmethod
+    def for_database(
+        cls, database: Path, embedder: Embedder, **options: Any
+    ) -> SemanticIndex:
+        """Open the index stored next to ``database``."""
+        return cls(database.parent / f"{database.name}.vectors", embedder, **options)
+
+    def close(self) -> None:
+        """Release the mapping and the manifest connection."""
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        self._manifest.close()
+
+    def __enter__(self) -> SemanticIndex:
+        """Use the index as a context manager that closes on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the index when leaving the ``with`` block."""
+        self.close()
+
+    def __len__(self) -> int:
+        """Number of indexed fragments."""
+        row = self._manifest.execute("SELECT count(*) FROM slots;").fetchone()
+        return int(row[0])
+
+    # Maintenance
+
+    def sync(self, connection: sqlite3.Connection) -> SyncReport:
+        """Embed new and changed fragments and drop deleted ones.
+
+        Args:
+            connection: Connection to the Branch database being indexed.
+        """
+        fragments = connection.cursor()
+        fragments.row_factory = None
+        fragments.execute(SELECT_FRAGMENT_TEXT_SQL)
+        snapshot = connect(self.path / MANIFEST_FILE)
+        entries: Iterator[tuple[str, int, bytes]] = iter(
+            snapshot.execute(SELECT_SLOTS_SQL)
+        )
+        entry = next(entries, None)
+        pending: list[tuple[str, str, bytes, int | None]] = []
+        removed: list[tuple[str, int]] = []
+        embedded = 0
+        try:
+            for fragment_id, content, selected_text in fragments:
+                while entry is not None and entry[0] < fragment_id:
+                    removed.append((entry[0], entry[1]))
+                    entry = next(entries, None)
+                text = fragment_text(content, selected_text)
+                digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+                if entry is not None and entry[0] == fragment_id:
+                    if entry[2] != digest:
+                        pending.append((fragment_id, text, digest, entry[1]))
+                    entry = next(entries, None)
+                else:
+                    pending.append((fragment_id, text, digest, None))
+                if len(pending) >= self.batch_size:
+                    embedded += self._store(pending)
+                    pending = []
+            embedded += self._store(pending)
+            while entry is not None:
+                removed.append((entry[0], entry[1]))
+                entry = next(entries, None)
+        finally:
+            snapshot.close()
+        self._remove(removed)
+        if embedded or removed:
+            self._clusters = None
+        return SyncReport(embedded=embedded, removed=len(removed), indexed=len(self))
+
+    # Queries
+
+    def similar(
+        self, fragment_id: UUID, limit: int = 10, *, approximate: bool = False
+    ) -> list[SimilarFragment]:
+        """Return the fragments most similar to an indexed fragment.
+
+        Raises:
+            LookupError: The fragment is not in the index (run :meth:`sync`).
+        """
+        row = self._manifest.execute(
+            "SELECT slot FROM slots WHERE fragment_id = ?;", (str(fragment_id),)
+        ).fetchone()
+        if row is None:
+            msg = f"Fragment {fragment_id} is not indexed"
+            raise LookupError(msg)
+        query = self._read_vector(row[0])
+        return self._nearest(query, limit, approximate, exclude=str(fragment_id))
+
+    def search(
+        self, text: str, limit: int = 10, *, approximate: bool = False
+    ) -> list[SimilarFragment]:
+        """Return the fragments most similar to arbitrary text."""
+        query = self.embedder.embed([text])[0]
+        return self._nearest(query, limit, approximate)
+
+    # Internals
+
+    def _check_dimensions(self) -> int:
+        row = self._manifest.execute(
+            "SELECT value FROM meta WHERE key = 'dimensions';"
+        ).fetchone()
+        dimensions = self.embedder.dimensions
+        if row is None:
+            with self._manifest:
+                self._manifest.execute(
+                    "INSERT INTO meta (key, value) VALUES ('dimensions', ?);",
+                    (str(dimensions),),
+                )
+        elif int(row[0]) != dimensions:
+            msg = (
+                f"Index at {self.path} has {row[0]} dimensions but "
+                f"{self.embedder.name} produces {dimensions}"
+            )
+            raise ValueError(msg)
+        return dimensions
+
+    def _store(self, pending: list[tuple[str, str, bytes, int | None]]) -> int:
+        """Embed a batch, write its vectors, then record it in the manifest."""
+        if not pending:
+            return 0
+        vectors = self.embedder.embed([text for _, text, _, _ in pending])
+        with self._manifest:
+            next_slot = int(self._manifest.execute(NEXT_SLOT_SQL).fetchone()[0])
+            slots = []
+            for _, _, _, existing in pending:
+                slot = existing if existing is not None else self._reuse_slot()
+                if slot is None:
+                    slot, next_slot = next_slot, next_slot + 1
+                slots.append(slot)
+            self._write_vectors(zip(slots, vectors, strict=True))
+            self._manifest.executemany(
+                UPSERT_SLOT_SQL,
+                [
+                    (fragment_id, slot, digest)
+                    for (fragment_id, _, digest, _), slot in zip(
+                        pending, slots, strict=True
+                    )
+                ],
+            )
+        return len(pending)
+
+    def _remove(self, removed: list[tuple[str, int]]) -> None:
+        if not removed:
+            return
+        zeros = [0.0] * self.dimensions
+        self._write_vectors((slot, zeros) for _, slot in removed)
+        with self._manifest:
+            self._manifest.executemany(
+                "DELETE FROM slots WHERE fragment_id = ?;",
+                [(fragment_id,) for fragment_id, _ in removed],
+            )
+            self._manifest.executemany(
+                "INSERT OR IGNORE INTO free_slots (slot) VALUES (?);",
+                [(slot,) for _, slot in removed],
+            )
+
+    def _reuse_slot(self) -> int | None:
+        row = self._manifest.execute(REUSE_SLOT_SQL).fetchone()
+        return int(row[0]) if row is not None else None
+
+    def _write_vectors(self, rows: Iterator[tuple[int, Sequence[float]]]) -> None:
+        with self._vectors_path.open("r+b") as file:
+            for slot, vector in rows:
+                packed = array("f", vector)
+                if not _LITTLE_ENDIAN:
+                    packed.byteswap()
+                file.seek(slot * self._row_bytes)
+                file.write(packed.tobytes())
+
+    def _rows(self) -> int:
+        return self._vectors_path.stat().st_size // self._row_bytes
+
+    def _mapping(self) -> mmap.mmap | None:
+        """Map the vector file, remapping if it grew since the last query."""
+        size = self._rows() * self._row_bytes
+        if self._mapped is not None and len(self._mapped) != size:
+            self._mapped.close()
+            self._mapped = None
+        if self._mapped is None and size:
+            with self._vectors_path.open("rb") as file:
+                self._mapped = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ)
+        return self._mapped
+
+    def _read_vector(self, slot: int) -> list[float]:
+        mapped = self._mapping()
+        assert mapped is not None
+        vector = array("f")
+        vector.frombytes(mapped[slot * self._row_bytes : (slot + 1) * self._row_bytes])
+        if not _LITTLE_ENDIAN:
+            vector.byteswap()
+        return vector.tolist()
+
+    def _nearest(
+        self,
+        query: Sequence[float],
+        limit: int,
+        approximate: bool,
+        exclude: str | None = None,
+    ) -> list[SimilarFragment]:
+        mapped = self._mapping()
+        if mapped is None or limit < 1:
+            return []
+        free = self._manifest.execute("SELECT count(*) FROM free_slots;").fetchone()
+        # Free slots hold zero vectors and may rank; over-fetch to skip them.
+        wanted = limit + int(free[0]) + (exclude is not None)
+        numpy = _numpy()
+        if numpy is None:
+            ranked = self._scan(mapped, query, wanted)
+        else:
+            ranked = self._vectorized(numpy, mapped, query, wanted, approximate)
+        ids = dict(
+            self._manifest.execute(
+                "SELECT slot, fragment_id FROM slots WHERE slot IN "  # noqa: S608
+                f"({', '.join('?' * len(ranked))});",
+                [slot for slot, _ in ranked],
+            ).fetchall()
+        )
+        hits = [
+            SimilarFragment(UUID(ids[slot]), score)
+            for slot, score in ranked
+            if slot in ids and ids[slot] != exclude
+        ]
+        return hits[:limit]
+
+    def _scan(
+        self, mapped: mmap.mmap, query: Sequence[float], wanted: int
+    ) -> list[tuple[int, float]]:
+        """Score every row in pure Python."""
+        view = memoryview(mapped).cast("f")
+        width = self.dimensions
+        if not _LITTLE_ENDIAN:  # pragma: no cover
+            swapped = array("f", view)
+            swapped.byteswap()
+            view = memoryview(swapped)
+        try:
+            scores = (
+                (
+                    slot,
+                    sum(
+                        map(
+                            operator.mul, view[slot * width : (slot + 1) * width], query
+                        )
+                    ),
+                )
+                for slot in range(len(view) // width)
+            )
+            return heapq.nlargest(wanted, scores, key=operator.itemgetter(1))
+        finally:
+            view.release()
+
+    def _vectorized(
+        self,
+        numpy: Any,
+        mapped: mmap.mmap,
+        query: Sequence[float],
+        wanted: int,
+        approximate: bool,
+    ) -> list[tuple[int, float]]:
+        """Score rows with NumPy, optionally only those in the nearest clusters."""
+        matrix = numpy.frombuffer(mapped, dtype="<f4").reshape(-1, self.dimensions)
+        vector = numpy.asarray(query, dtype=numpy.float32)
+        rows = matrix.shape[0]
+        if approximate and rows >= APPROXIMATE_MIN_ROWS:
+            if self._clusters is None or self._clusters.rows != rows:
+                self._clusters = _Clusters(numpy, matrix)
+            candidates = self._clusters.candidates(vector, wanted)
+            scores = matrix[candidates] @ vector
+        else:
+            candidates = None
+            scores = matrix @ vector
+        count = min(wanted, scores.shape[0])
+        top = numpy.argpartition(-scores, count - 1)[:count]
+        top = top[numpy.argsort(-scores[top])]
+        slots = top if candidates is None else candidates[top]
+        return [
+            (int(slot), float(score))
+            for slot, score in zip(slots, scores[top], strict=True)
+        ]
+
+
+class _Clusters:
+    """Inverted-file index: rows grouped under spherical k-means centroids."""
+
+    def __init__(self, numpy: Any, matrix: Any, chunk_rows: int = 65_536) -> None:
+        self._numpy = numpy
+        self.rows = matrix.shape[0]
+        count = max(1, int(numpy.sqrt(self.rows)))
+        generator = numpy.random.default_rng(0)
+        sample_size = min(self.rows, count * APPROXIMATE_SAMPLE_PER_CLUSTER)
+        sample = matrix[numpy.sort(generator.choice(self.rows, sample_size, False))]
+        centroids = sample[generator.choice(sample_size, count, False)].copy()
+        for _ in range(APPROXIMATE_TRAINING_ROUNDS):
+            members = numpy.argmax(sample @ centroids.T, axis=1)
+            sums = numpy.zeros_like(centroids)
+            numpy.add.at(sums, members, sample)
+            norms = numpy.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = numpy.where(
+                norms > 0, sums / numpy.maximum(norms, 1e-12), centroids
+            )
+        self._centroids = centroids.astype(numpy.float32)
+        assignment = numpy.concatenate(
+            [
+                numpy.argmax(
+                    matrix[start : start + chunk_rows] @ self._centroids.T, axis=1
+                )
+                for start in range(0, self.rows, chunk_rows)
+            ]
+        )
+        self._order = numpy.argsort(assignment, kind="stable")
+        self._bounds = numpy.searchsorted(
+            assignment[self._order], numpy.arange(count + 1)
+        )
+
+    def candidates(self, vector: Any, wanted: int) -> Any:
+        """Return the slots in the clusters nearest to ``vector``.
+
+        At least :data:`APPROXIMATE_PROBES` clusters are searched, and more if
+        they hold fewer than ``wanted`` rows between them.
+        """
+        numpy = self._numpy
+        ranked = numpy.argsort(-(self._centroids @ vector))
+        sizes = numpy.cumsum(self._bounds[ranked + 1] - self._bounds[ranked])
+        probes = max(APPROXIMATE_PROBES, int(numpy.searchsorted(sizes, wanted)) + 1)
+        return numpy.concatenate(
+            [
+                self._order[self._bounds[c] : self._bounds[c + 1]]
+                for c in ranked[:probes]
+            ]
+        )
+
+
+def fragment_text(content: str, selected_text: str | None) -> str:
+    """Text embedded for a fragment: its content plus the quoted passage."""
+    return f"{content}\n{selected_text}" if selected_text else content
+
+
+def _numpy() -> Any:
+    """Return the ``numpy`` module, or None if it is not installed."""
+    try:
+        import numpy  # noqa: PLC0415
+    except ImportError:
+        return None
+    return numpy
@@ -1 +1,12 @@
 """Branch Buffer module - post-reading review system."""
+
+from branch.buffer.index import BufferEntry, BufferIndex, StatusChange
+from branch.buffer.session_manager import SessionManager
+
+
+__all__ = [
+    "BufferEntry",
+    "BufferIndex",
+    "SessionManager",
+    "StatusChange",
+]
@@ -0,0 +1,300 @@
+"""Compact in-memory index of the Branch Buffer.
+
+The review UI only needs a handful of fields per fragment: id, status, page,
+timestamps and a short content preview. :class:`BufferIndex` keeps those in
+parallel typed arrays (one slot per fragment) instead of holding full
+``IdeaFragment`` models, so tens of thousands of captures fit in a few MB.
+Full fragments are loaded lazily through a loader such as
+``BranchRepository.get_fragment``.
+"""
+
+from __future__ import annotations
+
+import math
+import sys
+from array import array
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING
+from uuid import UUID
+
+from branch.models import FragmentStatus
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from branch.models import IdeaFragment
+    from branch.storage import BranchRepository
+
+
+DEFAULT_PREVIEW_CHARS = 80
+
+_STATUSES: tuple[FragmentStatus, ...] = tuple(FragmentStatus)
+_STATUS_CODES: dict[FragmentStatus, int] = {s: i for i, s in enumerate(_STATUSES)}
+_NO_PAGE = -1
+_U64 = (1 << 64) - 1
+
+
+@dataclass(frozen=True, slots=True)
+class BufferEntry:
+    """Lightweight view of one fragment, built on demand from the index."""
+
+    id: UUID
+    status: FragmentStatus
+    page_number: int | None
+    captured_at: datetime
+    updated_at: datetime | None
+    preview: str
+
+
+@dataclass(frozen=True, slots=True)
+class StatusChange:
+    """A status transition made in the index that storage has not seen yet."""
+
+    fragment_id: UUID
+    status: FragmentStatus
+    updated_at: datetime
+
+
+class BufferIndex:
+    """Chronological, array-backed index of fragments awaiting review.
+
+    Each fragment occupies one slot across the parallel arrays; ``_slots``
+    maps a fragment id to its slot so status transitions are O(1). Slots are
+    kept in insertion order, which is chronological when fragments are added
+    oldest first (as :meth:`from_repository` does).
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[UUID], IdeaFragment | None] | None = None,
+        preview_chars: int = DEFAULT_PREVIEW_CHARS,
+    ) -> None:
+        self._loader = loader
+        self._preview_chars = preview_chars
+
+        self._slots: dict[int, int] = {}
+        self._id_high = array("Q")
+        self._id_low = array("Q")
+        self._status = array("B")
+        self._page = array("i")
+        self._captured = array("d")
+        self._updated = array("d")
+        self._preview_start = array("L")
+        self._preview_length = array("H")
+        self._preview_data = bytearray()
+
+        self._dirty: set[int] = set()
+
+    @classmethod
+    def from_repository(
+        cls,
+        repository: BranchRepository,
+        document_id: UUID,
+        status: FragmentStatus | None = None,
+        preview_chars: int = DEFAULT_PREVIEW_CHARS,
+    ) -> BufferIndex:
+        """Build an index for a document by streaming its fragments."""
+        index = cls(loader=repository.get_fragment, preview_chars=preview_chars)
+        index.add_many(repository.iter_fragments(document_id, status=status))
+        return index
+
+    # Building
+
+    def add(
+        self,
+        fragment_id: UUID,
+        content: str,
+        captured_at: datetime,
+        *,
+        status: FragmentStatus = FragmentStatus.CAPTURED,
+        page_number: int | None = None,
+        updated_at: datetime | None = None,
+    ) -> None:
+        """Add a fragment, or refresh its slot if it is already indexed."""
+        key = fragment_id.int
+        preview = content[: self._preview_chars].encode()
+        slot = self._slots.get(key)
+        if slot is None:
+            self._slots[key] = len(self._status)
+            self._id_high.append(key >> 64)
+            self._id_low.append(key & _U64)
+            self._status.append(_STATUS_CODES[status])
+            self._page.append(_NO_PAGE if page_number is None else page_number)
+            self._captured.append(_timestamp(captured_at))
+            self._updated.append(_timestamp(updated_at))
+            self._preview_start.append(len(self._preview_data))
+            self._preview_length.append(len(preview))
+            self._preview_data += preview
+            return
+
+        self._status[slot] = _STATUS_CODES[status]
+        self._page[slot] = _NO_PAGE if page_number is None else page_number
+        self._captured[slot] = _timestamp(captured_at)
+        self._updated[slot] = _timestamp(updated_at)
+        if preview != self._preview_bytes(slot):
+            self._preview_start[slot] = len(self._preview_data)
+            self._preview_length[slot] = len(preview)
+            self._preview_data += preview
+
+    def add_fragment(self, fragment: IdeaFragment) -> None:
+        """Index a full fragment model, keeping only the review fields."""
+        self.add(
+            fragment.id,
+            fragment.content,
+            fragment.captured_at,
+            status=fragment.status,
+            page_number=fragment.anchor.page_number if fragment.anchor else None,
+            updated_at=fragment.updated_at,
+        )
+
+    def add_many(self, fragments: Iterable[IdeaFragment]) -> None:
+        """Index fragments one at a time without materializing the iterable."""
+        for fragment in fragments:
+            self.add_fragment(fragment)
+
+    # Lookups
+
+    def __len__(self) -> int:
+        """Return the number of indexed fragments."""
+        return len(self._status)
+
+    def __contains__(self, fragment_id: object) -> bool:
+        """Return whether a fragment id is indexed."""
+        return isinstance(fragment_id, UUID) and fragment_id.int in self._slots
+
+    def status_of(self, fragment_id: UUID) -> FragmentStatus:
+        """Return the current status of an indexed fragment."""
+        return _STATUSES[self._status[self._slot(fragment_id)]]
+
+    def entry(self, fragment_id: UUID) -> BufferEntry:
+        """Return the review fields for one fragment."""
+        return self._entry(self._slot(fragment_id))
+
+    def entries(self, status: FragmentStatus | None = None) -> Iterator[BufferEntry]:
+        """Yield entries in slot order, optionally filtered by status."""
+        code = None if status is None else _STATUS_CODES[status]
+        for slot, slot_status in enumerate(self._status):
+            if code is None or slot_status == code:
+                yield self._entry(slot)
+
+    def counts(self) -> dict[FragmentStatus, int]:
+        """Return the number of fragments in each status."""
+        tally = [0] * len(_STATUSES)
+        for code in self._status:
+            tally[code] += 1
+        return dict(zip(_STATUSES, tally, strict=True))
+
+    def load(self, fragment_id: UUID) -> IdeaFragment | None:
+        """Load the full fragment (including content) through the loader."""
+        self._slot(fragment_id)
+        if self._loader is None:
+            msg = "BufferIndex has no loader for full fragments"
+            raise LookupError(msg)
+        return self._loader(fragment_id)
+
+    # Status transitions
+
+    def set_status(
+        self, fragment_id: UUID, status: FragmentStatus, at: datetime | None = None
+    ) -> None:
+        """Move a fragment to ``status`` in O(1) and remember it as dirty."""
+        slot = self._slot(fragment_id)
+        self._status[slot] = _STATUS_CODES[status]
+        self._updated[slot] = _timestamp(at or datetime.utcnow())
+        self._dirty.add(slot)
+
+    def mark_reviewed(self, fragment_id: UUID) -> None:
+        """Mark a fragment as reviewed."""
+        self.set_status(fragment_id, FragmentStatus.REVIEWED)
+
+    def develop(self, fragment_id: UUID) -> None:
+        """Mark a fragment as developed into fuller notes."""
+        self.set_status(fragment_id, FragmentStatus.DEVELOPED)
+
+    def archive(self, fragment_id: UUID) -> None:
+        """Archive a fragment."""
+        self.set_status(fragment_id, FragmentStatus.ARCHIVED)
+
+    def discard(self, fragment_id: UUID) -> None:
+        """Mark a fragment for removal."""
+        self.set_status(fragment_id, FragmentStatus.DISCARDED)
+
+    def flush_changes(self, repository: BranchRepository) -> int:
+        """Persist pending status transitions; returns how many were written."""
+        changes = self.drain_changes()
+        if changes:
+            repository.update_fragment_statuses(
+                (c.fragment_id, c.status, c.updated_at) for c in changes
+            )
+        return len(changes)
+
+    def drain_changes(self) -> list[StatusChange]:
+        """Return and clear the status transitions made since the last drain."""
+        changes = [
+            StatusChange(
+                self._id(slot),
+                _STATUSES[self._status[slot]],
+                _datetime(self._updated[slot]),
+            )
+            for slot in sorted(self._dirty)
+        ]
+        self._dirty.clear()
+        return changes
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index structures."""
+        arrays = (
+            self._id_high,
+            self._id_low,
+            self._status,
+            self._page,
+            self._captured,
+            self._updated,
+            self._preview_start,
+            self._preview_length,
+        )
+        total = sum(sys.getsizeof(values) for values in arrays)
+        total += sys.getsizeof(self._preview_data) + sys.getsizeof(self._slots)
+        # Keys are the 128-bit UUID ints; slot values are small cached ints.
+        total += sum(sys.getsizeof(key) for key in self._slots)
+        return total
+
+    # Internals
+
+    def _slot(self, fragment_id: UUID) -> int:
+        try:
+            return self._slots[fragment_id.int]
+        except KeyError:
+            msg = f"Fragment {fragment_id} is not in the buffer index"
+            raise KeyError(msg) from None
+
+    def _id(self, slot: int) -> UUID:
+        return UUID(int=(self._id_high[slot] << 64) | self._id_low[slot])
+
+    def _preview_bytes(self, slot: int) -> bytes:
+        start = self._preview_start[slot]
+        return bytes(self._preview_data[start : start + self._preview_length[slot]])
+
+    def _entry(self, slot: int) -> BufferEntry:
+        page = self._page[slot]
+        updated = self._updated[slot]
+        return BufferEntry(
+            id=self._id(slot),
+            status=_STATUSES[self._status[slot]],
+            page_number=None if page == _NO_PAGE else page,
+            captured_at=_datetime(self._captured[slot]),
+            updated_at=None if math.isnan(updated) else _datetime(updated),
+            preview=self._preview_bytes(slot).decode(),
+        )
+
+
+def _timestamp(value: datetime | None) -> float:
+    """Encode a naive UTC datetime as epoch seconds (NaN for None)."""
+    return math.nan if value is None else value.replace(tzinfo=UTC).timestamp()
+
+
+def _datetime(value: float) -> datetime:
+    """Decode epoch seconds back into a naive UTC datetime."""
+    return datetime.fromtimestamp(value, UTC).replace(tzinfo=None)
@@ -0,0 +1,400 @@
+"""In-memory reading session with periodic checkpoints.
+
+Every capture in a reading session used to be its own write, and the
+session's counters (``record_capture``, ``record_dive_deep``) were never
+persisted. :class:`SessionManager` keeps the active :class:`BranchSession`
+and its fragments in memory, marks what changes as dirty, and writes only
+the dirty rows in one transaction at a *checkpoint*: every
+``checkpoint_interval`` seconds, when the reader turns the page after
+capturing something, and when the session ends. A page turn on its own only
+moves ``end_page`` in memory; the next checkpoint persists it. A long
+session costs a handful of transactions instead of one per capture or page.
+
+Between checkpoints each change is appended to a small JSON Lines journal.
+A checkpoint rotates to a new journal segment before writing and deletes
+older segments once the transaction commits, so after a crash
+:meth:`SessionManager.recover` replays exactly the changes that never reached
+the database.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any
+
+from branch.config import Config
+from branch.instrumentation import current
+from branch.models import BranchSession, IdeaFragment
+from branch.storage import StorageError
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import IO
+    from uuid import UUID
+
+    from branch.storage import BranchRepository
+
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_GLOB = "session-*.jsonl"
+
+
+class SessionManager:
+    """Buffer the active reading session and checkpoint it to storage."""
+
+    def __init__(
+        self,
+        repository: BranchRepository,
+        journal_dir: Path | None = None,
+        *,
+        checkpoint_interval: float | None = None,
+        fsync: bool | None = None,
+    ) -> None:
+        """Create a manager; call :meth:`start` to enable timed checkpoints.
+
+        Args:
+            repository: Where checkpoints are written.
+            journal_dir: Directory for journal segments; without one, changes
+                since the last checkpoint are lost on a crash.
+            checkpoint_interval: Seconds between timed checkpoints
+                (``SESSION_CHECKPOINT_S``).
+            fsync: Sync the journal after each change (``CAPTURE_FSYNC``).
+        """
+        self._repository = repository
+        self._journal_dir = journal_dir
+        self._interval = (
+            Config.SESSION_CHECKPOINT_S
+            if checkpoint_interval is None
+            else checkpoint_interval
+        )
+        self._fsync = Config.CAPTURE_FSYNC if fsync is None else fsync
+
+        self._lock = threading.RLock()
+        self._checkpoint_lock = threading.Lock()
+        self._session: BranchSession | None = None
+        self._fragments: dict[UUID, IdeaFragment] = {}
+        self._session_dirty = False
+        # ``end_page`` moved since the last checkpoint (not journaled).
+        self._page_moved = False
+        self._dirty: set[UUID] = set()
+
+        self._journal: IO[str] | None = None
+        self._next_segment = 0
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.checkpoints = 0
+
+    # Lifecycle
+
+    def start(self) -> SessionManager:
+        """Replay any journal left by a crash and start the checkpoint timer."""
+        if self._thread is not None:
+            return self
+        self.recover()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="branch-session-checkpoint", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the timer and checkpoint whatever is still dirty."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.checkpoint()
+        with self._lock:
+            self._close_journal()
+
+    def __enter__(self) -> SessionManager:
+        """Start the manager when entering a ``with`` block."""
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Checkpoint and stop when leaving the ``with`` block."""
+        self.close()
+
+    # Session state
+
+    @property
+    def session(self) -> BranchSession | None:
+        """The active session, or None between sessions."""
+        return self._session
+
+    @property
+    def fragments(self) -> list[IdeaFragment]:
+        """Fragments captured in the active session, oldest first."""
+        with self._lock:
+            return list(self._fragments.values())
+
+    @property
+    def dirty(self) -> int:
+        """Rows (session and fragments) waiting for the next checkpoint."""
+        with self._lock:
+            return len(self._dirty) + (self._session_dirty or self._page_moved)
+
+    def start_session(self, document_id: UUID, start_page: int = 1) -> BranchSession:
+        """Begin a session on a document, ending any session still active."""
+        session = BranchSession(document_id=document_id, start_page=start_page)
+        with self._checkpoint_lock:
+            if self._session is not None:
+                self._end_session(None)
+            with self._lock:
+                self._session = session
+                self._fragments = {}
+                self._touch_session()
+        return session
+
+    def end_session(self, end_page: int | None = None) -> BranchSession:
+        """End the active session and checkpoint it.
+
+        Raises:
+            StorageError: No session is active.
+        """
+        with self._checkpoint_lock:
+            return self._end_session(end_page)
+
+    def capture(self, fragment: IdeaFragment) -> IdeaFragment:
+        """Add a fragment to the active session without writing it yet.
+
+        The fragment is attached to the session (and its document when it has
+        none) and counted by :meth:`BranchSession.record_capture`.
+        """
+        with self._lock:
+            session = self._require_session()
+            fragment.session_id = session.id
+            if fragment.document_id is None:
+                fragment.document_id = session.document_id
+            self._fragments[fragment.id] = fragment
+            session.record_capture()
+            self._touch_session()
+            self._touch_fragment(fragment)
+        return fragment
+
+    def update_fragment(self, fragment: IdeaFragment) -> None:
+        """Record an edit to a fragment captured in this session.
+
+        Raises:
+            LookupError: The fragment does not belong to the active session.
+        """
+        with self._lock:
+            if fragment.id not in self._fragments:
+                msg = f"Fragment {fragment.id} is not part of the active session"
+                raise LookupError(msg)
+            self._fragments[fragment.id] = fragment
+            self._touch_fragment(fragment)
+
+    def record_dive_deep(self) -> None:
+        """Count a "Dive Deep" in the active session."""
+        with self._lock:
+            self._require_session().record_dive_deep()
+            self._touch_session()
+
+    def turn_page(self, page: int) -> None:
+        """Note the page being read; checkpoint if captures are waiting.
+
+        The new page alone is kept in memory and written by the next timed
+        checkpoint or :meth:`end_session`, so paging through a document does
+        not cost a transaction per page.
+        """
+        with self._lock:
+            session = self._require_session()
+            if session.end_page != page:
+                session.end_page = page
+                self._page_moved = True
+            captured = self._session_dirty or bool(self._dirty)
+        if captured:
+            self.checkpoint()
+
+    # Checkpoints
+
+    def checkpoint(self) -> int:
+        """Write dirty rows in one transaction.
+
+        Returns:
+            The number of rows written.
+        """
+        with self._checkpoint_lock:
+            with self._lock:
+                batch = self._take_dirty()
+            return 0 if batch is None else self._write(*batch)
+
+    def recover(self) -> int:
+        """Write the changes recorded in journal segments left by a crash.
+
+        Returns:
+            The number of rows written.
+        """
+        if self._journal_dir is None:
+            return 0
+        self._journal_dir.mkdir(parents=True, exist_ok=True)
+        segments = sorted(self._journal_dir.glob(JOURNAL_GLOB))
+        if not segments:
+            return 0
+        self._next_segment = _segment_number(segments[-1]) + 1
+        sessions: dict[UUID, BranchSession] = {}
+        fragments: dict[UUID, IdeaFragment] = {}
+        for path in segments:
+            for record in _read_journal(path):
+                if record["kind"] == "session":
+                    session = BranchSession.model_validate(record["data"])
+                    sessions[session.id] = session
+                else:
+                    fragment = IdeaFragment.model_validate(record["data"])
+                    fragments[fragment.id] = fragment
+        for session in sessions.values():
+            self._repository.upsert_session_and_fragments(
+                session,
+                [f for f in fragments.values() if f.session_id == session.id],
+            )
+        orphans = [f for f in fragments.values() if f.session_id not in sessions]
+        if orphans:
+            self._repository.upsert_session_and_fragments(None, orphans)
+        for path in segments:
+            path.unlink()
+        recovered = len(sessions) + len(fragments)
+        logger.info("Recovered %d session rows from the journal", recovered)
+        return recovered
+
+    # Checkpoint internals (callers hold ``_checkpoint_lock``)
+
+    def _end_session(self, end_page: int | None) -> BranchSession:
+        """End the session and detach it in the same critical section.
+
+        Captures racing with this fail with "no reading session" instead of
+        landing in a session that is already being written and reset.
+        """
+        with self._lock:
+            session = self._require_session()
+            session.end_session(end_page)
+            self._touch_session()
+            fragments = self._fragments
+            batch = self._take_dirty()
+            self._session = None
+            self._fragments = {}
+        assert batch is not None
+        try:
+            self._write(*batch)
+        except StorageError:
+            with self._lock:
+                self._session = session
+                self._fragments = fragments
+            raise
+        return session
+
+    def _take_dirty(
+        self,
+    ) -> tuple[BranchSession | None, list[IdeaFragment], list[Path]] | None:
+        """Copy and clear the dirty rows and rotate the journal (caller locks)."""
+        session = (
+            self._session.model_copy()
+            if self._session is not None and (self._session_dirty or self._page_moved)
+            else None
+        )
+        fragments = [self._fragments[i].model_copy() for i in self._dirty]
+        if session is None and not fragments:
+            return None
+        self._session_dirty = False
+        self._page_moved = False
+        self._dirty = set()
+        return session, fragments, self._rotate_journal()
+
+    def _write(
+        self,
+        session: BranchSession | None,
+        fragments: list[IdeaFragment],
+        finished: list[Path],
+    ) -> int:
+        """Commit one checkpoint; on failure mark its rows dirty again."""
+        try:
+            self._repository.upsert_session_and_fragments(session, fragments)
+        except StorageError:
+            with self._lock:
+                self._session_dirty |= session is not None
+                self._dirty.update(fragment.id for fragment in fragments)
+            raise
+        for path in finished:
+            path.unlink(missing_ok=True)
+        self.checkpoints += 1
+        written = len(fragments) + (session is not None)
+        current().count("session_checkpoint_rows", written)
+        return written
+
+    # Internals (callers hold ``_lock``)
+
+    def _require_session(self) -> BranchSession:
+        if self._session is None:
+            msg = "No reading session is active; call start_session() first"
+            raise StorageError(msg)
+        return self._session
+
+    def _touch_session(self) -> None:
+        assert self._session is not None
+        self._session_dirty = True
+        self._append("session", self._session.model_dump(mode="json"))
+
+    def _touch_fragment(self, fragment: IdeaFragment) -> None:
+        self._dirty.add(fragment.id)
+        self._append("fragment", fragment.model_dump(mode="json"))
+
+    def _append(self, kind: str, data: dict[str, Any]) -> None:
+        if self._journal_dir is None:
+            return
+        journal = self._journal or self._open_journal()
+        journal.write(json.dumps({"kind": kind, "data": data}) + "\n")
+        journal.flush()
+        if self._fsync:
+            os.fsync(journal.fileno())
+
+    def _open_journal(self) -> IO[str]:
+        assert self._journal_dir is not None
+        self._journal_dir.mkdir(parents=True, exist_ok=True)
+        path = self._journal_dir / f"session-{self._next_segment:010d}.jsonl"
+        self._next_segment += 1
+        self._journal = path.open("a", encoding="utf-8")
+        return self._journal
+
+    def _rotate_journal(self) -> list[Path]:
+        """Close the active segment; return every segment the checkpoint covers."""
+        self._close_journal()
+        if self._journal_dir is None:
+            return []
+        return sorted(self._journal_dir.glob(JOURNAL_GLOB))
+
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self.checkpoint()
+            except StorageError:
+                logger.exception("Session checkpoint failed; will retry")
+
+
+def _segment_number(path: Path) -> int:
+    return int(path.stem.removeprefix("session-"))
+
+
+def _read_journal(path: Path) -> list[dict[str, Any]]:
+    """Parse a journal segment, ignoring a torn final line from a crash."""
+    records = []
+    with path.open(encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning("Skipping unreadable line %d in %s", number, path)
+    return records
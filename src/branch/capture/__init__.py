@@ -1 +1,28 @@
 """Idea capture module for Branch."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from branch._lazy import lazy_exports
+
+
+if TYPE_CHECKING:
+    from branch.capture.queue import CaptureQueue
+    from branch.capture.voice import VoiceCapture, WhisperTranscriber
+
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "CaptureQueue": "branch.capture.queue",
+        "VoiceCapture": "branch.capture.voice",
+        "WhisperTranscriber": "branch.capture.voice",
+    },
+)
+
+__all__ = [
+    "CaptureQueue",
+    "VoiceCapture",
+    "WhisperTranscriber",
+]
@@ -0,0 +1,379 @@
+"""Write-behind capture queue.
+
+Capturing an idea must never stall the reader on an SQLite commit or fsync.
+:meth:`CaptureQueue.capture` appends the fragment to a spill segment on disk
+and to an in-memory queue, then returns. A background thread group-commits
+queued fragments through ``upsert_fragments_many`` once ``max_batch`` items
+are waiting or the oldest has waited ``max_delay`` seconds.
+
+Spill segments are append-only JSON Lines files. Each flush rotates to a new
+segment and deletes the old one only after its fragments are committed, so a
+crash at any point leaves every uncommitted capture on disk for
+:meth:`CaptureQueue.recover` to replay on the next start.
+
+Only rows that violate a constraint are set aside in ``rejected.jsonl``. Any
+other failure, such as a busy or locked database, keeps the spill segments
+and re-queues the whole batch after a growing backoff. If commits keep
+failing for ``retry_window`` seconds the flusher stops: waiting
+:meth:`CaptureQueue.flush` calls return False, new captures are refused, and
+the spill segments are replayed on the next start.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from pydantic import ValidationError
+
+from branch.config import Config
+from branch.instrumentation import current
+from branch.metrics import LatencyRecorder, LatencySummary
+from branch.models import IdeaFragment
+from branch.storage import StorageError
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import IO
+
+    from branch.storage import BranchRepository
+
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_GLOB = "capture-*.jsonl"
+REJECTED_FILE = "rejected.jsonl"
+RETRY_BACKOFF_S = 0.05
+RETRY_BACKOFF_MAX_S = 5.0
+
+
+class CaptureQueue:
+    """Accept captures immediately and persist them in background batches."""
+
+    def __init__(
+        self,
+        repository: BranchRepository,
+        spill_dir: Path | None = None,
+        *,
+        max_batch: int | None = None,
+        max_delay: float | None = None,
+        fsync: bool | None = None,
+        retry_window: float | None = None,
+    ) -> None:
+        self._repository = repository
+        self._spill_dir = spill_dir
+        self._max_batch = max_batch or Config.CAPTURE_MAX_BATCH
+        self._max_delay = (
+            Config.CAPTURE_MAX_DELAY_MS / 1000 if max_delay is None else max_delay
+        )
+        self._fsync = Config.CAPTURE_FSYNC if fsync is None else fsync
+        self._retry_window = (
+            Config.CAPTURE_RETRY_WINDOW_S if retry_window is None else retry_window
+        )
+
+        self._condition = threading.Condition()
+        self._queue: list[IdeaFragment] = []
+        self._oldest_at = 0.0
+        self._captured = 0
+        self._committed = 0
+        self._flush_requested = False
+        self._closing = False
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+
+        self._segment: IO[str] | None = None
+        self._segment_path: Path | None = None
+        # Segments whose captures were re-queued after a failed commit.
+        self._retained: list[Path] = []
+        self._next_segment = 0
+
+        self.capture_latency = LatencyRecorder()
+        self.flush_latency = LatencyRecorder()
+
+    # Lifecycle
+
+    def start(self) -> CaptureQueue:
+        """Replay any spilled captures from a previous run and start flushing."""
+        if self._thread is not None:
+            return self
+        self.recover()
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run, name="branch-capture-flusher", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self, timeout: float | None = None) -> None:
+        """Commit everything still queued, then stop the background thread."""
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._close_segment()
+
+    def __enter__(self) -> CaptureQueue:
+        """Start the queue when entering a ``with`` block."""
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Drain and stop the queue when leaving the ``with`` block."""
+        self.close()
+
+    # Capture path
+
+    def capture(self, fragment: IdeaFragment) -> None:
+        """Queue a fragment for persistence and return without touching SQLite."""
+        started = time.perf_counter()
+        line = fragment.model_dump_json() + "\n"
+        with self._condition:
+            if self._closing:
+                msg = "CaptureQueue is closed"
+                raise StorageError(msg)
+            if self._stopped:
+                msg = "CaptureQueue stopped after repeated commit failures"
+                raise StorageError(msg)
+            if self._spill_dir is not None:
+                segment = self._segment or self._open_segment()
+                segment.write(line)
+                segment.flush()
+                if self._fsync:
+                    os.fsync(segment.fileno())
+            self._queue.append(fragment)
+            self._captured += 1
+            if len(self._queue) == 1:
+                self._oldest_at = time.monotonic()
+                self._condition.notify_all()
+            elif len(self._queue) >= self._max_batch:
+                self._condition.notify_all()
+        elapsed = time.perf_counter() - started
+        self.capture_latency.record(elapsed)
+        instrumentation = current()
+        if instrumentation.enabled:
+            instrumentation.span("capture.enqueue", elapsed)
+            instrumentation.count("captures")
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything captured so far is committed.
+
+        Returns:
+            False if ``timeout`` expired or the flusher stopped first, True
+            otherwise.
+        """
+        with self._condition:
+            if self._thread is None:
+                msg = "CaptureQueue is not running; call start() first"
+                raise StorageError(msg)
+            target = self._captured
+            self._flush_requested = True
+            self._condition.notify_all()
+            self._condition.wait_for(
+                lambda: self._committed >= target or self._stopped, timeout=timeout
+            )
+            return self._committed >= target
+
+    @property
+    def pending(self) -> int:
+        """Number of captured fragments not yet committed."""
+        with self._condition:
+            return self._captured - self._committed
+
+    def latency(self) -> dict[str, LatencySummary]:
+        """Return p50/p99 summaries for ``capture()`` and for batch commits."""
+        return {
+            "capture": self.capture_latency.summary(),
+            "flush": self.flush_latency.summary(),
+        }
+
+    # Recovery
+
+    def recover(self) -> int:
+        """Commit fragments left in spill segments by a previous run.
+
+        Returns:
+            The number of fragments replayed.
+        """
+        if self._spill_dir is None:
+            return 0
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        segments = sorted(self._spill_dir.glob(SEGMENT_GLOB))
+        if segments:
+            self._next_segment = _segment_number(segments[-1]) + 1
+        replayed = 0
+        for path in segments:
+            fragments = _read_segment(path)
+            self._commit(fragments)
+            path.unlink()
+            replayed += len(fragments)
+        if replayed:
+            logger.info("Recovered %d spilled captures", replayed)
+        return replayed
+
+    # Background flushing
+
+    def _run(self) -> None:
+        try:
+            self._flush_loop()
+        finally:
+            with self._condition:
+                self._stopped = True
+                self._condition.notify_all()
+
+    def _flush_loop(self) -> None:
+        backoff = RETRY_BACKOFF_S
+        failing_since: float | None = None
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._queue or self._closing or self._flush_requested
+                )
+                while (
+                    self._queue
+                    and not self._closing
+                    and not self._flush_requested
+                    and len(self._queue) < self._max_batch
+                ):
+                    remaining = self._oldest_at + self._max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._queue = self._queue, []
+                batch_oldest = self._oldest_at
+                self._flush_requested = False
+                finished_segment = self._rotate_segment()
+                stop = self._closing and not batch
+
+            try:
+                self._commit(batch)
+            except Exception:
+                now = time.monotonic()
+                failing_since = now if failing_since is None else failing_since
+                give_up = now - failing_since >= self._retry_window
+                logger.exception("Capture commit failed; retrying in %.2fs", backoff)
+                current().count("capture_retries")
+                with self._condition:
+                    self._queue[:0] = batch
+                    self._oldest_at = batch_oldest
+                    # Retry as soon as the backoff ends, without batching delay.
+                    self._flush_requested = True
+                    if finished_segment is not None:
+                        self._retained.append(finished_segment)
+                    if self._closing or give_up:
+                        logger.error(
+                            "Stopping with %d uncommitted captures left for recovery",
+                            len(self._queue),
+                        )
+                        return
+                    self._condition.wait_for(lambda: self._closing, timeout=backoff)
+                backoff = min(backoff * 2, RETRY_BACKOFF_MAX_S)
+                continue
+
+            backoff = RETRY_BACKOFF_S
+            failing_since = None
+            with self._condition:
+                finished, self._retained = self._retained, []
+            if finished_segment is not None:
+                finished.append(finished_segment)
+            for path in finished:
+                path.unlink(missing_ok=True)
+            with self._condition:
+                self._committed += len(batch)
+                self._condition.notify_all()
+            if stop:
+                return
+
+    def _commit(self, batch: list[IdeaFragment]) -> None:
+        """Group-commit a batch, isolating rows that violate a constraint.
+
+        Raises:
+            StorageError: The batch failed for a reason other than a
+                constraint, e.g. a locked database; nothing is rejected and
+                the caller should retry it.
+        """
+        if not batch:
+            return
+        started = time.perf_counter()
+        rejected = 0
+        try:
+            self._repository.upsert_fragments_many(batch)
+        except StorageError as exc:
+            if not _violates_constraint(exc):
+                raise
+            logger.warning("Batch commit failed; retrying fragments one by one")
+            for fragment in batch:
+                try:
+                    self._repository.upsert_fragment(fragment)
+                except StorageError as row_exc:
+                    if not _violates_constraint(row_exc):
+                        raise
+                    logger.exception("Rejected capture %s", fragment.id)
+                    self._reject(fragment)
+                    rejected += 1
+        elapsed = time.perf_counter() - started
+        self.flush_latency.record(elapsed)
+        instrumentation = current()
+        if instrumentation.enabled:
+            instrumentation.span("capture.flush", elapsed)
+            instrumentation.count("captures_committed", len(batch) - rejected)
+            if rejected:
+                instrumentation.count("captures_rejected", rejected)
+
+    def _reject(self, fragment: IdeaFragment) -> None:
+        if self._spill_dir is None:
+            return
+        with (self._spill_dir / REJECTED_FILE).open("a", encoding="utf-8") as file:
+            file.write(fragment.model_dump_json() + "\n")
+
+    # Spill segments (callers hold ``_condition``)
+
+    def _open_segment(self) -> IO[str]:
+        assert self._spill_dir is not None
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        self._segment_path = (
+            self._spill_dir / f"capture-{self._next_segment:010d}.jsonl"
+        )
+        self._next_segment += 1
+        self._segment = self._segment_path.open("a", encoding="utf-8")
+        return self._segment
+
+    def _rotate_segment(self) -> Path | None:
+        """Close the active segment and return its path for later deletion."""
+        path = self._segment_path
+        self._close_segment()
+        return path
+
+    def _close_segment(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+        self._segment = None
+        self._segment_path = None
+
+
+def _violates_constraint(exc: StorageError) -> bool:
+    """Whether retrying the same row can never succeed."""
+    return isinstance(exc.__cause__, sqlite3.IntegrityError)
+
+
+def _segment_number(path: Path) -> int:
+    return int(path.stem.removeprefix("capture-"))
+
+
+def _read_segment(path: Path) -> list[IdeaFragment]:
+    """Parse a spill segment, ignoring a torn final line from a crash."""
+    fragments = []
+    with path.open(encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                fragments.append(IdeaFragment.model_validate_json(line))
+            except ValidationError:
+                logger.warning("Skipping unreadable line %d in %s", number, path)
+    return fragments
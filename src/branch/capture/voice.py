@@ -0,0 +1,341 @@
+"""Background voice transcription.
+
+A voice capture must not wait for speech recognition. :meth:`VoiceCapture.capture`
+writes the audio next to the database, stores a placeholder fragment
+(``capture_type="voice"``, content :data:`PENDING_CONTENT`) and returns. A
+bounded pool of worker threads transcribes the audio and then sets only the
+fragment's ``content`` and ``updated_at``, so a review made in the meantime is
+kept.
+
+Loading a Whisper model takes seconds, so :class:`WhisperTranscriber` loads it
+once and every worker shares it. Decoding audio (an ``ffmpeg`` subprocess) runs
+in parallel; inference on the shared model is serialized because Whisper
+installs per-call hooks on the model while decoding.
+
+Audio files are kept after transcription. A voice fragment whose content is
+still the placeholder, because the process stopped or transcription failed,
+is found with one query and queued again by :meth:`VoiceCapture.recover`. A
+transcript whose placeholder is gone (rejected by the capture queue or
+deleted), or still queued after ``flush_timeout``, counts as a failure.
+"""
+
+from __future__ import annotations
+
+import logging
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Protocol
+
+from branch.config import Config
+from branch.instrumentation import current
+from branch.metrics import LatencyRecorder, LatencySummary
+from branch.models import IdeaFragment
+from branch.storage import StorageError
+
+
+if TYPE_CHECKING:
+    from uuid import UUID
+
+    from branch.capture.queue import CaptureQueue
+    from branch.models.idea_fragment import TextAnchor
+    from branch.storage import BranchRepository
+
+
+logger = logging.getLogger(__name__)
+
+PENDING_CONTENT = "(voice note, transcribing…)"
+DEFAULT_AUDIO_SUFFIX = ".wav"
+
+
+class Transcriber(Protocol):
+    """Speech-to-text backend shared by all transcription workers."""
+
+    def transcribe(self, audio: Path) -> str:
+        """Return the text spoken in an audio file."""
+        ...
+
+
+class WhisperTranscriber:
+    """OpenAI Whisper, loaded once on first use (the ``ai`` extra)."""
+
+    def __init__(self, model_size: str | None = None) -> None:
+        self.model_size = model_size or Config.WHISPER_MODEL_SIZE
+        self._model: Any = None
+        self._load_lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+
+    def load(self) -> Any:
+        """Load the model if no worker has yet, and return it.
+
+        Raises:
+            ImportError: The ``whisper`` package (``ai`` extra) is missing.
+        """
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    import whisper  # noqa: PLC0415
+
+                    started = time.perf_counter()
+                    self._model = whisper.load_model(self.model_size)
+                    logger.info(
+                        "Loaded Whisper %s model in %.1fs",
+                        self.model_size,
+                        time.perf_counter() - started,
+                    )
+        return self._model
+
+    def transcribe(self, audio: Path) -> str:
+        """Decode ``audio`` and run the shared model on it."""
+        import whisper  # noqa: PLC0415
+
+        model = self.load()
+        samples = whisper.load_audio(str(audio))
+        with self._inference_lock:
+            result = model.transcribe(samples)
+        return str(result["text"]).strip()
+
+
+class VoiceCapture:
+    """Store voice captures immediately and transcribe them in the background."""
+
+    def __init__(
+        self,
+        repository: BranchRepository,
+        audio_dir: Path | None = None,
+        transcriber: Transcriber | None = None,
+        *,
+        workers: int | None = None,
+        capture_queue: CaptureQueue | None = None,
+        flush_timeout: float | None = None,
+    ) -> None:
+        """Create a voice capture pipeline; call :meth:`start` before capturing.
+
+        Args:
+            repository: Where placeholders are stored and transcripts written.
+            audio_dir: Directory for audio files (``VOICE_AUDIO_DIR``).
+            transcriber: Speech-to-text backend; defaults to a
+                :class:`WhisperTranscriber` of ``WHISPER_MODEL_SIZE``.
+            workers: Transcription threads (``VOICE_WORKERS``).
+            capture_queue: Store placeholders through this write-behind queue
+                instead of committing them on the caller's thread.
+            flush_timeout: Seconds a worker waits for its placeholder to
+                leave ``capture_queue`` (``VOICE_FLUSH_TIMEOUT_S``).
+        """
+        self._repository = repository
+        self._audio_dir = audio_dir or Config.VOICE_AUDIO_DIR
+        self._transcriber = transcriber or WhisperTranscriber()
+        self._workers = workers or Config.VOICE_WORKERS
+        self._capture_queue = capture_queue
+        self._flush_timeout = (
+            Config.VOICE_FLUSH_TIMEOUT_S if flush_timeout is None else flush_timeout
+        )
+
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._futures: set[Future[None]] = set()
+        self._transcribed = 0
+        self._failed = 0
+
+        self.transcribe_latency = LatencyRecorder()
+
+    # Lifecycle
+
+    def start(self) -> VoiceCapture:
+        """Start the worker pool and re-queue unfinished transcriptions."""
+        with self._lock:
+            if self._executor is not None:
+                return self
+            self._audio_dir.mkdir(parents=True, exist_ok=True)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._workers, thread_name_prefix="branch-voice"
+            )
+        self.recover()
+        return self
+
+    def close(self, *, wait_for_pending: bool = True) -> None:
+        """Stop the pool, by default after finishing queued transcriptions.
+
+        Without ``wait_for_pending`` queued work is dropped; its placeholders
+        are picked up again by :meth:`recover` on the next start.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=not wait_for_pending)
+
+    def __enter__(self) -> VoiceCapture:
+        """Start the pool when entering a ``with`` block."""
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Finish pending transcriptions and stop when leaving the block."""
+        self.close()
+
+    # Capture path
+
+    def capture(
+        self,
+        audio: bytes | Path,
+        *,
+        suffix: str | None = None,
+        document_id: UUID | None = None,
+        session_id: UUID | None = None,
+        anchor: TextAnchor | None = None,
+    ) -> IdeaFragment:
+        """Save the audio and a placeholder fragment, then queue transcription.
+
+        Args:
+            audio: Recorded audio, as bytes or a file to copy.
+            suffix: File extension for byte input; taken from the path
+                otherwise.
+            document_id: Document the idea belongs to.
+            session_id: Reading session the idea belongs to.
+            anchor: Position in the document.
+
+        Returns:
+            The placeholder fragment; its content is replaced when the
+            transcription finishes.
+        """
+        if self._executor is None:
+            msg = "VoiceCapture is not running; call start() first"
+            raise StorageError(msg)
+        fragment = IdeaFragment(
+            content=PENDING_CONTENT,
+            capture_type="voice",
+            document_id=document_id,
+            session_id=session_id,
+            anchor=anchor,
+        )
+        if isinstance(audio, Path):
+            suffix = audio.suffix
+        path = self._audio_dir / f"{fragment.id}{suffix or DEFAULT_AUDIO_SUFFIX}"
+        partial = path.with_name(path.name + ".part")
+        if isinstance(audio, Path):
+            shutil.copyfile(audio, partial)
+        else:
+            partial.write_bytes(audio)
+        partial.replace(path)
+
+        if self._capture_queue is not None:
+            self._capture_queue.capture(fragment)
+        else:
+            self._repository.upsert_fragment(fragment)
+        self._submit(fragment.id, path)
+        return fragment
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """Block until every queued transcription has finished.
+
+        Returns:
+            False if ``timeout`` expired first, True otherwise.
+        """
+        with self._lock:
+            futures = set(self._futures)
+        _, not_done = wait(futures, timeout=timeout)
+        return not not_done
+
+    @property
+    def pending(self) -> int:
+        """Number of transcriptions queued or running."""
+        with self._lock:
+            return len(self._futures)
+
+    def stats(self) -> dict[str, int]:
+        """Return counts of pending, transcribed and failed voice captures."""
+        with self._lock:
+            return {
+                "pending": len(self._futures),
+                "transcribed": self._transcribed,
+                "failed": self._failed,
+            }
+
+    def latency(self) -> dict[str, LatencySummary]:
+        """Return the p50/p99 summary of transcriptions, including the write."""
+        return {"transcribe": self.transcribe_latency.summary()}
+
+    # Recovery
+
+    def recover(self) -> int:
+        """Queue the audio of every voice fragment still showing the placeholder.
+
+        Placeholders are found with one query; only their audio files are
+        looked up, so kept audio of finished captures costs nothing.
+
+        Returns:
+            The number of transcriptions queued.
+        """
+        queued = 0
+        placeholders = self._repository.find_fragment_ids(
+            capture_type="voice", content=PENDING_CONTENT
+        )
+        for fragment_id in placeholders:
+            path = self._audio_path(fragment_id)
+            if path is None:
+                logger.warning("No audio for voice capture %s", fragment_id)
+                with self._lock:
+                    self._failed += 1
+                continue
+            self._submit(fragment_id, path)
+            queued += 1
+        if queued:
+            logger.info("Re-queued %d unfinished voice transcriptions", queued)
+        return queued
+
+    def _audio_path(self, fragment_id: UUID) -> Path | None:
+        """Return the saved audio of a capture, removing any torn ``.part``."""
+        found = None
+        for path in self._audio_dir.glob(f"{fragment_id}.*"):
+            if path.suffix == ".part":
+                path.unlink(missing_ok=True)
+            else:
+                found = path
+        return found
+
+    # Workers
+
+    def _submit(self, fragment_id: UUID, path: Path) -> None:
+        with self._lock:
+            if self._executor is None:
+                return
+            future = self._executor.submit(self._transcribe, fragment_id, path)
+            self._futures.add(future)
+        future.add_done_callback(self._finished)
+
+    def _finished(self, future: Future[None]) -> None:
+        with self._lock:
+            self._futures.discard(future)
+
+    def _transcribe(self, fragment_id: UUID, path: Path) -> None:
+        started = time.perf_counter()
+        try:
+            text = self._transcriber.transcribe(path)
+            # The placeholder must be committed before it can be updated.
+            if self._capture_queue is not None and not self._capture_queue.flush(
+                self._flush_timeout
+            ):
+                msg = f"Voice capture {fragment_id} placeholder is not committed"
+                raise StorageError(msg)
+            updated = self._repository.update_fragment_contents(
+                [(fragment_id, text, datetime.utcnow())]
+            )
+            if not updated:
+                msg = f"Voice capture {fragment_id} has no stored placeholder"
+                raise StorageError(msg)
+        except Exception:
+            logger.exception("Transcription of %s failed", path.name)
+            with self._lock:
+                self._failed += 1
+            current().count("voice_failed")
+            return
+        elapsed = time.perf_counter() - started
+        self.transcribe_latency.record(elapsed)
+        with self._lock:
+            self._transcribed += 1
+        instrumentation = current()
+        if instrumentation.enabled:
+            instrumentation.span("voice.transcribe", elapsed)
+            instrumentation.count("voice_transcribed")
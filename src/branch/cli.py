@@ -1,12 +1,469 @@
-"""Command-line interface for Branch."""
+"""Command-line interface for Branch.
 
+Buffer commands (``capture``, ``list``, ``search``, ``review``) first try a
+running ``branch serve`` daemon over its Unix socket and fall back to opening
+the database in-process. Only the standard-library client is imported on the
+daemon path, so a capture from an editor hook costs little more than
+interpreter start.
+"""
 
-def main() -> None:
-    """Main entry point for the CLI."""
-    print("Branch - Reading-First Research Companion")
-    print("Version 0.1.0")
-    print()
-    print("CLI coming soon...")
+from __future__ import annotations
+
+import json
+import signal
+import sys
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import click
+
+from branch import __version__
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+# Mirrors branch.models.FragmentStatus without importing Pydantic.
+FRAGMENT_STATUSES = ("captured", "reviewed", "developed", "archived", "discarded")
+SUMMARY_WIDTH = 60
+
+
+@click.group(invoke_without_command=True)
+@click.version_option(__version__, prog_name="branch")
+@click.pass_context
+def main(ctx: click.Context) -> None:
+    """Branch - Reading-First Research Companion."""
+    if ctx.invoked_subcommand is None:
+        click.echo("Branch - Reading-First Research Companion")
+        click.echo(f"Version {__version__}")
+        click.echo()
+        click.echo(ctx.get_help())
+
+
+@main.command("import")
+@click.argument(
+    "directory",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+)
+@click.option(
+    "--database",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="SQLite database file (defaults to DATABASE_URL).",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    help="Worker processes (defaults to IMPORT_WORKERS or the CPU count).",
+)
+def import_command(directory: Path, database: Path | None, workers: int | None) -> None:
+    """Import PDF, text, Markdown and HTML files under DIRECTORY."""
+    # Deferred so that `branch --help` does not pay for PyMuPDF and storage.
+    from branch.importer import import_directory  # noqa: PLC0415
+    from branch.instrumentation import configured  # noqa: PLC0415
+    from branch.storage import SQLiteRepository, database_path  # noqa: PLC0415
+
+    target = database or Path(database_path())
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with configured(), SQLiteRepository.open(target) as repository:
+        report = import_directory(repository, directory, workers=workers)
+
+    click.echo(
+        f"Scanned {report.scanned} files in {report.seconds:.1f}s: "
+        f"{report.imported} imported, {report.skipped} unchanged, "
+        f"{len(report.failed)} failed"
+    )
+    for failure in report.failed:
+        click.echo(f"  {failure.path}: {failure.error}", err=True)
+
+
+@main.command()
+@click.argument("destination", type=click.Path(path_type=Path))
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(["ndjson", "columnar"]),
+    default="ndjson",
+    show_default=True,
+    help="NDJSON file (gzipped if it ends in .gz) or a directory of columnar files.",
+)
+@click.option(
+    "--database",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="SQLite database file (defaults to DATABASE_URL).",
+)
+def backup(destination: Path, export_format: str, database: Path | None) -> None:
+    """Export documents, sessions and fragments to DESTINATION."""
+    from branch.storage import SQLiteRepository  # noqa: PLC0415
+    from branch.storage.export import export_columnar, export_ndjson  # noqa: PLC0415
+
+    export = export_columnar if export_format == "columnar" else export_ndjson
+    with SQLiteRepository.open(database or _default_database()) as repository:
+        counts = export(repository.connection, destination)
+    click.echo(_transfer_summary("Exported", counts))
+
+
+@main.command()
+@click.argument("source", type=click.Path(exists=True, path_type=Path))
+@click.option(
+    "--database",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="SQLite database file (defaults to DATABASE_URL).",
+)
+def restore(source: Path, database: Path | None) -> None:
+    """Upsert a `branch backup` file or directory into the database."""
+    from branch.storage import SQLiteRepository, StorageError  # noqa: PLC0415
+    from branch.storage.export import import_columnar, import_ndjson  # noqa: PLC0415
+
+    load = import_columnar if source.is_dir() else import_ndjson
+    target = database or _default_database()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with SQLiteRepository.open(target) as repository:
+        try:
+            counts = load(repository.connection, source)
+        except StorageError as exc:
+            raise click.ClickException(str(exc)) from exc
+    click.echo(_transfer_summary("Restored", counts))
+
+
+@main.command()
+@click.argument("fragment_id")
+@click.option("--limit", type=click.IntRange(min=1), default=10, show_default=True)
+@click.option(
+    "--approximate", is_flag=True, help="Probe nearest clusters on large indexes."
+)
+@click.option(
+    "--database",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="SQLite database file (defaults to DATABASE_URL).",
+)
+def related(
+    fragment_id: str, limit: int, *, approximate: bool, database: Path | None
+) -> None:
+    """Show the fragments most similar to FRAGMENT_ID, updating the index."""
+    from uuid import UUID  # noqa: PLC0415
+
+    from branch.ai import SemanticIndex  # noqa: PLC0415
+    from branch.ai.embedders import embedder_from_config  # noqa: PLC0415
+    from branch.config import Config  # noqa: PLC0415
+    from branch.storage import SQLiteRepository  # noqa: PLC0415
+
+    try:
+        target = UUID(fragment_id)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="FRAGMENT_ID") from exc
+    path = database or _default_database()
+    with (
+        SQLiteRepository.open(path) as repository,
+        SemanticIndex.for_database(
+            path, embedder_from_config(), batch_size=Config.EMBEDDING_BATCH_SIZE
+        ) as index,
+    ):
+        index.sync(repository.connection)
+        try:
+            hits = index.similar(target, limit, approximate=approximate)
+        except LookupError as exc:
+            raise click.ClickException(str(exc)) from exc
+        for hit in hits:
+            fragment = repository.get_fragment(hit.fragment_id)
+            if fragment is not None:
+                click.echo(
+                    f"{hit.fragment_id}  {hit.score:.3f}  {_summary(fragment.content)}"
+                )
+
+
+@main.command()
+@click.argument("fragment_ids", nargs=-1, required=True)
+@click.option(
+    "--database",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="SQLite database file (defaults to DATABASE_URL).",
+)
+def resolve(fragment_ids: tuple[str, ...], database: Path | None) -> None:
+    """Add a light resolution note to each fragment using the local model."""
+    import asyncio  # noqa: PLC0415
+    from uuid import UUID  # noqa: PLC0415
+
+    from branch.ai import ResolutionCache, Resolver  # noqa: PLC0415
+    from branch.config import Config  # noqa: PLC0415
+    from branch.storage import SQLiteRepository  # noqa: PLC0415
+
+    try:
+        ids = [UUID(fragment_id) for fragment_id in fragment_ids]
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="FRAGMENT_IDS") from exc
+
+    async def run(fragments: list[Any]) -> list[Any]:
+        async with Resolver.from_config(cache) as resolver:
+            return await resolver.resolve_fragments(fragments)
+
+    Config.RESOLVE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    cache = ResolutionCache(Config.RESOLVE_CACHE_PATH)
+    try:
+        with SQLiteRepository.open(database or _default_database()) as repository:
+            fragments = [repository.get_fragment(fragment_id) for fragment_id in ids]
+            missing = [str(i) for i, f in zip(ids, fragments, strict=True) if f is None]
+            if missing:
+                msg = f"Unknown fragment: {', '.join(missing)}"
+                raise click.ClickException(msg)
+            resolved = asyncio.run(run(fragments))
+            repository.update_fragment_resolutions(
+                (fragment.id, fragment.resolution_note, None, fragment.updated_at)
+                for fragment in resolved
+            )
+    finally:
+        cache.close()
+    for fragment in resolved:
+        click.echo(f"{fragment.id}  {fragment.resolution_note}")
+    if len(resolved) < len(ids):
+        msg = (
+            f"{len(ids) - len(resolved)} of {len(ids)} fragments could not be resolved"
+        )
+        raise click.ClickException(msg)
+
+
+def _transfer_summary(verb: str, counts: dict[str, int]) -> str:
+    return (
+        f"{verb} {counts.get('documents', 0)} documents, "
+        f"{counts.get('sessions', 0)} sessions, "
+        f"{counts.get('idea_fragments', 0)} fragments"
+    )
+
+
+def _connection_options(command: Callable[..., Any]) -> Callable[..., Any]:
+    """Add the options that choose between the daemon and in-process storage."""
+    command = click.option(
+        "--no-daemon",
+        is_flag=True,
+        help="Open the database in-process even if a daemon is running.",
+    )(command)
+    command = click.option(
+        "--socket",
+        "socket_path",
+        type=click.Path(dir_okay=False, path_type=Path),
+        envvar="DAEMON_SOCKET",
+        help="Daemon socket (defaults to DAEMON_SOCKET).",
+    )(command)
+    return click.option(
+        "--database",
+        type=click.Path(dir_okay=False, path_type=Path),
+        help="SQLite database file; implies --no-daemon.",
+    )(command)
+
+
+def _default_socket() -> Path:
+    from branch.config import Config  # noqa: PLC0415
+
+    return Config.DAEMON_SOCKET
+
+
+def _default_database() -> Path:
+    from branch.storage import database_path  # noqa: PLC0415
+
+    return Path(database_path())
+
+
+def _request(
+    op: str,
+    args: dict[str, Any],
+    *,
+    database: Path | None,
+    socket_path: Path | None,
+    no_daemon: bool,
+) -> Any:
+    """Run one buffer operation through the daemon, or in-process without one."""
+    # Deferred: the client is stdlib-only, while the in-process path needs
+    # Pydantic and SQLite, which only it should pay for.
+    from branch.daemon import DaemonClient, DaemonUnavailable, RequestError  # noqa: PLC0415
+
+    try:
+        if not no_daemon and database is None:
+            client = DaemonClient(socket_path or _default_socket())
+            try:
+                return client.call(op, **args)
+            except DaemonUnavailable:
+                pass
+        from branch.instrumentation import configured  # noqa: PLC0415
+        from branch.service import BranchService  # noqa: PLC0415
+
+        with (
+            configured(),
+            BranchService.open(database or _default_database()) as service,
+        ):
+            return service.handle(op, args)
+    except RequestError as exc:
+        raise click.ClickException(str(exc)) from exc
+
+
+def _summary(content: str) -> str:
+    line = content.strip().splitlines()[0] if content.strip() else ""
+    if len(line) > SUMMARY_WIDTH:
+        line = line[: SUMMARY_WIDTH - 1] + "…"
+    return line
+
+
+@main.command()
+@click.argument("text", required=False)
+@click.option("--document", "document_id", help="Document the idea belongs to (id).")
+@click.option("--page", "page_number", type=click.IntRange(min=1), help="Page number.")
+@click.option("--quote", "selected_text", help="Passage that prompted the idea.")
+@_connection_options
+def capture(
+    text: str | None,
+    document_id: str | None,
+    page_number: int | None,
+    selected_text: str | None,
+    **connection: Any,
+) -> None:
+    """Capture an idea and print its id; reads stdin when TEXT is omitted."""
+    content = text if text is not None else sys.stdin.read()
+    args: dict[str, Any] = {"content": content}
+    if document_id is not None:
+        args["document_id"] = document_id
+    if page_number is not None:
+        args["page_number"] = page_number
+    if selected_text is not None:
+        args["selected_text"] = selected_text
+    result = _request("capture", args, **connection)
+    click.echo(result["id"])
+
+
+@main.command("list")
+@click.option("--document", "document_id", help="Only this document, in page order.")
+@click.option(
+    "--status", type=click.Choice(FRAGMENT_STATUSES), help="Only this status."
+)
+@click.option("--limit", type=click.IntRange(min=1), default=50, show_default=True)
+@click.option("--json", "as_json", is_flag=True, help="Print fragments as JSON.")
+@_connection_options
+def list_command(
+    document_id: str | None,
+    status: str | None,
+    limit: int,
+    *,
+    as_json: bool,
+    **connection: Any,
+) -> None:
+    """List captured fragments, newest first."""
+    args: dict[str, Any] = {"limit": limit}
+    if document_id is not None:
+        args["document_id"] = document_id
+    if status is not None:
+        args["status"] = status
+    fragments = _request("list", args, **connection)
+    if as_json:
+        click.echo(json.dumps(fragments, indent=2))
+        return
+    for fragment in fragments:
+        captured = fragment["captured_at"][:16].replace("T", " ")
+        click.echo(
+            f"{fragment['id']}  {captured}  {fragment['status']:<9}  "
+            f"{_summary(fragment['content'])}"
+        )
+
+
+@main.command()
+@click.argument("query", nargs=-1, required=True)
+@click.option("--document", "document_id", help="Only fragments of this document.")
+@click.option("--limit", type=click.IntRange(min=1), default=20, show_default=True)
+@click.option("--json", "as_json", is_flag=True, help="Print hits as JSON.")
+@_connection_options
+def search(
+    query: tuple[str, ...],
+    document_id: str | None,
+    limit: int,
+    *,
+    as_json: bool,
+    **connection: Any,
+) -> None:
+    """Full-text search the buffer for every word of QUERY."""
+    args: dict[str, Any] = {"query": " ".join(query), "limit": limit}
+    if document_id is not None:
+        args["document_id"] = document_id
+    hits = _request("search", args, **connection)
+    if as_json:
+        click.echo(json.dumps(hits, indent=2))
+        return
+    for hit in hits:
+        click.echo(f"{hit['fragment']['id']}  {hit['snippet']}")
+
+
+@main.command()
+@click.argument("fragment_id")
+@click.argument(
+    "status", type=click.Choice(FRAGMENT_STATUSES), default="reviewed", required=False
+)
+@_connection_options
+def review(fragment_id: str, status: str, **connection: Any) -> None:
+    """Set the review STATUS of a fragment (default: reviewed)."""
+    result = _request(
+        "review", {"fragment_id": fragment_id, "status": status}, **connection
+    )
+    click.echo(f"{result['id']}  {result['status']}")
+
+
+@main.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="DAEMON_SOCKET",
+    help="Socket to listen on (defaults to DAEMON_SOCKET).",
+)
+@click.option(
+    "--database",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="SQLite database file (defaults to DATABASE_URL).",
+)
+def serve(socket_path: Path | None, database: Path | None) -> None:
+    """Run the Branch daemon in the foreground until stopped."""
+    from branch.daemon import DaemonServer, RequestError  # noqa: PLC0415
+    from branch.instrumentation import configured  # noqa: PLC0415
+    from branch.service import BranchService  # noqa: PLC0415
+
+    with configured():
+        service = BranchService.open(database or _default_database(), write_behind=True)
+        try:
+            server = DaemonServer(socket_path or _default_socket(), service.handle)
+        except RequestError as exc:
+            service.close()
+            raise click.ClickException(str(exc)) from exc
+
+        # serve_forever() runs on this thread, so shutdown() must come from
+        # another.
+        signal.signal(
+            signal.SIGTERM,
+            lambda *_: threading.Thread(target=server.shutdown, daemon=True).start(),
+        )
+        click.echo(f"Branch daemon listening on {server.socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.close()
+    click.echo("Branch daemon stopped")
+
+
+@main.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="DAEMON_SOCKET",
+    help="Daemon socket (defaults to DAEMON_SOCKET).",
+)
+def stop(socket_path: Path | None) -> None:
+    """Stop a running daemon after it commits queued captures."""
+    from branch.daemon import SHUTDOWN_OP, DaemonClient, DaemonUnavailable  # noqa: PLC0415
+
+    try:
+        DaemonClient(socket_path or _default_socket()).call(SHUTDOWN_OP)
+    except DaemonUnavailable as exc:
+        raise click.ClickException(str(exc)) from exc
+    click.echo("Branch daemon stopping")
 
 
 if __name__ == "__main__":
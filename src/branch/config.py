@@ -21,6 +21,53 @@ class Config:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./data/branch.db")
     DATA_DIR: Path = Path(os.getenv("DATA_DIR", "./data"))
 
+    # SQLite performance profile
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+    # Negative values are KiB, positive values are pages (SQLite semantics)
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024**2)))
+    SQLITE_TEMP_STORE: str = os.getenv("SQLITE_TEMP_STORE", "MEMORY").upper()
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_POOL_READERS: int = int(os.getenv("SQLITE_POOL_READERS", "4"))
+
+    # Query cache (CachedRepository)
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    QUERY_CACHE_TTL_SECONDS: float = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "30"))
+
+    # Capture queue (write-behind group commit)
+    CAPTURE_MAX_BATCH: int = int(os.getenv("CAPTURE_MAX_BATCH", "256"))
+    CAPTURE_MAX_DELAY_MS: int = int(os.getenv("CAPTURE_MAX_DELAY_MS", "50"))
+    CAPTURE_FSYNC: bool = os.getenv("CAPTURE_FSYNC", "false").lower() == "true"
+    # Longest the flusher retries failing commits before it stops
+    CAPTURE_RETRY_WINDOW_S: float = float(os.getenv("CAPTURE_RETRY_WINDOW_S", "60"))
+
+    # Reading sessions (SessionManager checkpoints)
+    SESSION_CHECKPOINT_S: float = float(os.getenv("SESSION_CHECKPOINT_S", "30"))
+
+    # Daemon (`branch serve`)
+    DAEMON_SOCKET: Path = Path(
+        os.getenv("DAEMON_SOCKET", str(DATA_DIR / "branch.sock"))
+    )
+
+    # Library import
+    # 0 means one worker process per CPU core
+    IMPORT_WORKERS: int = int(os.getenv("IMPORT_WORKERS", "0"))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+    # Reader
+    READER_CACHE_DIR: Path = Path(
+        os.getenv("READER_CACHE_DIR", str(DATA_DIR / "page_cache"))
+    )
+
+    # Page rendering
+    RENDER_CACHE_MB: int = int(os.getenv("RENDER_CACHE_MB", "256"))
+    RENDER_PREFETCH_PAGES: int = int(os.getenv("RENDER_PREFETCH_PAGES", "2"))
+
+    # Reading progress: write after page turns pause, or at most this late
+    PROGRESS_IDLE_MS: int = int(os.getenv("PROGRESS_IDLE_MS", "750"))
+    PROGRESS_MAX_DELAY_S: float = float(os.getenv("PROGRESS_MAX_DELAY_S", "5"))
+
     # AI Features (optional)
     ENABLE_AI_FEATURES: bool = (
         os.getenv("ENABLE_AI_FEATURES", "false").lower() == "true"
@@ -28,17 +75,40 @@ class Config:
     OLLAMA_API_URL: str = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
     OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "llama2")
     OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
+    # "hash" is the offline embedder; anything else is an Ollama model name
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "hash")
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    # "Resolve Lightly": requests in flight, per-request deadline, answer cache
+    RESOLVE_CONCURRENCY: int = int(os.getenv("RESOLVE_CONCURRENCY", "4"))
+    RESOLVE_TIMEOUT_S: float = float(os.getenv("RESOLVE_TIMEOUT_S", "30"))
+    RESOLVE_CACHE_PATH: Path = Path(
+        os.getenv("RESOLVE_CACHE_PATH", str(DATA_DIR / "resolve_cache.db"))
+    )
 
     # Voice Capture (optional)
     ENABLE_VOICE_CAPTURE: bool = (
         os.getenv("ENABLE_VOICE_CAPTURE", "false").lower() == "true"
     )
     WHISPER_MODEL_SIZE: str = os.getenv("WHISPER_MODEL_SIZE", "base")
+    # Threads sharing one loaded model; inference itself runs one at a time
+    VOICE_WORKERS: int = int(os.getenv("VOICE_WORKERS", "2"))
+    VOICE_AUDIO_DIR: Path = Path(os.getenv("VOICE_AUDIO_DIR", str(DATA_DIR / "voice")))
+    # Longest a worker waits for a queued placeholder to commit
+    VOICE_FLUSH_TIMEOUT_S: float = float(os.getenv("VOICE_FLUSH_TIMEOUT_S", "30"))
 
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
     LOG_FILE: Path = Path(os.getenv("LOG_FILE", "./logs/branch.log"))
 
+    # Instrumentation: one of off, memory, jsonl, prometheus
+    INSTRUMENTATION: str = os.getenv("INSTRUMENTATION", "off").lower()
+    # Defaults to DATA_DIR/metrics.jsonl or DATA_DIR/metrics.prom
+    INSTRUMENTATION_PATH: str | None = os.getenv("INSTRUMENTATION_PATH")
+    INSTRUMENTATION_INTERVAL_S: float = float(
+        os.getenv("INSTRUMENTATION_INTERVAL_S", "10")
+    )
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "100"))
+
     # Development
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
     TESTING: bool = os.getenv("TESTING", "false").lower() == "true"
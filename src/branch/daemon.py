@@ -0,0 +1,159 @@
+"""Unix-socket daemon that keeps Branch warm between CLI calls.
+
+Every ``branch`` invocation otherwise pays for interpreter start, Pydantic,
+schema application and opening SQLite before it can store a single fragment.
+``branch serve`` runs a :class:`DaemonServer` that holds those resources open,
+and the CLI becomes a thin :class:`DaemonClient` that sends one request over a
+Unix domain socket.
+
+The wire protocol is JSON Lines: each request is ``{"op": ..., "args": {...}}``
+and each response is ``{"ok": true, "result": ...}`` or
+``{"ok": false, "error": "..."}``. A connection may carry any number of
+requests.
+
+This module imports only the standard library so that the client side stays
+cheap; the server is handed a request handler (normally
+:meth:`branch.service.BranchService.handle`) rather than importing storage.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import socket
+import socketserver
+import threading
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+    RequestHandler = Callable[[str, dict[str, Any]], Any]
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10.0
+SHUTDOWN_OP = "shutdown"
+
+
+class RequestError(Exception):
+    """A request was rejected; the message is meant for the user."""
+
+
+class DaemonUnavailable(RequestError):
+    """No daemon is listening on the socket, so nothing was sent."""
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve JSON Lines requests on a Unix socket, one thread per connection."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, handler: RequestHandler) -> None:
+        self.socket_path = socket_path
+        self.handler = handler
+        _claim_socket(socket_path)
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(socket_path), _ConnectionHandler)
+        socket_path.chmod(0o600)
+
+    def respond(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Run one decoded request and build its response."""
+        op = request.get("op")
+        args = request.get("args") or {}
+        if not isinstance(op, str) or not isinstance(args, dict):
+            return {"ok": False, "error": "Malformed request"}
+        if op == SHUTDOWN_OP:
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True, "result": None}
+        try:
+            return {"ok": True, "result": self.handler(op, args)}
+        except RequestError as exc:
+            return {"ok": False, "error": str(exc)}
+        except Exception as exc:
+            logger.exception("Daemon request %r failed", op)
+            return {"ok": False, "error": f"Internal error: {exc}"}
+
+    def server_close(self) -> None:
+        """Close the listening socket and remove its file."""
+        super().server_close()
+        self.socket_path.unlink(missing_ok=True)
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    server: DaemonServer
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response: dict[str, Any] = {"ok": False, "error": "Invalid JSON"}
+            else:
+                if isinstance(request, dict):
+                    response = self.server.respond(request)
+                else:
+                    response = {"ok": False, "error": "Malformed request"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class DaemonClient:
+    """Send requests to a running :class:`DaemonServer`."""
+
+    def __init__(self, socket_path: Path, timeout: float = DEFAULT_TIMEOUT) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def call(self, op: str, **args: Any) -> Any:
+        """Send one request and return its result.
+
+        Raises:
+            DaemonUnavailable: Nothing is listening; the request was not sent,
+                so the caller may safely perform it another way.
+            RequestError: The daemon rejected the request or stopped
+                responding after receiving it.
+        """
+        payload = json.dumps({"op": op, "args": args}).encode() + b"\n"
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(str(self.socket_path))
+            except (FileNotFoundError, ConnectionRefusedError) as exc:
+                msg = f"No Branch daemon listening on {self.socket_path}"
+                raise DaemonUnavailable(msg) from exc
+            try:
+                sock.sendall(payload)
+                with sock.makefile("rb") as reader:
+                    line = reader.readline()
+            except OSError as exc:
+                msg = f"Branch daemon did not respond: {exc}"
+                raise RequestError(msg) from exc
+        if not line:
+            msg = "Branch daemon closed the connection"
+            raise RequestError(msg)
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RequestError(response.get("error", "Request failed"))
+        return response.get("result")
+
+    def is_running(self) -> bool:
+        """Return whether a daemon answers on the socket."""
+        try:
+            self.call("ping")
+        except RequestError:
+            return False
+        return True
+
+
+def _claim_socket(socket_path: Path) -> None:
+    """Remove a stale socket file, refusing if a daemon still owns it."""
+    if not socket_path.exists():
+        return
+    if DaemonClient(socket_path, timeout=1.0).is_running():
+        msg = f"A Branch daemon is already running on {socket_path}"
+        raise RequestError(msg)
+    socket_path.unlink()
@@ -0,0 +1,283 @@
+"""Bulk import of a document library.
+
+:func:`import_directory` walks a directory tree and reads metadata (title,
+author, page count) from every supported file. Extraction is CPU-bound and
+independent per file, so it is spread over a ``ProcessPoolExecutor``. Results
+stream back in order and are written in batches through
+``upsert_imported_documents``, one transaction per batch.
+
+Each imported file's size and ``mtime_ns`` are stored alongside its
+document. A re-import skips files whose stamp is unchanged without opening
+them, and re-reads changed files into their existing document so reading
+progress is kept. Existing documents are fetched once per batch, and progress
+is clamped to the new page count.
+"""
+
+from __future__ import annotations
+
+import html
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pymupdf
+
+from branch.config import Config
+from branch.models import Document
+from branch.storage import FileStamp
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from concurrent.futures import Executor
+
+    from branch.storage import BranchRepository
+
+
+logger = logging.getLogger(__name__)
+
+IMPORT_SUFFIXES = frozenset({".pdf", ".txt", ".md", ".html", ".htm"})
+
+# Below this many files, process start-up costs more than it saves.
+MIN_PARALLEL_FILES = 64
+MAX_CHUNKSIZE = 64
+HEAD_BYTES = 64 * 1024
+
+_HTML_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_HTML_AUTHOR = re.compile(
+    r"<meta\s+[^>]*name=[\"']author[\"'][^>]*content=[\"']([^\"']*)[\"']",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class FileMetadata:
+    """Metadata read from one file by a worker process."""
+
+    path: str
+    title: str | None = None
+    author: str | None = None
+    page_count: int | None = None
+
+
+@dataclass(frozen=True)
+class ImportFailure:
+    """A file whose metadata could not be read."""
+
+    path: str
+    error: str
+
+
+@dataclass
+class ImportReport:
+    """Counts and failures from one :func:`import_directory` run."""
+
+    scanned: int = 0
+    imported: int = 0
+    skipped: int = 0
+    failed: list[ImportFailure] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+def scan_library(root: Path) -> Iterator[tuple[str, int, int]]:
+    """Yield ``(path, size, mtime_ns)`` for supported files under ``root``.
+
+    Hidden files and directories are skipped and symlinks are not followed.
+    """
+    stack = [str(root.resolve())]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif (
+                    entry.is_file(follow_symlinks=False)
+                    and Path(entry.name).suffix.lower() in IMPORT_SUFFIXES
+                ):
+                    stat = entry.stat(follow_symlinks=False)
+                    yield entry.path, stat.st_size, stat.st_mtime_ns
+
+
+def extract_metadata(path: str) -> FileMetadata:
+    """Read title, author and page count from a supported file."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".pdf":
+        return _pdf_metadata(path)
+    head = _read_head(path)
+    if suffix in {".html", ".htm"}:
+        return _html_metadata(path, head)
+    if suffix == ".md":
+        return _markdown_metadata(path, head)
+    return FileMetadata(path)
+
+
+def import_directory(
+    repository: BranchRepository,
+    root: Path,
+    *,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    executor: Executor | None = None,
+) -> ImportReport:
+    """Import every supported file under ``root`` into ``repository``.
+
+    Args:
+        repository: Destination for documents and file stamps.
+        root: Directory to walk.
+        workers: Worker processes (default ``IMPORT_WORKERS``, else CPU count).
+        batch_size: Documents per insert transaction.
+        executor: Use this executor instead of creating a process pool.
+
+    Returns:
+        What was imported, skipped as unchanged, or failed.
+    """
+    started = time.perf_counter()
+    batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+    report = ImportReport()
+    stamps = repository.get_file_stamps()
+
+    pending: list[tuple[str, int, int]] = []
+    for path, size, mtime_ns in scan_library(root):
+        report.scanned += 1
+        known = stamps.get(path)
+        if known is not None and (known.size, known.mtime_ns) == (size, mtime_ns):
+            report.skipped += 1
+        else:
+            pending.append((path, size, mtime_ns))
+
+    results = _extract_all([path for path, _, _ in pending], workers, executor)
+    batch: list[tuple[FileMetadata, FileStamp | None, int, int]] = []
+    for (path, size, mtime_ns), result in zip(pending, results, strict=True):
+        if isinstance(result, ImportFailure):
+            logger.warning("Could not import %s: %s", result.path, result.error)
+            report.failed.append(result)
+            continue
+        batch.append((result, stamps.get(path), size, mtime_ns))
+        if len(batch) >= batch_size:
+            report.imported += _write_batch(repository, batch)
+            batch = []
+    if batch:
+        report.imported += _write_batch(repository, batch)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _extract_all(
+    paths: list[str], workers: int | None, executor: Executor | None
+) -> Iterable[FileMetadata | ImportFailure]:
+    workers = workers or Config.IMPORT_WORKERS or os.cpu_count() or 1
+    chunksize = max(1, min(MAX_CHUNKSIZE, len(paths) // (workers * 8)))
+    if executor is not None:
+        yield from executor.map(_safe_extract, paths, chunksize=chunksize)
+    elif workers == 1 or len(paths) < MIN_PARALLEL_FILES:
+        yield from map(_safe_extract, paths)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(_safe_extract, paths, chunksize=chunksize)
+
+
+def _safe_extract(path: str) -> FileMetadata | ImportFailure:
+    """Worker entry point: never raise, so one bad file cannot stop the pool."""
+    try:
+        return extract_metadata(path)
+    except Exception as exc:
+        return ImportFailure(path, f"{type(exc).__name__}: {exc}")
+
+
+def _write_batch(
+    repository: BranchRepository,
+    batch: list[tuple[FileMetadata, FileStamp | None, int, int]],
+) -> int:
+    """Store one batch, fetching the documents of changed files in one query."""
+    existing = repository.get_documents(
+        known.document_id for _, known, _, _ in batch if known is not None
+    )
+    imports = []
+    for metadata, known, size, mtime_ns in batch:
+        previous = existing.get(known.document_id) if known is not None else None
+        document = _to_document(metadata, previous)
+        imports.append(
+            (document, FileStamp(metadata.path, size, mtime_ns, document.id))
+        )
+    repository.upsert_imported_documents(imports)
+    return len(imports)
+
+
+def _to_document(metadata: FileMetadata, existing: Document | None) -> Document:
+    """Build a new document, or refresh the one a changed file already has."""
+    path = Path(metadata.path)
+    title = metadata.title or path.stem
+    if existing is not None:
+        document = existing.model_copy(
+            update={
+                "title": title,
+                "author": metadata.author,
+                "page_count": metadata.page_count,
+            }
+        )
+        if document.page_count and document.page_count != existing.page_count:
+            # Keep the reader's place, but never past the new last page.
+            document.last_page = min(document.last_page, document.page_count)
+            document.read_percentage = min(
+                document.last_page / document.page_count * 100, 100.0
+            )
+        return document
+    document = Document.from_file(path)
+    document.title = title
+    document.author = metadata.author
+    document.page_count = metadata.page_count
+    return document
+
+
+def _read_head(path: str) -> str:
+    with Path(path).open("rb") as file:
+        return file.read(HEAD_BYTES).decode("utf-8", errors="replace")
+
+
+def _pdf_metadata(path: str) -> FileMetadata:
+    with pymupdf.open(path) as document:  # type: ignore[no-untyped-call]
+        info = document.metadata or {}
+        return FileMetadata(
+            path,
+            title=(info.get("title") or "").strip() or None,
+            author=(info.get("author") or "").strip() or None,
+            page_count=int(document.page_count),
+        )
+
+
+def _html_metadata(path: str, head: str) -> FileMetadata:
+    title = _HTML_TITLE.search(head)
+    author = _HTML_AUTHOR.search(head)
+    return FileMetadata(
+        path,
+        title=_clean(html.unescape(title.group(1))) if title else None,
+        author=_clean(html.unescape(author.group(1))) if author else None,
+    )
+
+
+def _markdown_metadata(path: str, head: str) -> FileMetadata:
+    """Use YAML front matter ``title``/``author``, else the first ``#`` heading."""
+    lines = head.splitlines()
+    front: dict[str, str] = {}
+    if lines and lines[0].strip() == "---":
+        for line in lines[1:]:
+            if line.strip() == "---":
+                break
+            key, _, value = line.partition(":")
+            front[key.strip().lower()] = value.strip().strip("\"'")
+    title = front.get("title") or next(
+        (line[2:].strip() for line in lines if line.startswith("# ")), None
+    )
+    return FileMetadata(path, title=title or None, author=front.get("author") or None)
+
+
+def _clean(text: str) -> str | None:
+    return " ".join(text.split()) or None
@@ -0,0 +1,441 @@
+"""Pluggable timing spans, SQL statement timing and counters.
+
+Instrumented code asks :func:`current` for the active :class:`Instrumentation`
+and only does work when its ``enabled`` flag is set. The default is the no-op
+:data:`NOOP`, so a disabled call costs one function call and an attribute read.
+SQL timing goes further: :func:`branch.storage.sqlite.connect` only installs
+:class:`TracedConnection` when instrumentation is enabled, so connections
+opened while it is off run at full speed.
+
+:class:`Recorder` is the real implementation. It keeps rolling latency
+percentiles per span and per SQL statement, monotonic counters with a per-second
+rate, logs statements slower than ``slow_query_ms`` to ``branch.sql``, and
+hands periodic snapshots to exporters: :class:`JSONLExporter` appends one JSON
+object per snapshot, :class:`PrometheusExporter` rewrites a text-format file
+for a node exporter textfile collector.
+
+Typical use::
+
+    recorder = install(Recorder(exporters=[JSONLExporter(path)]))
+    ...
+    recorder.close()  # writes a final snapshot
+
+Long-running commands use :func:`configured`, which builds the recorder from
+the ``INSTRUMENTATION*`` settings in :class:`~branch.config.Config`.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Protocol, TypeVar, cast
+
+from branch.metrics import LatencyRecorder
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator, Iterable, Iterator
+
+
+F = TypeVar("F", bound="Callable[..., Any]")
+
+logger = logging.getLogger(__name__)
+sql_logger = logging.getLogger("branch.sql")
+
+STATEMENT_LABEL_WIDTH = 120
+DEFAULT_SLOW_QUERY_MS = 100.0
+
+
+class Instrumentation:
+    """Instrumentation interface; this base class ignores every event."""
+
+    enabled = False
+
+    def span(self, name: str, seconds: float) -> None:
+        """Record a completed operation called ``name``."""
+
+    def statement(self, sql: str, seconds: float) -> None:
+        """Record one executed SQL statement."""
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add ``value`` to the counter called ``name``."""
+
+    def close(self) -> None:
+        """Flush and release any exporters."""
+
+
+NOOP = Instrumentation()
+
+_current: Instrumentation = NOOP
+
+
+def current() -> Instrumentation:
+    """Return the active instrumentation (:data:`NOOP` unless installed)."""
+    return _current
+
+
+def install(instrumentation: Instrumentation) -> Instrumentation:
+    """Make ``instrumentation`` active process-wide and return it."""
+    global _current  # noqa: PLW0603
+    _current = instrumentation
+    return instrumentation
+
+
+def uninstall() -> None:
+    """Restore the no-op default; the previous instrumentation is not closed."""
+    install(NOOP)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorate a function so each call is recorded as span ``name``.
+
+    Generator functions are timed across the whole iteration, counting only
+    the time spent producing items, not the time the consumer holds them.
+    """
+
+    def decorate(func: F) -> F:
+        if inspect.isgeneratorfunction(func):
+
+            @functools.wraps(func)
+            def generator_wrapper(
+                *args: Any, **kwargs: Any
+            ) -> Generator[Any, None, Any]:
+                instrumentation = _current
+                if not instrumentation.enabled:
+                    return (yield from func(*args, **kwargs))
+                iterator = func(*args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            item = next(iterator)
+                        except StopIteration as stop:
+                            return stop.value
+                        finally:
+                            elapsed += time.perf_counter() - started
+                        yield item
+                finally:
+                    iterator.close()
+                    instrumentation.span(name, elapsed)
+
+            return cast("F", generator_wrapper)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            instrumentation = _current
+            if not instrumentation.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                instrumentation.span(name, time.perf_counter() - started)
+
+        return cast("F", wrapper)
+
+    return decorate
+
+
+class TracedConnection(sqlite3.Connection):
+    """SQLite connection that reports statement execution time.
+
+    Only the ``execute`` step is timed; rows fetched later from the cursor
+    are not.
+    """
+
+    def execute(self, sql: str, parameters: Any = (), /) -> sqlite3.Cursor:
+        """Execute one statement and record its duration."""
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _current.statement(sql, time.perf_counter() - started)
+
+    def executemany(self, sql: str, parameters: Iterable[Any], /) -> sqlite3.Cursor:
+        """Execute a statement for every parameter set and record the total."""
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            _current.statement(sql, time.perf_counter() - started)
+
+
+def connection_factory() -> type[sqlite3.Connection]:
+    """Connection class for new connections under the active instrumentation."""
+    return TracedConnection if _current.enabled else sqlite3.Connection
+
+
+class Exporter(Protocol):
+    """Destination for :meth:`Recorder.snapshot` results."""
+
+    def export(self, snapshot: dict[str, Any]) -> None:
+        """Write one snapshot."""
+
+    def close(self) -> None:
+        """Release any resources."""
+
+
+class JSONLExporter:
+    """Append each snapshot to a JSON Lines file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def export(self, snapshot: dict[str, Any]) -> None:
+        """Append ``snapshot`` as one line."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as file:
+            file.write(json.dumps(snapshot) + "\n")
+
+    def close(self) -> None:
+        """Nothing to release; each export opens and closes the file."""
+
+
+class PrometheusExporter:
+    """Rewrite a Prometheus text-format file with the latest snapshot."""
+
+    def __init__(self, path: Path, prefix: str = "branch") -> None:
+        self.path = path
+        self.prefix = prefix
+
+    def export(self, snapshot: dict[str, Any]) -> None:
+        """Replace the file atomically with ``snapshot`` in text format."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        scratch = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        scratch.write_text(self.render(snapshot), encoding="utf-8")
+        scratch.replace(self.path)
+
+    def render(self, snapshot: dict[str, Any]) -> str:
+        """Format a snapshot in the Prometheus exposition format."""
+        lines: list[str] = []
+        for kind, label in (("spans", "name"), ("statements", "sql")):
+            metric = f"{self.prefix}_{kind[:-1]}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for key, summary in snapshot[kind].items():
+                labels = f'{label}="{_escape(key)}"'
+                for quantile in ("p50", "p99"):
+                    lines.append(
+                        f'{metric}{{{labels},quantile="0.{quantile[1:]}"}} '
+                        f"{summary[quantile]}"
+                    )
+                lines.append(f"{metric}_sum{{{labels}}} {summary['total']}")
+                lines.append(f"{metric}_count{{{labels}}} {summary['count']}")
+        for name, counter in snapshot["counters"].items():
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {counter['total']}")
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        """Nothing to release."""
+
+
+class _Series:
+    """Latency window plus an all-time total for one span or statement."""
+
+    __slots__ = ("latency", "total")
+
+    def __init__(self) -> None:
+        self.latency = LatencyRecorder(window=1_000)
+        self.total = 0.0
+
+
+class Recorder(Instrumentation):
+    """Collect spans, statement timings and counters in memory."""
+
+    enabled = True
+
+    def __init__(
+        self,
+        *,
+        slow_query_ms: float = DEFAULT_SLOW_QUERY_MS,
+        exporters: Iterable[Exporter] = (),
+        interval: float | None = None,
+    ) -> None:
+        """Create a recorder.
+
+        Args:
+            slow_query_ms: Statements at least this slow are logged to
+                ``branch.sql`` at WARNING level.
+            exporters: Destinations for snapshots.
+            interval: If set, export a snapshot every ``interval`` seconds
+                from a background thread, in addition to on :meth:`close`.
+        """
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.exporters = list(exporters)
+        self._spans: dict[str, _Series] = {}
+        self._statements: dict[str, _Series] = {}
+        self._counters: dict[str, int] = {}
+        self._last_counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started = self._last_snapshot = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        if interval is not None and self.exporters:
+            self._thread = threading.Thread(
+                target=self._export_every,
+                args=(interval,),
+                name="branch-metrics-export",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def span(self, name: str, seconds: float) -> None:
+        """Record a completed operation called ``name``."""
+        self._series(self._spans, name).latency.record(seconds)
+        with self._lock:
+            self._spans[name].total += seconds
+
+    def statement(self, sql: str, seconds: float) -> None:
+        """Record one SQL statement, logging it if slow."""
+        label = " ".join(sql.split())[:STATEMENT_LABEL_WIDTH]
+        self._series(self._statements, label).latency.record(seconds)
+        with self._lock:
+            self._statements[label].total += seconds
+        if seconds >= self.slow_query_seconds:
+            sql_logger.warning("Slow query (%.1f ms): %s", seconds * 1000, label)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add ``value`` to the counter called ``name``."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counter(self, name: str) -> int:
+        """Return the all-time value of a counter."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Summarize everything recorded so far.
+
+        Counter rates are per second since the previous snapshot.
+        """
+        now = time.monotonic()
+        with self._lock:
+            elapsed = max(now - self._last_snapshot, 1e-9)
+            counters = {
+                name: {
+                    "total": total,
+                    "per_second": (total - self._last_counters.get(name, 0)) / elapsed,
+                }
+                for name, total in self._counters.items()
+            }
+            self._last_counters = dict(self._counters)
+            self._last_snapshot = now
+            spans = dict(self._spans)
+            statements = dict(self._statements)
+        return {
+            "time": datetime.utcnow().isoformat(timespec="seconds"),
+            "uptime": now - self._started,
+            "spans": {name: _summary(series) for name, series in spans.items()},
+            "statements": {sql: _summary(series) for sql, series in statements.items()},
+            "counters": counters,
+        }
+
+    def export(self) -> None:
+        """Send a snapshot to every exporter."""
+        if not self.exporters:
+            return
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            try:
+                exporter.export(snapshot)
+            except OSError:
+                logger.exception("Metrics export to %r failed", exporter)
+
+    def close(self) -> None:
+        """Stop periodic export, write a final snapshot, close exporters."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.export()
+        for exporter in self.exporters:
+            exporter.close()
+
+    def _series(self, table: dict[str, _Series], key: str) -> _Series:
+        series = table.get(key)
+        if series is None:
+            with self._lock:
+                series = table.setdefault(key, _Series())
+        return series
+
+    def _export_every(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.export()
+
+
+def from_config() -> Instrumentation:
+    """Build instrumentation from the ``INSTRUMENTATION*`` settings.
+
+    Returns :data:`NOOP` when ``INSTRUMENTATION`` is ``off``; ``memory``
+    collects without exporting; ``jsonl`` and ``prometheus`` also export to
+    ``INSTRUMENTATION_PATH`` (default ``DATA_DIR/metrics.jsonl`` or
+    ``DATA_DIR/metrics.prom``).
+
+    Raises:
+        ValueError: If ``INSTRUMENTATION`` names an unknown mode.
+    """
+    from branch.config import Config  # noqa: PLC0415
+
+    mode = Config.INSTRUMENTATION
+    if mode == "off":
+        return NOOP
+    exporters: list[Exporter] = []
+    if mode == "jsonl":
+        path = Config.INSTRUMENTATION_PATH or str(Config.DATA_DIR / "metrics.jsonl")
+        exporters.append(JSONLExporter(Path(path)))
+    elif mode == "prometheus":
+        path = Config.INSTRUMENTATION_PATH or str(Config.DATA_DIR / "metrics.prom")
+        exporters.append(PrometheusExporter(Path(path)))
+    elif mode != "memory":
+        msg = (
+            f"Unknown INSTRUMENTATION mode {mode!r}; "
+            "expected off, memory, jsonl or prometheus"
+        )
+        raise ValueError(msg)
+    return Recorder(
+        slow_query_ms=Config.SLOW_QUERY_MS,
+        exporters=exporters,
+        interval=Config.INSTRUMENTATION_INTERVAL_S,
+    )
+
+
+@contextmanager
+def configured() -> Iterator[Instrumentation]:
+    """Install :func:`from_config` instrumentation for the ``with`` block.
+
+    On exit the instrumentation is closed, which writes a final snapshot, and
+    the no-op default is restored.
+    """
+    instrumentation = install(from_config())
+    try:
+        yield instrumentation
+    finally:
+        uninstall()
+        instrumentation.close()
+
+
+def _summary(series: _Series) -> dict[str, float]:
+    summary = series.latency.summary()
+    return {
+        "count": summary.count,
+        "total": series.total,
+        "p50": summary.p50,
+        "p99": summary.p99,
+        "max": summary.max,
+    }
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
@@ -0,0 +1,88 @@
+"""Lightweight latency metrics shared by Branch subsystems.
+
+:class:`LatencyRecorder` keeps a bounded window of recent samples and reports
+percentiles on demand, so hot paths pay only for a timestamp and an append.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+DEFAULT_WINDOW = 10_000
+
+
+@dataclass(frozen=True)
+class LatencySummary:
+    """Percentile summary of recorded latencies, in seconds."""
+
+    count: int
+    p50: float
+    p99: float
+    max: float
+
+
+class LatencyRecorder:
+    """Thread-safe rolling window of latency samples."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Add one latency sample."""
+        with self._lock:
+            self._samples.append(seconds)
+            self._total += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Record how long the ``with`` block takes."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - started)
+
+    def percentile(self, q: float) -> float:
+        """Return the ``q``-th percentile (0-100) of the window, or 0.0 if empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        return _percentile(samples, q)
+
+    def summary(self) -> LatencySummary:
+        """Return count (all time) plus p50/p99/max over the current window."""
+        with self._lock:
+            samples = sorted(self._samples)
+            total = self._total
+        return LatencySummary(
+            count=total,
+            p50=_percentile(samples, 50),
+            p99=_percentile(samples, 99),
+            max=samples[-1] if samples else 0.0,
+        )
+
+    def reset(self) -> None:
+        """Discard all samples."""
+        with self._lock:
+            self._samples.clear()
+            self._total = 0
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    """Nearest-rank percentile of already-sorted samples."""
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, math.ceil(q / 100 * len(samples)) - 1))
+    return samples[rank]
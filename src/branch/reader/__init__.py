@@ -1 +1,63 @@
-"""Document reader module for Branch."""
+"""Document reader module for Branch.
+
+Exports are loaded lazily so that importing one reader module does not pull
+in PyMuPDF through the others.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from branch._lazy import lazy_exports
+
+
+if TYPE_CHECKING:
+    from branch.reader.anchors import AnchorIndex, ResolvedAnchor
+    from branch.reader.cache import EXTRACTOR_VERSION, PageCache, file_hash
+    from branch.reader.page import PageText, TextSpan
+    from branch.reader.pdf import PDFReader, extract_page
+    from branch.reader.progress import ProgressTracker
+    from branch.reader.render import (
+        PageRenderer,
+        PixmapCache,
+        RenderedPage,
+        RenderStats,
+    )
+
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "EXTRACTOR_VERSION": "branch.reader.cache",
+        "AnchorIndex": "branch.reader.anchors",
+        "PDFReader": "branch.reader.pdf",
+        "PageCache": "branch.reader.cache",
+        "PageRenderer": "branch.reader.render",
+        "PageText": "branch.reader.page",
+        "PixmapCache": "branch.reader.render",
+        "ProgressTracker": "branch.reader.progress",
+        "RenderStats": "branch.reader.render",
+        "RenderedPage": "branch.reader.render",
+        "ResolvedAnchor": "branch.reader.anchors",
+        "TextSpan": "branch.reader.page",
+        "extract_page": "branch.reader.pdf",
+        "file_hash": "branch.reader.cache",
+    },
+)
+
+__all__ = [
+    "EXTRACTOR_VERSION",
+    "AnchorIndex",
+    "PDFReader",
+    "PageCache",
+    "PageRenderer",
+    "PageText",
+    "PixmapCache",
+    "ProgressTracker",
+    "RenderStats",
+    "RenderedPage",
+    "ResolvedAnchor",
+    "TextSpan",
+    "extract_page",
+    "file_hash",
+]
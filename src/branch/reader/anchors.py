@@ -0,0 +1,400 @@
+"""Character-offset to page-coordinate index for resolving text anchors.
+
+:class:`AnchorIndex` flattens a whole document's extracted text into a few
+typed arrays: per-character boxes, per-line offset ranges and vertical
+extents, and page start offsets. Resolving ``TextAnchor`` offsets into
+highlight rectangles is then a bisect over line starts plus a constant
+amount of work per covered line, with no page text rescanned.
+
+The index serializes to a flat binary blob (:meth:`AnchorIndex.to_bytes`)
+that :class:`~branch.reader.pdf.PDFReader` stores next to the page cache, so
+it is built once per file and extractor version.
+
+When a PDF changes, stored offsets drift. :meth:`AnchorIndex.resolve` can
+re-anchor with ``selected_text``: first by a whitespace-tolerant search that
+prefers the original page and the nearest match, then by an approximate
+match scored with :mod:`difflib`.
+"""
+
+from __future__ import annotations
+
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import TYPE_CHECKING, Any
+
+from branch.models.idea_fragment import TextAnchor
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from branch.reader.page import BBox, PageText
+
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_MIN_RATIO = 0.8
+# Approximate matching is quadratic, so it only looks this many pages away.
+FUZZY_PAGE_RADIUS = 2
+
+_MAGIC = b"BRAX"
+_HEADER = struct.Struct("<4sHIII")
+
+
+@dataclass(frozen=True)
+class ResolvedAnchor:
+    """Where an anchor's text is in the current document, and how it was found.
+
+    ``method`` is ``"exact"`` when the stored offsets still match,
+    ``"offsets"`` when there was no ``selected_text`` to check them against,
+    ``"search"`` for a whitespace-tolerant text match and ``"fuzzy"`` for an
+    approximate one (``score`` is then the difflib ratio). ``selected_text``
+    is the quote the anchor was resolved from, kept for :meth:`to_anchor`.
+    """
+
+    page_number: int
+    start: int
+    end: int
+    rects: tuple[BBox, ...]
+    method: str
+    score: float = 1.0
+    selected_text: str | None = None
+
+    @property
+    def moved(self) -> bool:
+        """Whether the anchor had to be re-located."""
+        return self.method in {"search", "fuzzy"}
+
+    def to_anchor(self, selected_text: str | None = None) -> TextAnchor:
+        """Return a repaired ``TextAnchor`` pointing at the resolved range.
+
+        The original ``selected_text`` is kept unless another is given, so the
+        repaired anchor can be verified or re-anchored again later.
+        """
+        return TextAnchor(
+            page_number=self.page_number,
+            start_position=self.start,
+            end_position=self.end,
+            selected_text=self.selected_text
+            if selected_text is None
+            else selected_text,
+        )
+
+
+class AnchorIndex:
+    """Array-backed map from page-local character offsets to glyph boxes.
+
+    Offsets are global inside the index: page ``n`` covers
+    ``page_starts[n - 1]:page_starts[n]``. Lines are maximal runs of
+    characters with boxes, so separator newlines never produce rectangles.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        *,
+        page_starts: array[int],
+        boxes: array[float],
+        line_starts: array[int],
+        line_ends: array[int],
+        line_top: array[float],
+        line_bottom: array[float],
+    ) -> None:
+        self._text = text
+        self._page_starts = page_starts
+        self._boxes = boxes
+        self._line_starts = line_starts
+        self._line_ends = line_ends
+        self._line_top = line_top
+        self._line_bottom = line_bottom
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[PageText]) -> AnchorIndex:
+        """Build an index from extracted pages, in page order starting at 1."""
+        parts: list[str] = []
+        page_starts = array("I", [0])
+        boxes = array("f")
+        line_starts = array("I")
+        line_ends = array("I")
+        line_top = array("f")
+        line_bottom = array("f")
+
+        offset = 0
+        for expected, page in enumerate(pages, start=1):
+            if page.page_number != expected:
+                msg = f"Expected page {expected}, got page {page.page_number}"
+                raise ValueError(msg)
+            parts.append(page.text)
+            boxes.extend(page.char_boxes)
+            char_boxes = page.char_boxes
+            line_start: int | None = None
+            top = bottom = 0.0
+            for local in range(len(page.text) + 1):
+                if local < len(page.text):
+                    x0, y0, x1, y1 = char_boxes[4 * local : 4 * local + 4]
+                    has_box = not x0 == y0 == x1 == y1 == 0
+                else:
+                    has_box = False
+                if not has_box:
+                    if line_start is not None:
+                        line_starts.append(offset + line_start)
+                        line_ends.append(offset + local)
+                        line_top.append(top)
+                        line_bottom.append(bottom)
+                        line_start = None
+                elif line_start is None:
+                    line_start, top, bottom = local, y0, y1
+                else:
+                    top, bottom = min(top, y0), max(bottom, y1)
+            offset += len(page.text)
+            page_starts.append(offset)
+
+        return cls(
+            "".join(parts),
+            page_starts=page_starts,
+            boxes=boxes,
+            line_starts=line_starts,
+            line_ends=line_ends,
+            line_top=line_top,
+            line_bottom=line_bottom,
+        )
+
+    # Serialization
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a flat little-endian binary blob."""
+        encoded = self._text.encode("utf-8")
+        header = _HEADER.pack(
+            _MAGIC,
+            INDEX_FORMAT_VERSION,
+            len(self._page_starts),
+            len(self._line_starts),
+            len(encoded),
+        )
+        chunks = [header]
+        for values in self._arrays():
+            chunk = array(values.typecode, values)
+            if sys.byteorder == "big":
+                chunk.byteswap()
+            chunks.append(chunk.tobytes())
+        chunks.append(encoded)
+        return b"".join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> AnchorIndex:
+        """Load an index written by :meth:`to_bytes`.
+
+        Raises:
+            ValueError: If the blob is not a supported anchor index.
+        """
+        if len(data) < _HEADER.size:
+            msg = "Anchor index is truncated"
+            raise ValueError(msg)
+        magic, version, page_slots, line_count, text_bytes = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != INDEX_FORMAT_VERSION:
+            msg = "Not a supported anchor index"
+            raise ValueError(msg)
+
+        view = memoryview(data)[_HEADER.size :]
+        page_starts, view = _take(view, "I", page_slots)
+        char_count = page_starts[-1]
+        boxes, view = _take(view, "f", 4 * char_count)
+        line_starts, view = _take(view, "I", line_count)
+        line_ends, view = _take(view, "I", line_count)
+        line_top, view = _take(view, "f", line_count)
+        line_bottom, view = _take(view, "f", line_count)
+        if len(view) != text_bytes:
+            msg = "Anchor index text section has the wrong length"
+            raise ValueError(msg)
+        text = bytes(view).decode("utf-8")
+        if len(text) != char_count:
+            msg = "Anchor index text does not match its character boxes"
+            raise ValueError(msg)
+        return cls(
+            text,
+            page_starts=page_starts,
+            boxes=boxes,
+            line_starts=line_starts,
+            line_ends=line_ends,
+            line_top=line_top,
+            line_bottom=line_bottom,
+        )
+
+    # Lookups
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages in the index."""
+        return len(self._page_starts) - 1
+
+    def page_text(self, page_number: int) -> str:
+        """Return the extracted text of a 1-based page."""
+        start, end = self._page_bounds(page_number)
+        return self._text[start:end]
+
+    def rects(self, page_number: int, start: int, end: int) -> list[BBox]:
+        """Return one highlight rectangle per line covered by ``[start, end)``.
+
+        Offsets are page-local, as stored in ``TextAnchor``.
+        """
+        page_start, page_end = self._page_bounds(page_number)
+        if not 0 <= start <= end <= page_end - page_start:
+            msg = f"Range {start}:{end} is outside page {page_number}"
+            raise IndexError(msg)
+        first, last = page_start + start, page_start + end
+        rects: list[BBox] = []
+        line = max(0, bisect_right(self._line_starts, first) - 1)
+        while line < len(self._line_starts) and self._line_starts[line] < last:
+            low = max(first, self._line_starts[line])
+            high = min(last, self._line_ends[line])
+            if low < high:
+                rects.append(
+                    (
+                        self._boxes[4 * low],
+                        self._line_top[line],
+                        self._boxes[4 * (high - 1) + 2],
+                        self._line_bottom[line],
+                    )
+                )
+            line += 1
+        return rects
+
+    def resolve(
+        self,
+        anchor: TextAnchor,
+        *,
+        fuzzy: bool = True,
+        min_ratio: float = DEFAULT_MIN_RATIO,
+    ) -> ResolvedAnchor | None:
+        """Locate an anchor's text and its highlight rectangles.
+
+        Stored offsets are trusted when they still select ``selected_text``.
+        Otherwise, with ``fuzzy`` set, the selected text is searched for,
+        starting on the anchor's page and moving outwards.
+
+        Returns:
+            The resolved range, or None if the anchor cannot be placed.
+        """
+        page = anchor.page_number
+        start, end = anchor.start_position, anchor.end_position
+        selected = anchor.selected_text
+        if page is None or not 1 <= page <= self.page_count:
+            page = None
+
+        if page is not None and start is not None and end is not None:
+            text = self.page_text(page)
+            if 0 <= start <= end <= len(text) and (
+                selected is None or text[start:end] == selected
+            ):
+                method = "offsets" if selected is None else "exact"
+                return self._resolved(page, start, end, method, selected=selected)
+
+        if not fuzzy or not selected or not selected.strip():
+            return None
+        origin_page = page or 1
+        origin = start or 0
+
+        found = self._search(selected, origin_page, origin)
+        if found is not None:
+            return self._resolved(*found, "search", selected=selected)
+        approximate = self._approximate(selected, origin_page, min_ratio)
+        if approximate is not None:
+            page_number, low, high, ratio = approximate
+            return self._resolved(
+                page_number, low, high, "fuzzy", ratio, selected=selected
+            )
+        return None
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index."""
+        total = sys.getsizeof(self._text)
+        return total + sum(sys.getsizeof(values) for values in self._arrays())
+
+    # Internals
+
+    def _arrays(self) -> tuple[array[int] | array[float], ...]:
+        return (
+            self._page_starts,
+            self._boxes,
+            self._line_starts,
+            self._line_ends,
+            self._line_top,
+            self._line_bottom,
+        )
+
+    def _page_bounds(self, page_number: int) -> tuple[int, int]:
+        if not 1 <= page_number <= self.page_count:
+            msg = f"Page {page_number} is outside 1..{self.page_count}"
+            raise IndexError(msg)
+        return self._page_starts[page_number - 1], self._page_starts[page_number]
+
+    def _resolved(
+        self,
+        page: int,
+        start: int,
+        end: int,
+        method: str,
+        score: float = 1.0,
+        *,
+        selected: str | None,
+    ) -> ResolvedAnchor:
+        rects = tuple(self.rects(page, start, end))
+        return ResolvedAnchor(page, start, end, rects, method, score, selected)
+
+    def _pages_by_distance(
+        self, origin: int, radius: int | None = None
+    ) -> Iterator[int]:
+        yield origin
+        limit = self.page_count if radius is None else radius + 1
+        for distance in range(1, limit):
+            for page in (origin - distance, origin + distance):
+                if 1 <= page <= self.page_count:
+                    yield page
+
+    def _search(
+        self, selected: str, origin_page: int, origin: int
+    ) -> tuple[int, int, int] | None:
+        """Whitespace- and case-tolerant search, nearest page then offset."""
+        pattern = re.compile(
+            r"\s+".join(re.escape(word) for word in selected.split()), re.IGNORECASE
+        )
+        for page in self._pages_by_distance(origin_page):
+            matches = list(pattern.finditer(self.page_text(page)))
+            if matches:
+                best = min(matches, key=lambda m: abs(m.start() - origin))
+                return page, best.start(), best.end()
+        return None
+
+    def _approximate(
+        self, selected: str, origin_page: int, min_ratio: float
+    ) -> tuple[int, int, int, float] | None:
+        """Best difflib match around the longest common block, if good enough."""
+        best: tuple[int, int, int, float] | None = None
+        for page in self._pages_by_distance(origin_page, FUZZY_PAGE_RADIUS):
+            text = self.page_text(page)
+            matcher = SequenceMatcher(None, text, selected, autojunk=False)
+            block = matcher.find_longest_match(0, len(text), 0, len(selected))
+            if block.size == 0:
+                continue
+            low = max(0, block.a - block.b)
+            high = min(len(text), low + len(selected))
+            ratio = SequenceMatcher(None, text[low:high], selected).ratio()
+            if ratio >= min_ratio and (best is None or ratio > best[3]):
+                best = (page, low, high, ratio)
+        return best
+
+
+def _take(view: memoryview, typecode: str, count: int) -> tuple[array[Any], memoryview]:
+    values = array(typecode)
+    size = values.itemsize * count
+    if len(view) < size:
+        msg = "Anchor index is truncated"
+        raise ValueError(msg)
+    values.frombytes(view[:size])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values, view[size:]
@@ -0,0 +1,192 @@
+"""On-disk cache of extracted page text.
+
+Extraction is the expensive part of opening a PDF, and a page's text never
+changes unless the file does. :class:`PageCache` stores each extracted page
+under ``<root>/v<extractor version>/<file hash>/<page>.json`` so a reopened
+document only pays for reading small JSON files, and only for the pages the
+reader actually visits. Bumping :data:`EXTRACTOR_VERSION` orphans every old
+entry instead of serving text laid out by a previous extractor.
+
+File hashes are memoized against ``(size, mtime_ns)`` so reopening a large,
+unchanged PDF does not re-hash it.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import sys
+from array import array
+from typing import TYPE_CHECKING, Any
+
+from branch.config import Config
+from branch.reader.page import PageText, TextSpan
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extraction output changes shape or content.
+EXTRACTOR_VERSION = 1
+
+FINGERPRINTS_FILE = "fingerprints.json"
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_hash(path: Path) -> str:
+    """Return the BLAKE2b digest of a file's contents as hex."""
+    digest = hashlib.blake2b(digest_size=20)
+    with path.open("rb") as file:
+        while chunk := file.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PageCache:
+    """Persistent page-text cache keyed by file hash, page and extractor version."""
+
+    def __init__(
+        self, root: Path | None = None, version: int = EXTRACTOR_VERSION
+    ) -> None:
+        self._root = root or Config.READER_CACHE_DIR
+        self._version = version
+        self._fingerprints: dict[str, Any] | None = None
+
+    @property
+    def root(self) -> Path:
+        """Directory holding every cached version."""
+        return self._root
+
+    @property
+    def version(self) -> int:
+        """Extractor version this cache reads and writes."""
+        return self._version
+
+    def fingerprint(self, path: Path) -> str:
+        """Return the content hash of ``path``, re-hashing only if it changed."""
+        stat = path.stat()
+        key = str(path.resolve())
+        fingerprints = self._load_fingerprints()
+        known = fingerprints.get(key)
+        if (
+            known
+            and known["size"] == stat.st_size
+            and known["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return str(known["hash"])
+        digest = file_hash(path)
+        fingerprints[key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest,
+        }
+        _write_atomic(self._root / FINGERPRINTS_FILE, json.dumps(fingerprints))
+        return digest
+
+    def get(self, digest: str, page_number: int) -> PageText | None:
+        """Return a cached page, or None on a miss or an unreadable entry."""
+        path = self._page_path(digest, page_number)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            return _decode_page(payload)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Discarding corrupt page cache entry %s", path)
+            path.unlink(missing_ok=True)
+            return None
+
+    def put(self, digest: str, page: PageText) -> None:
+        """Store an extracted page."""
+        payload = json.dumps(_encode_page(page), separators=(",", ":"))
+        _write_atomic(self._page_path(digest, page.page_number), payload)
+
+    def get_blob(self, digest: str, name: str) -> bytes | None:
+        """Return a per-file artifact (such as an anchor index), if cached."""
+        try:
+            return self._blob_path(digest, name).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put_blob(self, digest: str, name: str, data: bytes) -> None:
+        """Store a per-file artifact next to the file's cached pages."""
+        path = self._blob_path(digest, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temporary.write_bytes(data)
+        temporary.replace(path)
+
+    def __contains__(self, key: object) -> bool:
+        """Return whether ``(file hash, page number)`` is cached."""
+        if not isinstance(key, tuple) or len(key) != 2:
+            return False
+        digest, page_number = key
+        return self._page_path(digest, page_number).exists()
+
+    def _page_path(self, digest: str, page_number: int) -> Path:
+        return self._root / f"v{self._version}" / digest / f"{page_number:05d}.json"
+
+    def _blob_path(self, digest: str, name: str) -> Path:
+        return self._root / f"v{self._version}" / digest / f"{name}.bin"
+
+    def _load_fingerprints(self) -> dict[str, Any]:
+        if self._fingerprints is None:
+            try:
+                text = (self._root / FINGERPRINTS_FILE).read_text(encoding="utf-8")
+                self._fingerprints = json.loads(text)
+            except (FileNotFoundError, ValueError):
+                self._fingerprints = {}
+        return self._fingerprints
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    """Write via a temporary file so readers never see a partial entry."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temporary.write_text(text, encoding="utf-8")
+    temporary.replace(path)
+
+
+def _encode_page(page: PageText) -> dict[str, Any]:
+    boxes = array("f", page.char_boxes)
+    if sys.byteorder == "big":
+        boxes.byteswap()
+    return {
+        "page": page.page_number,
+        "width": page.width,
+        "height": page.height,
+        "text": page.text,
+        "spans": [
+            [span.start, span.end, *span.bbox, span.font, span.size]
+            for span in page.spans
+        ],
+        "chars": base64.b64encode(boxes.tobytes()).decode("ascii"),
+    }
+
+
+def _decode_page(payload: dict[str, Any]) -> PageText:
+    boxes = array("f")
+    boxes.frombytes(base64.b64decode(payload["chars"]))
+    if sys.byteorder == "big":
+        boxes.byteswap()
+    text = payload["text"]
+    if len(boxes) != 4 * len(text):
+        msg = "character box count does not match text length"
+        raise ValueError(msg)
+    return PageText(
+        page_number=payload["page"],
+        width=payload["width"],
+        height=payload["height"],
+        text=text,
+        spans=tuple(
+            TextSpan(start, end, (x0, y0, x1, y1), font, size)
+            for start, end, x0, y0, x1, y1, font, size in payload["spans"]
+        ),
+        char_boxes=boxes,
+    )
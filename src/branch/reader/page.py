@@ -0,0 +1,63 @@
+"""Extracted page text with character positions.
+
+A page's text is the concatenation of its spans: spans on a line are joined
+directly, each line ends with a newline and each block is followed by one
+more newline. ``TextAnchor.start_position``/``end_position`` are offsets into
+this text. Every character has a bounding box in ``char_boxes`` (four floats
+per character, in PDF points); the separator newlines have empty boxes.
+"""
+
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+
+
+BBox = tuple[float, float, float, float]
+
+
+@dataclass(frozen=True, slots=True)
+class TextSpan:
+    """A run of characters sharing one font, as ``[start, end)`` offsets."""
+
+    start: int
+    end: int
+    bbox: BBox
+    font: str
+    size: float
+
+
+@dataclass(frozen=True, slots=True)
+class PageText:
+    """Text, spans and per-character boxes of one page (1-based)."""
+
+    page_number: int
+    width: float
+    height: float
+    text: str
+    spans: tuple[TextSpan, ...] = ()
+    char_boxes: array[float] = field(default_factory=lambda: array("f"))
+
+    def char_box(self, offset: int) -> BBox | None:
+        """Return the box of the character at ``offset``, or None for separators."""
+        if not 0 <= offset < len(self.text):
+            msg = f"Offset {offset} is outside page {self.page_number}"
+            raise IndexError(msg)
+        x0, y0, x1, y1 = self.char_boxes[4 * offset : 4 * offset + 4]
+        if x0 == x1 == y0 == y1 == 0:
+            return None
+        return (x0, y0, x1, y1)
+
+    def span_at(self, offset: int) -> TextSpan | None:
+        """Return the span containing ``offset``, if any."""
+        low, high = 0, len(self.spans)
+        while low < high:
+            middle = (low + high) // 2
+            span = self.spans[middle]
+            if offset < span.start:
+                high = middle
+            elif offset >= span.end:
+                low = middle + 1
+            else:
+                return span
+        return None
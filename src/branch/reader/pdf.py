@@ -0,0 +1,202 @@
+"""Lazy, cached PDF text extraction on top of PyMuPDF.
+
+:class:`PDFReader` extracts one page at a time, when it is first asked for,
+and stores the result in a :class:`~branch.reader.cache.PageCache`. Opening a
+document only reads the PDF cross-reference table, so the page count is known
+immediately without parsing any page content.
+"""
+
+from __future__ import annotations
+
+import logging
+from array import array
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+import pymupdf
+
+from branch.reader.anchors import AnchorIndex
+from branch.reader.cache import PageCache
+from branch.reader.page import PageText, TextSpan
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from branch.models import Document
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_PAGES = 32
+ANCHOR_INDEX_BLOB = "anchors"
+
+_NO_BOX = (0.0, 0.0, 0.0, 0.0)
+
+
+class PDFReader:
+    """Page-by-page text reader for one PDF file.
+
+    Pages are served from a small in-memory LRU first, then from the on-disk
+    page cache, and only extracted with PyMuPDF on a miss in both.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        cache: PageCache | None = None,
+        *,
+        memory_pages: int = DEFAULT_MEMORY_PAGES,
+    ) -> None:
+        self._path = path
+        self._cache = cache if cache is not None else PageCache()
+        self._memory_pages = memory_pages
+        self._recent: OrderedDict[int, PageText] = OrderedDict()
+        self._digest: str | None = None
+        self._document: Any = None
+        self._page_count: int | None = None
+        self._anchor_index: AnchorIndex | None = None
+        self.extracted = 0
+
+    @property
+    def path(self) -> Path:
+        """Path of the PDF being read."""
+        return self._path
+
+    @property
+    def digest(self) -> str:
+        """Content hash used as the cache key for this file."""
+        if self._digest is None:
+            self._digest = self._cache.fingerprint(self._path)
+        return self._digest
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages, read from the cross-reference table only."""
+        if self._page_count is None:
+            self._page_count = int(self._open().page_count)
+        return self._page_count
+
+    def update_document(self, document: Document) -> None:
+        """Set ``document.page_count`` without extracting any page."""
+        document.page_count = self.page_count
+
+    def page(self, page_number: int) -> PageText:
+        """Return the text of a 1-based page, extracting it only if needed."""
+        if not 1 <= page_number <= self.page_count:
+            msg = f"Page {page_number} is outside 1..{self.page_count}"
+            raise IndexError(msg)
+
+        page = self._recent.get(page_number)
+        if page is not None:
+            self._recent.move_to_end(page_number)
+            return page
+
+        page = self._cache.get(self.digest, page_number)
+        if page is None:
+            page = extract_page(self._open(), page_number)
+            self._cache.put(self.digest, page)
+            self.extracted += 1
+
+        self._recent[page_number] = page
+        if len(self._recent) > self._memory_pages:
+            self._recent.popitem(last=False)
+        return page
+
+    def anchor_index(self) -> AnchorIndex:
+        """Return the document's anchor index, building and caching it once.
+
+        Building extracts every page not already cached; later calls (and
+        later readers of the same file) load the stored binary index.
+        """
+        if self._anchor_index is None:
+            data = self._cache.get_blob(self.digest, ANCHOR_INDEX_BLOB)
+            if data is not None:
+                try:
+                    self._anchor_index = AnchorIndex.from_bytes(data)
+                except ValueError:
+                    logger.warning(
+                        "Rebuilding unreadable anchor index for %s", self._path
+                    )
+            if self._anchor_index is None:
+                self._anchor_index = AnchorIndex.from_pages(self.pages())
+                self._cache.put_blob(
+                    self.digest, ANCHOR_INDEX_BLOB, self._anchor_index.to_bytes()
+                )
+        return self._anchor_index
+
+    def pages(self, start: int = 1, end: int | None = None) -> Iterator[PageText]:
+        """Yield pages ``start..end`` (inclusive) lazily."""
+        last = self.page_count if end is None else end
+        for page_number in range(start, last + 1):
+            yield self.page(page_number)
+
+    def close(self) -> None:
+        """Release the underlying PyMuPDF document."""
+        if self._document is not None:
+            self._document.close()
+            self._document = None
+
+    def __enter__(self) -> PDFReader:
+        """Use the reader as a context manager that closes on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the PDF when leaving the ``with`` block."""
+        self.close()
+
+    def _open(self) -> Any:
+        if self._document is None:
+            self._document = pymupdf.open(self._path)  # type: ignore[no-untyped-call]
+        return self._document
+
+
+def extract_page(document: Any, page_number: int) -> PageText:
+    """Extract text, spans and character boxes from one page of a PyMuPDF doc."""
+    page = document[page_number - 1]
+    raw = page.get_text("rawdict", flags=pymupdf.TEXTFLAGS_RAWDICT)
+    parts: list[str] = []
+    spans: list[TextSpan] = []
+    boxes = array("f")
+    offset = 0
+
+    def separator() -> None:
+        nonlocal offset
+        parts.append("\n")
+        boxes.extend(_NO_BOX)
+        offset += 1
+
+    for block in raw["blocks"]:
+        if block.get("type", 0) != 0:
+            continue
+        for line in block["lines"]:
+            for span in line["spans"]:
+                start = offset
+                for char in span["chars"]:
+                    text = char["c"]
+                    parts.append(text)
+                    for _ in text:
+                        boxes.extend(char["bbox"])
+                    offset += len(text)
+                if offset > start:
+                    spans.append(
+                        TextSpan(
+                            start,
+                            offset,
+                            tuple(span["bbox"]),
+                            span["font"],
+                            float(span["size"]),
+                        )
+                    )
+            separator()
+        separator()
+
+    return PageText(
+        page_number=page_number,
+        width=float(raw["width"]),
+        height=float(raw["height"]),
+        text="".join(parts),
+        spans=tuple(spans),
+        char_boxes=boxes,
+    )
@@ -0,0 +1,211 @@
+"""Debounced persistence of reading progress.
+
+``Document.update_progress`` runs on every page turn. Writing each one would
+mean hundreds of transactions while the reader scrolls through a long PDF.
+:class:`ProgressTracker` applies the turn to the in-memory document at once,
+keeps only the latest position per document, and writes it with a narrow
+``UPDATE`` of the three progress columns when page turns pause for ``idle``
+seconds, or at the latest ``max_delay`` seconds after the first unsaved turn,
+so progress also reaches the database during a long, steady scroll. A write
+that fails puts its changes back, unless a newer turn replaced them, and is
+retried after ``max_delay``.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from branch.config import Config
+from branch.instrumentation import current
+from branch.storage import StorageError
+
+
+if TYPE_CHECKING:
+    from datetime import datetime
+    from uuid import UUID
+
+    from branch.models import Document
+    from branch.storage import BranchRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressTracker:
+    """Coalesce page turns and persist the latest position in the background."""
+
+    def __init__(
+        self,
+        repository: BranchRepository,
+        *,
+        idle: float | None = None,
+        max_delay: float | None = None,
+    ) -> None:
+        """Create a tracker; call :meth:`start` (or use ``with``) before turning.
+
+        Args:
+            repository: Receives :meth:`BranchRepository.update_document_progress`.
+            idle: Seconds without a page turn before flushing
+                (``PROGRESS_IDLE_MS``).
+            max_delay: Longest a page turn waits to be written
+                (``PROGRESS_MAX_DELAY_S``).
+        """
+        self._repository = repository
+        self._idle = Config.PROGRESS_IDLE_MS / 1000 if idle is None else idle
+        self._max_delay = (
+            Config.PROGRESS_MAX_DELAY_S if max_delay is None else max_delay
+        )
+
+        self._condition = threading.Condition()
+        self._pending: dict[UUID, tuple[UUID, int, datetime, float]] = {}
+        self._first_at = 0.0
+        self._last_at = 0.0
+        self._flush_requested = False
+        self._closing = False
+        self._thread: threading.Thread | None = None
+        self._in_flight = 0
+
+        self.turns = 0
+        self.writes = 0
+
+    # Lifecycle
+
+    def start(self) -> ProgressTracker:
+        """Start the background flusher."""
+        if self._thread is None:
+            self._closing = False
+            self._thread = threading.Thread(
+                target=self._run, name="branch-progress", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Write any pending progress and stop the flusher."""
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._write(self._take())
+
+    def __enter__(self) -> ProgressTracker:
+        """Start the tracker when entering a ``with`` block."""
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Flush and stop when leaving the ``with`` block."""
+        self.close()
+
+    # Page turns
+
+    def page_turned(self, document: Document, page: int) -> None:
+        """Update ``document`` in memory and schedule its progress for writing.
+
+        Raises:
+            ValueError: ``page`` is below 1.
+        """
+        if page < 1:
+            msg = f"Page numbers start at 1, got {page}"
+            raise ValueError(msg)
+        document.update_progress(page)
+        assert document.last_opened_at is not None
+        # A stale page count can put the page past the end; the column is
+        # capped at 100 and one bad row would fail every document in the batch.
+        document.read_percentage = min(document.read_percentage, 100.0)
+        change = (document.id, page, document.last_opened_at, document.read_percentage)
+        with self._condition:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_at = now
+            self._last_at = now
+            self._pending[document.id] = change
+            self.turns += 1
+            self._condition.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until progress recorded so far is written.
+
+        Returns:
+            False if ``timeout`` expired first, True otherwise.
+        """
+        with self._condition:
+            if self._thread is None:
+                msg = "ProgressTracker is not running; call start() first"
+                raise StorageError(msg)
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._in_flight, timeout=timeout
+            )
+
+    @property
+    def pending(self) -> int:
+        """Documents whose latest progress is not written yet."""
+        with self._condition:
+            return len(self._pending)
+
+    # Background flushing
+
+    def _due(self) -> float:
+        """Seconds until the pending progress should be written (caller locks)."""
+        deadline = min(self._last_at + self._idle, self._first_at + self._max_delay)
+        return deadline - time.monotonic()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._pending or self._closing or self._flush_requested
+                )
+                while self._pending and not self._closing and not self._flush_requested:
+                    remaining = self._due()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                self._flush_requested = False
+                changes = self._take()
+                self._in_flight = len(changes)
+                stop = self._closing
+
+            written = False
+            try:
+                written = self._write(changes)
+            finally:
+                with self._condition:
+                    self._in_flight = 0
+                    self._condition.notify_all()
+                    if not written and not stop:
+                        self._condition.wait_for(
+                            lambda: self._closing or self._flush_requested,
+                            timeout=self._max_delay,
+                        )
+            if stop:
+                return
+
+    def _take(self) -> list[tuple[UUID, int, datetime, float]]:
+        with self._condition:
+            changes, self._pending = list(self._pending.values()), {}
+        return changes
+
+    def _write(self, changes: list[tuple[UUID, int, datetime, float]]) -> bool:
+        """Write ``changes``; on failure keep them pending and return False."""
+        if not changes:
+            return True
+        try:
+            self._repository.update_document_progress(changes)
+        except StorageError:
+            logger.exception("Could not save reading progress")
+            with self._condition:
+                if not self._pending:
+                    self._first_at = self._last_at = time.monotonic()
+                for change in changes:
+                    self._pending.setdefault(change[0], change)
+            return False
+        self.writes += 1
+        current().count("progress_writes")
+        return True
@@ -0,0 +1,326 @@
+"""Page rendering with a pixmap cache and background prefetch.
+
+Page turns have to feel instant, so :class:`PageRenderer` keeps rendered
+pixmaps in a byte-budgeted LRU (:class:`PixmapCache`) and, after every page
+it serves, renders the neighbouring pages on a worker thread before the
+reader asks for them.
+
+The cache holds one LRU per zoom level, each with the full byte budget, and
+keeps only the most recently used zoom levels. Zooming in therefore does not
+flush the pages rendered at the previous zoom, and zooming back is free.
+
+PyMuPDF is not thread-safe, so every render (foreground or prefetch) holds a
+single lock. A page request waits for at most one in-flight prefetch render,
+and a jump to another page drops prefetch work queued for the old one.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import pymupdf
+
+from branch.config import Config
+from branch.metrics import LatencyRecorder, LatencySummary
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ZOOM_LEVELS = 2
+PAGE_LATENCY_ENTRIES = 256
+
+
+@dataclass(frozen=True, slots=True)
+class RenderedPage:
+    """Raw RGB pixels of one page at one zoom level."""
+
+    page_number: int
+    zoom: float
+    width: int
+    height: int
+    stride: int
+    samples: bytes
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the pixel buffer."""
+        return len(self.samples)
+
+
+@dataclass(frozen=True)
+class RenderStats:
+    """Cache effectiveness and render latency for a :class:`PageRenderer`."""
+
+    hits: int
+    misses: int
+    prefetched: int
+    evictions: int
+    cached_bytes: int
+    latency: LatencySummary
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of page requests served from the cache."""
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+class PixmapCache:
+    """Thread-safe LRU of rendered pages, budgeted in bytes per zoom level."""
+
+    def __init__(
+        self, budget_bytes: int, max_zoom_levels: int = DEFAULT_ZOOM_LEVELS
+    ) -> None:
+        self._budget = budget_bytes
+        self._max_zoom_levels = max_zoom_levels
+        self._levels: OrderedDict[float, OrderedDict[int, RenderedPage]] = OrderedDict()
+        self._sizes: dict[float, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, page_number: int, zoom: float) -> RenderedPage | None:
+        """Return a cached page and mark it (and its zoom level) as recent."""
+        with self._lock:
+            level = self._levels.get(zoom)
+            if level is None:
+                return None
+            page = level.get(page_number)
+            if page is not None:
+                level.move_to_end(page_number)
+                self._levels.move_to_end(zoom)
+            return page
+
+    def __contains__(self, key: object) -> bool:
+        """Return whether ``(page_number, zoom)`` is cached, without touching LRU."""
+        if not isinstance(key, tuple):
+            return False
+        page_number, zoom = key
+        with self._lock:
+            return page_number in self._levels.get(zoom, {})
+
+    def put(self, page: RenderedPage) -> None:
+        """Insert a page, evicting least recently used pages over budget."""
+        if page.nbytes > self._budget:
+            return
+        with self._lock:
+            level = self._levels.get(page.zoom)
+            if level is None:
+                level = self._levels[page.zoom] = OrderedDict()
+                self._sizes[page.zoom] = 0
+                while len(self._levels) > self._max_zoom_levels:
+                    zoom, dropped = self._levels.popitem(last=False)
+                    self.evictions += len(dropped)
+                    del self._sizes[zoom]
+            self._levels.move_to_end(page.zoom)
+
+            previous = level.pop(page.page_number, None)
+            if previous is not None:
+                self._sizes[page.zoom] -= previous.nbytes
+            level[page.page_number] = page
+            self._sizes[page.zoom] += page.nbytes
+            while self._sizes[page.zoom] > self._budget:
+                _, evicted = level.popitem(last=False)
+                self._sizes[page.zoom] -= evicted.nbytes
+                self.evictions += 1
+
+    @property
+    def nbytes(self) -> int:
+        """Total bytes held across zoom levels."""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def clear(self) -> None:
+        """Drop every cached page."""
+        with self._lock:
+            self._levels.clear()
+            self._sizes.clear()
+
+
+class PageRenderer:
+    """Render pages of one PDF with caching and neighbour prefetch."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        zoom: float = 1.0,
+        prefetch: int | None = None,
+        cache: PixmapCache | None = None,
+    ) -> None:
+        self._path = path
+        self.zoom = zoom
+        self._prefetch = Config.RENDER_PREFETCH_PAGES if prefetch is None else prefetch
+        self._cache = cache or PixmapCache(Config.RENDER_CACHE_MB * 1024 * 1024)
+
+        self._render_lock = threading.Lock()
+        self._document: Any = pymupdf.open(path)  # type: ignore[no-untyped-call]
+        self._page_count = int(self._document.page_count)
+
+        self._condition = threading.Condition()
+        self._queue: deque[tuple[int, float]] = deque()
+        self._busy = False
+        self._closing = False
+        self._thread: threading.Thread | None = None
+
+        self._hits = 0
+        self._misses = 0
+        self._prefetched = 0
+        self.render_latency = LatencyRecorder()
+        # Latest render time per (page, zoom), bounded to the most recent renders.
+        self.page_latency: OrderedDict[tuple[int, float], float] = OrderedDict()
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages in the document."""
+        return self._page_count
+
+    @property
+    def cache(self) -> PixmapCache:
+        """The pixmap cache backing this renderer."""
+        return self._cache
+
+    def page(self, page_number: int, zoom: float | None = None) -> RenderedPage:
+        """Return a rendered page, then prefetch its neighbours."""
+        zoom = self.zoom if zoom is None else zoom
+        if not 1 <= page_number <= self._page_count:
+            msg = f"Page {page_number} is outside 1..{self._page_count}"
+            raise IndexError(msg)
+
+        rendered = self._cache.get(page_number, zoom)
+        with self._condition:
+            if rendered is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        if rendered is None:
+            rendered = self._render(page_number, zoom)
+        self.prefetch_around(page_number, zoom)
+        return rendered
+
+    def prefetch_around(self, page_number: int, zoom: float | None = None) -> None:
+        """Queue the next and previous pages, nearest first, replacing old work."""
+        zoom = self.zoom if zoom is None else zoom
+        wanted = []
+        for distance in range(1, self._prefetch + 1):
+            for neighbour in (page_number + distance, page_number - distance):
+                if (
+                    1 <= neighbour <= self._page_count
+                    and (neighbour, zoom) not in self._cache
+                ):
+                    wanted.append((neighbour, zoom))
+        with self._condition:
+            if self._closing:
+                return
+            self._queue.clear()
+            self._queue.extend(wanted)
+            if wanted:
+                self._ensure_worker()
+                self._condition.notify_all()
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Block until queued prefetch work is done; False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queue and not self._busy, timeout=timeout
+            )
+
+    def stats(self) -> RenderStats:
+        """Return hit rate, prefetch count, evictions and render latency."""
+        with self._condition:
+            hits, misses, prefetched = self._hits, self._misses, self._prefetched
+        return RenderStats(
+            hits=hits,
+            misses=misses,
+            prefetched=prefetched,
+            evictions=self._cache.evictions,
+            cached_bytes=self._cache.nbytes,
+            latency=self.render_latency.summary(),
+        )
+
+    def close(self) -> None:
+        """Stop prefetching and release the PDF."""
+        with self._condition:
+            self._closing = True
+            self._queue.clear()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._render_lock:
+            self._document.close()
+
+    def __enter__(self) -> PageRenderer:
+        """Use the renderer as a context manager that closes on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the renderer when leaving the ``with`` block."""
+        self.close()
+
+    # Internals
+
+    def _render(self, page_number: int, zoom: float) -> RenderedPage:
+        with self._render_lock:
+            # A prefetch may have rendered this page while we waited.
+            cached = self._cache.get(page_number, zoom)
+            if cached is not None:
+                return cached
+            started = time.perf_counter()
+            matrix = pymupdf.Matrix(zoom, zoom)  # type: ignore[no-untyped-call]
+            pixmap = self._document[page_number - 1].get_pixmap(
+                matrix=matrix, alpha=False
+            )
+            rendered = RenderedPage(
+                page_number=page_number,
+                zoom=zoom,
+                width=pixmap.width,
+                height=pixmap.height,
+                stride=pixmap.stride,
+                samples=pixmap.samples,
+            )
+            elapsed = time.perf_counter() - started
+            # Cache before releasing the lock so a waiting request finds it.
+            self._cache.put(rendered)
+            self.page_latency[page_number, zoom] = elapsed
+            self.page_latency.move_to_end((page_number, zoom))
+            if len(self.page_latency) > PAGE_LATENCY_ENTRIES:
+                self.page_latency.popitem(last=False)
+        self.render_latency.record(elapsed)
+        return rendered
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="branch-page-prefetch", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._closing)
+                if self._closing:
+                    return
+                page_number, zoom = self._queue.popleft()
+                self._busy = True
+            try:
+                if (page_number, zoom) not in self._cache:
+                    self._render(page_number, zoom)
+                    with self._condition:
+                        self._prefetched += 1
+            except Exception:
+                # A bad page must not stop prefetching for the rest.
+                logger.exception("Could not prefetch page %d", page_number)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
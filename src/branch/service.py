@@ -0,0 +1,222 @@
+"""Buffer operations shared by the CLI and the daemon.
+
+:class:`BranchService` implements capture, list, search and review on top of a
+repository. The CLI runs it in-process when no daemon is listening, and
+``branch serve`` exposes the same :meth:`BranchService.handle` over a Unix
+socket (see :mod:`branch.daemon`), so both paths behave identically.
+
+Requests and results are plain JSON values. With a :class:`CaptureQueue`
+attached (daemon mode) captures are acknowledged before they are committed;
+every read first flushes the queue so a listing always shows the captures
+that preceded it.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import asdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+from uuid import UUID
+
+from branch import __version__
+from branch.capture import CaptureQueue
+from branch.daemon import RequestError
+from branch.models import FragmentStatus, IdeaFragment
+from branch.models.idea_fragment import TextAnchor
+from branch.storage import CachedRepository, SQLiteRepository, StorageError
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+    from branch.storage import BranchRepository
+
+
+DEFAULT_LIST_LIMIT = 50
+DEFAULT_SEARCH_LIMIT = 20
+FLUSH_TIMEOUT = 10.0
+
+
+class BranchService:
+    """Run buffer operations against one repository."""
+
+    def __init__(
+        self,
+        repository: BranchRepository,
+        capture_queue: CaptureQueue | None = None,
+    ) -> None:
+        self._repository = repository
+        self._queue = capture_queue
+        self._started = time.monotonic()
+        self._operations: dict[str, Callable[..., Any]] = {
+            "ping": self.ping,
+            "capture": self.capture,
+            "list": self.list_fragments,
+            "search": self.search_fragments,
+            "review": self.review,
+        }
+
+    @classmethod
+    def open(cls, database: Path, *, write_behind: bool = False) -> BranchService:
+        """Open the database at ``database`` and build a service on it.
+
+        Args:
+            database: SQLite database file; its directory is created if needed.
+            write_behind: Pool connections, cache queries, and queue captures
+                for group commit, spilling them next to the database until
+                committed. Meant for the long-lived daemon; one-shot CLI calls
+                commit directly.
+        """
+        database.parent.mkdir(parents=True, exist_ok=True)
+        if not write_behind:
+            return cls(SQLiteRepository.open(database))
+        repository = CachedRepository(SQLiteRepository.pooled(database))
+        spill_dir = database.parent / f"{database.name}.captures"
+        return cls(repository, CaptureQueue(repository, spill_dir).start())
+
+    def close(self) -> None:
+        """Commit queued captures and close the repository."""
+        if self._queue is not None:
+            self._queue.close()
+        close = getattr(self._repository, "close", None)
+        if close is not None:
+            close()
+
+    def __enter__(self) -> BranchService:
+        """Use the service as a context manager that closes on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the service when leaving the ``with`` block."""
+        self.close()
+
+    def handle(self, op: str, args: dict[str, Any]) -> Any:
+        """Dispatch one request by operation name.
+
+        Raises:
+            RequestError: The operation is unknown or its arguments are
+                invalid, or storage rejected it.
+        """
+        operation = self._operations.get(op)
+        if operation is None:
+            msg = f"Unknown operation {op!r}"
+            raise RequestError(msg)
+        try:
+            return operation(**args)
+        except TypeError as exc:
+            msg = f"Invalid arguments for {op!r}: {exc}"
+            raise RequestError(msg) from exc
+        except (ValueError, LookupError, StorageError) as exc:
+            raise RequestError(str(exc)) from exc
+
+    # Operations
+
+    def ping(self) -> dict[str, Any]:
+        """Report the server version, process, pending captures and cache use."""
+        status: dict[str, Any] = {
+            "version": __version__,
+            "pid": os.getpid(),
+            "uptime": time.monotonic() - self._started,
+            "pending": 0 if self._queue is None else self._queue.pending,
+        }
+        if isinstance(self._repository, CachedRepository):
+            status["cache"] = {
+                level: asdict(stats)
+                for level, stats in self._repository.stats().items()
+            }
+        return status
+
+    def capture(
+        self,
+        content: str,
+        document_id: str | None = None,
+        page_number: int | None = None,
+        selected_text: str | None = None,
+        capture_type: str = "text",
+    ) -> dict[str, Any]:
+        """Store a new fragment and return its id and capture time."""
+        if not content.strip():
+            msg = "Nothing to capture"
+            raise ValueError(msg)
+        document = _uuid(document_id)
+        # Queued captures commit later, where an unknown document would only
+        # surface as a rejected row; check now so both paths fail the same.
+        if document is not None and self._repository.get_document(document) is None:
+            msg = f"No document with id {document_id}"
+            raise LookupError(msg)
+        anchor = None
+        if page_number is not None or selected_text is not None:
+            anchor = TextAnchor(page_number=page_number, selected_text=selected_text)
+        fragment = IdeaFragment(
+            content=content,
+            document_id=document,
+            anchor=anchor,
+            capture_type=capture_type,
+        )
+        if self._queue is None:
+            self._repository.upsert_fragment(fragment)
+        else:
+            self._queue.capture(fragment)
+        return {"id": str(fragment.id), "captured_at": fragment.captured_at.isoformat()}
+
+    def list_fragments(
+        self,
+        document_id: str | None = None,
+        status: str | None = None,
+        limit: int = DEFAULT_LIST_LIMIT,
+    ) -> list[dict[str, Any]]:
+        """Return fragments, newest first or in reading order for one document."""
+        self._flush()
+        wanted = FragmentStatus(status) if status is not None else None
+        document = _uuid(document_id)
+        if document is None:
+            fragments = self._repository.recent_fragments(limit, wanted)
+        else:
+            fragments = list(
+                self._repository.iter_fragments(document, limit=limit, status=wanted)
+            )
+        return [fragment.model_dump(mode="json") for fragment in fragments]
+
+    def search_fragments(
+        self,
+        query: str,
+        document_id: str | None = None,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+    ) -> list[dict[str, Any]]:
+        """Return full-text matches, best first, with highlighted snippets."""
+        self._flush()
+        hits = self._repository.search_fragments(query, _uuid(document_id), limit)
+        return [
+            {
+                "fragment": hit.fragment.model_dump(mode="json"),
+                "score": hit.score,
+                "snippet": hit.snippet,
+            }
+            for hit in hits
+        ]
+
+    def review(self, fragment_id: str, status: str) -> dict[str, Any]:
+        """Move a fragment to a new review status."""
+        self._flush()
+        target = FragmentStatus(status)
+        fragment = self._repository.get_fragment(UUID(fragment_id))
+        if fragment is None:
+            msg = f"No fragment with id {fragment_id}"
+            raise LookupError(msg)
+        updated_at = datetime.utcnow()
+        self._repository.update_fragment_statuses([(fragment.id, target, updated_at)])
+        return {"id": str(fragment.id), "status": target.value}
+
+    # Internals
+
+    def _flush(self) -> None:
+        if self._queue is not None and not self._queue.flush(FLUSH_TIMEOUT):
+            msg = "Timed out waiting for queued captures to commit"
+            raise StorageError(msg)
+
+
+def _uuid(value: str | None) -> UUID | None:
+    return UUID(value) if value is not None else None
@@ -1,16 +1,44 @@
 """Storage and persistence module for Branch."""
 
-from branch.storage.repository import BranchRepository, StorageError
+from branch.storage.cache import CachedRepository, CacheStats, TTLCache
+from branch.storage.migrations import AppliedMigration, Migration, migrate
+from branch.storage.repository import (
+    BranchRepository,
+    FileStamp,
+    FragmentSearchHit,
+    StorageError,
+)
 from branch.storage.schema import SCHEMA_VERSION, apply_schema, current_schema_objects
-from branch.storage.sqlite import connect, initialize
+from branch.storage.sqlite import (
+    ConnectionPool,
+    SQLiteProfile,
+    connect,
+    database_path,
+    initialize,
+    read_snapshot,
+)
+from branch.storage.sqlite_repository import SQLiteRepository
 
 
 __all__ = [
     "SCHEMA_VERSION",
+    "AppliedMigration",
     "BranchRepository",
+    "CacheStats",
+    "CachedRepository",
+    "ConnectionPool",
+    "FileStamp",
+    "FragmentSearchHit",
+    "Migration",
+    "SQLiteProfile",
+    "SQLiteRepository",
     "StorageError",
+    "TTLCache",
     "apply_schema",
     "connect",
     "current_schema_objects",
+    "database_path",
     "initialize",
+    "migrate",
+    "read_snapshot",
 ]
@@ -0,0 +1,605 @@
+"""Read-through query cache in front of a :class:`BranchRepository`.
+
+Review sessions issue the same few queries over and over: a document's
+fragments, status counts and the most recent captures. :class:`CachedRepository`
+answers repeats from two bounded LRU caches whose entries also expire after a
+TTL:
+
+* the *entity* level holds single documents, sessions and fragments by id;
+* the *query* level holds list, count and search results keyed by the query
+  shape (method and arguments).
+
+Every query entry is tagged with the scope it depends on: the document it is
+restricted to, or the whole buffer for cross-document queries. A write drops
+only the scopes it can affect, so capturing into one document keeps every other
+document's cached lists warm.
+
+Loads record the cache generation before querying and are discarded if an
+invalidation happened meanwhile, so a read racing a write can never re-insert
+a stale result.
+
+Returned models are shared with the cache. Treat them as read-only, or write
+them back through the repository (which invalidates them) after changing them.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from branch.config import Config
+
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable, Iterable, Iterator
+    from datetime import date, datetime
+    from uuid import UUID
+
+    from branch.models import BranchSession, Document, FragmentStatus, IdeaFragment
+    from branch.storage.repository import (
+        BranchRepository,
+        FileStamp,
+        FragmentSearchHit,
+    )
+
+
+T = TypeVar("T")
+
+BUFFER_SCOPE = ("buffer",)
+# Fragment-to-document map kept to invalidate the old document when a
+# fragment moves; bounded so long-running daemons do not grow without limit.
+KNOWN_FRAGMENTS_LIMIT = 65_536
+
+_MISSING: Any = object()
+
+
+def document_scope(document_id: UUID | None) -> tuple[str, UUID | None]:
+    """Scope tag for queries restricted to one document."""
+    return ("document", document_id)
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """Counters for one cache level, for sizing ``max_entries`` and ``ttl``."""
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after insert.
+
+    Entries may be tagged with scopes; :meth:`invalidate` drops every entry
+    tagged with a scope.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_entries < 1:
+            msg = f"max_entries must be positive, got {max_entries}"
+            raise ValueError(msg)
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any, tuple[Hashable, ...]]]
+        self._entries = OrderedDict()
+        self._scopes: dict[Hashable, set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped by every invalidation; see :meth:`put`."""
+        with self._lock:
+            return self._generation
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry and mark it recent, or ``default``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        scopes: tuple[Hashable, ...] = (),
+        *,
+        generation: int | None = None,
+    ) -> bool:
+        """Insert an entry, evicting the least recently used over capacity.
+
+        Args:
+            key: Cache key.
+            value: Value to store.
+            scopes: Tags that :meth:`invalidate` can drop the entry by.
+            generation: :attr:`generation` read before ``value`` was loaded;
+                the put is skipped if anything was invalidated since.
+
+        Returns:
+            Whether the value was stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + self._ttl, value, scopes)
+            for scope in scopes:
+                self._scopes.setdefault(scope, set()).add(key)
+            while len(self._entries) > self._max_entries:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+            return True
+
+    def invalidate(self, *scopes: Hashable) -> int:
+        """Drop every entry tagged with any of ``scopes``; return how many."""
+        with self._lock:
+            self._generation += 1
+            dropped = 0
+            for scope in scopes:
+                for key in self._scopes.get(scope, set()).copy():
+                    self._remove(key)
+                    dropped += 1
+            self._invalidations += dropped
+            return dropped
+
+    def discard(self, *keys: Hashable) -> None:
+        """Drop specific entries."""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+                    self._invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._scopes.clear()
+
+    def __len__(self) -> int:
+        """Number of stored entries, including any not yet found expired."""
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> CacheStats:
+        """Return hit, miss, eviction, expiration and invalidation counts."""
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                invalidations=self._invalidations,
+                size=len(self._entries),
+            )
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, scopes = self._entries.pop(key)
+        for scope in scopes:
+            keys = self._scopes.get(scope)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._scopes[scope]
+
+
+class CachedRepository:
+    """A :class:`BranchRepository` that caches reads of another repository.
+
+    Writes go straight to the wrapped repository and then invalidate the
+    cached entries they affect.
+    """
+
+    def __init__(
+        self,
+        repository: BranchRepository,
+        *,
+        max_entries: int | None = None,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._repository = repository
+        max_entries = max_entries or Config.QUERY_CACHE_SIZE
+        ttl = Config.QUERY_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.entities = TTLCache(max_entries, ttl, clock=clock)
+        self.queries = TTLCache(max_entries, ttl, clock=clock)
+        self._fragment_documents: OrderedDict[UUID, UUID | None] = OrderedDict()
+        self._known_lock = threading.Lock()
+
+    @property
+    def repository(self) -> BranchRepository:
+        """The wrapped repository."""
+        return self._repository
+
+    def stats(self) -> dict[str, CacheStats]:
+        """Return counters for the ``entities`` and ``queries`` levels."""
+        return {"entities": self.entities.stats(), "queries": self.queries.stats()}
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self.entities.clear()
+        self.queries.clear()
+
+    def close(self) -> None:
+        """Close the wrapped repository if it can be closed."""
+        close = getattr(self._repository, "close", None)
+        if close is not None:
+            close()
+
+    def __enter__(self) -> CachedRepository:
+        """Use the repository as a context manager that closes on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the wrapped repository when leaving the ``with`` block."""
+        self.close()
+
+    # Documents
+
+    def upsert_document(self, document: Document) -> None:
+        """Insert or update a document record."""
+        self._repository.upsert_document(document)
+        self.entities.discard(("document", document.id))
+
+    def update_document_progress(
+        self, changes: Iterable[tuple[UUID, int, datetime, float]]
+    ) -> None:
+        """Set ``last_page``, ``last_opened_at`` and ``read_percentage`` in bulk."""
+        changes = list(changes)
+        self._repository.update_document_progress(changes)
+        self.entities.discard(*(("document", change[0]) for change in changes))
+
+    def upsert_documents_many(self, documents: Iterable[Document]) -> None:
+        """Insert or update many documents in one transaction."""
+        documents = list(documents)
+        self._repository.upsert_documents_many(documents)
+        self.entities.discard(*(("document", document.id) for document in documents))
+
+    def get_document(self, document_id: UUID) -> Document | None:
+        """Fetch a document by id."""
+        return self._load(
+            self.entities,
+            ("document", document_id),
+            (),
+            lambda: self._repository.get_document(document_id),
+        )
+
+    def get_documents(self, document_ids: Iterable[UUID]) -> dict[UUID, Document]:
+        """Fetch many documents by id (not cached); unknown ids are left out."""
+        return self._repository.get_documents(document_ids)
+
+    def get_file_stamps(self) -> dict[str, FileStamp]:
+        """Return the stamp of every imported file (not cached)."""
+        return self._repository.get_file_stamps()
+
+    def upsert_imported_documents(
+        self, imports: Iterable[tuple[Document, FileStamp]]
+    ) -> None:
+        """Insert or update documents and their file stamps in one transaction."""
+        imports = list(imports)
+        self._repository.upsert_imported_documents(imports)
+        self.entities.discard(*(("document", document.id) for document, _ in imports))
+
+    # Sessions
+
+    def upsert_session(self, session: BranchSession) -> None:
+        """Insert or update a reading session."""
+        self._repository.upsert_session(session)
+        self.entities.discard(("session", session.id))
+
+    def upsert_session_and_fragments(
+        self, session: BranchSession | None, fragments: Iterable[IdeaFragment]
+    ) -> None:
+        """Insert or update a session and fragments in one transaction."""
+        fragments = list(fragments)
+        previous = self._previous_documents(fragment.id for fragment in fragments)
+        self._repository.upsert_session_and_fragments(session, fragments)
+        if session is not None:
+            self.entities.discard(("session", session.id))
+        self._invalidate_fragments(
+            [fragment.id for fragment in fragments],
+            {fragment.document_id for fragment in fragments} | previous,
+        )
+        self._remember(fragments)
+
+    def get_session(self, session_id: UUID) -> BranchSession | None:
+        """Fetch a session by id."""
+        return self._load(
+            self.entities,
+            ("session", session_id),
+            (),
+            lambda: self._repository.get_session(session_id),
+        )
+
+    # Fragments
+
+    def upsert_fragment(self, fragment: IdeaFragment) -> None:
+        """Insert or update an idea fragment."""
+        self.upsert_fragments_many([fragment])
+
+    def upsert_fragments_many(self, fragments: Iterable[IdeaFragment]) -> None:
+        """Insert or update many idea fragments in one transaction."""
+        fragments = list(fragments)
+        previous = self._previous_documents(fragment.id for fragment in fragments)
+        if len(fragments) == 1:
+            self._repository.upsert_fragment(fragments[0])
+        else:
+            self._repository.upsert_fragments_many(fragments)
+        self._invalidate_fragments(
+            [fragment.id for fragment in fragments],
+            {fragment.document_id for fragment in fragments} | previous,
+        )
+        self._remember(fragments)
+
+    def update_fragment_statuses(
+        self, changes: Iterable[tuple[UUID, FragmentStatus, datetime]]
+    ) -> None:
+        """Set ``status`` and ``updated_at`` for many fragments in one transaction."""
+        changes = list(changes)
+        fragment_ids = [fragment_id for fragment_id, _, _ in changes]
+        documents = self._previous_documents(fragment_ids)
+        self._repository.update_fragment_statuses(changes)
+        self._invalidate_fragments(fragment_ids, documents)
+
+    def update_fragment_contents(
+        self, changes: Iterable[tuple[UUID, str, datetime]]
+    ) -> int:
+        """Set ``content`` and ``updated_at`` for many fragments in one transaction."""
+        changes = list(changes)
+        fragment_ids = [fragment_id for fragment_id, _, _ in changes]
+        documents = self._previous_documents(fragment_ids)
+        updated = self._repository.update_fragment_contents(changes)
+        self._invalidate_fragments(fragment_ids, documents)
+        return updated
+
+    def update_fragment_resolutions(
+        self, changes: Iterable[tuple[UUID, str, FragmentStatus | None, datetime]]
+    ) -> None:
+        """Set ``resolution_note``, ``status`` and ``updated_at`` in one transaction."""
+        changes = list(changes)
+        fragment_ids = [fragment_id for fragment_id, _, _, _ in changes]
+        documents = self._previous_documents(fragment_ids)
+        self._repository.update_fragment_resolutions(changes)
+        self._invalidate_fragments(fragment_ids, documents)
+
+    def get_fragment_documents(
+        self, fragment_ids: Iterable[UUID]
+    ) -> dict[UUID, UUID | None]:
+        """Map stored fragment ids to their document ids; unknown ids are left out."""
+        return self._repository.get_fragment_documents(fragment_ids)
+
+    def find_fragment_ids(self, *, capture_type: str, content: str) -> list[UUID]:
+        """Return the ids of fragments of ``capture_type`` holding ``content``."""
+        return self._repository.find_fragment_ids(
+            capture_type=capture_type, content=content
+        )
+
+    def get_fragment(self, fragment_id: UUID) -> IdeaFragment | None:
+        """Fetch an idea fragment by id."""
+        return self._load_fragments(
+            self.entities,
+            ("fragment", fragment_id),
+            (),
+            lambda: self._repository.get_fragment(fragment_id),
+        )
+
+    def list_fragments_for_document(self, document_id: UUID) -> list[IdeaFragment]:
+        """Return all fragments anchored to a document."""
+        return list(
+            self._load_fragments(
+                self.queries,
+                ("list_fragments_for_document", document_id),
+                (document_scope(document_id),),
+                lambda: list(self._repository.list_fragments_for_document(document_id)),
+            )
+        )
+
+    def iter_fragments(
+        self,
+        document_id: UUID,
+        *,
+        after: tuple[datetime, UUID] | None = None,
+        limit: int | None = None,
+        status: FragmentStatus | None = None,
+    ) -> Iterator[IdeaFragment]:
+        """Stream a document's fragments in ``(captured_at, id)`` order.
+
+        The page requested is materialized once and cached, so pass a
+        ``limit`` when paging through very large documents.
+        """
+        return iter(
+            self._load_fragments(
+                self.queries,
+                ("iter_fragments", document_id, after, limit, status),
+                (document_scope(document_id),),
+                lambda: list(
+                    self._repository.iter_fragments(
+                        document_id, after=after, limit=limit, status=status
+                    )
+                ),
+            )
+        )
+
+    def recent_fragments(
+        self, limit: int = 50, status: FragmentStatus | None = None
+    ) -> list[IdeaFragment]:
+        """Return the most recently captured fragments across all documents."""
+        return list(
+            self._load_fragments(
+                self.queries,
+                ("recent_fragments", limit, status),
+                (BUFFER_SCOPE,),
+                lambda: self._repository.recent_fragments(limit, status),
+            )
+        )
+
+    def count_fragments_by_status(
+        self, document_id: UUID | None = None
+    ) -> dict[FragmentStatus, int]:
+        """Count fragments per status, for one document or the whole buffer."""
+        scope = BUFFER_SCOPE if document_id is None else document_scope(document_id)
+        counts: dict[FragmentStatus, int] = self._load(
+            self.queries,
+            ("count_fragments_by_status", document_id),
+            (scope,),
+            lambda: self._repository.count_fragments_by_status(document_id),
+        )
+        return dict(counts)
+
+    def count_session_fragments(self, session_id: UUID) -> int:
+        """Return how many stored fragments belong to a session."""
+        count: int = self._load(
+            self.queries,
+            ("count_session_fragments", session_id),
+            (BUFFER_SCOPE,),
+            lambda: self._repository.count_session_fragments(session_id),
+        )
+        return count
+
+    def daily_capture_counts(
+        self, start: date | None = None, end: date | None = None
+    ) -> dict[date, int]:
+        """Return fragments captured per UTC day within an inclusive range."""
+        counts: dict[date, int] = self._load(
+            self.queries,
+            ("daily_capture_counts", start, end),
+            (BUFFER_SCOPE,),
+            lambda: self._repository.daily_capture_counts(start, end),
+        )
+        return dict(counts)
+
+    def search_fragments(
+        self,
+        query: str,
+        document_id: UUID | None = None,
+        limit: int = 20,
+        **options: Any,
+    ) -> list[FragmentSearchHit]:
+        """Return fragments matching a full-text query, best match first.
+
+        Extra keyword ``options`` are passed to the wrapped repository and
+        become part of the cache key.
+        """
+        scope = BUFFER_SCOPE if document_id is None else document_scope(document_id)
+        key = ("search_fragments", query, document_id, limit, *sorted(options.items()))
+        hits: list[FragmentSearchHit] = self._load(
+            self.queries,
+            key,
+            (scope,),
+            lambda: self._repository.search_fragments(
+                query, document_id, limit, **options
+            ),
+        )
+        self._remember(hit.fragment for hit in hits)
+        return list(hits)
+
+    # Internals
+
+    def _load(
+        self,
+        cache: TTLCache,
+        key: Hashable,
+        scopes: tuple[Hashable, ...],
+        load: Callable[[], T],
+    ) -> T:
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value  # type: ignore[no-any-return]
+        generation = cache.generation
+        value = load()
+        cache.put(key, value, scopes, generation=generation)
+        return value
+
+    def _load_fragments(
+        self,
+        cache: TTLCache,
+        key: Hashable,
+        scopes: tuple[Hashable, ...],
+        load: Callable[[], T],
+    ) -> T:
+        def load_and_remember() -> T:
+            value = load()
+            if isinstance(value, list):
+                self._remember(value)
+            elif value is not None:
+                self._remember([value])  # type: ignore[list-item]
+            return value
+
+        return self._load(cache, key, scopes, load_and_remember)
+
+    def _remember(self, fragments: Iterable[IdeaFragment]) -> None:
+        with self._known_lock:
+            for fragment in fragments:
+                self._fragment_documents[fragment.id] = fragment.document_id
+                self._fragment_documents.move_to_end(fragment.id)
+            while len(self._fragment_documents) > KNOWN_FRAGMENTS_LIMIT:
+                self._fragment_documents.popitem(last=False)
+
+    def _previous_documents(self, fragment_ids: Iterable[UUID]) -> set[UUID | None]:
+        """Return the documents ``fragment_ids`` currently belong to.
+
+        Fragments this cache has never returned are looked up in one batched
+        query, so a write that moves a fragment between documents also
+        invalidates its old document without a SELECT per row. With no cached
+        queries there is nothing to invalidate and no lookup.
+        """
+        documents: set[UUID | None] = set()
+        if not len(self.queries):
+            return documents
+        unseen = []
+        with self._known_lock:
+            for fragment_id in fragment_ids:
+                known = self._fragment_documents.get(fragment_id, _MISSING)
+                if known is _MISSING:
+                    unseen.append(fragment_id)
+                else:
+                    documents.add(known)
+        if unseen:
+            documents.update(self._repository.get_fragment_documents(unseen).values())
+        return documents
+
+    def _invalidate_fragments(
+        self, fragment_ids: list[UUID], documents: set[UUID | None]
+    ) -> None:
+        self.entities.discard(
+            *(("fragment", fragment_id) for fragment_id in fragment_ids)
+        )
+        self.queries.invalidate(
+            BUFFER_SCOPE, *(document_scope(document) for document in documents)
+        )
@@ -0,0 +1,453 @@
+"""Streaming backup and restore of documents, sessions and fragments.
+
+Rows travel straight between SQLite cursors and the file, fetched
+:data:`BATCH_ROWS` at a time, so no models are built and memory stays bounded
+by one batch whatever the buffer size. Two formats are supported:
+
+- **NDJSON** (:func:`export_ndjson`): a header line followed by one JSON
+  object per row, tagged with its ``table``. Paths ending in ``.gz`` are
+  gzip-compressed.
+- **Columnar** (:func:`export_columnar`): a directory with one file per
+  table. With ``pyarrow`` installed each table is a Parquet file; otherwise a
+  compact binary format is written (see :func:`_write_binary_table`) in which
+  every batch stores each column contiguously and zlib-compressed, so
+  repeated document ids, statuses and timestamp prefixes compress well.
+
+Restores upsert by id inside one transaction, with foreign keys and the
+schema's CHECK constraints in force; rows are not revalidated by Pydantic.
+"""
+
+from __future__ import annotations
+
+import gzip
+import itertools
+import json
+import re
+import sqlite3
+import struct
+import sys
+import zlib
+from array import array
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Any, cast
+
+from branch.storage.mapping import DOCUMENT_COLUMNS, FRAGMENT_COLUMNS, SESSION_COLUMNS
+from branch.storage.repository import StorageError
+from branch.storage.schema import SCHEMA_VERSION
+from branch.storage.sqlite import read_snapshot
+from branch.storage.sqlite_repository import upsert_sql
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+    from pathlib import Path
+
+
+# Parents before children, so foreign keys hold throughout a restore.
+EXPORT_TABLES: dict[str, Sequence[str]] = {
+    "documents": DOCUMENT_COLUMNS,
+    "sessions": SESSION_COLUMNS,
+    "idea_fragments": FRAGMENT_COLUMNS,
+}
+
+# SQLite renders and parses NDJSON rows itself (JSON1), which is several times
+# faster than building dicts and calling json in Python.
+NDJSON_SELECT_SQL = {
+    table: "SELECT json_object({}) FROM {};".format(  # noqa: S608
+        ", ".join([f"'table', '{table}'", *(f"'{c}', {c}" for c in columns)]),
+        table,
+    )
+    for table, columns in EXPORT_TABLES.items()
+}
+NDJSON_UPSERT_SQL = {
+    table: upsert_sql(
+        table,
+        columns,
+        "SELECT {} WHERE true".format(
+            ", ".join(f"json_extract(?1, '$.{column}')" for column in columns)
+        ),
+    )
+    for table, columns in EXPORT_TABLES.items()
+}
+COLUMNAR_UPSERT_SQL = {
+    table: upsert_sql(table, columns, f"VALUES ({', '.join('?' * len(columns))})")
+    for table, columns in EXPORT_TABLES.items()
+}
+
+BATCH_ROWS = 50_000
+NDJSON_FORMAT = "branch-ndjson"
+BINARY_MAGIC = b"BRANCHCOL\x01"
+BINARY_SUFFIX = ".bcol"
+PARQUET_SUFFIX = ".parquet"
+COMPRESSION_LEVEL = 1
+
+_LENGTH = struct.Struct("<I")
+# Rows written by export_ndjson start with their table tag.
+_TABLE_TAG = re.compile(r'\{"table":"(\w+)"')
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+# NDJSON
+
+
+def export_ndjson(connection: sqlite3.Connection, path: Path) -> dict[str, int]:
+    """Write every document, session and fragment to an NDJSON file.
+
+    Returns:
+        Rows written per table.
+    """
+    header = {
+        "format": NDJSON_FORMAT,
+        "schema_version": SCHEMA_VERSION,
+        "tables": {table: list(columns) for table, columns in EXPORT_TABLES.items()},
+    }
+    counts: dict[str, int] = {}
+    with read_snapshot(connection), _open_text(path, "w") as file:
+        file.write(json.dumps(header) + "\n")
+        for table in EXPORT_TABLES:
+            counts[table] = 0
+            for rows in _fetch_batches(connection, NDJSON_SELECT_SQL[table]):
+                file.write("\n".join([line for (line,) in rows]) + "\n")
+                counts[table] += len(rows)
+    return counts
+
+
+def import_ndjson(connection: sqlite3.Connection, path: Path) -> dict[str, int]:
+    """Upsert every row of an NDJSON export in one transaction.
+
+    Returns:
+        Rows read per table.
+
+    Raises:
+        StorageError: The file is not a Branch export for this schema, or a
+            row is malformed or violates a constraint. Nothing is written in
+            that case.
+    """
+    counts = dict.fromkeys(EXPORT_TABLES, 0)
+    with _open_text(path, "r") as file, _restoring(connection):
+        header = _parse_json(file.readline(), path, 1)
+        if not isinstance(header, dict) or header.get("format") != NDJSON_FORMAT:
+            msg = f"{path} is not a Branch NDJSON export"
+            raise StorageError(msg)
+        _check_columns(header.get("tables", {}), path)
+
+        table: str | None = None
+        batch: list[tuple[str]] = []
+        for number, line in enumerate(file, start=2):
+            if not line.strip():
+                continue
+            tag = _TABLE_TAG.match(line)
+            row_table = tag[1] if tag else _parse_json(line, path, number).get("table")
+            if row_table not in EXPORT_TABLES:
+                msg = f"{path}:{number}: unknown table {row_table!r}"
+                raise StorageError(msg)
+            if row_table != table or len(batch) >= BATCH_ROWS:
+                _upsert(connection, NDJSON_UPSERT_SQL, table, batch)
+                table, batch = row_table, []
+            batch.append((line,))
+            counts[row_table] += 1
+        _upsert(connection, NDJSON_UPSERT_SQL, table, batch)
+    return counts
+
+
+# Columnar
+
+
+def columnar_backend() -> str:
+    """Return ``"parquet"`` if pyarrow is installed, else ``"binary"``."""
+    try:
+        import pyarrow  # noqa: F401, PLC0415
+    except ImportError:
+        return "binary"
+    return "parquet"
+
+
+def export_columnar(
+    connection: sqlite3.Connection,
+    directory: Path,
+    backend: str | None = None,
+) -> dict[str, int]:
+    """Write one columnar file per table into ``directory``.
+
+    Args:
+        connection: Database to export.
+        directory: Created if missing; existing table files are replaced.
+        backend: ``"parquet"`` or ``"binary"``; defaults to
+            :func:`columnar_backend`.
+
+    Returns:
+        Rows written per table.
+    """
+    backend = backend or columnar_backend()
+    if backend not in {"parquet", "binary"}:
+        msg = f"Unknown columnar backend {backend!r}; expected parquet or binary"
+        raise ValueError(msg)
+    directory.mkdir(parents=True, exist_ok=True)
+    kinds = {table: _column_kinds(connection, table) for table in EXPORT_TABLES}
+    counts: dict[str, int] = {}
+    with read_snapshot(connection):
+        for table, columns in EXPORT_TABLES.items():
+            select = f"SELECT {', '.join(columns)} FROM {table};"  # noqa: S608
+            batches = _fetch_batches(connection, select)
+            if backend == "parquet":
+                path = directory / f"{table}{PARQUET_SUFFIX}"
+                counts[table] = _write_parquet_table(path, table, kinds[table], batches)
+            else:
+                path = directory / f"{table}{BINARY_SUFFIX}"
+                counts[table] = _write_binary_table(path, table, kinds[table], batches)
+    return counts
+
+
+def import_columnar(connection: sqlite3.Connection, directory: Path) -> dict[str, int]:
+    """Upsert every table file found in ``directory`` in one transaction.
+
+    Either backend's files are accepted; tables without a file are skipped.
+
+    Raises:
+        StorageError: A file is malformed or does not match this schema, or a
+            row violates a constraint. Nothing is written in that case.
+    """
+    counts: dict[str, int] = {}
+    with _restoring(connection):
+        for table in EXPORT_TABLES:
+            parquet = directory / f"{table}{PARQUET_SUFFIX}"
+            binary = directory / f"{table}{BINARY_SUFFIX}"
+            if parquet.exists():
+                batches = _read_parquet_table(parquet, table)
+            elif binary.exists():
+                batches = _read_binary_table(binary, table)
+            else:
+                continue
+            counts[table] = 0
+            for rows in batches:
+                _upsert(connection, COLUMNAR_UPSERT_SQL, table, rows)
+                counts[table] += len(rows)
+    return counts
+
+
+# Compact binary columnar files
+#
+#   magic, u32 header length, JSON header {"table", "schema_version", "columns"}
+#   repeated batches: u32 row count, then per column u32 length + zlib payload
+#   u32 0 terminates the file
+#
+# Column payloads: INTEGER and REAL are a null flag byte, a null mask (one
+# byte per row, only when the flag is set) and little-endian int64/float64
+# values. TEXT is int32 character lengths (-1 for NULL) followed by the UTF-8
+# of all values joined.
+
+
+def _write_binary_table(
+    path: Path,
+    table: str,
+    kinds: Sequence[tuple[str, str]],
+    batches: Iterator[list[tuple[Any, ...]]],
+) -> int:
+    header = {
+        "table": table,
+        "schema_version": SCHEMA_VERSION,
+        "columns": [list(kind) for kind in kinds],
+    }
+    encoded_header = json.dumps(header).encode()
+    total = 0
+    with path.open("wb") as file:
+        file.write(BINARY_MAGIC + _LENGTH.pack(len(encoded_header)) + encoded_header)
+        for rows in batches:
+            file.write(_LENGTH.pack(len(rows)))
+            for (_, kind), values in zip(kinds, zip(*rows, strict=True), strict=True):
+                payload = zlib.compress(_encode_column(kind, values), COMPRESSION_LEVEL)
+                file.write(_LENGTH.pack(len(payload)) + payload)
+            total += len(rows)
+        file.write(_LENGTH.pack(0))
+    return total
+
+
+def _read_binary_table(path: Path, table: str) -> Iterator[list[tuple[Any, ...]]]:
+    with path.open("rb") as file:
+        if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            msg = f"{path} is not a Branch columnar export"
+            raise StorageError(msg)
+        header = json.loads(file.read(_read_length(file, path)))
+        _check_columns({table: [name for name, _ in header["columns"]]}, path)
+        kinds = [kind for _, kind in header["columns"]]
+        while count := _read_length(file, path):
+            columns = []
+            for kind in kinds:
+                try:
+                    payload = zlib.decompress(file.read(_read_length(file, path)))
+                except zlib.error as exc:
+                    msg = f"{path} is corrupt: {exc}"
+                    raise StorageError(msg) from exc
+                columns.append(_decode_column(kind, payload, count))
+            yield list(zip(*columns, strict=True))
+
+
+def _encode_column(kind: str, values: Sequence[Any]) -> bytes:
+    if kind == "TEXT":
+        lengths = array("i", [-1 if value is None else len(value) for value in values])
+        text = "".join([value for value in values if value is not None])
+        return _little_endian(lengths) + text.encode()
+    typecode = "q" if kind == "INTEGER" else "d"
+    if None in values:
+        mask = bytes([value is None for value in values])
+        numbers = array(typecode, [0 if value is None else value for value in values])
+        return b"\x01" + mask + _little_endian(numbers)
+    return b"\x00" + _little_endian(array(typecode, values))
+
+
+def _decode_column(kind: str, payload: bytes, count: int) -> list[Any]:
+    if kind == "TEXT":
+        lengths = _from_little_endian("i", payload[: 4 * count])
+        text = payload[4 * count :].decode()
+        ends = itertools.accumulate(max(length, 0) for length in lengths)
+        return [
+            None if length < 0 else text[end - length : end]
+            for length, end in zip(lengths, ends, strict=True)
+        ]
+    typecode = "q" if kind == "INTEGER" else "d"
+    if payload[0]:
+        mask = payload[1 : 1 + count]
+        numbers = _from_little_endian(typecode, payload[1 + count :])
+        return [
+            None if null else value for null, value in zip(mask, numbers, strict=True)
+        ]
+    return _from_little_endian(typecode, payload[1:]).tolist()
+
+
+def _little_endian(values: array[Any]) -> bytes:
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array[Any]:
+    values = array(typecode)
+    values.frombytes(data)
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def _read_length(file: IO[bytes], path: Path) -> int:
+    data = file.read(_LENGTH.size)
+    if len(data) != _LENGTH.size:
+        msg = f"{path} is truncated"
+        raise StorageError(msg)
+    length: int = _LENGTH.unpack(data)[0]
+    return length
+
+
+# Parquet (optional pyarrow)
+
+_ARROW_TYPES = {"TEXT": "string", "INTEGER": "int64", "REAL": "float64"}
+
+
+def _write_parquet_table(
+    path: Path,
+    table: str,
+    kinds: Sequence[tuple[str, str]],
+    batches: Iterator[list[tuple[Any, ...]]],
+) -> int:
+    import pyarrow as pa  # noqa: PLC0415
+    import pyarrow.parquet as pq  # noqa: PLC0415
+
+    schema = pa.schema(
+        [(name, _ARROW_TYPES[kind]) for name, kind in kinds],
+        metadata={"branch.table": table, "branch.schema_version": str(SCHEMA_VERSION)},
+    )
+    total = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            columns = zip(*rows, strict=True)
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [
+                        pa.array(values, type=field.type)
+                        for values, field in zip(columns, schema, strict=True)
+                    ],
+                    schema=schema,
+                )
+            )
+            total += len(rows)
+    return total
+
+
+def _read_parquet_table(path: Path, table: str) -> Iterator[list[tuple[Any, ...]]]:
+    import pyarrow.parquet as pq  # noqa: PLC0415
+
+    parquet = pq.ParquetFile(path)
+    _check_columns({table: parquet.schema_arrow.names}, path)
+    for batch in parquet.iter_batches(batch_size=BATCH_ROWS):
+        columns = [column.to_pylist() for column in batch.columns]
+        yield list(zip(*columns, strict=True))
+
+
+# Shared helpers
+
+
+@contextmanager
+def _restoring(connection: sqlite3.Connection) -> Iterator[None]:
+    """Run a restore in one transaction, translating SQLite errors."""
+    try:
+        with connection:
+            yield
+    except sqlite3.Error as exc:
+        raise StorageError(str(exc)) from exc
+
+
+def _fetch_batches(
+    connection: sqlite3.Connection, sql: str
+) -> Iterator[list[tuple[Any, ...]]]:
+    cursor = connection.cursor()
+    cursor.row_factory = None  # plain tuples
+    cursor.execute(sql)
+    while rows := cursor.fetchmany(BATCH_ROWS):
+        yield rows
+
+
+def _upsert(
+    connection: sqlite3.Connection,
+    statements: dict[str, str],
+    table: str | None,
+    rows: Sequence[tuple[Any, ...]],
+) -> None:
+    if table is not None and rows:
+        connection.executemany(statements[table], rows)
+
+
+def _column_kinds(connection: sqlite3.Connection, table: str) -> list[tuple[str, str]]:
+    declared = {
+        row[1]: row[2].upper()
+        for row in connection.execute(f"PRAGMA table_info({table})")
+    }
+    return [(column, declared[column]) for column in EXPORT_TABLES[table]]
+
+
+def _check_columns(tables: dict[str, Sequence[str]], path: Path) -> None:
+    for table, columns in tables.items():
+        expected = EXPORT_TABLES.get(table, ())
+        if list(columns) != list(expected):
+            msg = (
+                f"{path}: columns of {table!r} do not match this schema "
+                f"(version {SCHEMA_VERSION})"
+            )
+            raise StorageError(msg)
+
+
+def _parse_json(line: str, path: Path, number: int) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        msg = f"{path}:{number}: invalid JSON"
+        raise StorageError(msg) from exc
+
+
+def _open_text(path: Path, mode: str) -> IO[str]:
+    if path.suffix == ".gz":
+        return cast(
+            "IO[str]",
+            gzip.open(
+                path, f"{mode}t", encoding="utf-8", compresslevel=COMPRESSION_LEVEL
+            ),
+        )
+    return path.open(mode, encoding="utf-8")
@@ -0,0 +1,348 @@
+"""Column-to-field mapping between SQLite rows and Branch models.
+
+Rows are flattened in the column order declared here; ``TextAnchor`` lives in
+the ``anchor_*`` columns of ``idea_fragments``. Two read paths are provided:
+
+- ``row_to_*`` runs full Pydantic validation and is meant for rows of unknown
+  provenance (imports, hand-edited databases).
+- ``hydrate_*`` trusts the row, parses only UUIDs, datetimes and enums, and
+  builds models the way ``model_construct`` does, minus its per-field
+  overhead. Use it for rows the repository wrote itself, where validation
+  already happened on the way in.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TypeVar
+from uuid import UUID, SafeUUID
+
+from pydantic import BaseModel
+
+from branch.models import BranchSession, Document, FragmentStatus, IdeaFragment
+from branch.models.document import DocumentType
+from branch.models.idea_fragment import TextAnchor
+
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+
+_Model = TypeVar("_Model", bound=BaseModel)
+
+DOCUMENT_COLUMNS: Sequence[str] = (
+    "id",
+    "title",
+    "file_path",
+    "url",
+    "document_type",
+    "page_count",
+    "author",
+    "added_at",
+    "last_opened_at",
+    "last_page",
+    "read_percentage",
+)
+
+SESSION_COLUMNS: Sequence[str] = (
+    "id",
+    "document_id",
+    "started_at",
+    "ended_at",
+    "start_page",
+    "end_page",
+    "fragments_captured",
+    "dive_deeps",
+    "notes",
+)
+
+FRAGMENT_COLUMNS: Sequence[str] = (
+    "id",
+    "content",
+    "anchor_page_number",
+    "anchor_start_position",
+    "anchor_end_position",
+    "anchor_selected_text",
+    "document_id",
+    "session_id",
+    "captured_at",
+    "updated_at",
+    "status",
+    "capture_type",
+    "resolution_note",
+)
+
+# ``idea_fragments`` column -> ``TextAnchor`` field
+ANCHOR_COLUMNS: dict[str, str] = {
+    "anchor_page_number": "page_number",
+    "anchor_start_position": "start_position",
+    "anchor_end_position": "end_position",
+    "anchor_selected_text": "selected_text",
+}
+
+
+def to_db_datetime(value: datetime | None) -> str | None:
+    """Serialize a datetime with a fixed width so text ordering matches time."""
+    return value.isoformat(timespec="microseconds") if value is not None else None
+
+
+# Trusted construction helpers. ``uuid.UUID.__init__`` and ``model_construct``
+# are pure Python and slower than Pydantic's Rust validator, so the trusted
+# path sets instance state directly, exactly as ``model_construct`` does once
+# defaults are resolved.
+
+_new = object.__new__
+_set = object.__setattr__
+_UUID_UNKNOWN = SafeUUID.unknown
+_FRAGMENT_STATUSES = {status.value: status for status in FragmentStatus}
+_DOCUMENT_TYPES = {doc_type.value: doc_type for doc_type in DocumentType}
+
+
+def _parse_uuid(value: str) -> UUID:
+    """Parse a canonical UUID string written by the repository."""
+    parsed = _new(UUID)
+    _set(parsed, "int", int(value.replace("-", ""), 16))
+    _set(parsed, "is_safe", _UUID_UNKNOWN)
+    return parsed
+
+
+# Parent ids repeat across many rows, so they are memoized.
+_parse_parent_uuid = lru_cache(maxsize=4096)(_parse_uuid)
+
+
+def _construct(
+    model: type[_Model], fields: frozenset[str], values: dict[str, Any]
+) -> _Model:
+    """Create a model instance from already-typed values without validation."""
+    instance = _new(model)
+    _set(instance, "__dict__", values)
+    _set(instance, "__pydantic_fields_set__", set(fields))
+    _set(instance, "__pydantic_extra__", None)
+    _set(instance, "__pydantic_private__", None)
+    return instance
+
+
+def _datetime(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def _parent_uuid(value: str | None) -> UUID | None:
+    return _parse_parent_uuid(value) if value is not None else None
+
+
+_DOCUMENT_FIELDS = frozenset(Document.model_fields)
+_SESSION_FIELDS = frozenset(BranchSession.model_fields)
+_FRAGMENT_FIELDS = frozenset(IdeaFragment.model_fields)
+_ANCHOR_FIELDS = frozenset(TextAnchor.model_fields)
+
+
+def flatten_anchor(anchor: TextAnchor | None) -> dict[str, Any]:
+    """Map an optional anchor onto its ``anchor_*`` columns."""
+    if anchor is None:
+        return dict.fromkeys(ANCHOR_COLUMNS)
+    return {column: getattr(anchor, field) for column, field in ANCHOR_COLUMNS.items()}
+
+
+def unflatten_anchor(
+    page_number: int | None,
+    start_position: int | None,
+    end_position: int | None,
+    selected_text: str | None,
+) -> TextAnchor | None:
+    """Rebuild a trusted anchor from its columns; all-NULL means no anchor."""
+    if (
+        page_number is None
+        and start_position is None
+        and end_position is None
+        and selected_text is None
+    ):
+        return None
+    return _construct(
+        TextAnchor,
+        _ANCHOR_FIELDS,
+        {
+            "page_number": page_number,
+            "start_position": start_position,
+            "end_position": end_position,
+            "selected_text": selected_text,
+        },
+    )
+
+
+# Model -> row
+
+
+def document_to_row(document: Document) -> dict[str, Any]:
+    """Flatten a document into named SQL parameters."""
+    return {
+        "id": str(document.id),
+        "title": document.title,
+        "file_path": str(document.file_path) if document.file_path else None,
+        "url": document.url,
+        "document_type": document.document_type.value,
+        "page_count": document.page_count,
+        "author": document.author,
+        "added_at": to_db_datetime(document.added_at),
+        "last_opened_at": to_db_datetime(document.last_opened_at),
+        "last_page": document.last_page,
+        "read_percentage": document.read_percentage,
+    }
+
+
+def session_to_row(session: BranchSession) -> dict[str, Any]:
+    """Flatten a session into named SQL parameters."""
+    return {
+        "id": str(session.id),
+        "document_id": str(session.document_id),
+        "started_at": to_db_datetime(session.started_at),
+        "ended_at": to_db_datetime(session.ended_at),
+        "start_page": session.start_page,
+        "end_page": session.end_page,
+        "fragments_captured": session.fragments_captured,
+        "dive_deeps": session.dive_deeps,
+        "notes": session.notes,
+    }
+
+
+def fragment_to_row(fragment: IdeaFragment) -> dict[str, Any]:
+    """Flatten a fragment, including its optional anchor, into SQL parameters."""
+    return {
+        "id": str(fragment.id),
+        "content": fragment.content,
+        **flatten_anchor(fragment.anchor),
+        "document_id": str(fragment.document_id) if fragment.document_id else None,
+        "session_id": str(fragment.session_id) if fragment.session_id else None,
+        "captured_at": to_db_datetime(fragment.captured_at),
+        "updated_at": to_db_datetime(fragment.updated_at),
+        "status": fragment.status.value,
+        "capture_type": fragment.capture_type,
+        "resolution_note": fragment.resolution_note,
+    }
+
+
+# Row -> model, validated
+
+
+def row_to_document(row: Sequence[Any]) -> Document:
+    """Build a validated document from a ``documents`` row."""
+    return Document.model_validate(dict(zip(DOCUMENT_COLUMNS, row, strict=True)))
+
+
+def row_to_session(row: Sequence[Any]) -> BranchSession:
+    """Build a validated session from a ``sessions`` row."""
+    return BranchSession.model_validate(dict(zip(SESSION_COLUMNS, row, strict=True)))
+
+
+def row_to_fragment(row: Sequence[Any]) -> IdeaFragment:
+    """Build a validated fragment from an ``idea_fragments`` row."""
+    data = dict(zip(FRAGMENT_COLUMNS, row, strict=True))
+    anchor = {field: data.pop(column) for column, field in ANCHOR_COLUMNS.items()}
+    if any(value is not None for value in anchor.values()):
+        data["anchor"] = anchor
+    return IdeaFragment.model_validate(data)
+
+
+# Row -> model, trusted
+
+
+def hydrate_document(row: Sequence[Any]) -> Document:
+    """Build a document from a row the repository wrote, skipping validation."""
+    (
+        id_,
+        title,
+        file_path,
+        url,
+        document_type,
+        page_count,
+        author,
+        added_at,
+        last_opened_at,
+        last_page,
+        read_percentage,
+    ) = row
+    return _construct(
+        Document,
+        _DOCUMENT_FIELDS,
+        {
+            "id": _parse_uuid(id_),
+            "title": title,
+            "file_path": Path(file_path) if file_path is not None else None,
+            "url": url,
+            "document_type": _DOCUMENT_TYPES[document_type],
+            "page_count": page_count,
+            "author": author,
+            "added_at": datetime.fromisoformat(added_at),
+            "last_opened_at": _datetime(last_opened_at),
+            "last_page": last_page,
+            "read_percentage": float(read_percentage),
+        },
+    )
+
+
+def hydrate_session(row: Sequence[Any]) -> BranchSession:
+    """Build a session from a row the repository wrote, skipping validation."""
+    (
+        id_,
+        document_id,
+        started_at,
+        ended_at,
+        start_page,
+        end_page,
+        fragments_captured,
+        dive_deeps,
+        notes,
+    ) = row
+    return _construct(
+        BranchSession,
+        _SESSION_FIELDS,
+        {
+            "id": _parse_uuid(id_),
+            "document_id": _parse_parent_uuid(document_id),
+            "started_at": datetime.fromisoformat(started_at),
+            "ended_at": _datetime(ended_at),
+            "start_page": start_page,
+            "end_page": end_page,
+            "fragments_captured": fragments_captured,
+            "dive_deeps": dive_deeps,
+            "notes": notes,
+        },
+    )
+
+
+def hydrate_fragment(row: Sequence[Any]) -> IdeaFragment:
+    """Build a fragment from a row the repository wrote, skipping validation."""
+    (
+        id_,
+        content,
+        page_number,
+        start_position,
+        end_position,
+        selected_text,
+        document_id,
+        session_id,
+        captured_at,
+        updated_at,
+        status,
+        capture_type,
+        resolution_note,
+    ) = row
+    return _construct(
+        IdeaFragment,
+        _FRAGMENT_FIELDS,
+        {
+            "id": _parse_uuid(id_),
+            "content": content,
+            "anchor": unflatten_anchor(
+                page_number, start_position, end_position, selected_text
+            ),
+            "document_id": _parent_uuid(document_id),
+            "session_id": _parent_uuid(session_id),
+            "captured_at": datetime.fromisoformat(captured_at),
+            "updated_at": _datetime(updated_at),
+            "status": _FRAGMENT_STATUSES[status],
+            "capture_type": capture_type,
+            "resolution_note": resolution_note,
+        },
+    )
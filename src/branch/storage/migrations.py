@@ -0,0 +1,124 @@
+"""Schema migration engine driven by ``PRAGMA user_version``.
+
+Each :class:`Migration` moves the database from ``version - 1`` to
+``version``. :func:`migrate` reads the stored version once, runs only the
+pending steps inside a single transaction, and returns per-step timings. A
+database that is already current costs one PRAGMA read and no DDL.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from branch.storage.repository import StorageError
+
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One step in the schema history.
+
+    Statements are frozen once released: later changes belong in a new
+    migration, never in an edit to an existing one.
+    """
+
+    version: int
+    description: str
+    statements: Sequence[str]
+
+
+@dataclass(frozen=True)
+class AppliedMigration:
+    """Timing report for a migration step that was applied."""
+
+    version: int
+    description: str
+    duration_seconds: float
+
+
+def get_user_version(connection: sqlite3.Connection) -> int:
+    """Return the schema version recorded in the database header."""
+    return int(connection.execute("PRAGMA user_version;").fetchone()[0])
+
+
+def validate_registry(migrations: Sequence[Migration]) -> None:
+    """Ensure versions start at 1 and increase by exactly one per step."""
+    for expected, migration in enumerate(migrations, start=1):
+        if migration.version != expected:
+            msg = (
+                f"Migration registry out of order: expected version {expected}, "
+                f"found {migration.version} ({migration.description!r})"
+            )
+            raise StorageError(msg)
+
+
+def pending_migrations(
+    migrations: Sequence[Migration], current_version: int
+) -> list[Migration]:
+    """Return the migrations newer than ``current_version``, in order."""
+    return [m for m in migrations if m.version > current_version]
+
+
+def migrate(
+    connection: sqlite3.Connection,
+    migrations: Sequence[Migration],
+    target: int | None = None,
+) -> list[AppliedMigration]:
+    """Bring the database up to ``target`` (default: latest) in one transaction.
+
+    Raises:
+        StorageError: If the registry is malformed, the database is newer than
+            the registry, or a step fails (all pending steps are rolled back).
+    """
+    validate_registry(migrations)
+    latest = migrations[-1].version if migrations else 0
+    target = latest if target is None else target
+    current = get_user_version(connection)
+
+    if current > latest:
+        msg = f"Database schema version {current} is newer than supported {latest}"
+        raise StorageError(msg)
+    if current >= target:
+        return []
+
+    steps = [m for m in pending_migrations(migrations, current) if m.version <= target]
+    applied: list[AppliedMigration] = []
+    try:
+        connection.execute("BEGIN IMMEDIATE;")
+        for migration in steps:
+            started = time.perf_counter()
+            for statement in migration.statements:
+                connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {int(migration.version)};")
+            applied.append(
+                AppliedMigration(
+                    migration.version,
+                    migration.description,
+                    time.perf_counter() - started,
+                )
+            )
+        connection.commit()
+    except sqlite3.Error as exc:
+        if connection.in_transaction:
+            connection.rollback()
+        msg = f"Migration to version {target} failed: {exc}"
+        raise StorageError(msg) from exc
+
+    for step in applied:
+        logger.info(
+            "Applied schema migration %d (%s) in %.2f ms",
+            step.version,
+            step.description,
+            step.duration_seconds * 1000,
+        )
+    return applied
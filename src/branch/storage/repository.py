@@ -6,40 +6,158 @@ underlying persistence layer while keeping read flow latency low.
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, Protocol
 
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Iterable, Iterator
+    from datetime import date, datetime
     from uuid import UUID
 
-    from branch.models import BranchSession, Document, IdeaFragment
+    from branch.models import BranchSession, Document, FragmentStatus, IdeaFragment
 
 
 class StorageError(Exception):
     """Base exception for storage-related failures."""
 
 
+@dataclass(frozen=True)
+class FragmentSearchHit:
+    """A full-text match: the fragment, its bm25 score, and a text snippet.
+
+    Lower scores are more relevant, following SQLite's ``bm25()`` convention.
+    """
+
+    fragment: IdeaFragment
+    score: float
+    snippet: str
+
+
+@dataclass(frozen=True)
+class FileStamp:
+    """Size and modification time of an imported file, and its document."""
+
+    file_path: str
+    size: int
+    mtime_ns: int
+    document_id: UUID
+
+
 class BranchRepository(Protocol):
     """Abstract interface for Branch storage backends."""
 
     def upsert_document(self, document: Document) -> None:
         """Insert or update a document record."""
 
+    def upsert_documents_many(self, documents: Iterable[Document]) -> None:
+        """Insert or update many documents in one transaction."""
+
+    def update_document_progress(
+        self, changes: Iterable[tuple[UUID, int, datetime, float]]
+    ) -> None:
+        """Set ``last_page``, ``last_opened_at`` and ``read_percentage`` in bulk."""
+
     def get_document(self, document_id: UUID) -> Document | None:
         """Fetch a document by id."""
 
+    def get_documents(self, document_ids: Iterable[UUID]) -> dict[UUID, Document]:
+        """Fetch many documents by id; unknown ids are left out."""
+
+    def get_file_stamps(self) -> dict[str, FileStamp]:
+        """Return the stamp of every imported file, keyed by file path."""
+
+    def upsert_imported_documents(
+        self, imports: Iterable[tuple[Document, FileStamp]]
+    ) -> None:
+        """Insert or update documents and their file stamps in one transaction."""
+
     def upsert_session(self, session: BranchSession) -> None:
         """Insert or update a reading session."""
 
+    def upsert_session_and_fragments(
+        self, session: BranchSession | None, fragments: Iterable[IdeaFragment]
+    ) -> None:
+        """Insert or update a session and fragments in one transaction."""
+
     def get_session(self, session_id: UUID) -> BranchSession | None:
         """Fetch a session by id."""
 
     def upsert_fragment(self, fragment: IdeaFragment) -> None:
         """Insert or update an idea fragment."""
 
+    def upsert_fragments_many(self, fragments: Iterable[IdeaFragment]) -> None:
+        """Insert or update many idea fragments in one transaction."""
+
+    def update_fragment_statuses(
+        self, changes: Iterable[tuple[UUID, FragmentStatus, datetime]]
+    ) -> None:
+        """Set ``status`` and ``updated_at`` for many fragments in one transaction."""
+
+    def update_fragment_contents(
+        self, changes: Iterable[tuple[UUID, str, datetime]]
+    ) -> int:
+        """Set ``content`` and ``updated_at`` for many fragments in one transaction.
+
+        Returns:
+            The number of fragments updated; ids with no stored row are skipped.
+        """
+
+    def update_fragment_resolutions(
+        self, changes: Iterable[tuple[UUID, str, FragmentStatus | None, datetime]]
+    ) -> None:
+        """Set ``resolution_note``, ``status`` and ``updated_at`` in one transaction.
+
+        A ``None`` status leaves the stored status unchanged.
+        """
+
+    def get_fragment_documents(
+        self, fragment_ids: Iterable[UUID]
+    ) -> dict[UUID, UUID | None]:
+        """Map stored fragment ids to their document ids; unknown ids are left out."""
+
+    def find_fragment_ids(self, *, capture_type: str, content: str) -> list[UUID]:
+        """Return the ids of fragments of ``capture_type`` holding ``content``."""
+
     def get_fragment(self, fragment_id: UUID) -> IdeaFragment | None:
         """Fetch an idea fragment by id."""
 
     def list_fragments_for_document(self, document_id: UUID) -> Iterable[IdeaFragment]:
         """Return all fragments anchored to a document."""
+
+    def iter_fragments(
+        self,
+        document_id: UUID,
+        *,
+        after: tuple[datetime, UUID] | None = None,
+        limit: int | None = None,
+        status: FragmentStatus | None = None,
+    ) -> Iterator[IdeaFragment]:
+        """Stream a document's fragments in ``(captured_at, id)`` order.
+
+        ``after`` is an exclusive keyset cursor, so callers can page through
+        large buffers without offsets or loading everything up front.
+        """
+
+    def recent_fragments(
+        self, limit: int = 50, status: FragmentStatus | None = None
+    ) -> list[IdeaFragment]:
+        """Return the most recently captured fragments across all documents."""
+
+    def count_fragments_by_status(
+        self, document_id: UUID | None = None
+    ) -> dict[FragmentStatus, int]:
+        """Count fragments per status, for one document or the whole buffer."""
+
+    def count_session_fragments(self, session_id: UUID) -> int:
+        """Return how many stored fragments belong to a session."""
+
+    def daily_capture_counts(
+        self, start: date | None = None, end: date | None = None
+    ) -> dict[date, int]:
+        """Return fragments captured per UTC day within an inclusive range."""
+
+    def search_fragments(
+        self, query: str, document_id: UUID | None = None, limit: int = 20
+    ) -> list[FragmentSearchHit]:
+        """Return fragments matching a full-text query, best match first."""
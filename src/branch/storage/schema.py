@@ -1,20 +1,51 @@
 """SQLite schema definitions for Branch storage.
 
 The schema is intentionally minimal: it persists documents, reading sessions,
-and idea fragments while keeping user-facing reading flow unchanged.
+and idea fragments while keeping user-facing reading flow unchanged. Its
+history is the ordered :data:`MIGRATIONS` registry; :func:`apply_schema` runs
+whatever steps a database has not seen yet.
 """
 
 from __future__ import annotations
 
+import sqlite3
 from typing import TYPE_CHECKING
 
+from branch.storage.migrations import Migration, get_user_version, migrate
+from branch.storage.repository import StorageError
+
 
 if TYPE_CHECKING:
-    import sqlite3
     from collections.abc import Iterable, Sequence
 
+    from branch.storage.migrations import AppliedMigration
 
-SCHEMA_VERSION = 1
+# idea_fragments. ``id`` is the public key; ``seq`` is an INTEGER PRIMARY KEY
+# that is never exposed and gives the full-text index a key VACUUM cannot
+# renumber.
+FRAGMENTS_TABLE_STATEMENT = """
+    CREATE TABLE IF NOT EXISTS idea_fragments (
+        seq INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        content TEXT NOT NULL,
+        anchor_page_number INTEGER,
+        anchor_start_position INTEGER,
+        anchor_end_position INTEGER,
+        anchor_selected_text TEXT,
+        document_id TEXT
+            REFERENCES documents(id) ON DELETE SET NULL ON UPDATE CASCADE,
+        session_id TEXT
+            REFERENCES sessions(id) ON DELETE SET NULL ON UPDATE CASCADE,
+        captured_at TEXT NOT NULL DEFAULT (CURRENT_TIMESTAMP),
+        updated_at TEXT,
+        status TEXT NOT NULL DEFAULT 'captured'
+            CHECK (
+                status IN ('captured', 'reviewed', 'developed', 'archived', 'discarded')
+            ),
+        capture_type TEXT NOT NULL DEFAULT 'text',
+        resolution_note TEXT
+    );
+    """
 
 # Table DDL statements. Keep small and composable for migrations later.
 CREATE_TABLE_STATEMENTS: Sequence[str] = (
@@ -49,75 +80,332 @@ CREATE_TABLE_STATEMENTS: Sequence[str] = (
         notes TEXT
     );
     """,
-    """
-    CREATE TABLE IF NOT EXISTS idea_fragments (
-        id TEXT PRIMARY KEY,
-        content TEXT NOT NULL,
-        anchor_page_number INTEGER,
-        anchor_start_position INTEGER,
-        anchor_end_position INTEGER,
-        anchor_selected_text TEXT,
-        document_id TEXT
-            REFERENCES documents(id) ON DELETE SET NULL ON UPDATE CASCADE,
-        session_id TEXT
-            REFERENCES sessions(id) ON DELETE SET NULL ON UPDATE CASCADE,
-        captured_at TEXT NOT NULL DEFAULT (CURRENT_TIMESTAMP),
-        updated_at TEXT,
-        status TEXT NOT NULL DEFAULT 'captured'
-            CHECK (
-                status IN ('captured', 'reviewed', 'developed', 'archived', 'discarded')
-            ),
-        capture_type TEXT NOT NULL DEFAULT 'text',
-        resolution_note TEXT
-    );
-    """,
+    FRAGMENTS_TABLE_STATEMENT,
 )
 
-CREATE_INDEX_STATEMENTS: Sequence[str] = (
-    """
+SESSIONS_DOCUMENT_INDEX = """
     CREATE INDEX IF NOT EXISTS idx_sessions_document_id
     ON sessions(document_id);
+    """
+
+# Serves document lookups and keyset pagination over a document's buffer.
+FRAGMENTS_DOCUMENT_CAPTURED_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_fragments_document_captured
+    ON idea_fragments(document_id, captured_at, id);
+    """
+
+FRAGMENTS_SESSION_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_fragments_session_id
+    ON idea_fragments(session_id);
+    """
+
+FRAGMENTS_STATUS_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_fragments_status
+    ON idea_fragments(status);
+    """
+
+# Indexes present once every migration has run.
+CREATE_INDEX_STATEMENTS: Sequence[str] = (
+    SESSIONS_DOCUMENT_INDEX,
+    FRAGMENTS_DOCUMENT_CAPTURED_INDEX,
+    FRAGMENTS_SESSION_INDEX,
+    FRAGMENTS_STATUS_INDEX,
+)
+
+# Full-text index over fragment text. External-content FTS5 keeps a single
+# copy of the text in idea_fragments; triggers keep the index in sync. It is
+# keyed by ``seq`` rather than the implicit rowid, which VACUUM may renumber.
+FRAGMENTS_FTS_STATEMENTS: Sequence[str] = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS idea_fragments_fts USING fts5(
+        content,
+        anchor_selected_text,
+        resolution_note,
+        content='idea_fragments',
+        content_rowid='seq',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idea_fragments_fts_insert
+    AFTER INSERT ON idea_fragments BEGIN
+        INSERT INTO idea_fragments_fts (
+            rowid, content, anchor_selected_text, resolution_note
+        ) VALUES (
+            new.seq, new.content, new.anchor_selected_text, new.resolution_note
+        );
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idea_fragments_fts_delete
+    AFTER DELETE ON idea_fragments BEGIN
+        INSERT INTO idea_fragments_fts (
+            idea_fragments_fts, rowid, content, anchor_selected_text, resolution_note
+        ) VALUES (
+            'delete', old.seq, old.content, old.anchor_selected_text,
+            old.resolution_note
+        );
+    END;
     """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idea_fragments_fts_update
+    AFTER UPDATE OF content, anchor_selected_text, resolution_note
+    ON idea_fragments BEGIN
+        INSERT INTO idea_fragments_fts (
+            idea_fragments_fts, rowid, content, anchor_selected_text, resolution_note
+        ) VALUES (
+            'delete', old.seq, old.content, old.anchor_selected_text,
+            old.resolution_note
+        );
+        INSERT INTO idea_fragments_fts (
+            rowid, content, anchor_selected_text, resolution_note
+        ) VALUES (
+            new.seq, new.content, new.anchor_selected_text, new.resolution_note
+        );
+    END;
+    """,
+)
+
+FRAGMENT_DATA_COLUMNS = (
+    "id, content, anchor_page_number, anchor_start_position, anchor_end_position, "
+    "anchor_selected_text, document_id, session_id, captured_at, updated_at, "
+    "status, capture_type, resolution_note"
+)
+
+# Fragment indexes as created by version 1.
+VERSION_ONE_FRAGMENT_INDEXES: Sequence[str] = (
     """
     CREATE INDEX IF NOT EXISTS idx_fragments_document_id
     ON idea_fragments(document_id);
     """,
+    FRAGMENTS_SESSION_INDEX,
+    FRAGMENTS_STATUS_INDEX,
+)
+
+# Databases written before the migration registry are at version 1 with
+# ``id TEXT PRIMARY KEY`` and no ``seq``. Rebuild the table in the current
+# shape (dropping it drops its indexes, so they are created again) before
+# migration 3 builds the full-text index on ``seq``.
+ADD_FRAGMENT_SEQ_STATEMENTS: Sequence[str] = (
+    "ALTER TABLE idea_fragments RENAME TO idea_fragments_old;",
+    FRAGMENTS_TABLE_STATEMENT,
+    f"""
+    INSERT INTO idea_fragments ({FRAGMENT_DATA_COLUMNS})
+    SELECT {FRAGMENT_DATA_COLUMNS} FROM idea_fragments_old ORDER BY rowid;
+    """,  # noqa: S608
+    "DROP TABLE idea_fragments_old;",
+    *VERSION_ONE_FRAGMENT_INDEXES,
+)
+
+# Size and mtime of each imported file, so re-imports can skip unchanged files.
+DOCUMENT_FILES_STATEMENTS: Sequence[str] = (
     """
-    CREATE INDEX IF NOT EXISTS idx_fragments_session_id
-    ON idea_fragments(session_id);
+    CREATE TABLE IF NOT EXISTS document_files (
+        file_path TEXT PRIMARY KEY,
+        document_id TEXT NOT NULL
+            REFERENCES documents(id) ON DELETE CASCADE ON UPDATE CASCADE,
+        size INTEGER NOT NULL CHECK (size >= 0),
+        mtime_ns INTEGER NOT NULL
+    ) WITHOUT ROWID;
     """,
+)
+
+# Materialized fragment counts, kept current by triggers so dashboards read a
+# handful of rows instead of grouping idea_fragments. Fragments without a
+# document are counted under document_id ''. Rows may reach zero and stay.
+FRAGMENT_STATS_STATEMENTS: Sequence[str] = (
     """
-    CREATE INDEX IF NOT EXISTS idx_fragments_status
-    ON idea_fragments(status);
+    CREATE TABLE IF NOT EXISTS fragment_status_counts (
+        document_id TEXT NOT NULL,
+        status TEXT NOT NULL,
+        fragments INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (document_id, status)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS session_fragment_counts (
+        session_id TEXT PRIMARY KEY,
+        fragments INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS daily_capture_counts (
+        day TEXT PRIMARY KEY,
+        fragments INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idea_fragments_stats_insert
+    AFTER INSERT ON idea_fragments BEGIN
+        INSERT INTO fragment_status_counts (document_id, status, fragments)
+        VALUES (COALESCE(new.document_id, ''), new.status, 1)
+        ON CONFLICT DO UPDATE SET fragments = fragments + 1;
+        INSERT INTO session_fragment_counts (session_id, fragments)
+        SELECT new.session_id, 1 WHERE new.session_id IS NOT NULL
+        ON CONFLICT DO UPDATE SET fragments = fragments + 1;
+        INSERT INTO daily_capture_counts (day, fragments)
+        VALUES (substr(new.captured_at, 1, 10), 1)
+        ON CONFLICT DO UPDATE SET fragments = fragments + 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idea_fragments_stats_delete
+    AFTER DELETE ON idea_fragments BEGIN
+        UPDATE fragment_status_counts SET fragments = fragments - 1
+        WHERE document_id = COALESCE(old.document_id, '') AND status = old.status;
+        UPDATE session_fragment_counts SET fragments = fragments - 1
+        WHERE session_id = old.session_id;
+        UPDATE daily_capture_counts SET fragments = fragments - 1
+        WHERE day = substr(old.captured_at, 1, 10);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idea_fragments_stats_update_status
+    AFTER UPDATE OF document_id, status ON idea_fragments
+    WHEN old.document_id IS NOT new.document_id OR old.status IS NOT new.status
+    BEGIN
+        UPDATE fragment_status_counts SET fragments = fragments - 1
+        WHERE document_id = COALESCE(old.document_id, '') AND status = old.status;
+        INSERT INTO fragment_status_counts (document_id, status, fragments)
+        VALUES (COALESCE(new.document_id, ''), new.status, 1)
+        ON CONFLICT DO UPDATE SET fragments = fragments + 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idea_fragments_stats_update_session
+    AFTER UPDATE OF session_id ON idea_fragments
+    WHEN old.session_id IS NOT new.session_id
+    BEGIN
+        UPDATE session_fragment_counts SET fragments = fragments - 1
+        WHERE session_id = old.session_id;
+        INSERT INTO session_fragment_counts (session_id, fragments)
+        SELECT new.session_id, 1 WHERE new.session_id IS NOT NULL
+        ON CONFLICT DO UPDATE SET fragments = fragments + 1;
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idea_fragments_stats_update_day
+    AFTER UPDATE OF captured_at ON idea_fragments
+    WHEN substr(old.captured_at, 1, 10) IS NOT substr(new.captured_at, 1, 10)
+    BEGIN
+        UPDATE daily_capture_counts SET fragments = fragments - 1
+        WHERE day = substr(old.captured_at, 1, 10);
+        INSERT INTO daily_capture_counts (day, fragments)
+        VALUES (substr(new.captured_at, 1, 10), 1)
+        ON CONFLICT DO UPDATE SET fragments = fragments + 1;
+    END;
     """,
 )
 
+# Fill the stats tables from fragments stored before they existed.
+BACKFILL_FRAGMENT_STATS_STATEMENTS: Sequence[str] = (
+    """
+    INSERT INTO fragment_status_counts (document_id, status, fragments)
+    SELECT COALESCE(document_id, ''), status, COUNT(*)
+    FROM idea_fragments GROUP BY 1, 2;
+    """,
+    """
+    INSERT INTO session_fragment_counts (session_id, fragments)
+    SELECT session_id, COUNT(*) FROM idea_fragments
+    WHERE session_id IS NOT NULL GROUP BY 1;
+    """,
+    """
+    INSERT INTO daily_capture_counts (day, fragments)
+    SELECT substr(captured_at, 1, 10), COUNT(*) FROM idea_fragments GROUP BY 1;
+    """,
+)
 
-def apply_schema(connection: sqlite3.Connection) -> None:
-    """Create all tables and indexes for the current schema version.
+# Ordered schema history. Released steps are never edited; add a new one.
+MIGRATIONS: Sequence[Migration] = (
+    Migration(
+        version=1,
+        description="Create documents, sessions and idea_fragments",
+        statements=(
+            *CREATE_TABLE_STATEMENTS,
+            SESSIONS_DOCUMENT_INDEX,
+            *VERSION_ONE_FRAGMENT_INDEXES,
+        ),
+    ),
+    Migration(
+        version=2,
+        description="Replace fragment document index with keyset composite index",
+        statements=(
+            "DROP INDEX IF EXISTS idx_fragments_document_id;",
+            FRAGMENTS_DOCUMENT_CAPTURED_INDEX,
+        ),
+    ),
+    Migration(
+        version=3,
+        description="Add FTS5 full-text index over fragment text",
+        statements=(
+            *FRAGMENTS_FTS_STATEMENTS,
+            "INSERT INTO idea_fragments_fts (idea_fragments_fts) VALUES ('rebuild');",
+        ),
+    ),
+    Migration(
+        version=4,
+        description="Track imported file stamps in document_files",
+        statements=DOCUMENT_FILES_STATEMENTS,
+    ),
+    Migration(
+        version=5,
+        description="Add trigger-maintained fragment statistics tables",
+        statements=(
+            *FRAGMENT_STATS_STATEMENTS,
+            *BACKFILL_FRAGMENT_STATS_STATEMENTS,
+        ),
+    ),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def apply_schema(connection: sqlite3.Connection) -> list[AppliedMigration]:
+    """Bring the database up to :data:`SCHEMA_VERSION`.
 
-    PRAGMAs are set to enforce foreign keys, and `user_version` is recorded
-    to support future migrations.
+    Foreign keys are enforced if the connection has not already enabled them
+    (connections from :func:`branch.storage.sqlite.connect` have). Only
+    migrations newer than the stored ``user_version`` run, all in one
+    transaction; a current database skips DDL entirely.
+
+    Returns:
+        Timing reports for the migration steps that were applied.
     """
-    connection.execute("PRAGMA foreign_keys = ON;")
+    if not connection.execute("PRAGMA foreign_keys;").fetchone()[0]:
+        connection.execute("PRAGMA foreign_keys = ON;")
+
+    if get_user_version(connection) == 1 and not _has_fragment_seq(connection):
+        _add_fragment_seq(connection)
+    return migrate(connection, MIGRATIONS)
+
 
-    for statement in CREATE_TABLE_STATEMENTS:
-        connection.execute(statement)
+def _has_fragment_seq(connection: sqlite3.Connection) -> bool:
+    columns = connection.execute("PRAGMA table_info(idea_fragments);").fetchall()
+    return any(column[1] == "seq" for column in columns)
 
-    for statement in CREATE_INDEX_STATEMENTS:
-        connection.execute(statement)
 
-    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
-    connection.commit()
+def _add_fragment_seq(connection: sqlite3.Connection) -> None:
+    try:
+        connection.execute("BEGIN IMMEDIATE;")
+        for statement in ADD_FRAGMENT_SEQ_STATEMENTS:
+            connection.execute(statement)
+        connection.commit()
+    except sqlite3.Error as exc:
+        connection.rollback()
+        msg = f"Adding the fragment sequence key failed: {exc}"
+        raise StorageError(msg) from exc
 
 
 def current_schema_objects() -> dict[str, Iterable[str] | tuple[int, ...]]:
     """Provide a simple view of the schema objects for debugging and documentation.
 
-    Returns a mapping containing the DDL for tables and indexes.
+    Returns a mapping containing the DDL for tables, indexes, the full-text
+    index with its sync triggers, and the statistics tables with theirs.
     """
     return {
-        "tables": CREATE_TABLE_STATEMENTS,
+        "tables": (*CREATE_TABLE_STATEMENTS, *DOCUMENT_FILES_STATEMENTS),
         "indexes": CREATE_INDEX_STATEMENTS,
+        "full_text": FRAGMENTS_FTS_STATEMENTS,
+        "statistics": FRAGMENT_STATS_STATEMENTS,
         "version": (SCHEMA_VERSION,),
     }
@@ -1,37 +1,311 @@
 """SQLite helpers for Branch storage.
 
-Connections created here enable foreign key enforcement and expose a helper
-to apply the current schema.
+Connections created here enable foreign key enforcement, apply the configured
+performance profile (WAL journal, relaxed sync, larger cache, mmap), and expose
+a helper to apply the current schema. :class:`ConnectionPool` shares one
+database between a single writer and several concurrent readers.
+
+Reader connections are opened read-only (a ``mode=ro`` URI plus
+``PRAGMA query_only``), so a review or stats query can never take the write
+lock. :func:`read_snapshot` pins one WAL snapshot on such a connection for a
+whole block of queries; concurrent commits stay invisible until it ends.
 """
 
 from __future__ import annotations
 
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 
+from branch.config import Config
+from branch.instrumentation import connection_factory
+from branch.storage.repository import StorageError
 from branch.storage.schema import apply_schema
 
 
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
 SQLitePath = str | Path
 
+JOURNAL_MODES = frozenset({"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"})
+SYNCHRONOUS_LEVELS = frozenset({"OFF", "NORMAL", "FULL", "EXTRA"})
+TEMP_STORES = frozenset({"DEFAULT", "FILE", "MEMORY"})
+
+
+@dataclass(frozen=True)
+class SQLiteProfile:
+    """Connection-level PRAGMA settings applied by :func:`connect`."""
+
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size: int = -65536
+    mmap_size: int = 256 * 1024**2
+    temp_store: str = "MEMORY"
+    busy_timeout_ms: int = 5000
+
+    def __post_init__(self) -> None:
+        """Reject values that cannot be safely interpolated into a PRAGMA."""
+        for value, allowed in (
+            (self.journal_mode, JOURNAL_MODES),
+            (self.synchronous, SYNCHRONOUS_LEVELS),
+            (self.temp_store, TEMP_STORES),
+        ):
+            if value.upper() not in allowed:
+                msg = f"Unsupported PRAGMA value {value!r}; expected one of {allowed}"
+                raise ValueError(msg)
+
+    @classmethod
+    def from_config(cls) -> SQLiteProfile:
+        """Build a profile from the ``SQLITE_*`` settings in :class:`Config`."""
+        return cls(
+            journal_mode=Config.SQLITE_JOURNAL_MODE,
+            synchronous=Config.SQLITE_SYNCHRONOUS,
+            cache_size=Config.SQLITE_CACHE_SIZE,
+            mmap_size=Config.SQLITE_MMAP_SIZE,
+            temp_store=Config.SQLITE_TEMP_STORE,
+            busy_timeout_ms=Config.SQLITE_BUSY_TIMEOUT_MS,
+        )
+
+    def pragmas(self, *, read_only: bool = False) -> tuple[str, ...]:
+        """Return the PRAGMA statements for this profile, in application order.
+
+        Read-only connections skip the journal settings, which only the
+        writer may change, and refuse writes with ``query_only``.
+        """
+        if read_only:
+            return (
+                "PRAGMA query_only = ON;",
+                f"PRAGMA cache_size = {int(self.cache_size)};",
+                f"PRAGMA mmap_size = {int(self.mmap_size)};",
+                f"PRAGMA temp_store = {self.temp_store.upper()};",
+                f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)};",
+            )
+        return (
+            "PRAGMA foreign_keys = ON;",
+            f"PRAGMA journal_mode = {self.journal_mode.upper()};",
+            f"PRAGMA synchronous = {self.synchronous.upper()};",
+            f"PRAGMA cache_size = {int(self.cache_size)};",
+            f"PRAGMA mmap_size = {int(self.mmap_size)};",
+            f"PRAGMA temp_store = {self.temp_store.upper()};",
+            f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)};",
+        )
 
-def connect(database: SQLitePath = ":memory:") -> sqlite3.Connection:
+
+def database_path(url: str | None = None) -> str:
+    """Translate a ``sqlite:///`` URL (default ``DATABASE_URL``) into a path.
+
+    Raises:
+        StorageError: If the URL is not a SQLite URL.
+    """
+    url = Config.DATABASE_URL if url is None else url
+    prefix = "sqlite:///"
+    if not url.startswith(prefix):
+        msg = f"Unsupported database URL {url!r}; expected {prefix}<path>"
+        raise StorageError(msg)
+    return url.removeprefix(prefix) or ":memory:"
+
+
+def connect(
+    database: SQLitePath = ":memory:",
+    profile: SQLiteProfile | None = None,
+    *,
+    check_same_thread: bool = True,
+    read_only: bool = False,
+) -> sqlite3.Connection:
     """Create a SQLite connection with sane defaults for Branch.
 
     - Enables foreign key enforcement
+    - Applies the performance profile (defaults to :class:`Config` settings)
     - Uses row factory for dict-style access
+    - Times statements if instrumentation is enabled when it is opened
+    - With ``read_only``, opens an existing file through a ``mode=ro`` URI
+      and sets ``query_only``
+
+    Raises:
+        StorageError: ``read_only`` was requested for ``:memory:``.
     """
-    connection = sqlite3.connect(str(database))
+    profile = profile or SQLiteProfile.from_config()
+    target = str(database)
+    if read_only:
+        if target == ":memory:":
+            msg = "A read-only connection needs a file database"
+            raise StorageError(msg)
+        target = f"{Path(database).resolve().as_uri()}?mode=ro"
+    connection = sqlite3.connect(
+        target,
+        check_same_thread=check_same_thread,
+        factory=connection_factory(),
+        uri=read_only,
+    )
     connection.row_factory = sqlite3.Row
-    connection.execute("PRAGMA foreign_keys = ON;")
+    for pragma in profile.pragmas(read_only=read_only):
+        connection.execute(pragma)
     return connection
 
 
-def initialize(database: SQLitePath = ":memory:") -> sqlite3.Connection:
+@contextmanager
+def read_snapshot(connection: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Hold one read transaction on ``connection`` for the whole block.
+
+    Every query in the block sees the database as of entry; in WAL mode
+    writers keep committing meanwhile. The transaction is rolled back on exit.
+    A connection already inside a transaction is used as is.
+    """
+    if connection.in_transaction:
+        yield connection
+        return
+    connection.execute("BEGIN;")
+    try:
+        # A deferred BEGIN takes its snapshot at the first read; take it now.
+        connection.execute("SELECT count(*) FROM sqlite_master;").fetchone()
+        yield connection
+    finally:
+        connection.rollback()
+
+
+def initialize(
+    database: SQLitePath = ":memory:",
+    profile: SQLiteProfile | None = None,
+    *,
+    check_same_thread: bool = True,
+) -> sqlite3.Connection:
     """Connect to SQLite and ensure the Branch schema exists.
 
     Returns the open connection for immediate use.
     """
-    connection = connect(database)
+    connection = connect(database, profile, check_same_thread=check_same_thread)
     apply_schema(connection)
     return connection
+
+
+class ConnectionPool:
+    """Thread-safe pool with one writer connection and N reader connections.
+
+    SQLite allows a single writer at a time, so writes are serialized behind a
+    lock on one dedicated connection. Readers each get their own read-only
+    connection; in WAL mode they read the last committed snapshot without
+    waiting for an in-flight write to finish.
+
+    A ``read_only`` pool opens no writer at all: the schema must already
+    exist and :meth:`writer` raises.
+    """
+
+    def __init__(
+        self,
+        database: SQLitePath,
+        readers: int | None = None,
+        profile: SQLiteProfile | None = None,
+        *,
+        timeout: float | None = None,
+        read_only: bool = False,
+    ) -> None:
+        if str(database) == ":memory:":
+            msg = "ConnectionPool needs a file database; ':memory:' is per-connection"
+            raise StorageError(msg)
+        readers = Config.SQLITE_POOL_READERS if readers is None else readers
+        if readers < 1:
+            msg = f"ConnectionPool needs at least one reader, got {readers}"
+            raise ValueError(msg)
+
+        self._database = database
+        self._profile = profile or SQLiteProfile.from_config()
+        self._timeout = timeout
+        self._read_only = read_only
+        self._write_lock = threading.Lock()
+        self._writer = connect(
+            database, self._profile, check_same_thread=False, read_only=read_only
+        )
+        if not read_only:
+            apply_schema(self._writer)
+
+        self._size = readers
+        self._readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._all_readers: list[sqlite3.Connection] = []
+        self._create_lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def writer_connection(self) -> sqlite3.Connection:
+        """The dedicated writer connection (use :meth:`writer` to lock it)."""
+        return self._writer
+
+    @property
+    def size(self) -> int:
+        """Maximum number of reader connections."""
+        return self._size
+
+    @property
+    def read_only(self) -> bool:
+        """Whether the pool refuses writes."""
+        return self._read_only
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._create_lock:
+            if len(self._all_readers) < self._size:
+                connection = connect(
+                    self._database,
+                    self._profile,
+                    check_same_thread=False,
+                    read_only=True,
+                )
+                self._all_readers.append(connection)
+                return connection
+        try:
+            return self._readers.get(timeout=self._timeout)
+        except queue.Empty as exc:
+            msg = "Timed out waiting for a reader connection"
+            raise StorageError(msg) from exc
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a reader connection for the duration of the block."""
+        if self._closed:
+            msg = "ConnectionPool is closed"
+            raise StorageError(msg)
+        connection = self._acquire_reader()
+        try:
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.rollback()
+            self._readers.put(connection)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Hold the writer connection exclusively for the duration of the block."""
+        if self._closed:
+            msg = "ConnectionPool is closed"
+            raise StorageError(msg)
+        if self._read_only:
+            msg = "ConnectionPool was opened read-only"
+            raise StorageError(msg)
+        with self._write_lock:
+            yield self._writer
+
+    def close(self) -> None:
+        """Close the writer and every reader connection."""
+        self._closed = True
+        with self._write_lock:
+            self._writer.close()
+        with self._create_lock:
+            for connection in self._all_readers:
+                connection.close()
+            self._all_readers.clear()
+
+    def __enter__(self) -> ConnectionPool:
+        """Use the pool as a context manager that closes on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close all connections when leaving the ``with`` block."""
+        self.close()
@@ -0,0 +1,797 @@
+"""SQLite implementation of the Branch repository protocol.
+
+All writes are expressed as ``INSERT ... ON CONFLICT DO UPDATE`` upserts. SQL
+text lives in module-level constants so every call reuses the same statement
+string and hits the per-connection prepared statement cache of ``sqlite3``.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any
+from uuid import UUID
+
+from branch.instrumentation import traced
+from branch.models import FragmentStatus
+from branch.storage.mapping import (
+    DOCUMENT_COLUMNS,
+    FRAGMENT_COLUMNS,
+    SESSION_COLUMNS,
+    document_to_row,
+    fragment_to_row,
+    hydrate_document,
+    hydrate_fragment,
+    hydrate_session,
+    row_to_document,
+    row_to_fragment,
+    row_to_session,
+    session_to_row,
+    to_db_datetime,
+)
+from branch.storage.repository import FileStamp, FragmentSearchHit, StorageError
+from branch.storage.sqlite import ConnectionPool, connect, initialize, read_snapshot
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+    from branch.models import BranchSession, Document, IdeaFragment
+    from branch.storage.sqlite import SQLitePath, SQLiteProfile
+
+
+def upsert_sql(table: str, columns: Sequence[str], source: str | None = None) -> str:
+    """Build an ``INSERT ... ON CONFLICT(id) DO UPDATE`` statement.
+
+    Values come from named parameters unless ``source`` supplies another row
+    source, such as positional ``VALUES`` or a ``SELECT ... WHERE true``.
+    """
+    names = ", ".join(columns)
+    if source is None:
+        source = f"VALUES ({', '.join(f':{column}' for column in columns)})"
+    updates = ", ".join(
+        f"{column} = excluded.{column}" for column in columns if column != "id"
+    )
+    return (
+        f"INSERT INTO {table} ({names}) {source} "
+        f"ON CONFLICT(id) DO UPDATE SET {updates};"
+    )
+
+
+def _select_sql(table: str, columns: Sequence[str]) -> str:
+    """Build a ``SELECT`` of all mapped columns for a single id."""
+    return f"SELECT {', '.join(columns)} FROM {table} WHERE id = ?;"  # noqa: S608
+
+
+UPSERT_DOCUMENT_SQL = upsert_sql("documents", DOCUMENT_COLUMNS)
+UPDATE_DOCUMENT_PROGRESS_SQL = (
+    "UPDATE documents SET last_page = ?, last_opened_at = ?, read_percentage = ? "
+    "WHERE id = ?;"
+)
+UPSERT_SESSION_SQL = upsert_sql("sessions", SESSION_COLUMNS)
+UPSERT_FRAGMENT_SQL = upsert_sql("idea_fragments", FRAGMENT_COLUMNS)
+
+UPDATE_FRAGMENT_STATUS_SQL = (
+    "UPDATE idea_fragments SET status = ?, updated_at = ? WHERE id = ?;"
+)
+
+UPDATE_FRAGMENT_CONTENT_SQL = (
+    "UPDATE idea_fragments SET content = ?, updated_at = ? WHERE id = ?;"
+)
+
+UPDATE_FRAGMENT_RESOLUTION_SQL = (
+    "UPDATE idea_fragments SET resolution_note = ?, "
+    "status = COALESCE(?, status), updated_at = ? WHERE id = ?;"
+)
+
+UPSERT_FILE_STAMP_SQL = (
+    "INSERT INTO document_files (file_path, document_id, size, mtime_ns) "
+    "VALUES (?, ?, ?, ?) ON CONFLICT(file_path) DO UPDATE SET "
+    "document_id = excluded.document_id, size = excluded.size, "
+    "mtime_ns = excluded.mtime_ns;"
+)
+
+SELECT_FRAGMENT_IDS_BY_CONTENT_SQL = (
+    "SELECT id FROM idea_fragments WHERE capture_type = ? AND content = ?;"
+)
+
+SELECT_FILE_STAMPS_SQL = (
+    "SELECT file_path, size, mtime_ns, document_id FROM document_files;"
+)
+
+SELECT_DOCUMENT_SQL = _select_sql("documents", DOCUMENT_COLUMNS)
+SELECT_SESSION_SQL = _select_sql("sessions", SESSION_COLUMNS)
+SELECT_FRAGMENT_SQL = _select_sql("idea_fragments", FRAGMENT_COLUMNS)
+
+DEFAULT_PAGE_SIZE = 500
+# Bound parameters per ``IN (...)`` lookup, well under SQLite's variable limit.
+LOOKUP_CHUNK_SIZE = 500
+
+FragmentCursor = tuple[datetime, UUID]
+
+
+def _fragment_page_sql(*, after: bool, status: bool) -> str:
+    """Build a keyset page query over ``idx_fragments_document_captured``."""
+    conditions = ["document_id = ?"]
+    if after:
+        conditions.append("(captured_at, id) > (?, ?)")
+    if status:
+        conditions.append("status = ?")
+    return (
+        f"SELECT {', '.join(FRAGMENT_COLUMNS)} FROM idea_fragments "  # noqa: S608
+        f"WHERE {' AND '.join(conditions)} ORDER BY captured_at, id LIMIT ?;"
+    )
+
+
+SELECT_FRAGMENT_PAGE_SQL = {
+    (after, status): _fragment_page_sql(after=after, status=status)
+    for after in (False, True)
+    for status in (False, True)
+}
+
+
+def _recent_fragments_sql(*, status: bool) -> str:
+    """Build a newest-first query across every document's fragments."""
+    condition = "WHERE status = ? " if status else ""
+    return (
+        f"SELECT {', '.join(FRAGMENT_COLUMNS)} FROM idea_fragments "  # noqa: S608
+        f"{condition}ORDER BY captured_at DESC, id DESC LIMIT ?;"
+    )
+
+
+SELECT_RECENT_FRAGMENTS_SQL = {
+    status: _recent_fragments_sql(status=status) for status in (False, True)
+}
+
+DEFAULT_RECENT_LIMIT = 50
+
+# Counts read the trigger-maintained stats tables (schema version 5).
+COUNT_FRAGMENTS_BY_STATUS_SQL = (
+    "SELECT status, SUM(fragments) FROM fragment_status_counts "
+    "GROUP BY status HAVING SUM(fragments) > 0;"
+)
+COUNT_DOCUMENT_FRAGMENTS_BY_STATUS_SQL = (
+    "SELECT status, fragments FROM fragment_status_counts "
+    "WHERE document_id = ? AND fragments > 0;"
+)
+COUNT_SESSION_FRAGMENTS_SQL = (
+    "SELECT fragments FROM session_fragment_counts WHERE session_id = ?;"
+)
+DAILY_CAPTURE_COUNTS_SQL = (
+    "SELECT day, fragments FROM daily_capture_counts "
+    "WHERE day BETWEEN ? AND ? AND fragments > 0 ORDER BY day;"
+)
+
+
+DEFAULT_SEARCH_LIMIT = 20
+SNIPPET_TOKENS = 12
+
+
+def _search_sql(*, by_document: bool) -> str:
+    """Build a ranked FTS5 query joined back to the fragment rows."""
+    columns = ", ".join(f"f.{column}" for column in FRAGMENT_COLUMNS)
+    document_filter = "AND f.document_id = ? " if by_document else ""
+    return (
+        f"SELECT {columns}, bm25(idea_fragments_fts) AS score, "  # noqa: S608
+        "snippet(idea_fragments_fts, -1, ?, ?, '…', ?) AS snippet "
+        "FROM idea_fragments_fts "
+        "JOIN idea_fragments AS f ON f.seq = idea_fragments_fts.rowid "
+        f"WHERE idea_fragments_fts MATCH ? {document_filter}"
+        "ORDER BY rank LIMIT ?;"
+    )
+
+
+SEARCH_FRAGMENTS_SQL = _search_sql(by_document=False)
+SEARCH_FRAGMENTS_BY_DOCUMENT_SQL = _search_sql(by_document=True)
+
+
+def to_match_query(text: str) -> str:
+    """Turn free text into an FTS5 query that matches every term.
+
+    Each whitespace-separated term is quoted, so punctuation and FTS5 operators
+    typed by the user are searched literally instead of raising syntax errors.
+    """
+    terms = text.split()
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def fragment_cursor(fragment: IdeaFragment) -> FragmentCursor:
+    """Return the keyset cursor that resumes iteration after ``fragment``."""
+    return (fragment.captured_at, fragment.id)
+
+
+class SQLiteRepository:
+    """SQLite-backed implementation of :class:`BranchRepository`.
+
+    The repository wraps either a single connection or a
+    :class:`ConnectionPool`. Each public write runs in its own transaction;
+    the ``*_many`` variants batch all rows into one transaction with
+    ``executemany`` so bulk imports pay for a single commit. With a pool,
+    writes are serialized on the writer connection and reads are spread over
+    the reader connections so they never queue behind a capture.
+
+    :meth:`read_only` opens a pool whose connections can only read, for
+    review and analytics that must never contend with captures, and
+    :meth:`snapshot` pins one read transaction so a run of queries sees a
+    single consistent state of the database.
+
+    Rows are hydrated with the trusted ``hydrate_*`` path by default, since
+    every row was validated by Pydantic before it was written. Pass
+    ``validate_rows=True`` for databases that may have been edited by hand.
+    """
+
+    def __init__(
+        self,
+        connection: sqlite3.Connection | ConnectionPool,
+        *,
+        validate_rows: bool = False,
+    ) -> None:
+        if isinstance(connection, ConnectionPool):
+            self._pool: ConnectionPool | None = connection
+            self._connection = connection.writer_connection
+        else:
+            self._pool = None
+            self._connection = connection
+        # Serializes use of a single shared connection across threads.
+        self._lock = threading.RLock()
+        # The connection pinned by ``snapshot()`` on the current thread.
+        self._pinned = threading.local()
+        if validate_rows:
+            self._document = row_to_document
+            self._session = row_to_session
+            self._fragment = row_to_fragment
+        else:
+            self._document = hydrate_document
+            self._session = hydrate_session
+            self._fragment = hydrate_fragment
+
+    @classmethod
+    def open(
+        cls,
+        database: SQLitePath = ":memory:",
+        profile: SQLiteProfile | None = None,
+        *,
+        validate_rows: bool = False,
+    ) -> SQLiteRepository:
+        """Open a database, apply the schema, and wrap it in a repository.
+
+        The connection may be used from any thread; the repository serializes
+        access to it. Use :meth:`pooled` for concurrent readers.
+        """
+        connection = initialize(database, profile, check_same_thread=False)
+        return cls(connection, validate_rows=validate_rows)
+
+    @classmethod
+    def pooled(
+        cls,
+        database: SQLitePath,
+        readers: int | None = None,
+        profile: SQLiteProfile | None = None,
+        *,
+        validate_rows: bool = False,
+    ) -> SQLiteRepository:
+        """Open a file database behind a one-writer, N-reader connection pool."""
+        return cls(
+            ConnectionPool(database, readers, profile), validate_rows=validate_rows
+        )
+
+    @classmethod
+    def read_only(
+        cls,
+        database: SQLitePath,
+        readers: int | None = None,
+        profile: SQLiteProfile | None = None,
+        *,
+        validate_rows: bool = False,
+    ) -> SQLiteRepository:
+        """Open an existing file database with read-only connections only.
+
+        Every connection uses a ``mode=ro`` URI and ``query_only``, so reads
+        never take the write lock; writes raise :class:`StorageError`.
+        """
+        return cls(
+            ConnectionPool(database, readers, profile, read_only=True),
+            validate_rows=validate_rows,
+        )
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The underlying (writer) SQLite connection."""
+        return self._connection
+
+    def close(self) -> None:
+        """Close the underlying connection or pool."""
+        if self._pool is not None:
+            self._pool.close()
+        else:
+            self._connection.close()
+
+    def __enter__(self) -> SQLiteRepository:
+        """Use the repository as a context manager that closes on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the connection when leaving the ``with`` block."""
+        self.close()
+
+    @contextmanager
+    def snapshot(self) -> Iterator[SQLiteRepository]:
+        """Pin one read transaction for every read this thread makes in the block.
+
+        All queries inside see the database as it was on entry, while other
+        connections keep committing. A pooled repository borrows a reader
+        for the block; a single-connection file database opens a dedicated
+        read-only connection. Nested calls reuse the outer snapshot.
+
+        Raises:
+            StorageError: On a write from this thread inside the block.
+        """
+        if getattr(self._pinned, "connection", None) is not None:
+            yield self
+            return
+        with self._snapshot_connection() as connection, read_snapshot(connection):
+            self._pinned.connection = connection
+            try:
+                yield self
+            finally:
+                self._pinned.connection = None
+
+    @contextmanager
+    def _snapshot_connection(self) -> Iterator[sqlite3.Connection]:
+        if self._pool is not None:
+            with self._pool.reader() as connection:
+                yield connection
+            return
+        with self._lock:
+            path = self._connection.execute("PRAGMA database_list;").fetchone()["file"]
+        if not path:
+            # In-memory databases have no second connection to read from.
+            with self._lock:
+                yield self._connection
+            return
+        connection = connect(path, check_same_thread=False, read_only=True)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block in one write transaction, translating SQLite errors."""
+        if getattr(self._pinned, "connection", None) is not None:
+            msg = "Cannot write inside a read snapshot"
+            raise StorageError(msg)
+        try:
+            if self._pool is None:
+                with self._lock, self._connection:
+                    yield self._connection
+            else:
+                with self._pool.writer() as connection, connection:
+                    yield connection
+        except sqlite3.Error as exc:
+            raise StorageError(str(exc)) from exc
+
+    @contextmanager
+    def _reading(self) -> Iterator[sqlite3.Connection]:
+        """Provide a connection for reads, translating SQLite errors.
+
+        Results must be consumed in-block.
+        """
+        pinned: sqlite3.Connection | None = getattr(self._pinned, "connection", None)
+        try:
+            if pinned is not None:
+                yield pinned
+            elif self._pool is None:
+                with self._lock:
+                    yield self._connection
+            else:
+                with self._pool.reader() as connection:
+                    yield connection
+        except sqlite3.Error as exc:
+            raise StorageError(str(exc)) from exc
+
+    # Documents
+
+    @traced("repository.upsert_document")
+    def upsert_document(self, document: Document) -> None:
+        """Insert or update a document record."""
+        with self._transaction() as connection:
+            connection.execute(UPSERT_DOCUMENT_SQL, document_to_row(document))
+
+    @traced("repository.upsert_documents_many")
+    def upsert_documents_many(self, documents: Iterable[Document]) -> None:
+        """Insert or update many documents in a single transaction."""
+        with self._transaction() as connection:
+            connection.executemany(
+                UPSERT_DOCUMENT_SQL, (document_to_row(doc) for doc in documents)
+            )
+
+    @traced("repository.update_document_progress")
+    def update_document_progress(
+        self, changes: Iterable[tuple[UUID, int, datetime, float]]
+    ) -> None:
+        """Set the reading progress of many documents in one transaction.
+
+        Each change is ``(document_id, last_page, last_opened_at,
+        read_percentage)``; only those three columns are written.
+        """
+        with self._transaction() as connection:
+            connection.executemany(
+                UPDATE_DOCUMENT_PROGRESS_SQL,
+                (
+                    (page, to_db_datetime(opened_at), percentage, str(document_id))
+                    for document_id, page, opened_at, percentage in changes
+                ),
+            )
+
+    @traced("repository.get_document")
+    def get_document(self, document_id: UUID) -> Document | None:
+        """Fetch a document by id."""
+        with self._reading() as connection:
+            row = connection.execute(
+                SELECT_DOCUMENT_SQL, (str(document_id),)
+            ).fetchone()
+        return self._document(row) if row is not None else None
+
+    @traced("repository.get_documents")
+    def get_documents(self, document_ids: Iterable[UUID]) -> dict[UUID, Document]:
+        """Fetch many documents in chunked ``IN`` queries; unknown ids are left out."""
+        ids = list(dict.fromkeys(str(document_id) for document_id in document_ids))
+        documents: dict[UUID, Document] = {}
+        with self._reading() as connection:
+            for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+                chunk = ids[start : start + LOOKUP_CHUNK_SIZE]
+                rows = connection.execute(
+                    f"SELECT {', '.join(DOCUMENT_COLUMNS)} FROM documents "  # noqa: S608
+                    f"WHERE id IN ({', '.join('?' * len(chunk))});",
+                    chunk,
+                )
+                for row in rows:
+                    document = self._document(row)
+                    documents[document.id] = document
+        return documents
+
+    @traced("repository.get_file_stamps")
+    def get_file_stamps(self) -> dict[str, FileStamp]:
+        """Return the stamp of every imported file, keyed by file path."""
+        with self._reading() as connection:
+            rows = connection.execute(SELECT_FILE_STAMPS_SQL).fetchall()
+        return {
+            path: FileStamp(path, size, mtime_ns, UUID(document_id))
+            for path, size, mtime_ns, document_id in rows
+        }
+
+    @traced("repository.upsert_imported_documents")
+    def upsert_imported_documents(
+        self, imports: Iterable[tuple[Document, FileStamp]]
+    ) -> None:
+        """Insert or update documents and their file stamps in one transaction."""
+        imports = list(imports)
+        with self._transaction() as connection:
+            connection.executemany(
+                UPSERT_DOCUMENT_SQL, (document_to_row(doc) for doc, _ in imports)
+            )
+            connection.executemany(
+                UPSERT_FILE_STAMP_SQL,
+                (
+                    (stamp.file_path, str(doc.id), stamp.size, stamp.mtime_ns)
+                    for doc, stamp in imports
+                ),
+            )
+
+    # Sessions
+
+    @traced("repository.upsert_session")
+    def upsert_session(self, session: BranchSession) -> None:
+        """Insert or update a reading session."""
+        with self._transaction() as connection:
+            connection.execute(UPSERT_SESSION_SQL, session_to_row(session))
+
+    @traced("repository.upsert_session_and_fragments")
+    def upsert_session_and_fragments(
+        self, session: BranchSession | None, fragments: Iterable[IdeaFragment]
+    ) -> None:
+        """Insert or update a session and fragments in one transaction."""
+        with self._transaction() as connection:
+            if session is not None:
+                connection.execute(UPSERT_SESSION_SQL, session_to_row(session))
+            connection.executemany(
+                UPSERT_FRAGMENT_SQL, (fragment_to_row(frag) for frag in fragments)
+            )
+
+    @traced("repository.get_session")
+    def get_session(self, session_id: UUID) -> BranchSession | None:
+        """Fetch a session by id."""
+        with self._reading() as connection:
+            row = connection.execute(SELECT_SESSION_SQL, (str(session_id),)).fetchone()
+        return self._session(row) if row is not None else None
+
+    # Fragments
+
+    @traced("repository.upsert_fragment")
+    def upsert_fragment(self, fragment: IdeaFragment) -> None:
+        """Insert or update an idea fragment."""
+        with self._transaction() as connection:
+            connection.execute(UPSERT_FRAGMENT_SQL, fragment_to_row(fragment))
+
+    @traced("repository.upsert_fragments_many")
+    def upsert_fragments_many(self, fragments: Iterable[IdeaFragment]) -> None:
+        """Insert or update many idea fragments in a single transaction."""
+        with self._transaction() as connection:
+            connection.executemany(
+                UPSERT_FRAGMENT_SQL, (fragment_to_row(frag) for frag in fragments)
+            )
+
+    @traced("repository.update_fragment_statuses")
+    def update_fragment_statuses(
+        self, changes: Iterable[tuple[UUID, FragmentStatus, datetime]]
+    ) -> None:
+        """Set ``status`` and ``updated_at`` for many fragments in one transaction.
+
+        Only the two changed columns are written, so review transitions avoid
+        rewriting (and re-indexing) fragment text.
+        """
+        with self._transaction() as connection:
+            connection.executemany(
+                UPDATE_FRAGMENT_STATUS_SQL,
+                (
+                    (status.value, to_db_datetime(updated_at), str(fragment_id))
+                    for fragment_id, status, updated_at in changes
+                ),
+            )
+
+    @traced("repository.update_fragment_contents")
+    def update_fragment_contents(
+        self, changes: Iterable[tuple[UUID, str, datetime]]
+    ) -> int:
+        """Set ``content`` and ``updated_at`` for many fragments in one transaction.
+
+        Status, anchor and review fields are left alone, so a late write such
+        as a finished transcription cannot undo a concurrent review.
+
+        Returns:
+            The number of fragments updated; ids with no stored row are skipped.
+        """
+        with self._transaction() as connection:
+            cursor = connection.executemany(
+                UPDATE_FRAGMENT_CONTENT_SQL,
+                (
+                    (content, to_db_datetime(updated_at), str(fragment_id))
+                    for fragment_id, content, updated_at in changes
+                ),
+            )
+        return cursor.rowcount
+
+    @traced("repository.update_fragment_resolutions")
+    def update_fragment_resolutions(
+        self, changes: Iterable[tuple[UUID, str, FragmentStatus | None, datetime]]
+    ) -> None:
+        """Set ``resolution_note``, ``status`` and ``updated_at`` in one transaction.
+
+        A ``None`` status keeps the stored one, so a slow model answer cannot
+        undo a review, edit or transcription committed while it was pending.
+        """
+        with self._transaction() as connection:
+            connection.executemany(
+                UPDATE_FRAGMENT_RESOLUTION_SQL,
+                (
+                    (
+                        note,
+                        status.value if status is not None else None,
+                        to_db_datetime(updated_at),
+                        str(fragment_id),
+                    )
+                    for fragment_id, note, status, updated_at in changes
+                ),
+            )
+
+    @traced("repository.get_fragment_documents")
+    def get_fragment_documents(
+        self, fragment_ids: Iterable[UUID]
+    ) -> dict[UUID, UUID | None]:
+        """Map stored fragment ids to their document ids in chunked ``IN`` queries.
+
+        Ids with no stored fragment are left out of the result.
+        """
+        ids = list(dict.fromkeys(str(fragment_id) for fragment_id in fragment_ids))
+        documents: dict[UUID, UUID | None] = {}
+        with self._reading() as connection:
+            for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+                chunk = ids[start : start + LOOKUP_CHUNK_SIZE]
+                rows = connection.execute(
+                    "SELECT id, document_id FROM idea_fragments "  # noqa: S608
+                    f"WHERE id IN ({', '.join('?' * len(chunk))});",
+                    chunk,
+                )
+                for fragment_id, document_id in rows:
+                    documents[UUID(fragment_id)] = (
+                        UUID(document_id) if document_id is not None else None
+                    )
+        return documents
+
+    @traced("repository.find_fragment_ids")
+    def find_fragment_ids(self, *, capture_type: str, content: str) -> list[UUID]:
+        """Return the ids of fragments of ``capture_type`` holding ``content``."""
+        with self._reading() as connection:
+            rows = connection.execute(
+                SELECT_FRAGMENT_IDS_BY_CONTENT_SQL, (capture_type, content)
+            ).fetchall()
+        return [UUID(row[0]) for row in rows]
+
+    @traced("repository.get_fragment")
+    def get_fragment(self, fragment_id: UUID) -> IdeaFragment | None:
+        """Fetch an idea fragment by id."""
+        with self._reading() as connection:
+            row = connection.execute(
+                SELECT_FRAGMENT_SQL, (str(fragment_id),)
+            ).fetchone()
+        return self._fragment(row) if row is not None else None
+
+    @traced("repository.list_fragments_for_document")
+    def list_fragments_for_document(self, document_id: UUID) -> list[IdeaFragment]:
+        """Return all fragments anchored to a document, oldest first."""
+        return list(self.iter_fragments(document_id))
+
+    @traced("repository.iter_fragments")
+    def iter_fragments(
+        self,
+        document_id: UUID,
+        *,
+        after: FragmentCursor | None = None,
+        limit: int | None = None,
+        status: FragmentStatus | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> Iterator[IdeaFragment]:
+        """Stream a document's fragments in ``(captured_at, id)`` order.
+
+        Rows are fetched ``page_size`` at a time with keyset pagination, so
+        memory stays bounded by one page regardless of buffer size and no
+        connection is held while the caller consumes results.
+
+        Args:
+            document_id: Document whose fragments to stream.
+            after: Exclusive ``(captured_at, id)`` cursor to resume from,
+                typically :func:`fragment_cursor` of the last item seen.
+            limit: Maximum number of fragments to yield in total.
+            status: Only yield fragments with this status.
+            page_size: Rows fetched per query.
+        """
+        if page_size < 1:
+            msg = f"page_size must be positive, got {page_size}"
+            raise ValueError(msg)
+        remaining = limit
+        while remaining is None or remaining > 0:
+            batch = page_size if remaining is None else min(page_size, remaining)
+            params: list[Any] = [str(document_id)]
+            if after is not None:
+                params.extend((to_db_datetime(after[0]), str(after[1])))
+            if status is not None:
+                params.append(status.value)
+            params.append(batch)
+            sql = SELECT_FRAGMENT_PAGE_SQL[(after is not None, status is not None)]
+
+            with self._reading() as connection:
+                rows = connection.execute(sql, params).fetchall()
+            page = [self._fragment(row) for row in rows]
+            yield from page
+
+            if len(page) < batch:
+                return
+            after = fragment_cursor(page[-1])
+            if remaining is not None:
+                remaining -= len(page)
+
+    @traced("repository.recent_fragments")
+    def recent_fragments(
+        self,
+        limit: int = DEFAULT_RECENT_LIMIT,
+        status: FragmentStatus | None = None,
+    ) -> list[IdeaFragment]:
+        """Return the most recently captured fragments, newest first.
+
+        Unlike :meth:`iter_fragments` this spans every document (and fragments
+        with none), which is what the buffer listing shows.
+        """
+        params: list[Any] = [] if status is None else [status.value]
+        params.append(limit)
+        with self._reading() as connection:
+            rows = connection.execute(
+                SELECT_RECENT_FRAGMENTS_SQL[status is not None], params
+            ).fetchall()
+        return [self._fragment(row) for row in rows]
+
+    @traced("repository.count_fragments_by_status")
+    def count_fragments_by_status(
+        self, document_id: UUID | None = None
+    ) -> dict[FragmentStatus, int]:
+        """Count fragments per status, for one document or the whole buffer.
+
+        Statuses without fragments are omitted. Reads ``fragment_status_counts``
+        rather than grouping fragments, so the cost does not grow with the
+        buffer.
+        """
+        with self._reading() as connection:
+            if document_id is None:
+                rows = connection.execute(COUNT_FRAGMENTS_BY_STATUS_SQL).fetchall()
+            else:
+                rows = connection.execute(
+                    COUNT_DOCUMENT_FRAGMENTS_BY_STATUS_SQL, (str(document_id),)
+                ).fetchall()
+        return {FragmentStatus(status): count for status, count in rows}
+
+    @traced("repository.count_session_fragments")
+    def count_session_fragments(self, session_id: UUID) -> int:
+        """Return how many stored fragments belong to a session."""
+        with self._reading() as connection:
+            row = connection.execute(
+                COUNT_SESSION_FRAGMENTS_SQL, (str(session_id),)
+            ).fetchone()
+        return int(row[0]) if row is not None else 0
+
+    @traced("repository.daily_capture_counts")
+    def daily_capture_counts(
+        self, start: date | None = None, end: date | None = None
+    ) -> dict[date, int]:
+        """Return fragments captured per UTC day, oldest first.
+
+        Args:
+            start: First day to include; defaults to the earliest capture.
+            end: Last day to include; defaults to the latest capture.
+        """
+        bounds = (
+            start.isoformat() if start is not None else "",
+            end.isoformat() if end is not None else "9999-12-31",
+        )
+        with self._reading() as connection:
+            rows = connection.execute(DAILY_CAPTURE_COUNTS_SQL, bounds).fetchall()
+        return {date.fromisoformat(day): count for day, count in rows}
+
+    @traced("repository.search_fragments")
+    def search_fragments(
+        self,
+        query: str,
+        document_id: UUID | None = None,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        *,
+        raw: bool = False,
+        highlight: tuple[str, str] = ("[", "]"),
+    ) -> list[FragmentSearchHit]:
+        """Rank fragments against a full-text query using FTS5 and bm25.
+
+        Args:
+            query: Free text; every term must match. With ``raw=True`` it is
+                passed through as FTS5 query syntax (phrases, ``OR``, prefixes).
+            document_id: Restrict matches to one document.
+            limit: Maximum number of hits.
+            raw: Treat ``query`` as FTS5 syntax instead of plain terms.
+            highlight: Markers placed around matched terms in the snippet.
+        """
+        match = query if raw else to_match_query(query)
+        if not match:
+            return []
+        params: list[Any] = [*highlight, SNIPPET_TOKENS, match]
+        if document_id is not None:
+            params.append(str(document_id))
+        params.append(limit)
+        sql = (
+            SEARCH_FRAGMENTS_SQL
+            if document_id is None
+            else SEARCH_FRAGMENTS_BY_DOCUMENT_SQL
+        )
+        with self._reading() as connection:
+            try:
+                rows = connection.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as exc:
+                msg = f"Invalid search query {query!r}: {exc}"
+                raise StorageError(msg) from exc
+        width = len(FRAGMENT_COLUMNS)
+        return [
+            FragmentSearchHit(
+                fragment=self._fragment(row[:width]),
+                score=row["score"],
+                snippet=row["snippet"],
+            )
+            for row in rows
+        ]
@@ -1,9 +1,11 @@
 """Pytest configuration for Branch tests."""
 
+import pymupdf
 import pytest
 
 from branch.models import BranchSession, Document, IdeaFragment
 from branch.models.idea_fragment import TextAnchor
+from branch.storage import SQLiteRepository
 
 
 @pytest.fixture
@@ -25,3 +27,31 @@ def sample_document():
 def sample_session(sample_document):
     """Create a sample session for testing."""
     return BranchSession(document_id=sample_document.id)
+
+
+@pytest.fixture
+def repository():
+    """Create an in-memory SQLite repository with the schema applied."""
+    repo = SQLiteRepository.open(":memory:")
+    yield repo
+    repo.close()
+
+
+def _write_pdf(path, pages, *, title="", author="", page_size=None):
+    """Save a PDF with one page per entry of ``pages``, each a list of lines."""
+    width, height = page_size or (595, 842)
+    document = pymupdf.open()
+    for lines in pages:
+        page = document.new_page(width=width, height=height)
+        for number, line in enumerate(lines):
+            page.insert_text((20, 50 + 20 * number), line)
+    document.set_metadata({"title": title, "author": author})
+    document.save(path)
+    document.close()
+    return path
+
+
+@pytest.fixture
+def pdf_factory():
+    """Return a function that writes a small text PDF and returns its path."""
+    return _write_pdf
@@ -0,0 +1,115 @@
+"""Tests for the compact Branch Buffer index."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from branch.buffer import BufferIndex
+from branch.models import Document, FragmentStatus, IdeaFragment
+from branch.models.idea_fragment import TextAnchor
+
+
+@pytest.fixture
+def stored(repository):
+    document = Document(title="Book")
+    repository.upsert_document(document)
+    start = datetime(2025, 3, 1, 9, 30, 0, 123456)
+    fragments = [
+        IdeaFragment(
+            content=f"Idea {i}: " + "x" * 200,
+            document_id=document.id,
+            anchor=TextAnchor(page_number=i + 1),
+            captured_at=start + timedelta(minutes=i),
+        )
+        for i in range(5)
+    ]
+    repository.upsert_fragments_many(fragments)
+    return document, fragments
+
+
+def test_index_keeps_only_review_fields(repository, stored):
+    """Entries carry id, status, page, timestamps and a truncated preview."""
+    document, fragments = stored
+
+    index = BufferIndex.from_repository(repository, document.id, preview_chars=12)
+    entries = list(index.entries())
+
+    assert len(index) == 5
+    assert [entry.id for entry in entries] == [f.id for f in fragments]
+    assert entries[2].preview == "Idea 2: xxxx"
+    assert entries[2].page_number == 3
+    assert entries[2].captured_at == fragments[2].captured_at
+    assert entries[2].updated_at is None
+
+
+def test_status_transitions_are_tracked_and_flushed(repository, stored):
+    """Transitions update the index immediately and persist on flush."""
+    document, fragments = stored
+    index = BufferIndex.from_repository(repository, document.id)
+
+    index.mark_reviewed(fragments[0].id)
+    index.archive(fragments[1].id)
+    index.discard(fragments[2].id)
+
+    assert index.status_of(fragments[1].id) == FragmentStatus.ARCHIVED
+    assert index.counts()[FragmentStatus.CAPTURED] == 2
+    assert [e.id for e in index.entries(FragmentStatus.DISCARDED)] == [fragments[2].id]
+
+    assert index.flush_changes(repository) == 3
+    assert index.flush_changes(repository) == 0
+    stored_statuses = [repository.get_fragment(f.id).status for f in fragments[:3]]
+    assert stored_statuses == [
+        FragmentStatus.REVIEWED,
+        FragmentStatus.ARCHIVED,
+        FragmentStatus.DISCARDED,
+    ]
+    assert repository.get_fragment(fragments[0].id).updated_at is not None
+
+
+def test_full_content_is_loaded_lazily(repository, stored):
+    """The full fragment comes from the loader, not the index."""
+    document, fragments = stored
+    index = BufferIndex.from_repository(repository, document.id, preview_chars=4)
+
+    loaded = index.load(fragments[4].id)
+
+    assert loaded.content == fragments[4].content
+    with pytest.raises(KeyError):
+        index.load(uuid4())
+
+    unloaded = BufferIndex()
+    unloaded.add_fragment(fragments[0])
+    with pytest.raises(LookupError, match="no loader"):
+        unloaded.load(fragments[0].id)
+
+
+def test_re_adding_refreshes_the_slot():
+    """Adding a known id updates its fields instead of adding a slot."""
+    index = BufferIndex()
+    fragment = IdeaFragment(content="first draft")
+    index.add_fragment(fragment)
+    fragment.content = "second draft"
+    fragment.develop()
+    index.add_fragment(fragment)
+
+    entry = index.entry(fragment.id)
+
+    assert len(index) == 1
+    assert entry.preview == "second draft"
+    assert entry.status == FragmentStatus.DEVELOPED
+    assert fragment.id in index
+    assert uuid4() not in index
+
+
+def test_large_buffer_stays_compact():
+    """Fifty thousand fragments fit in a few MB."""
+    index = BufferIndex()
+    now = datetime(2025, 1, 1)
+    for i in range(50_000):
+        index.add(uuid4(), "A captured idea about the page " * 4, now, page_number=i)
+
+    assert len(index) == 50_000
+    assert index.memory_bytes() < 16 * 1024**2
@@ -0,0 +1,232 @@
+"""Tests for the write-behind capture queue and latency metrics."""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from uuid import uuid4
+
+import pytest
+
+from branch.capture import CaptureQueue
+from branch.metrics import LatencyRecorder
+from branch.models import Document, IdeaFragment
+from branch.storage import StorageError
+
+
+@pytest.fixture
+def document(repository):
+    document = Document(title="Book")
+    repository.upsert_document(document)
+    return document
+
+
+def make_fragments(document, count):
+    return [
+        IdeaFragment(content=f"Idea {i}", document_id=document.id) for i in range(count)
+    ]
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_capture_returns_before_commit_and_flush_persists(
+    repository, document, tmp_path
+):
+    """Captures are queued immediately and committed by flush()."""
+    fragments = make_fragments(document, 10)
+
+    with CaptureQueue(repository, tmp_path, max_batch=1000, max_delay=60) as queue:
+        for fragment in fragments:
+            queue.capture(fragment)
+        assert queue.pending == 10
+        assert queue.flush(timeout=5)
+        assert queue.pending == 0
+
+    stored = repository.list_fragments_for_document(document.id)
+    assert {f.id for f in stored} == {f.id for f in fragments}
+    assert not list(tmp_path.glob("capture-*.jsonl"))
+
+
+def test_full_batch_commits_without_explicit_flush(repository, document):
+    """Reaching max_batch wakes the flusher even with a long delay."""
+    queue = CaptureQueue(repository, max_batch=5, max_delay=60).start()
+    try:
+        for fragment in make_fragments(document, 5):
+            queue.capture(fragment)
+        assert wait_until(lambda: queue.pending == 0)
+    finally:
+        queue.close()
+
+    assert len(repository.list_fragments_for_document(document.id)) == 5
+
+
+def test_delay_commits_a_partial_batch(repository, document):
+    """A lone capture is committed once max_delay elapses."""
+    queue = CaptureQueue(repository, max_batch=100, max_delay=0.01).start()
+    try:
+        queue.capture(make_fragments(document, 1)[0])
+        assert wait_until(lambda: queue.pending == 0)
+    finally:
+        queue.close()
+
+
+def test_close_commits_remaining_captures(repository, document):
+    """Closing drains the queue instead of dropping captures."""
+    queue = CaptureQueue(repository, max_batch=1000, max_delay=60).start()
+    for fragment in make_fragments(document, 3):
+        queue.capture(fragment)
+    queue.close()
+
+    assert len(repository.list_fragments_for_document(document.id)) == 3
+    with pytest.raises(StorageError):
+        queue.capture(make_fragments(document, 1)[0])
+
+
+def test_recover_replays_spill_segments(repository, document, tmp_path):
+    """Segments left by a crash are committed on start, torn lines skipped."""
+    fragments = make_fragments(document, 3)
+    segment = tmp_path / "capture-0000000007.jsonl"
+    lines = [fragment.model_dump_json() for fragment in fragments]
+    segment.write_text("\n".join(lines) + '\n{"id": "torn', encoding="utf-8")
+
+    with CaptureQueue(repository, tmp_path) as queue:
+        assert queue.pending == 0
+        new = make_fragments(document, 1)[0]
+        queue.capture(new)
+        queue.flush(timeout=5)
+
+    stored = {f.id for f in repository.list_fragments_for_document(document.id)}
+    assert stored == {f.id for f in fragments} | {new.id}
+    assert not segment.exists()
+
+
+def test_rejected_rows_do_not_block_the_batch(repository, document, tmp_path):
+    """One bad row is set aside while the rest of the batch is committed."""
+    good = make_fragments(document, 2)
+    orphan = IdeaFragment(content="No such document", document_id=uuid4())
+
+    with CaptureQueue(repository, tmp_path, max_batch=100, max_delay=60) as queue:
+        for fragment in (good[0], orphan, good[1]):
+            queue.capture(fragment)
+        queue.flush(timeout=5)
+
+    stored = {f.id for f in repository.list_fragments_for_document(document.id)}
+    assert stored == {f.id for f in good}
+    rejected = (tmp_path / "rejected.jsonl").read_text(encoding="utf-8")
+    assert str(orphan.id) in rejected
+
+
+def test_transient_failure_requeues_the_batch(
+    repository, document, tmp_path, monkeypatch
+):
+    """A locked database delays a batch; it never rejects or drops captures."""
+    fragments = make_fragments(document, 3)
+    upsert_many = repository.upsert_fragments_many
+    failures = []
+
+    def locked_once(batch):
+        if not failures:
+            failures.append(len(batch))
+            error = StorageError("database is locked")
+            raise error from sqlite3.OperationalError("database is locked")
+        upsert_many(batch)
+
+    monkeypatch.setattr(repository, "upsert_fragments_many", locked_once)
+    with CaptureQueue(repository, tmp_path, max_batch=100, max_delay=60) as queue:
+        for fragment in fragments:
+            queue.capture(fragment)
+        assert queue.flush(timeout=5)
+
+    assert failures == [3]
+    stored = {f.id for f in repository.list_fragments_for_document(document.id)}
+    assert stored == {f.id for f in fragments}
+    assert not (tmp_path / "rejected.jsonl").exists()
+    assert not list(tmp_path.glob("capture-*.jsonl"))
+
+
+def test_unexpected_errors_do_not_stop_the_flusher(repository, document, monkeypatch):
+    """The flusher survives a non-storage exception and commits on retry."""
+    fragments = make_fragments(document, 2)
+    upsert_many = repository.upsert_fragments_many
+    calls = []
+
+    def broken_once(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            msg = "boom"
+            raise RuntimeError(msg)
+        upsert_many(batch)
+
+    monkeypatch.setattr(repository, "upsert_fragments_many", broken_once)
+    with CaptureQueue(repository, max_batch=100, max_delay=60) as queue:
+        for fragment in fragments:
+            queue.capture(fragment)
+        assert queue.flush(timeout=5)
+
+    assert len(repository.list_fragments_for_document(document.id)) == 2
+
+
+def test_persistent_failure_stops_the_flusher(
+    repository, document, tmp_path, monkeypatch
+):
+    """Waiters are released once commits fail for the whole retry window."""
+
+    def locked(batch):
+        error = StorageError("database is locked")
+        raise error from sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(repository, "upsert_fragments_many", locked)
+    fragment = make_fragments(document, 1)[0]
+    with CaptureQueue(repository, tmp_path, max_delay=0, retry_window=0.1) as queue:
+        queue.capture(fragment)
+        assert not queue.flush()
+        with pytest.raises(StorageError, match="repeated commit failures"):
+            queue.capture(make_fragments(document, 1)[0])
+
+    monkeypatch.undo()
+    with CaptureQueue(repository, tmp_path):
+        pass
+    assert repository.get_fragment(fragment.id) is not None
+
+
+def test_flush_requires_a_running_queue(repository):
+    """flush() without start() is a usage error, not a silent no-op."""
+    with pytest.raises(StorageError):
+        CaptureQueue(repository).flush()
+
+
+def test_queue_reports_capture_and_flush_latency(repository, document):
+    """Both the capture path and batch commits are timed."""
+    with CaptureQueue(repository, max_batch=1000, max_delay=60) as queue:
+        for fragment in make_fragments(document, 20):
+            queue.capture(fragment)
+        queue.flush(timeout=5)
+        latency = queue.latency()
+
+    assert latency["capture"].count == 20
+    assert latency["flush"].count == 1
+    assert 0 < latency["capture"].p50 <= latency["capture"].p99
+
+
+def test_latency_recorder_percentiles():
+    """Nearest-rank percentiles over a bounded window."""
+    recorder = LatencyRecorder(window=100)
+    for value in range(1, 201):
+        recorder.record(value / 1000)
+
+    summary = recorder.summary()
+    assert summary.count == 200
+    assert summary.p50 == pytest.approx(0.150)
+    assert summary.p99 == pytest.approx(0.199)
+    assert summary.max == pytest.approx(0.200)
+
+    recorder.reset()
+    assert recorder.summary().count == 0
+    assert recorder.percentile(50) == 0.0
@@ -0,0 +1,175 @@
+"""Tests for the buffer service, the Unix-socket daemon and its CLI client."""
+
+from __future__ import annotations
+
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from uuid import UUID, uuid4
+
+import pytest
+from click.testing import CliRunner
+
+from branch.capture import CaptureQueue
+from branch.cli import main
+from branch.daemon import DaemonClient, DaemonServer, DaemonUnavailable, RequestError
+from branch.service import BranchService
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to ~100 bytes, too short for tmp_path.
+    directory = Path(tempfile.mkdtemp(prefix="branch-"))
+    yield directory / "branch.sock"
+    shutil.rmtree(directory)
+
+
+@pytest.fixture
+def service(repository):
+    queue = CaptureQueue(repository, max_delay=0.01).start()
+    service = BranchService(repository, queue)
+    yield service
+    queue.close()
+
+
+@pytest.fixture
+def server(service, socket_path):
+    server = DaemonServer(socket_path, service.handle)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_service_capture_list_search_review(service):
+    first = service.capture("Compare with Kuhn", page_number=3, selected_text="shift")
+    service.capture("Unrelated thought")
+
+    listed = service.handle("list", {"limit": 10})
+    assert [fragment["content"] for fragment in listed] == [
+        "Unrelated thought",
+        "Compare with Kuhn",
+    ]
+    assert listed[1]["anchor"]["page_number"] == 3
+
+    hits = service.handle("search", {"query": "kuhn"})
+    assert [hit["fragment"]["id"] for hit in hits] == [first["id"]]
+    assert hits[0]["snippet"] == "Compare with [Kuhn]"
+
+    assert service.handle("review", {"fragment_id": first["id"], "status": "archived"})
+    archived = service.handle("list", {"status": "archived"})
+    assert [fragment["id"] for fragment in archived] == [first["id"]]
+
+
+@pytest.mark.parametrize(
+    ("op", "args", "message"),
+    [
+        ("explode", {}, "Unknown operation"),
+        ("capture", {"content": "  "}, "Nothing to capture"),
+        ("capture", {"text": "x"}, "Invalid arguments"),
+        ("list", {"status": "lost"}, "not a valid FragmentStatus"),
+        ("review", {"fragment_id": "nope", "status": "reviewed"}, "badly formed"),
+    ],
+)
+def test_service_rejects_bad_requests(service, op, args, message):
+    with pytest.raises(RequestError, match=message):
+        service.handle(op, args)
+
+
+def test_capture_rejects_an_unknown_document(service, repository, sample_document):
+    with pytest.raises(RequestError, match="No document"):
+        service.handle("capture", {"content": "Lost", "document_id": str(uuid4())})
+    assert service.handle("list", {}) == []
+
+    repository.upsert_document(sample_document)
+    captured = service.handle(
+        "capture", {"content": "Kept", "document_id": str(sample_document.id)}
+    )
+    assert [fragment["id"] for fragment in service.handle("list", {})] == [
+        captured["id"]
+    ]
+
+
+def test_client_round_trip(server, socket_path):
+    client = DaemonClient(socket_path)
+
+    captured = client.call("capture", content="Over the socket")
+
+    assert client.call("ping")["version"]
+    assert client.call("list")[0]["id"] == captured["id"]
+    with pytest.raises(RequestError, match="Unknown operation"):
+        client.call("explode")
+
+
+def test_client_reports_missing_daemon(socket_path):
+    client = DaemonClient(socket_path)
+    with pytest.raises(DaemonUnavailable):
+        client.call("ping")
+    assert not client.is_running()
+
+
+def test_second_server_refuses_a_live_socket(server, service, socket_path):
+    with pytest.raises(RequestError, match="already running"):
+        DaemonServer(socket_path, service.handle)
+
+
+def test_stale_socket_file_is_replaced(service, socket_path):
+    DaemonServer(socket_path, service.handle).socket.close()
+    assert socket_path.exists()
+
+    server = DaemonServer(socket_path, service.handle)
+    server.server_close()
+
+    assert not socket_path.exists()
+
+
+def test_shutdown_request_stops_the_server(service, socket_path):
+    server = DaemonServer(socket_path, service.handle)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    DaemonClient(socket_path).call("shutdown")
+    thread.join(timeout=5)
+    server.server_close()
+
+    assert not thread.is_alive()
+
+
+def test_cli_uses_running_daemon(server, socket_path, repository):
+    runner = CliRunner()
+    options = ["--socket", str(socket_path)]
+
+    result = runner.invoke(main, ["capture", *options], input="Piped from an editor\n")
+    assert result.exit_code == 0, result.output
+    fragment_id = result.output.strip()
+
+    listed = runner.invoke(main, ["list", *options])
+    assert fragment_id in listed.output
+    assert "Piped from an editor" in listed.output
+
+    reviewed = runner.invoke(main, ["review", fragment_id, "developed", *options])
+    assert reviewed.output.strip() == f"{fragment_id}  developed"
+    assert repository.get_fragment(UUID(fragment_id)).status.value == "developed"
+
+
+def test_cli_falls_back_to_the_database(tmp_path):
+    runner = CliRunner()
+    database = tmp_path / "branch.db"
+
+    def run(*args):
+        result = runner.invoke(main, [*args, "--database", str(database)])
+        assert result.exit_code == 0, result.output
+        return result.output
+
+    fragment_id = run("capture", "Written without a daemon").strip()
+    assert "[daemon]" in run("search", "daemon")
+    assert fragment_id in run("list", "--status", "captured")
+
+    missing = runner.invoke(
+        main, ["list", "--document", "nope", "--database", str(database)]
+    )
+    assert missing.exit_code == 1
+    assert "badly formed" in missing.output
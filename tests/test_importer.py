@@ -0,0 +1,194 @@
+"""Tests for bulk library import."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from branch.cli import main
+from branch.importer import extract_metadata, import_directory, scan_library
+from branch.models.document import DocumentType
+from branch.storage import SQLiteRepository
+
+
+def blank_pages(count):
+    return [[] for _ in range(count)]
+
+
+@pytest.fixture
+def library(tmp_path, pdf_factory):
+    root = tmp_path / "library"
+    (root / "papers" / "2024").mkdir(parents=True)
+    (root / ".hidden").mkdir()
+    pdf_factory(
+        root / "papers" / "attention.pdf",
+        blank_pages(3),
+        title="Attention",
+        author="Vaswani",
+    )
+    pdf_factory(root / "papers" / "2024" / "untitled.pdf", blank_pages(2))
+    (root / "notes.md").write_text(
+        "---\ntitle: Reading Notes\nauthor: Me\n---\n# Heading\n", encoding="utf-8"
+    )
+    (root / "essay.html").write_text(
+        '<html><head><title>On &amp; Off</title><meta name="author" '
+        'content="Ada"></head></html>',
+        encoding="utf-8",
+    )
+    (root / "plain.txt").write_text("just text", encoding="utf-8")
+    (root / "image.png").write_bytes(b"\x89PNG")
+    (root / ".hidden" / "secret.txt").write_text("skip me", encoding="utf-8")
+    return root
+
+
+def documents_by_title(repository):
+    rows = repository.connection.execute("SELECT id FROM documents").fetchall()
+    documents = [repository.get_document(row[0]) for row in rows]
+    return {document.title: document for document in documents}
+
+
+def test_scan_skips_hidden_and_unsupported_files(library):
+    names = sorted(Path(path).name for path, _, _ in scan_library(library))
+    assert names == [
+        "attention.pdf",
+        "essay.html",
+        "notes.md",
+        "plain.txt",
+        "untitled.pdf",
+    ]
+
+
+def test_extract_metadata_per_format(library):
+    pdf = extract_metadata(str(library / "papers" / "attention.pdf"))
+    assert (pdf.title, pdf.author, pdf.page_count) == ("Attention", "Vaswani", 3)
+
+    markdown = extract_metadata(str(library / "notes.md"))
+    assert (markdown.title, markdown.author) == ("Reading Notes", "Me")
+
+    page = extract_metadata(str(library / "essay.html"))
+    assert (page.title, page.author) == ("On & Off", "Ada")
+
+
+def test_import_directory_stores_documents(repository, library):
+    report = import_directory(repository, library, workers=1)
+
+    assert (report.scanned, report.imported, report.skipped) == (5, 5, 0)
+    documents = documents_by_title(repository)
+    assert documents["Attention"].page_count == 3
+    assert documents["Attention"].author == "Vaswani"
+    assert documents["untitled"].page_count == 2
+    assert documents["plain"].document_type == DocumentType.TEXT
+    assert documents["On & Off"].document_type == DocumentType.HTML
+
+
+def test_reimport_skips_unchanged_and_refreshes_changed(
+    repository, library, pdf_factory
+):
+    import_directory(repository, library, workers=1)
+    attention = documents_by_title(repository)["Attention"]
+    attention.update_progress(2)
+    repository.upsert_document(attention)
+
+    path = library / "papers" / "attention.pdf"
+    pdf_factory(path, blank_pages(4), title="Attention Revised", author="Vaswani")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    report = import_directory(repository, library, workers=1)
+
+    assert (report.imported, report.skipped) == (1, 4)
+    revised = repository.get_document(attention.id)
+    assert revised.title == "Attention Revised"
+    assert revised.page_count == 4
+    assert revised.last_page == 2
+
+
+def test_reimport_fetches_changed_documents_per_batch(
+    repository, library, pdf_factory, monkeypatch
+):
+    import_directory(repository, library, workers=1)
+    untitled = documents_by_title(repository)["untitled"]
+    untitled.update_progress(2)
+    repository.upsert_document(untitled)
+
+    for path in library.rglob("*.pdf"):
+        pdf_factory(path, blank_pages(1))
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    batches = []
+    get_documents = repository.get_documents
+
+    def counted(document_ids):
+        batches.append(list(document_ids))
+        return get_documents(batches[-1])
+
+    def no_point_lookups(document_id):
+        raise AssertionError(document_id)
+
+    monkeypatch.setattr(repository, "get_documents", counted)
+    monkeypatch.setattr(repository, "get_document", no_point_lookups)
+    report = import_directory(repository, library, workers=1)
+    monkeypatch.undo()
+
+    assert report.imported == 2
+    assert [len(ids) for ids in batches] == [2]
+    shrunk = repository.get_document(untitled.id)
+    assert (shrunk.page_count, shrunk.last_page, shrunk.read_percentage) == (
+        1,
+        1,
+        100.0,
+    )
+
+
+def test_unreadable_files_are_reported_not_raised(repository, tmp_path):
+    (tmp_path / "broken.pdf").write_bytes(b"not a pdf")
+    (tmp_path / "fine.txt").write_text("ok", encoding="utf-8")
+
+    report = import_directory(repository, tmp_path, workers=1)
+
+    assert report.imported == 1
+    assert [Path(f.path).name for f in report.failed] == ["broken.pdf"]
+
+
+def test_import_streams_in_batches_through_an_executor(repository, tmp_path):
+    for number in range(25):
+        (tmp_path / f"note-{number:02d}.md").write_text(
+            f"# Note {number}\n", encoding="utf-8"
+        )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        report = import_directory(
+            repository, tmp_path, batch_size=10, executor=executor
+        )
+
+    assert report.imported == 25
+    assert len(documents_by_title(repository)) == 25
+
+
+def test_import_command(library, tmp_path):
+    database = tmp_path / "branch.db"
+    runner = CliRunner()
+
+    result = runner.invoke(main, ["import", str(library), "--database", database])
+    assert result.exit_code == 0, result.output
+    assert "5 imported" in result.output
+
+    result = runner.invoke(main, ["import", str(library), "--database", database])
+    assert "5 unchanged" in result.output
+
+    with SQLiteRepository.open(database) as repository:
+        assert len(repository.get_file_stamps()) == 5
+
+
+def test_large_imports_use_a_process_pool(repository, tmp_path):
+    for number in range(70):
+        (tmp_path / f"page-{number:02d}.txt").write_text("text", encoding="utf-8")
+
+    report = import_directory(repository, tmp_path, workers=2)
+
+    assert report.imported == 70
+    assert not report.failed
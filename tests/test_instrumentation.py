@@ -0,0 +1,159 @@
+"""Tests for profiling spans, SQL timing, counters and exporters."""
+
+from __future__ import annotations
+
+import json
+import logging
+
+import pytest
+
+from branch import instrumentation
+from branch.capture import CaptureQueue
+from branch.config import Config
+from branch.instrumentation import (
+    NOOP,
+    JSONLExporter,
+    PrometheusExporter,
+    Recorder,
+    TracedConnection,
+    current,
+    install,
+    traced,
+    uninstall,
+)
+from branch.models import Document, IdeaFragment
+from branch.storage import SQLiteRepository
+
+
+@pytest.fixture
+def recorder():
+    installed = install(Recorder(slow_query_ms=1_000))
+    yield installed
+    uninstall()
+
+
+def test_noop_is_the_default():
+    assert current() is NOOP
+    assert not NOOP.enabled
+
+
+def test_disabled_connections_are_not_traced(repository):
+    assert type(repository.connection) is not TracedConnection
+
+
+def test_traced_records_spans_only_when_enabled():
+    calls = []
+    wrapped = traced("work")(lambda x: calls.append(x) or x * 2)
+
+    assert wrapped(2) == 4
+    recorder = install(Recorder())
+    try:
+        assert wrapped(3) == 6
+    finally:
+        uninstall()
+
+    assert calls == [2, 3]
+    assert recorder.snapshot()["spans"]["work"]["count"] == 1
+
+
+def test_traced_generator_records_one_span_per_iteration(recorder):
+    @traced("items")
+    def items(n):
+        yield from range(n)
+
+    assert list(items(3)) == [0, 1, 2]
+    assert next(items(5)) == 0  # abandoned early, span recorded on close
+
+    assert recorder.snapshot()["spans"]["items"]["count"] == 2
+
+
+def test_repository_calls_and_statements_are_recorded(recorder):
+    with SQLiteRepository.open(":memory:") as repo:
+        assert isinstance(repo.connection, TracedConnection)
+        document = Document(title="Paper")
+        repo.upsert_document(document)
+        repo.upsert_fragment(IdeaFragment(content="idea", document_id=document.id))
+        assert len(repo.list_fragments_for_document(document.id)) == 1
+
+    snapshot = recorder.snapshot()
+    assert snapshot["spans"]["repository.upsert_document"]["count"] == 1
+    assert snapshot["spans"]["repository.iter_fragments"]["count"] == 1
+    statements = snapshot["statements"]
+    assert any(sql.startswith("INSERT INTO idea_fragments") for sql in statements)
+    assert all("\n" not in sql for sql in statements)
+
+
+def test_slow_statements_are_logged(caplog):
+    install(Recorder(slow_query_ms=0))
+    try:
+        with caplog.at_level(logging.WARNING, logger="branch.sql"):
+            SQLiteRepository.open(":memory:").close()
+    finally:
+        uninstall()
+
+    assert any("Slow query" in record.message for record in caplog.records)
+
+
+def test_capture_counters_and_rates(recorder, repository):
+    with CaptureQueue(repository, max_delay=0) as queue:
+        for index in range(3):
+            queue.capture(IdeaFragment(content=f"idea {index}"))
+        queue.flush(5)
+
+    counters = recorder.snapshot()["counters"]
+    assert counters["captures"]["total"] == 3
+    assert counters["captures"]["per_second"] > 0
+    assert counters["captures_committed"]["total"] == 3
+    # Rates are measured since the previous snapshot.
+    assert recorder.snapshot()["counters"]["captures"]["per_second"] == 0
+
+
+def test_jsonl_exporter_appends_snapshots(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    recorder = Recorder(exporters=[JSONLExporter(path)])
+    recorder.count("captures", 2)
+    recorder.export()
+    recorder.close()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["counters"]["captures"]["total"] == 2
+
+
+def test_prometheus_exporter_writes_text_format(tmp_path):
+    path = tmp_path / "metrics.prom"
+    recorder = Recorder(exporters=[PrometheusExporter(path)])
+    recorder.span("repository.get_fragment", 0.002)
+    recorder.statement('SELECT "x"\n  FROM t', 0.001)
+    recorder.count("captures")
+    recorder.close()
+
+    text = path.read_text()
+    assert "# TYPE branch_span_seconds summary" in text
+    assert 'branch_span_seconds_count{name="repository.get_fragment"} 1' in text
+    assert 'sql="SELECT \\"x\\" FROM t",quantile="0.99"' in text
+    assert "branch_captures_total 1" in text
+    assert list(tmp_path.iterdir()) == [path]
+
+
+@pytest.mark.parametrize(
+    ("mode", "exporter"),
+    [("jsonl", JSONLExporter), ("prometheus", PrometheusExporter)],
+)
+def test_from_config_builds_exporters(monkeypatch, tmp_path, mode, exporter):
+    monkeypatch.setattr(Config, "INSTRUMENTATION", mode)
+    monkeypatch.setattr(Config, "DATA_DIR", tmp_path)
+    built = instrumentation.from_config()
+    try:
+        assert isinstance(built, Recorder)
+        assert isinstance(built.exporters[0], exporter)
+    finally:
+        built.close()
+
+
+def test_from_config_off_and_unknown(monkeypatch):
+    monkeypatch.setattr(Config, "INSTRUMENTATION", "off")
+    assert instrumentation.from_config() is NOOP
+    monkeypatch.setattr(Config, "INSTRUMENTATION", "statsd")
+    with pytest.raises(ValueError, match="statsd"):
+        instrumentation.from_config()
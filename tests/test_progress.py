@@ -0,0 +1,120 @@
+"""Tests for debounced reading-progress persistence."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from branch.models import Document
+from branch.reader import ProgressTracker
+from branch.storage import CachedRepository, StorageError
+
+
+@pytest.fixture
+def document(repository):
+    document = Document(title="Long PDF", page_count=500)
+    repository.upsert_document(document)
+    return document
+
+
+def test_fast_scroll_is_written_a_few_times(repository, document):
+    with ProgressTracker(repository, idle=0.2, max_delay=5) as tracker:
+        for page in range(1, 501):
+            tracker.page_turned(document, page)
+        assert document.last_page == 500
+        assert tracker.flush(timeout=5)
+
+    stored = repository.get_document(document.id)
+    assert (stored.last_page, stored.read_percentage) == (500, 100.0)
+    assert stored.last_opened_at == document.last_opened_at
+    assert tracker.turns == 500
+    assert tracker.writes <= 2
+
+
+def test_progress_is_written_once_turns_pause(repository, document):
+    with ProgressTracker(repository, idle=0.02, max_delay=5) as tracker:
+        tracker.page_turned(document, 42)
+        deadline = time.monotonic() + 5
+        while tracker.writes == 0 and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+        assert repository.get_document(document.id).last_page == 42
+
+
+def test_steady_scroll_is_written_by_max_delay(repository, document):
+    with ProgressTracker(repository, idle=10, max_delay=0.05) as tracker:
+        for page in range(1, 40):
+            tracker.page_turned(document, page)
+            time.sleep(0.005)
+        assert tracker.writes >= 1
+
+
+def test_narrow_update_keeps_other_columns(repository, document):
+    renamed = document.model_copy(update={"title": "Renamed elsewhere"})
+    repository.upsert_document(renamed)
+
+    with ProgressTracker(repository, idle=0) as tracker:
+        tracker.page_turned(document, 7)
+
+    stored = repository.get_document(document.id)
+    assert (stored.title, stored.last_page) == ("Renamed elsewhere", 7)
+
+
+def test_cached_repository_sees_new_progress(repository, document):
+    cached = CachedRepository(repository)
+    assert cached.get_document(document.id).last_page == 1
+
+    with ProgressTracker(cached, idle=0) as tracker:
+        tracker.page_turned(document, 3)
+
+    assert cached.get_document(document.id).last_page == 3
+
+
+def test_page_past_the_end_does_not_fail_the_batch(repository):
+    short = Document(title="Short", page_count=10)
+    stale = Document(title="Stale page count", page_count=10)
+    for document in (short, stale):
+        repository.upsert_document(document)
+
+    with ProgressTracker(repository, idle=10) as tracker:
+        tracker.page_turned(short, 5)
+        tracker.page_turned(stale, 11)
+        with pytest.raises(ValueError, match="start at 1"):
+            tracker.page_turned(short, 0)
+
+    assert tracker.writes == 1
+    assert repository.get_document(short.id).last_page == 5
+    stored = repository.get_document(stale.id)
+    assert (stored.last_page, stored.read_percentage) == (11, 100.0)
+
+
+class FlakyRepository:
+    """Fail the first progress write, then delegate."""
+
+    def __init__(self, repository):
+        self._repository = repository
+        self.failures = 1
+
+    def update_document_progress(self, changes):
+        if self.failures:
+            self.failures -= 1
+            msg = "database is locked"
+            raise StorageError(msg)
+        self._repository.update_document_progress(changes)
+
+
+def test_failed_write_is_retried(repository, document):
+    flaky = FlakyRepository(repository)
+
+    with ProgressTracker(flaky, idle=0, max_delay=0.01) as tracker:
+        tracker.page_turned(document, 9)
+        assert tracker.flush(timeout=5)
+
+    assert flaky.failures == 0
+    assert repository.get_document(document.id).last_page == 9
+
+
+def test_flush_requires_a_running_tracker(repository):
+    with pytest.raises(StorageError, match="not running"):
+        ProgressTracker(repository).flush()
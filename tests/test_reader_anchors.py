@@ -0,0 +1,138 @@
+"""Tests for the offset-to-coordinate anchor index and re-anchoring."""
+
+from __future__ import annotations
+
+import pytest
+
+from branch.models.idea_fragment import TextAnchor
+from branch.reader import AnchorIndex, PageCache, PDFReader
+
+
+PAGES = [
+    ["Reading without interruption", "keeps ideas flowing freely"],
+    ["Capture the thought, defer the work", "and return to the page"],
+    ["Entropy measures surprise", "in a message source"],
+]
+
+
+@pytest.fixture
+def reader(tmp_path, pdf_factory):
+    path = pdf_factory(tmp_path / "book.pdf", PAGES)
+    with PDFReader(path, PageCache(tmp_path / "cache")) as reader:
+        yield reader
+
+
+def anchor_for(index, page_number, selected):
+    start = index.page_text(page_number).index(selected)
+    return TextAnchor(
+        page_number=page_number,
+        start_position=start,
+        end_position=start + len(selected),
+        selected_text=selected,
+    )
+
+
+def test_rects_follow_character_boxes(reader):
+    """A single-line selection maps to one rectangle around its glyphs."""
+    index = reader.anchor_index()
+    page = reader.page(2)
+    start = page.text.index("defer")
+
+    (rect,) = index.rects(2, start, start + len("defer"))
+
+    assert rect[0] == pytest.approx(page.char_box(start)[0])
+    assert rect[2] == pytest.approx(page.char_box(start + 4)[2])
+    assert rect[1] < rect[3]
+
+
+def test_multi_line_selection_gets_one_rect_per_line(reader):
+    index = reader.anchor_index()
+    text = index.page_text(1)
+    start = text.index("interruption")
+    end = text.index("ideas") + len("ideas")
+
+    rects = index.rects(1, start, end)
+
+    assert len(rects) == 2
+    assert rects[0][3] <= rects[1][1] + 1
+
+
+def test_exact_and_offset_only_resolution(reader):
+    index = reader.anchor_index()
+    anchor = anchor_for(index, 3, "measures surprise")
+
+    resolved = index.resolve(anchor)
+    assert resolved.method == "exact"
+    assert not resolved.moved
+    assert len(resolved.rects) == 1
+
+    bare = TextAnchor(page_number=3, start_position=0, end_position=7)
+    assert index.resolve(bare).method == "offsets"
+
+
+def test_drifted_offsets_are_re_anchored_by_search(reader):
+    """Stale offsets fall back to the selected text, on any page."""
+    index = reader.anchor_index()
+    anchor = TextAnchor(
+        page_number=1,
+        start_position=3,
+        end_position=12,
+        selected_text="return  to the\npage",
+    )
+
+    resolved = index.resolve(anchor)
+
+    assert resolved.method == "search"
+    assert resolved.moved
+    assert resolved.page_number == 2
+    repaired = resolved.to_anchor()
+    assert repaired.selected_text == anchor.selected_text
+    again = index.resolve(repaired)
+    assert (again.page_number, again.start, again.end) == (
+        resolved.page_number,
+        resolved.start,
+        resolved.end,
+    )
+    text = index.page_text(2)
+    assert text[repaired.start_position : repaired.end_position] == (
+        "return to the page"
+    )
+
+
+def test_fuzzy_mode_tolerates_edited_text(reader):
+    index = reader.anchor_index()
+    anchor = TextAnchor(
+        page_number=3, start_position=500, selected_text="Entropy measure surprise"
+    )
+
+    assert index.resolve(anchor, fuzzy=False) is None
+    resolved = index.resolve(anchor)
+    assert resolved.method == "fuzzy"
+    assert resolved.page_number == 3
+    assert resolved.score >= 0.8
+    assert index.resolve(TextAnchor(selected_text="zzzz qqqq xxxx")) is None
+
+
+def test_index_round_trips_through_bytes(reader):
+    index = reader.anchor_index()
+    loaded = AnchorIndex.from_bytes(index.to_bytes())
+
+    assert loaded.page_count == 3
+    assert [loaded.page_text(n) for n in (1, 2, 3)] == [
+        index.page_text(n) for n in (1, 2, 3)
+    ]
+    assert loaded.rects(2, 0, 10) == index.rects(2, 0, 10)
+    with pytest.raises(ValueError, match="truncated"):
+        AnchorIndex.from_bytes(index.to_bytes()[:30])
+
+
+def test_reader_caches_the_index_on_disk(reader, tmp_path, monkeypatch):
+    reader.anchor_index()
+
+    def fail(*_args):
+        pytest.fail("anchor index was rebuilt")
+
+    monkeypatch.setattr(AnchorIndex, "from_pages", fail)
+    with PDFReader(reader.path, PageCache(tmp_path / "cache")) as reopened:
+        assert reopened.anchor_index().page_count == 3
+        assert reopened.extracted == 0
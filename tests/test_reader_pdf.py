@@ -0,0 +1,113 @@
+"""Tests for lazy PDF extraction and the persistent page cache."""
+
+from __future__ import annotations
+
+import pytest
+
+from branch.models import Document
+from branch.reader import PageCache, PDFReader
+
+
+@pytest.fixture
+def pdf_path(tmp_path, pdf_factory):
+    pages = [[f"Page {n} opening line", f"Page {n} second line"] for n in range(1, 6)]
+    return pdf_factory(tmp_path / "book.pdf", pages)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PageCache(tmp_path / "cache")
+
+
+def test_page_text_has_character_boxes(pdf_path, cache):
+    """Every text character maps to a box inside the page."""
+    with PDFReader(pdf_path, cache) as reader:
+        page = reader.page(2)
+
+    assert "Page 2 opening line" in page.text
+    assert "Page 2 second line" in page.text
+    assert len(page.char_boxes) == 4 * len(page.text)
+
+    offset = page.text.index("opening")
+    x0, y0, x1, y1 = page.char_box(offset)
+    assert 0 <= x0 < x1 <= page.width
+    assert 0 <= y0 < y1 <= page.height
+    assert page.char_box(page.text.index("\n")) is None
+    assert page.span_at(offset).start <= offset < page.span_at(offset).end
+
+
+def test_pages_are_extracted_lazily(pdf_path, cache):
+    """Only the requested pages are extracted; repeats hit memory."""
+    with PDFReader(pdf_path, cache) as reader:
+        reader.page(3)
+        reader.page(3)
+        assert reader.extracted == 1
+        assert (reader.digest, 3) in cache
+        assert (reader.digest, 4) not in cache
+
+
+def test_reopening_is_served_from_the_disk_cache(pdf_path, cache, monkeypatch):
+    """A second reader never calls the extractor for cached pages."""
+    with PDFReader(pdf_path, cache) as reader:
+        first = list(reader.pages())
+
+    def fail(*_args):
+        pytest.fail("page was re-extracted")
+
+    monkeypatch.setattr("branch.reader.pdf.extract_page", fail)
+    with PDFReader(pdf_path, PageCache(cache.root)) as reader:
+        second = list(reader.pages())
+        assert reader.extracted == 0
+
+    assert [p.text for p in second] == [p.text for p in first]
+    assert [p.spans for p in second] == [p.spans for p in first]
+    assert [p.char_boxes for p in second] == [p.char_boxes for p in first]
+
+
+def test_cache_key_includes_extractor_version(pdf_path, cache):
+    """A new extractor version does not reuse old entries."""
+    with PDFReader(pdf_path, cache) as reader:
+        reader.page(1)
+
+    with PDFReader(pdf_path, PageCache(cache.root, version=2)) as reader:
+        reader.page(1)
+        assert reader.extracted == 1
+
+
+def test_changed_file_gets_a_new_hash(tmp_path, cache, pdf_factory):
+    """Rewriting the PDF invalidates its cached pages."""
+    path = pdf_factory(tmp_path / "draft.pdf", [["First draft"]])
+    with PDFReader(path, cache) as reader:
+        old_digest = reader.digest
+        assert "First draft" in reader.page(1).text
+
+    pdf_factory(path, [["Second draft"]])
+    with PDFReader(path, cache) as reader:
+        assert reader.digest != old_digest
+        assert "Second draft" in reader.page(1).text
+
+
+def test_corrupt_entry_is_re_extracted(pdf_path, cache):
+    """An unreadable cache file is dropped instead of raising."""
+    with PDFReader(pdf_path, cache) as reader:
+        reader.page(1)
+        digest = reader.digest
+
+    entry = cache.root / f"v{cache.version}" / digest / "00001.json"
+    entry.write_text("{not json", encoding="utf-8")
+
+    with PDFReader(pdf_path, cache) as reader:
+        assert "Page 1" in reader.page(1).text
+        assert reader.extracted == 1
+
+
+def test_update_document_sets_page_count(pdf_path, cache):
+    """page_count comes from the PDF without extracting any page."""
+    document = Document.from_file(pdf_path)
+    with PDFReader(pdf_path, cache) as reader:
+        reader.update_document(document)
+        assert reader.extracted == 0
+        with pytest.raises(IndexError):
+            reader.page(6)
+
+    assert document.page_count == 5
@@ -0,0 +1,122 @@
+"""Tests for page rendering, the pixmap cache and prefetch."""
+
+from __future__ import annotations
+
+import pytest
+
+from branch.reader import PageRenderer, PixmapCache, RenderedPage
+
+
+@pytest.fixture
+def pdf_path(tmp_path, pdf_factory):
+    pages = [[f"Page {number}"] for number in range(1, 9)]
+    return pdf_factory(tmp_path / "book.pdf", pages, page_size=(200, 100))
+
+
+def fake_page(page_number, zoom=1.0, size=100):
+    return RenderedPage(page_number, zoom, 10, 10, 30, bytes(size))
+
+
+def test_render_returns_pixels_at_zoom(pdf_path):
+    with PageRenderer(pdf_path, prefetch=0) as renderer:
+        normal = renderer.page(1)
+        zoomed = renderer.page(1, zoom=2.0)
+
+    assert (normal.width, normal.height) == (200, 100)
+    assert (zoomed.width, zoomed.height) == (400, 200)
+    assert normal.nbytes == normal.stride * normal.height
+
+
+def test_neighbours_are_prefetched(pdf_path):
+    """After serving a page, the next and previous pages are rendered ahead."""
+    with PageRenderer(pdf_path, prefetch=2) as renderer:
+        renderer.page(4)
+        assert renderer.wait_idle(timeout=5)
+        cached = [n for n in range(1, 9) if (n, 1.0) in renderer.cache]
+        assert cached == [2, 3, 4, 5, 6]
+
+        renderer.page(5)
+        renderer.page(3)
+        assert renderer.wait_idle(timeout=5)
+        stats = renderer.stats()
+
+    assert (stats.hits, stats.misses) == (2, 1)
+    assert stats.hit_rate == pytest.approx(2 / 3)
+    assert stats.prefetched >= 4
+    assert stats.latency.count == 1 + stats.prefetched
+    assert (4, 1.0) in renderer.page_latency
+
+
+def test_prefetch_survives_a_failing_page(pdf_path, monkeypatch):
+    """A page that fails to render is skipped; prefetch keeps working."""
+    with PageRenderer(pdf_path, prefetch=1) as renderer:
+        render = renderer._render
+
+        def broken_page_five(page_number, zoom):
+            if page_number == 5:
+                msg = "corrupt page"
+                raise RuntimeError(msg)
+            return render(page_number, zoom)
+
+        monkeypatch.setattr(renderer, "_render", broken_page_five)
+        renderer.page(4)
+        assert renderer.wait_idle(timeout=5)
+
+        renderer.page(7)
+        assert renderer.wait_idle(timeout=5)
+        cached = [n for n in range(1, 9) if (n, 1.0) in renderer.cache]
+
+    assert cached == [3, 4, 6, 7, 8]
+
+
+def test_page_latency_is_bounded(pdf_path, monkeypatch):
+    monkeypatch.setattr("branch.reader.render.PAGE_LATENCY_ENTRIES", 3)
+    with PageRenderer(pdf_path, prefetch=0) as renderer:
+        for number in range(1, 9):
+            renderer.page(number)
+
+    assert list(renderer.page_latency) == [(6, 1.0), (7, 1.0), (8, 1.0)]
+
+
+def test_cache_evicts_least_recent_over_budget():
+    cache = PixmapCache(budget_bytes=250)
+    for number in (1, 2, 3):
+        cache.put(fake_page(number))
+    assert cache.get(1, 1.0) is None
+    assert cache.get(2, 1.0) is not None
+
+    cache.put(fake_page(4))
+
+    assert (3, 1.0) not in cache
+    assert (2, 1.0) in cache
+    assert cache.nbytes == 200
+    assert cache.evictions == 2
+
+
+def test_each_zoom_level_has_its_own_budget():
+    cache = PixmapCache(budget_bytes=200, max_zoom_levels=2)
+    cache.put(fake_page(1, zoom=1.0))
+    cache.put(fake_page(2, zoom=1.0))
+    cache.put(fake_page(1, zoom=2.0))
+    cache.put(fake_page(2, zoom=2.0))
+
+    assert cache.nbytes == 400
+    assert cache.evictions == 0
+
+    cache.get(1, 2.0)
+    cache.put(fake_page(1, zoom=3.0))
+
+    assert (1, 1.0) not in cache
+    assert (1, 2.0) in cache
+    assert (1, 3.0) in cache
+
+
+def test_oversized_pages_are_not_cached():
+    cache = PixmapCache(budget_bytes=50)
+    cache.put(fake_page(1))
+    assert cache.nbytes == 0
+
+
+def test_out_of_range_page(pdf_path):
+    with PageRenderer(pdf_path) as renderer, pytest.raises(IndexError):
+        renderer.page(9)
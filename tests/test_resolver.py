@@ -0,0 +1,204 @@
+"""Tests for batched, cached light resolution against a stub model server."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from click.testing import CliRunner
+
+from branch.ai import ResolutionCache, ResolveError, Resolver, ResolveRequest
+from branch.ai.resolver import cache_key
+from branch.cli import main
+from branch.config import Config
+from branch.models import FragmentStatus, IdeaFragment
+from branch.models.idea_fragment import TextAnchor
+from branch.storage import SQLiteRepository
+
+
+pytest.importorskip("ollama")
+
+
+class StubOllama(ThreadingHTTPServer):
+    """Answers ``/api/generate`` like Ollama, recording what it saw."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.prompts: list[str] = []
+        self.connections = 0
+        self.active = 0
+        self.peak = 0
+        self.delay = 0.0
+        self.slow_words: set[str] = set()
+        self.on_request = None
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.prompts.append(payload["prompt"])
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        if server.on_request is not None:
+            server.on_request()
+        slow = any(word in payload["prompt"] for word in server.slow_words)
+        time.sleep(2 if slow else server.delay)
+        with server.lock:
+            server.active -= 1
+        idea = payload["prompt"].rsplit("Idea: ", 1)[-1]
+        body = json.dumps({"model": payload["model"], "response": f" About {idea}. "})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    stub = StubOllama()
+    thread = threading.Thread(target=stub.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    resolution_cache = ResolutionCache(tmp_path / "cache.db")
+    yield resolution_cache
+    resolution_cache.close()
+
+
+def run(server, cache, requests, **options):
+    async def batch():
+        async with Resolver("stub", server.url, cache, **options) as resolver:
+            return await resolver.resolve_many(requests)
+
+    return asyncio.run(batch())
+
+
+def test_batch_runs_under_the_concurrency_cap_on_reused_connections(server, cache):
+    server.delay = 0.02
+    requests = [ResolveRequest(f"idea {number}") for number in range(24)]
+
+    results = run(server, cache, requests, concurrency=3)
+
+    assert [result.text for result in results] == [
+        f"About idea {n}." for n in range(24)
+    ]
+    assert server.peak <= 3
+    assert server.connections <= 3
+
+
+def test_repeated_and_near_duplicate_questions_hit_the_cache(server, cache):
+    run(server, cache, [ResolveRequest("What is entropy?", "a passage")])
+
+    results = run(
+        server,
+        cache,
+        [
+            ResolveRequest("what is   ENTROPY", "A passage."),
+            ResolveRequest("What is entropy?", "another passage"),
+        ],
+    )
+
+    assert [result.cached for result in results] == [True, False]
+    assert len(server.prompts) == 2
+    assert len(cache) == 2
+
+
+def test_identical_requests_in_one_batch_share_a_call(server, cache):
+    server.delay = 0.05
+    results = run(server, cache, [ResolveRequest("Same idea")] * 10)
+
+    assert len(server.prompts) == 1
+    assert sum(not result.cached for result in results) == 1
+
+
+def test_deadline_bounds_a_batch_with_a_stuck_request(server, cache):
+    server.slow_words = {"stuck"}
+    requests = [ResolveRequest("stuck idea"), ResolveRequest("quick idea")]
+    started = time.perf_counter()
+
+    stuck, quick = run(server, cache, requests, timeout=0.5)
+
+    assert time.perf_counter() - started < 2
+    assert isinstance(stuck, ResolveError)
+    assert quick.text == "About quick idea."
+    assert cache.get(cache_key("stub", "stuck idea", None)) is None
+
+
+def test_unreachable_server_is_a_resolve_error(cache):
+    async def attempt():
+        async with Resolver("stub", "http://127.0.0.1:9", cache) as resolver:
+            await resolver.resolve("idea")
+
+    with pytest.raises(ResolveError, match="Cannot reach"):
+        asyncio.run(attempt())
+
+
+def test_resolve_fragments_adds_notes(server, cache):
+    fragments = [
+        IdeaFragment(content="Why log base 2", anchor=TextAnchor(selected_text="bits")),
+        IdeaFragment(content="Second thought"),
+    ]
+
+    async def resolve():
+        async with Resolver("stub", server.url, cache) as resolver:
+            return await resolver.resolve_fragments(fragments)
+
+    assert asyncio.run(resolve()) == fragments
+    assert fragments[0].resolution_note == "About Why log base 2."
+    assert fragments[0].updated_at is not None
+    assert 'reading: "bits"' in server.prompts[0]
+
+
+def test_resolve_command_stores_notes(server, tmp_path, monkeypatch):
+    database = tmp_path / "branch.db"
+    fragment = IdeaFragment(content="Is entropy additive")
+    with SQLiteRepository.open(database) as repo:
+        repo.upsert_fragment(fragment)
+    monkeypatch.setattr(Config, "OLLAMA_API_URL", server.url)
+    monkeypatch.setattr(Config, "RESOLVE_CACHE_PATH", tmp_path / "cache.db")
+
+    def review_meanwhile():
+        with SQLiteRepository.open(database) as repo:
+            repo.update_fragment_statuses(
+                [(fragment.id, FragmentStatus.REVIEWED, fragment.captured_at)]
+            )
+
+    server.on_request = review_meanwhile
+    result = CliRunner().invoke(
+        main, ["resolve", str(fragment.id), "--database", str(database)]
+    )
+
+    assert result.exit_code == 0, result.output
+    with SQLiteRepository.open(database) as repo:
+        stored = repo.get_fragment(fragment.id)
+    assert stored.resolution_note == "About Is entropy additive."
+    assert stored.status == FragmentStatus.REVIEWED
@@ -0,0 +1,192 @@
+"""Tests for the embedders and the incremental semantic fragment index."""
+
+from __future__ import annotations
+
+import math
+
+import pytest
+from click.testing import CliRunner
+
+from branch.ai import HashEmbedder, SemanticIndex, semantic_index
+from branch.ai.semantic_index import fragment_text
+from branch.cli import main
+from branch.models import IdeaFragment
+from branch.models.idea_fragment import TextAnchor
+from branch.storage import SQLiteRepository
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self):
+        super().__init__(dimensions=64)
+        self.embedded: list[str] = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return super().embed(texts)
+
+
+@pytest.fixture
+def embedder():
+    return CountingEmbedder()
+
+
+@pytest.fixture
+def index(tmp_path, embedder):
+    with SemanticIndex(tmp_path, embedder, batch_size=2) as semantic:
+        yield semantic
+
+
+@pytest.fixture
+def fragments(repository):
+    items = [
+        IdeaFragment(content="Entropy measures surprise in information theory"),
+        IdeaFragment(content="Shannon entropy and surprise of a message"),
+        IdeaFragment(content="Sourdough bread needs a lively starter"),
+        IdeaFragment(
+            content="Bake at high heat",
+            anchor=TextAnchor(selected_text="bread crust and oven spring"),
+        ),
+    ]
+    repository.upsert_fragments_many(items)
+    return items
+
+
+def test_hash_embedder_is_normalized_and_deterministic():
+    embedder = HashEmbedder(dimensions=32)
+    first, again = (
+        embedder.embed(["Entropy and surprise"]),
+        HashEmbedder(32).embed(["Entropy and surprise"]),
+    )
+
+    assert first == again
+    assert math.isclose(sum(value * value for value in first[0]), 1.0)
+    assert embedder.embed([""]) == [[0.0] * 32]
+
+
+def test_fragment_text_includes_selected_passage():
+    assert fragment_text("idea", None) == "idea"
+    assert fragment_text("idea", "quote") == "idea\nquote"
+
+
+def test_similar_ranks_related_fragments_first(index, repository, fragments):
+    report = index.sync(repository.connection)
+
+    assert (report.embedded, report.removed, report.indexed) == (4, 0, 4)
+    hits = index.similar(fragments[0].id, limit=3)
+    assert hits[0].fragment_id == fragments[1].id
+    assert fragments[0].id not in {hit.fragment_id for hit in hits}
+    assert [hit.score for hit in hits] == sorted(
+        (hit.score for hit in hits), reverse=True
+    )
+
+
+def test_search_matches_selected_text(index, repository, fragments):
+    index.sync(repository.connection)
+
+    assert index.search("oven spring crust", limit=1)[0].fragment_id == fragments[3].id
+
+
+def test_sync_only_embeds_new_and_changed_fragments(
+    index, embedder, repository, fragments
+):
+    index.sync(repository.connection)
+    embedder.embedded.clear()
+
+    assert index.sync(repository.connection).embedded == 0
+
+    changed = fragments[2].model_copy(update={"content": "Rye bread starter"})
+    added = IdeaFragment(content="Mutual information")
+    repository.upsert_fragments_many([changed, added])
+    report = index.sync(repository.connection)
+
+    assert report.embedded == 2
+    assert sorted(embedder.embedded) == ["Mutual information", "Rye bread starter"]
+    assert len(index) == 5
+
+
+def test_deleted_fragments_free_their_slots(index, repository, fragments):
+    index.sync(repository.connection)
+    with repository.connection:
+        repository.connection.execute(
+            "DELETE FROM idea_fragments WHERE id = ?", (str(fragments[1].id),)
+        )
+
+    report = index.sync(repository.connection)
+    assert (report.removed, report.indexed) == (1, 3)
+    assert fragments[1].id not in {
+        h.fragment_id for h in index.similar(fragments[0].id)
+    }
+
+    repository.upsert_fragment(IdeaFragment(content="Entropy again"))
+    index.sync(repository.connection)
+    vectors = index.path / "vectors.f32"
+    assert vectors.stat().st_size == 4 * 64 * 4  # the freed slot was reused
+    assert len(index.similar(fragments[0].id, limit=10)) == 3
+
+
+def test_index_survives_reopening(tmp_path, embedder, repository, fragments):
+    with SemanticIndex(tmp_path, embedder) as semantic:
+        semantic.sync(repository.connection)
+    with SemanticIndex(tmp_path, embedder) as semantic:
+        assert semantic.sync(repository.connection).embedded == 0
+        assert semantic.similar(fragments[0].id)[0].fragment_id == fragments[1].id
+
+
+def test_unknown_fragment_and_dimension_mismatch(tmp_path, index, fragments):
+    with pytest.raises(LookupError):
+        index.similar(fragments[0].id)
+
+    class Wider(HashEmbedder):
+        @property
+        def name(self):
+            return "hash-64"
+
+    with pytest.raises(ValueError, match="dimensions"):
+        SemanticIndex(tmp_path, Wider(dimensions=128))
+
+
+def test_pure_python_scan_matches_numpy(index, repository, fragments, monkeypatch):
+    index.sync(repository.connection)
+    expected = [hit.fragment_id for hit in index.similar(fragments[2].id, limit=3)]
+
+    monkeypatch.setattr(semantic_index, "_numpy", lambda: None)
+
+    assert [h.fragment_id for h in index.similar(fragments[2].id, limit=3)] == expected
+
+
+def test_approximate_search_probes_clusters(index, repository, monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(semantic_index, "APPROXIMATE_MIN_ROWS", 0)
+    monkeypatch.setattr(semantic_index, "APPROXIMATE_PROBES", 1)
+    topics = ["entropy surprise signal", "bread starter oven", "chess opening gambit"]
+    items = [
+        IdeaFragment(content=f"{topic} note {number}")
+        for topic in topics
+        for number in range(30)
+    ]
+    repository.upsert_fragments_many(items)
+    index.sync(repository.connection)
+
+    hits = index.search("entropy surprise signal", limit=5, approximate=True)
+
+    assert len(hits) == 5
+    assert {hit.fragment_id for hit in hits} <= {item.id for item in items[:30]}
+
+
+def test_related_command(tmp_path):
+    database = tmp_path / "branch.db"
+    items = [
+        IdeaFragment(content="Entropy measures surprise"),
+        IdeaFragment(content="Surprise and entropy of messages"),
+        IdeaFragment(content="Sourdough starter"),
+    ]
+    with SQLiteRepository.open(database) as repo:
+        repo.upsert_fragments_many(items)
+
+    result = CliRunner().invoke(
+        main, ["related", str(items[0].id), "--limit", "1", "--database", str(database)]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith(str(items[1].id))
+    assert (tmp_path / "branch.db.vectors" / "hash-256" / "vectors.f32").exists()
@@ -0,0 +1,184 @@
+"""Tests for the checkpointing reading-session manager."""
+
+from __future__ import annotations
+
+import pytest
+
+from branch.buffer import SessionManager
+from branch.models import Document, IdeaFragment
+from branch.storage import SQLiteRepository, StorageError
+
+
+class CountingRepository(SQLiteRepository):
+    """Counts checkpoint transactions and optionally fails them."""
+
+    transactions = 0
+    fail = False
+    during_write = None
+
+    def upsert_session_and_fragments(self, session, fragments):
+        if self.during_write is not None:
+            self.during_write()
+        if self.fail:
+            msg = "disk full"
+            raise StorageError(msg)
+        self.transactions += 1
+        super().upsert_session_and_fragments(session, fragments)
+
+
+@pytest.fixture
+def repository():
+    repo = CountingRepository.open(":memory:")
+    yield repo
+    repo.close()
+
+
+@pytest.fixture
+def document(repository):
+    document = Document(title="Long read")
+    repository.upsert_document(document)
+    return document
+
+
+@pytest.fixture
+def manager(repository, tmp_path):
+    return SessionManager(repository, tmp_path / "journal", checkpoint_interval=3600)
+
+
+def test_long_session_takes_a_handful_of_transactions(manager, repository, document):
+    session = manager.start_session(document.id)
+    for page in range(1, 501):
+        if page % 100 == 0:
+            for number in range(40):
+                manager.capture(IdeaFragment(content=f"Idea {page}.{number}"))
+            manager.record_dive_deep()
+        manager.turn_page(page + 1)
+    manager.end_session()
+
+    assert repository.transactions == 7
+    stored = repository.get_session(session.id)
+    assert (stored.fragments_captured, stored.dive_deeps) == (200, 5)
+    assert stored.end_page == 501
+    assert stored.ended_at is not None
+    assert repository.count_session_fragments(session.id) == 200
+    assert manager.session is None
+
+
+def test_page_turns_alone_wait_for_the_next_checkpoint(manager, repository, document):
+    session = manager.start_session(document.id)
+    manager.checkpoint()
+    transactions = repository.transactions
+
+    for page in range(2, 200):
+        manager.turn_page(page)
+
+    assert repository.transactions == transactions
+    assert manager.checkpoint() == 1
+    assert repository.get_session(session.id).end_page == 199
+
+
+def test_checkpoint_writes_only_dirty_rows(manager, document):
+    manager.start_session(document.id)
+    first, _ = (manager.capture(IdeaFragment(content=c)) for c in "ab")
+    assert manager.checkpoint() == 3
+    assert manager.checkpoint() == 0
+
+    first.resolve_lightly("note")
+    manager.update_fragment(first)
+
+    assert manager.dirty == 1
+    assert manager.checkpoint() == 1
+
+
+def test_failed_checkpoint_keeps_rows_dirty(manager, repository, document):
+    manager.start_session(document.id)
+    manager.capture(IdeaFragment(content="kept"))
+    repository.fail = True
+
+    with pytest.raises(StorageError):
+        manager.checkpoint()
+
+    repository.fail = False
+    assert manager.checkpoint() == 2
+
+
+def test_capture_racing_the_end_of_a_session_is_refused(manager, repository, document):
+    manager.start_session(document.id)
+    kept = manager.capture(IdeaFragment(content="before the end"))
+    refused = []
+
+    def capture_during_write():
+        repository.during_write = None
+        with pytest.raises(StorageError, match="No reading session"):
+            manager.capture(IdeaFragment(content="too late"))
+        refused.append(True)
+
+    repository.during_write = capture_during_write
+    manager.end_session()
+
+    assert refused
+    assert manager.dirty == 0
+    assert manager.checkpoint() == 0
+    assert repository.get_fragment(kept.id) is not None
+
+
+def test_failed_end_of_session_can_be_retried(manager, repository, document):
+    session = manager.start_session(document.id)
+    manager.capture(IdeaFragment(content="kept"))
+    repository.fail = True
+
+    with pytest.raises(StorageError):
+        manager.end_session()
+
+    repository.fail = False
+    assert manager.session is session
+    assert manager.checkpoint() == 2
+    assert repository.get_session(session.id).ended_at is not None
+
+
+def test_crash_is_recovered_from_the_journal(repository, document, tmp_path):
+    crashed = SessionManager(repository, tmp_path, checkpoint_interval=3600)
+    session = crashed.start_session(document.id)
+    saved = crashed.capture(IdeaFragment(content="checkpointed"))
+    crashed.checkpoint()
+    lost = crashed.capture(IdeaFragment(content="only in the journal"))
+    crashed.record_dive_deep()
+    crashed._close_journal()  # the process died here, without a checkpoint
+
+    with SessionManager(repository, tmp_path, checkpoint_interval=3600) as restarted:
+        assert restarted.session is None
+
+    assert repository.get_fragment(lost.id).content == "only in the journal"
+    assert repository.get_fragment(saved.id) is not None
+    stored = repository.get_session(session.id)
+    assert (stored.fragments_captured, stored.dive_deeps) == (2, 1)
+    assert list(tmp_path.glob("session-*.jsonl")) == []
+
+
+def test_torn_journal_line_is_skipped(repository, document, tmp_path):
+    crashed = SessionManager(repository, tmp_path, checkpoint_interval=3600)
+    crashed.start_session(document.id)
+    fragment = crashed.capture(IdeaFragment(content="whole"))
+    crashed._close_journal()
+    with next(tmp_path.glob("session-*.jsonl")).open("a") as journal:
+        journal.write('{"kind": "frag')
+
+    assert SessionManager(repository, tmp_path).recover() == 2
+    assert repository.get_fragment(fragment.id) is not None
+
+
+def test_timer_checkpoints_in_the_background(repository, document):
+    with SessionManager(repository, checkpoint_interval=0.01) as manager:
+        manager.start_session(document.id)
+        fragment = manager.capture(IdeaFragment(content="eventually"))
+        for _ in range(500):
+            if repository.get_fragment(fragment.id) is not None:
+                break
+            manager._stop.wait(0.01)
+
+    assert repository.get_fragment(fragment.id) is not None
+
+
+def test_operations_need_an_active_session(manager):
+    with pytest.raises(StorageError, match="No reading session"):
+        manager.capture(IdeaFragment(content="orphan"))
@@ -0,0 +1,42 @@
+"""Tests that the ``branch`` entry point stays cheap to import."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+import branch
+
+
+HEAVY_MODULES = ("pydantic", "pymupdf", "sqlite3", "dotenv", "rich", "sqlalchemy")
+
+
+def imported_after(statement):
+    script = (
+        f"import sys\n{statement}\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+@pytest.mark.parametrize(
+    "statement",
+    ["import branch", "import branch.cli", "import branch.reader.page"],
+)
+def test_entry_points_do_not_import_heavy_dependencies(statement):
+    assert imported_after(statement) == []
+
+
+def test_lazy_exports_resolve_on_first_use():
+    assert "Document" in dir(branch)
+    from branch.models.document import Document  # noqa: PLC0415
+
+    assert branch.Document is Document
+    assert imported_after("from branch import IdeaFragment") == ["pydantic"]
+    with pytest.raises(AttributeError, match="no attribute 'Missing'"):
+        _ = branch.Missing
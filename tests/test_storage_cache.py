@@ -0,0 +1,174 @@
+"""Tests for the LRU + TTL query cache in front of the repository."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from branch.models import Document, FragmentStatus, IdeaFragment
+from branch.storage import CachedRepository, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cached(repository, clock):
+    return CachedRepository(repository, max_entries=8, ttl=10.0, clock=clock)
+
+
+@pytest.fixture
+def documents(cached):
+    paper, book = Document(title="Paper"), Document(title="Book")
+    cached.upsert_documents_many([paper, book])
+    cached.upsert_fragments_many(
+        [
+            IdeaFragment(content="Entropy and surprise", document_id=paper.id),
+            IdeaFragment(content="Belief propagation", document_id=paper.id),
+            IdeaFragment(content="Thermodynamics", document_id=book.id),
+        ]
+    )
+    return paper, book
+
+
+def test_repeated_queries_hit_the_cache(cached, documents):
+    paper, _ = documents
+
+    first = cached.list_fragments_for_document(paper.id)
+    second = cached.list_fragments_for_document(paper.id)
+    counts = cached.count_fragments_by_status(paper.id)
+    cached.count_fragments_by_status(paper.id)
+
+    assert [fragment.id for fragment in second] == [fragment.id for fragment in first]
+    assert counts == {FragmentStatus.CAPTURED: 2}
+    stats = cached.stats()["queries"]
+    assert (stats.hits, stats.misses, stats.size) == (2, 2, 2)
+    assert stats.hit_rate == 0.5
+
+
+def test_fragment_write_invalidates_only_its_document(cached, documents):
+    paper, book = documents
+    cached.list_fragments_for_document(paper.id)
+    cached.list_fragments_for_document(book.id)
+    cached.recent_fragments()
+
+    cached.upsert_fragment(IdeaFragment(content="Carnot cycle", document_id=book.id))
+
+    assert len(cached.list_fragments_for_document(book.id)) == 2
+    assert [f.content for f in cached.recent_fragments(limit=1)] == ["Carnot cycle"]
+    cached.list_fragments_for_document(paper.id)
+    stats = cached.stats()["queries"]
+    assert stats.invalidations == 2
+    assert stats.hits == 1
+
+
+def test_status_updates_invalidate_counts(cached, documents):
+    paper, _ = documents
+    fragment = cached.list_fragments_for_document(paper.id)[0]
+    assert cached.count_fragments_by_status() == {FragmentStatus.CAPTURED: 3}
+
+    cached.update_fragment_statuses(
+        [(fragment.id, FragmentStatus.REVIEWED, datetime.utcnow())]
+    )
+
+    assert cached.count_fragments_by_status(paper.id) == {
+        FragmentStatus.CAPTURED: 1,
+        FragmentStatus.REVIEWED: 1,
+    }
+    assert cached.get_fragment(fragment.id).status is FragmentStatus.REVIEWED
+
+
+def test_moving_a_fragment_invalidates_its_old_document(repository, cached, documents):
+    paper, book = documents
+    fragment = repository.list_fragments_for_document(paper.id)[0]
+    assert len(cached.list_fragments_for_document(paper.id)) == 2
+
+    cached.upsert_fragment(fragment.model_copy(update={"document_id": book.id}))
+
+    assert len(cached.list_fragments_for_document(paper.id)) == 1
+
+
+def test_batch_of_new_captures_costs_one_lookup(
+    repository, cached, documents, monkeypatch
+):
+    paper, _ = documents
+    cached.list_fragments_for_document(paper.id)
+    lookups = []
+    monkeypatch.setattr(repository, "get_fragment", lookups.append)
+    lookup_documents = repository.get_fragment_documents
+
+    def counted(fragment_ids):
+        lookups.append(list(fragment_ids))
+        return lookup_documents(lookups[-1])
+
+    monkeypatch.setattr(repository, "get_fragment_documents", counted)
+
+    cached.upsert_fragments_many(
+        IdeaFragment(content=f"New {i}", document_id=paper.id) for i in range(50)
+    )
+
+    assert [len(ids) for ids in lookups] == [50]
+    assert len(cached.list_fragments_for_document(paper.id)) == 52
+
+
+def test_entries_expire_after_ttl(cached, documents, clock):
+    paper, _ = documents
+    cached.get_document(paper.id)
+    clock.now = 9.0
+    assert cached.get_document(paper.id).title == "Paper"
+
+    clock.now = 10.0
+    cached.get_document(paper.id)
+
+    stats = cached.stats()["entities"]
+    assert (stats.hits, stats.misses, stats.expirations) == (1, 2, 1)
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = TTLCache(max_entries=2, ttl=10.0, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats().evictions == 1
+
+
+def test_loads_racing_an_invalidation_are_not_stored(clock):
+    cache = TTLCache(max_entries=4, ttl=10.0, clock=clock)
+    generation = cache.generation
+    cache.invalidate(("document", None))
+
+    assert not cache.put("stale", 1, generation=generation)
+    assert cache.get("stale") is None
+
+
+def test_session_and_document_writes_refresh_entities(
+    cached, sample_document, sample_session
+):
+    cached.upsert_document(sample_document)
+    cached.upsert_session(sample_session)
+    assert cached.get_session(sample_session.id).fragments_captured == 0
+
+    sample_session.fragments_captured = 3
+    cached.upsert_session(sample_session)
+    assert cached.get_session(sample_session.id).fragments_captured == 3
+
+    document = Document(title="Draft")
+    cached.upsert_document(document)
+    assert cached.get_document(document.id).title == "Draft"
+    cached.upsert_document(document.model_copy(update={"title": "Final"}))
+    assert cached.get_document(document.id).title == "Final"
@@ -0,0 +1,177 @@
+"""Tests for streaming NDJSON and columnar backup and restore."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from branch.cli import main
+from branch.models import BranchSession, Document, FragmentStatus, IdeaFragment
+from branch.models.idea_fragment import TextAnchor
+from branch.storage import SQLiteRepository, StorageError, export
+from branch.storage.export import (
+    export_columnar,
+    export_ndjson,
+    import_columnar,
+    import_ndjson,
+)
+
+
+TABLES = ("documents", "sessions", "idea_fragments")
+
+
+@pytest.fixture
+def populated(repository):
+    document = Document(title="Paper — ünïcode", page_count=12, read_percentage=37.5)
+    session = BranchSession(document_id=document.id, end_page=4)
+    repository.upsert_document(document)
+    repository.upsert_session(session)
+    repository.upsert_fragments_many(
+        [
+            IdeaFragment(
+                content="Entropy 🔥",
+                document_id=document.id,
+                session_id=session.id,
+                anchor=TextAnchor(page_number=3, selected_text="surprise"),
+            ),
+            IdeaFragment(content="Loose thought", status=FragmentStatus.REVIEWED),
+            IdeaFragment(content="", document_id=document.id),
+        ]
+    )
+    return repository
+
+
+@pytest.fixture
+def restored():
+    repo = SQLiteRepository.open(":memory:")
+    yield repo
+    repo.close()
+
+
+def dump(repository):
+    return {
+        table: sorted(
+            tuple(row)
+            for row in repository.connection.execute(f"SELECT * FROM {table}")  # noqa: S608
+        )
+        for table in TABLES
+    }
+
+
+@pytest.mark.parametrize("name", ["backup.ndjson", "backup.ndjson.gz"])
+def test_ndjson_round_trip(populated, restored, tmp_path, name):
+    path = tmp_path / name
+    counts = export_ndjson(populated.connection, path)
+
+    assert counts == {"documents": 1, "sessions": 1, "idea_fragments": 3}
+    assert import_ndjson(restored.connection, path) == counts
+    assert dump(restored) == dump(populated)
+    assert restored.count_fragments_by_status() == populated.count_fragments_by_status()
+    assert restored.search_fragments("entropy")
+
+
+def test_ndjson_rows_are_tagged_objects(populated, tmp_path):
+    path = tmp_path / "backup.ndjson"
+    export_ndjson(populated.connection, path)
+
+    header, *rows = (json.loads(line) for line in path.read_text().splitlines())
+    assert header["format"] == "branch-ndjson"
+    assert [row["table"] for row in rows] == [
+        "documents",
+        "sessions",
+        "idea_fragments",
+        "idea_fragments",
+        "idea_fragments",
+    ]
+    assert rows[0]["title"] == "Paper — ünïcode"
+
+
+def test_binary_columnar_round_trip(populated, restored, tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "BATCH_ROWS", 2)  # several batches per table
+    counts = export_columnar(populated.connection, tmp_path, backend="binary")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "documents.bcol",
+        "idea_fragments.bcol",
+        "sessions.bcol",
+    ]
+    assert import_columnar(restored.connection, tmp_path) == counts
+    assert dump(restored) == dump(populated)
+
+
+def test_restore_upserts_over_existing_rows(populated, tmp_path):
+    path = tmp_path / "backup.ndjson"
+    export_ndjson(populated.connection, path)
+    before = dump(populated)
+
+    import_ndjson(populated.connection, path)
+
+    assert dump(populated) == before
+
+
+def test_empty_database_round_trip(repository, restored, tmp_path):
+    counts = export_columnar(repository.connection, tmp_path, backend="binary")
+
+    assert counts == dict.fromkeys(TABLES, 0)
+    assert import_columnar(restored.connection, tmp_path) == counts
+
+
+def test_failed_restore_writes_nothing(restored, tmp_path):
+    orphan = IdeaFragment(content="orphan", document_id=Document(title="Gone").id)
+    source = SQLiteRepository.open(":memory:")
+    source.connection.execute("PRAGMA foreign_keys = OFF")
+    source.upsert_fragments_many([IdeaFragment(content="fine"), orphan])
+    path = tmp_path / "backup.ndjson"
+    export_ndjson(source.connection, path)
+    source.close()
+
+    with pytest.raises(StorageError, match="FOREIGN KEY"):
+        import_ndjson(restored.connection, path)
+    assert dump(restored)["idea_fragments"] == []
+
+
+def test_rejects_foreign_files(restored, tmp_path):
+    path = tmp_path / "notes.ndjson"
+    path.write_text('{"hello": "world"}\n')
+    with pytest.raises(StorageError, match="not a Branch NDJSON export"):
+        import_ndjson(restored.connection, path)
+
+    (tmp_path / "documents.bcol").write_bytes(b"PAR1....")
+    with pytest.raises(StorageError, match="not a Branch columnar export"):
+        import_columnar(restored.connection, tmp_path)
+
+
+def test_rejects_mismatched_columns(populated, restored, tmp_path):
+    path = tmp_path / "backup.ndjson"
+    export_ndjson(populated.connection, path)
+    header, rest = path.read_text().split("\n", 1)
+    data = json.loads(header)
+    data["tables"]["documents"].append("rating")
+    path.write_text(json.dumps(data) + "\n" + rest)
+
+    with pytest.raises(StorageError, match="do not match"):
+        import_ndjson(restored.connection, path)
+
+
+def test_backup_and_restore_commands(tmp_path):
+    source, target = tmp_path / "source.db", tmp_path / "target.db"
+    with SQLiteRepository.open(source) as repo:
+        repo.upsert_fragment(IdeaFragment(content="Portable idea"))
+    runner = CliRunner()
+
+    for args in (["--format", "columnar"], []):
+        destination = tmp_path / ("columns" if args else "backup.ndjson")
+        result = runner.invoke(
+            main, ["backup", str(destination), "--database", str(source), *args]
+        )
+        assert result.exit_code == 0, result.output
+        assert "1 fragments" in result.output
+        result = runner.invoke(
+            main, ["restore", str(destination), "--database", str(target)]
+        )
+        assert result.exit_code == 0, result.output
+
+    with SQLiteRepository.open(target) as repo:
+        assert [f.content for f in repo.recent_fragments()] == ["Portable idea"]
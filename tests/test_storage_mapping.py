@@ -0,0 +1,114 @@
+"""Tests for row/model mapping and trusted hydration."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from branch.models import BranchSession, Document, IdeaFragment
+from branch.models.document import DocumentType
+from branch.models.idea_fragment import TextAnchor
+from branch.storage import SQLiteRepository
+from branch.storage.mapping import (
+    DOCUMENT_COLUMNS,
+    FRAGMENT_COLUMNS,
+    SESSION_COLUMNS,
+    document_to_row,
+    flatten_anchor,
+    fragment_to_row,
+    hydrate_document,
+    hydrate_fragment,
+    hydrate_session,
+    row_to_document,
+    row_to_fragment,
+    row_to_session,
+    session_to_row,
+    unflatten_anchor,
+)
+
+
+def _as_row(mapping, columns):
+    return tuple(mapping[column] for column in columns)
+
+
+@pytest.mark.parametrize(
+    "anchor",
+    [
+        None,
+        TextAnchor(page_number=4),
+        TextAnchor(page_number=2, start_position=5, end_position=9, selected_text="s"),
+    ],
+)
+def test_fragment_paths_agree(anchor):
+    """Trusted and validated hydration build identical fragments."""
+    fragment = IdeaFragment(content="idea", anchor=anchor)
+    fragment.resolve_lightly("note")
+    row = _as_row(fragment_to_row(fragment), FRAGMENT_COLUMNS)
+
+    assert hydrate_fragment(row) == row_to_fragment(row) == fragment
+
+
+def test_document_and_session_paths_agree():
+    """Trusted hydration preserves enums, paths, and optional datetimes."""
+    document = Document(
+        title="Notes",
+        file_path=Path("library/notes.md"),
+        document_type=DocumentType.MARKDOWN,
+        page_count=10,
+    )
+    document.update_progress(3)
+    session = BranchSession(document_id=document.id)
+    session.end_session(end_page=3)
+
+    document_row = _as_row(document_to_row(document), DOCUMENT_COLUMNS)
+    session_row = _as_row(session_to_row(session), SESSION_COLUMNS)
+
+    assert hydrate_document(document_row) == row_to_document(document_row) == document
+    assert hydrate_session(session_row) == row_to_session(session_row) == session
+    assert isinstance(hydrate_document(document_row).document_type, DocumentType)
+
+
+def test_anchor_flatten_round_trip():
+    """Anchors map onto anchor_* columns and back; all-NULL means no anchor."""
+    anchor = TextAnchor(page_number=1, selected_text="quote")
+    columns = flatten_anchor(anchor)
+
+    assert columns == {
+        "anchor_page_number": 1,
+        "anchor_start_position": None,
+        "anchor_end_position": None,
+        "anchor_selected_text": "quote",
+    }
+    assert unflatten_anchor(*columns.values()) == anchor
+    assert unflatten_anchor(*flatten_anchor(None).values()) is None
+
+
+def test_validated_repository_mode(sample_document):
+    """Repositories can opt back into validated hydration."""
+    repo = SQLiteRepository.open(":memory:", validate_rows=True)
+    repo.upsert_document(sample_document)
+    repo.connection.execute(
+        "UPDATE documents SET page_count = 'many' WHERE id = ?;",
+        (str(sample_document.id),),
+    )
+
+    with pytest.raises(ValueError, match="page_count"):
+        repo.get_document(sample_document.id)
+
+
+def test_hydrated_models_behave_like_validated_ones(repository, sample_document):
+    """Trusted instances support mutation, dumping, and re-persisting."""
+    fragment = IdeaFragment(content="idea", document_id=sample_document.id)
+    repository.upsert_document(sample_document)
+    repository.upsert_fragment(fragment)
+
+    loaded = repository.get_fragment(fragment.id)
+    loaded.mark_reviewed()
+    repository.upsert_fragment(loaded)
+
+    assert (
+        loaded.model_dump()
+        == IdeaFragment.model_validate(loaded.model_dump()).model_dump()
+    )
+    assert repository.get_fragment(fragment.id).status == loaded.status
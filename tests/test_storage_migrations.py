@@ -0,0 +1,98 @@
+"""Tests for the user_version-driven migration engine."""
+
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from branch.storage import SCHEMA_VERSION, StorageError, apply_schema
+from branch.storage.migrations import Migration, get_user_version, migrate
+from branch.storage.schema import MIGRATIONS
+
+
+def _index_names(connection):
+    rows = connection.execute("SELECT name FROM sqlite_master WHERE type='index'")
+    return {row[0] for row in rows}
+
+
+def test_fresh_database_runs_every_migration():
+    """A new database applies the full history and reports timings."""
+    connection = sqlite3.connect(":memory:")
+
+    applied = apply_schema(connection)
+
+    assert [step.version for step in applied] == list(range(1, SCHEMA_VERSION + 1))
+    assert all(step.duration_seconds >= 0 for step in applied)
+    assert get_user_version(connection) == SCHEMA_VERSION
+
+
+def test_current_database_skips_all_ddl():
+    """Re-applying the schema to a current database issues no DDL at all."""
+    connection = sqlite3.connect(":memory:")
+    apply_schema(connection)
+
+    statements: list[str] = []
+    connection.set_trace_callback(statements.append)
+    applied = apply_schema(connection)
+    connection.set_trace_callback(None)
+
+    assert applied == []
+    assert not any(
+        keyword in statement.upper()
+        for statement in statements
+        for keyword in ("CREATE", "DROP", "ALTER", "BEGIN")
+    )
+
+
+def test_upgrade_from_version_one_runs_only_pending_steps():
+    """A version 1 database only receives the later migrations."""
+    connection = sqlite3.connect(":memory:")
+    migrate(connection, MIGRATIONS, target=1)
+    assert "idx_fragments_document_id" in _index_names(connection)
+
+    applied = apply_schema(connection)
+
+    assert [step.version for step in applied] == list(range(2, SCHEMA_VERSION + 1))
+    indexes = _index_names(connection)
+    assert "idx_fragments_document_id" not in indexes
+    assert "idx_fragments_document_captured" in indexes
+
+
+def test_failed_migration_rolls_back_every_pending_step():
+    """A failing step leaves the database at its previous version."""
+    registry = (
+        Migration(1, "create", ("CREATE TABLE a (id INTEGER);",)),
+        Migration(2, "add table", ("CREATE TABLE b (id INTEGER);",)),
+        Migration(3, "broken", ("CREATE TABLE a (id INTEGER);",)),
+    )
+    connection = sqlite3.connect(":memory:")
+
+    with pytest.raises(StorageError, match="Migration to version 3 failed"):
+        migrate(connection, registry)
+
+    tables = {
+        row[0]
+        for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type='table'"
+        )
+    }
+    assert tables == set()
+    assert get_user_version(connection) == 0
+
+
+def test_newer_database_is_rejected():
+    """Databases written by a newer schema are not silently downgraded."""
+    connection = sqlite3.connect(":memory:")
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1};")
+
+    with pytest.raises(StorageError, match="newer than supported"):
+        apply_schema(connection)
+
+
+def test_registry_must_be_contiguous():
+    """Gaps in the registry are reported before anything runs."""
+    registry = (Migration(1, "one", ()), Migration(3, "three", ()))
+
+    with pytest.raises(StorageError, match="out of order"):
+        migrate(sqlite3.connect(":memory:"), registry)
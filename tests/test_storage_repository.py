@@ -0,0 +1,241 @@
+"""Tests for the SQLite repository implementation."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from branch.models import BranchSession, Document, FragmentStatus, IdeaFragment
+from branch.models.idea_fragment import TextAnchor
+from branch.storage import BranchRepository, SQLiteRepository, StorageError
+from branch.storage.sqlite_repository import fragment_cursor
+
+
+def test_repository_satisfies_protocol(repository):
+    """SQLiteRepository can be used wherever the protocol is expected."""
+    repo: BranchRepository = repository
+    assert isinstance(repo, SQLiteRepository)
+
+
+def test_document_round_trip(repository, sample_document):
+    """Documents are stored and read back unchanged."""
+    repository.upsert_document(sample_document)
+
+    loaded = repository.get_document(sample_document.id)
+
+    assert loaded == sample_document
+
+
+def test_document_upsert_updates_existing_row(repository, sample_document):
+    """A second upsert with the same id updates rather than duplicates."""
+    repository.upsert_document(sample_document)
+    sample_document.update_progress(40)
+    repository.upsert_document(sample_document)
+
+    loaded = repository.get_document(sample_document.id)
+    count = repository.connection.execute("SELECT COUNT(*) FROM documents").fetchone()
+
+    assert loaded is not None
+    assert loaded.last_page == 40
+    assert loaded.read_percentage == 40.0
+    assert count[0] == 1
+
+
+def test_missing_records_return_none(repository):
+    """Lookups for unknown ids return None."""
+    assert repository.get_document(uuid4()) is None
+    assert repository.get_session(uuid4()) is None
+    assert repository.get_fragment(uuid4()) is None
+
+
+def test_session_round_trip(repository, sample_document, sample_session):
+    """Sessions are stored and read back unchanged."""
+    repository.upsert_document(sample_document)
+    sample_session.record_capture()
+    sample_session.end_session(end_page=12)
+    repository.upsert_session(sample_session)
+
+    assert repository.get_session(sample_session.id) == sample_session
+
+
+def test_fragment_round_trip_with_anchor(repository, sample_document):
+    """Fragment anchors are flattened to columns and rebuilt on read."""
+    repository.upsert_document(sample_document)
+    fragment = IdeaFragment(
+        content="Compare with chapter 3",
+        document_id=sample_document.id,
+        anchor=TextAnchor(
+            page_number=7, start_position=10, end_position=20, selected_text="x"
+        ),
+    )
+    repository.upsert_fragment(fragment)
+
+    assert repository.get_fragment(fragment.id) == fragment
+
+
+def test_fragment_without_anchor_round_trips(repository):
+    """Fragments with no anchor keep ``anchor`` as None."""
+    fragment = IdeaFragment(content="Loose thought")
+    repository.upsert_fragment(fragment)
+
+    loaded = repository.get_fragment(fragment.id)
+
+    assert loaded is not None
+    assert loaded.anchor is None
+
+
+def test_fragment_status_update(repository, sample_fragment):
+    """Status transitions persist through upsert."""
+    repository.upsert_fragment(sample_fragment)
+    sample_fragment.archive()
+    repository.upsert_fragment(sample_fragment)
+
+    loaded = repository.get_fragment(sample_fragment.id)
+
+    assert loaded is not None
+    assert loaded.status == FragmentStatus.ARCHIVED
+    assert loaded.updated_at == sample_fragment.updated_at
+
+
+def test_resolution_update_leaves_other_columns(repository, sample_fragment):
+    """Resolution notes are written narrowly; a None status keeps the stored one."""
+    repository.upsert_fragment(sample_fragment)
+    sample_fragment.archive()
+    repository.update_fragment_statuses(
+        [(sample_fragment.id, sample_fragment.status, sample_fragment.updated_at)]
+    )
+    noted = datetime(2024, 5, 1, 12, 0)
+
+    repository.update_fragment_resolutions(
+        [(sample_fragment.id, "A note", None, noted)]
+    )
+
+    loaded = repository.get_fragment(sample_fragment.id)
+    assert loaded is not None
+    assert (loaded.resolution_note, loaded.status) == (
+        "A note",
+        FragmentStatus.ARCHIVED,
+    )
+    assert loaded.content == sample_fragment.content
+    assert loaded.updated_at == noted
+
+
+def test_batch_upserts_and_listing(repository):
+    """Batch upserts write every row and listing is ordered by capture time."""
+    documents = [Document(title=f"Doc {i}") for i in range(3)]
+    repository.upsert_documents_many(documents)
+
+    target = documents[1]
+    fragments = [
+        IdeaFragment(content=f"Idea {i}", document_id=target.id) for i in range(50)
+    ]
+    repository.upsert_fragments_many(reversed(fragments))
+
+    listed = repository.list_fragments_for_document(target.id)
+
+    assert [doc.id for doc in documents] == [
+        repository.get_document(doc.id).id for doc in documents
+    ]
+    assert [fragment.id for fragment in listed] == [f.id for f in fragments]
+    assert repository.list_fragments_for_document(documents[0].id) == []
+
+
+def test_batch_upsert_is_atomic(repository):
+    """A failing row rolls back the whole batch."""
+    good = IdeaFragment(content="Fine")
+    orphan = IdeaFragment(content="Orphan", document_id=uuid4())
+
+    with pytest.raises(StorageError):
+        repository.upsert_fragments_many([good, orphan])
+
+    assert repository.get_fragment(good.id) is None
+
+
+def test_session_requires_document(repository):
+    """Integrity errors surface as StorageError."""
+    with pytest.raises(StorageError):
+        repository.upsert_session(BranchSession(document_id=uuid4()))
+
+
+def test_read_errors_surface_as_storage_error(sample_document):
+    """Reads on a closed connection raise StorageError, not sqlite3 errors."""
+    repository = SQLiteRepository.open(":memory:")
+    repository.close()
+
+    with pytest.raises(StorageError, match="closed"):
+        repository.get_document(sample_document.id)
+    with pytest.raises(StorageError):
+        repository.count_fragments_by_status()
+
+
+def _seed_fragments(repository, count):
+    document = Document(title="Annotated book")
+    repository.upsert_document(document)
+    start = datetime(2025, 1, 1)
+    fragments = [
+        IdeaFragment(
+            content=f"Idea {i}",
+            document_id=document.id,
+            captured_at=start + timedelta(seconds=i // 2),  # pairs share a timestamp
+        )
+        for i in range(count)
+    ]
+    repository.upsert_fragments_many(fragments)
+    return document, sorted(fragments, key=lambda f: (f.captured_at, str(f.id)))
+
+
+def test_iter_fragments_pages_in_keyset_order(repository):
+    """Small pages still yield every fragment exactly once, in order."""
+    document, expected = _seed_fragments(repository, 23)
+
+    streamed = list(repository.iter_fragments(document.id, page_size=4))
+
+    assert [f.id for f in streamed] == [f.id for f in expected]
+
+
+def test_iter_fragments_resumes_after_cursor(repository):
+    """A cursor from the last seen fragment continues where it left off."""
+    document, expected = _seed_fragments(repository, 10)
+
+    first = list(repository.iter_fragments(document.id, limit=3))
+    rest = list(
+        repository.iter_fragments(
+            document.id, after=fragment_cursor(first[-1]), page_size=2
+        )
+    )
+
+    assert [f.id for f in first + rest] == [f.id for f in expected]
+
+
+def test_iter_fragments_limit_and_status(repository):
+    """Limit caps the total and status filters rows."""
+    document, expected = _seed_fragments(repository, 12)
+    for fragment in expected[::3]:
+        fragment.mark_reviewed()
+    repository.upsert_fragments_many(expected[::3])
+
+    reviewed = list(
+        repository.iter_fragments(
+            document.id, status=FragmentStatus.REVIEWED, page_size=1
+        )
+    )
+    limited = list(repository.iter_fragments(document.id, limit=5, page_size=2))
+
+    assert [f.id for f in reviewed] == [f.id for f in expected[::3]]
+    assert len(limited) == 5
+
+
+def test_iter_fragments_uses_composite_index(repository):
+    """Keyset pages are served by the (document_id, captured_at, id) index."""
+    plan = repository.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM idea_fragments "
+        "WHERE document_id = ? AND (captured_at, id) > (?, ?) "
+        "ORDER BY captured_at, id LIMIT 10",
+        ("doc", "2025-01-01", "id"),
+    ).fetchall()
+    details = " ".join(row["detail"] for row in plan)
+
+    assert "idx_fragments_document_captured" in details
+    assert "TEMP B-TREE" not in details
@@ -0,0 +1,147 @@
+"""Tests for FTS5-backed fragment search."""
+
+from __future__ import annotations
+
+import sqlite3
+from uuid import uuid4
+
+import pytest
+
+from branch.models import Document, IdeaFragment
+from branch.models.idea_fragment import TextAnchor
+from branch.storage import SQLiteRepository, StorageError, apply_schema
+from branch.storage.schema import CREATE_TABLE_STATEMENTS, FRAGMENTS_TABLE_STATEMENT
+from branch.storage.sqlite_repository import to_match_query
+
+
+@pytest.fixture
+def seeded(repository):
+    paper = Document(title="Paper")
+    book = Document(title="Book")
+    repository.upsert_documents_many([paper, book])
+    fragments = {
+        "entropy": IdeaFragment(
+            content="Entropy as a measure of surprise",
+            document_id=paper.id,
+            anchor=TextAnchor(page_number=3, selected_text="Shannon entropy"),
+        ),
+        "graphs": IdeaFragment(
+            content="Compare message passing to belief propagation",
+            document_id=paper.id,
+        ),
+        "book": IdeaFragment(
+            content="Entropy shows up in thermodynamics too",
+            document_id=book.id,
+        ),
+    }
+    repository.upsert_fragments_many(fragments.values())
+    return paper, book, fragments
+
+
+def test_search_ranks_matches_with_snippets(repository, seeded):
+    """Matches across content and anchor text are ranked by bm25."""
+    _, _, fragments = seeded
+
+    hits = repository.search_fragments("entropy")
+
+    assert {hit.fragment.id for hit in hits} == {
+        fragments["entropy"].id,
+        fragments["book"].id,
+    }
+    assert hits[0].fragment.id == fragments["entropy"].id
+    assert hits[0].score <= hits[1].score
+    assert "[Entropy]" in hits[0].snippet or "[entropy]" in hits[0].snippet
+
+
+def test_search_filters_by_document(repository, seeded):
+    """document_id restricts hits to one document."""
+    _, book, fragments = seeded
+
+    hits = repository.search_fragments("entropy", document_id=book.id)
+
+    assert [hit.fragment.id for hit in hits] == [fragments["book"].id]
+
+
+def test_search_index_follows_updates_and_deletes(repository, seeded):
+    """Triggers keep the full-text index in sync with fragment writes."""
+    _, _, fragments = seeded
+    graphs = fragments["graphs"]
+    graphs.resolve_lightly("See loopy belief propagation survey")
+    repository.upsert_fragment(graphs)
+
+    assert [hit.fragment.id for hit in repository.search_fragments("loopy")] == [
+        graphs.id
+    ]
+
+    repository.connection.execute(
+        "DELETE FROM idea_fragments WHERE id = ?;", (str(graphs.id),)
+    )
+    assert repository.search_fragments("loopy") == []
+
+
+def test_search_index_is_keyed_by_a_stable_integer(repository, seeded):
+    """The index follows ``seq``, an INTEGER PRIMARY KEY VACUUM keeps intact."""
+    _, _, fragments = seeded
+    key = repository.connection.execute("PRAGMA table_info(idea_fragments);").fetchone()
+    assert (key["name"], key["type"], key["pk"]) == ("seq", "INTEGER", 1)
+    repository.connection.execute(
+        "DELETE FROM idea_fragments WHERE id = ?;", (str(fragments["entropy"].id),)
+    )
+    repository.connection.commit()
+
+    repository.connection.execute("VACUUM;")
+
+    hits = repository.search_fragments("entropy")
+    assert [hit.fragment.id for hit in hits] == [fragments["book"].id]
+    assert [hit.fragment.id for hit in repository.search_fragments("belief")] == [
+        fragments["graphs"].id
+    ]
+
+
+def test_version_one_database_gains_the_sequence_key(tmp_path):
+    """A table from before the registry is rebuilt around ``seq`` and indexed."""
+    path = tmp_path / "old.db"
+    connection = sqlite3.connect(path)
+    old_table = FRAGMENTS_TABLE_STATEMENT.replace(
+        "seq INTEGER PRIMARY KEY,", ""
+    ).replace("id TEXT NOT NULL UNIQUE", "id TEXT PRIMARY KEY")
+    for statement in (*CREATE_TABLE_STATEMENTS[:2], old_table):
+        connection.execute(statement)
+    connection.execute("PRAGMA user_version = 1;")
+    gone, kept = uuid4(), uuid4()
+    connection.executemany(
+        "INSERT INTO idea_fragments (id, content, status) VALUES (?, ?, ?)",
+        [(str(gone), "gone soon", "captured"), (str(kept), "kept entropy", "archived")],
+    )
+    connection.execute("DELETE FROM idea_fragments WHERE id = ?;", (str(gone),))
+    connection.commit()
+    apply_schema(connection)
+    connection.close()
+
+    with SQLiteRepository.open(path) as repository:
+        key = repository.connection.execute(
+            "PRAGMA table_info(idea_fragments);"
+        ).fetchone()
+        assert key["name"] == "seq"
+        hits = repository.search_fragments("entropy")
+        assert [hit.fragment.id for hit in hits] == [kept]
+        assert repository.search_fragments("gone") == []
+        assert sum(repository.count_fragments_by_status().values()) == 1
+
+
+def test_search_treats_user_text_literally(repository, seeded):
+    """Operators and quotes in plain queries do not raise syntax errors."""
+    assert repository.search_fragments('surprise" OR (') == []
+    assert repository.search_fragments("   ") == []
+    assert to_match_query('say "hi"') == '"say" """hi"""'
+
+
+def test_raw_queries_support_fts_syntax(repository, seeded):
+    """Raw mode exposes prefix and boolean FTS5 syntax."""
+    _, _, fragments = seeded
+
+    hits = repository.search_fragments("therm*", raw=True)
+
+    assert [hit.fragment.id for hit in hits] == [fragments["book"].id]
+    with pytest.raises(StorageError, match="Invalid search query"):
+        repository.search_fragments('"unterminated', raw=True)
@@ -0,0 +1,116 @@
+"""Tests for read-only connections and pinned read snapshots."""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+
+import pytest
+
+from branch.models import FragmentStatus, IdeaFragment
+from branch.storage import (
+    ConnectionPool,
+    SQLiteRepository,
+    StorageError,
+    connect,
+    initialize,
+)
+
+
+def _pragma(connection, name):
+    return connection.execute(f"PRAGMA {name};").fetchone()[0]
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "branch.db"
+    with SQLiteRepository.open(path) as repo:
+        repo.upsert_fragment(IdeaFragment(content="first"))
+    return path
+
+
+def test_read_only_connection_refuses_writes(database):
+    """A ``mode=ro`` connection is query-only and cannot modify the file."""
+    connection = connect(database, read_only=True)
+
+    assert _pragma(connection, "query_only") == 1
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        connection.execute("DELETE FROM idea_fragments;")
+    connection.close()
+
+
+def test_read_only_connection_needs_a_file():
+    """There is no second view of an in-memory database to open read-only."""
+    with pytest.raises(StorageError):
+        connect(":memory:", read_only=True)
+
+
+def test_pool_readers_are_read_only(database):
+    """Pooled readers cannot write even if a caller tries to."""
+    with ConnectionPool(database, readers=1) as pool, pool.reader() as reader:
+        assert _pragma(reader, "query_only") == 1
+
+
+def test_read_only_repository_reads_but_rejects_writes(database):
+    """A read-only repository serves queries and refuses every write."""
+    with SQLiteRepository.read_only(database, readers=2) as repo:
+        assert repo.count_fragments_by_status() == {FragmentStatus.CAPTURED: 1}
+        with pytest.raises(StorageError, match="read-only"):
+            repo.upsert_fragment(IdeaFragment(content="second"))
+
+
+def test_snapshot_hides_writes_committed_after_it_started(database):
+    """Queries in one snapshot agree with each other while captures continue."""
+    with (
+        SQLiteRepository.read_only(database) as review,
+        SQLiteRepository.pooled(database) as capture,
+    ):
+        with review.snapshot():
+            before = review.count_fragments_by_status()
+            capture.upsert_fragment(IdeaFragment(content="second"))
+            assert review.count_fragments_by_status() == before
+            assert len(review.recent_fragments(10)) == 1
+
+        assert review.count_fragments_by_status() == {FragmentStatus.CAPTURED: 2}
+
+
+def test_snapshot_does_not_block_writers_on_a_single_connection(database):
+    """A file repository snapshots on its own connection, leaving writes free."""
+    with SQLiteRepository.open(database) as repo, repo.snapshot():
+        writer = threading.Thread(
+            target=repo.upsert_fragment, args=(IdeaFragment(content="second"),)
+        )
+        writer.start()
+        writer.join(timeout=5)
+
+        assert not writer.is_alive()
+        assert len(repo.recent_fragments(10)) == 1
+
+
+def test_writes_inside_a_snapshot_are_rejected(database):
+    """A snapshot is read-only for the thread that holds it."""
+    with (
+        SQLiteRepository.pooled(database) as repo,
+        repo.snapshot(),
+        pytest.raises(StorageError, match="snapshot"),
+    ):
+        repo.upsert_fragment(IdeaFragment(content="second"))
+
+
+def test_memory_repository_snapshot(repository):
+    """In-memory repositories pin their shared connection for the block."""
+    repository.upsert_fragment(IdeaFragment(content="first"))
+
+    with repository.snapshot(), repository.snapshot():
+        assert repository.count_fragments_by_status() == {FragmentStatus.CAPTURED: 1}
+
+    assert not repository.connection.in_transaction
+
+
+def test_read_only_pool_has_no_writer(database):
+    """A read-only pool skips schema setup and refuses the writer."""
+    initialize(database).close()
+    with ConnectionPool(database, read_only=True) as pool:
+        assert pool.read_only
+        with pytest.raises(StorageError), pool.writer():
+            pass
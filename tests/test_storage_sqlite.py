@@ -0,0 +1,131 @@
+"""Tests for SQLite connection helpers and the connection pool."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from branch.config import Config
+from branch.models import Document, IdeaFragment
+from branch.storage import (
+    ConnectionPool,
+    SQLiteProfile,
+    SQLiteRepository,
+    StorageError,
+    connect,
+    initialize,
+)
+
+
+def _pragma(connection, name):
+    return connection.execute(f"PRAGMA {name};").fetchone()[0]
+
+
+def test_connect_applies_performance_profile(tmp_path):
+    """File databases get WAL, relaxed sync, and the configured cache size."""
+    profile = SQLiteProfile(cache_size=-2048, mmap_size=0)
+    connection = connect(tmp_path / "branch.db", profile)
+
+    assert _pragma(connection, "journal_mode") == "wal"
+    assert _pragma(connection, "synchronous") == 1  # NORMAL
+    assert _pragma(connection, "cache_size") == -2048
+    assert _pragma(connection, "temp_store") == 2  # MEMORY
+    assert _pragma(connection, "foreign_keys") == 1
+
+
+def test_profile_reads_config(monkeypatch):
+    """The default profile mirrors the SQLITE_* settings on Config."""
+    monkeypatch.setattr(Config, "SQLITE_SYNCHRONOUS", "FULL")
+    monkeypatch.setattr(Config, "SQLITE_CACHE_SIZE", 500)
+
+    connection = connect(":memory:")
+
+    assert _pragma(connection, "synchronous") == 2  # FULL
+    assert _pragma(connection, "cache_size") == 500
+
+
+def test_profile_rejects_unknown_values():
+    """Only whitelisted PRAGMA keywords are accepted."""
+    with pytest.raises(ValueError, match="Unsupported PRAGMA value"):
+        SQLiteProfile(journal_mode="WAL; DROP TABLE documents")
+
+
+def test_pool_rejects_memory_database():
+    """In-memory databases cannot be shared across pooled connections."""
+    with pytest.raises(StorageError):
+        ConnectionPool(":memory:")
+
+
+def test_pool_reads_do_not_wait_for_writer(tmp_path):
+    """Readers see the last committed snapshot while a write is in progress."""
+    initialize(tmp_path / "branch.db").close()
+    with ConnectionPool(tmp_path / "branch.db", readers=2) as pool:
+        with pool.writer() as writer:
+            writer.execute(
+                "INSERT INTO documents (id, title) VALUES ('a', 'committed');"
+            )
+            writer.commit()
+
+        write_started = threading.Event()
+        release_writer = threading.Event()
+
+        def long_write():
+            with pool.writer() as writer:
+                writer.execute(
+                    "INSERT INTO documents (id, title) VALUES ('b', 'pending');"
+                )
+                write_started.set()
+                release_writer.wait(timeout=5)
+                writer.commit()
+
+        thread = threading.Thread(target=long_write)
+        thread.start()
+        write_started.wait(timeout=5)
+
+        with pool.reader() as reader:
+            titles = [row[0] for row in reader.execute("SELECT title FROM documents")]
+
+        release_writer.set()
+        thread.join()
+
+        assert titles == ["committed"]
+
+
+def test_pool_limits_reader_connections(tmp_path):
+    """Borrowing beyond the pool size times out instead of opening more."""
+    with ConnectionPool(tmp_path / "branch.db", readers=1, timeout=0.05) as pool:
+        with (
+            pool.reader(),
+            pytest.raises(StorageError, match="Timed out"),
+            pool.reader(),
+        ):
+            pass
+        with pool.reader() as reader:
+            assert reader.execute("SELECT 1").fetchone()[0] == 1
+
+
+def test_pooled_repository_round_trip(tmp_path):
+    """A pooled repository writes through the writer and reads via readers."""
+    repo = SQLiteRepository.pooled(tmp_path / "branch.db", readers=2)
+    document = Document(title="Pooled")
+    fragments = [
+        IdeaFragment(content=str(i), document_id=document.id) for i in range(5)
+    ]
+
+    repo.upsert_document(document)
+    repo.upsert_fragments_many(fragments)
+
+    results: list[int] = []
+
+    def read():
+        results.append(len(repo.list_fragments_for_document(document.id)))
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    repo.close()
+
+    assert results == [5, 5, 5, 5]
@@ -0,0 +1,183 @@
+"""Tests for the trigger-maintained fragment statistics tables."""
+
+from __future__ import annotations
+
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+
+from branch.models import BranchSession, Document, FragmentStatus, IdeaFragment
+from branch.storage import SQLiteRepository, apply_schema
+from branch.storage.migrations import migrate
+from branch.storage.schema import MIGRATIONS
+
+
+def grouped_counts(connection):
+    """Recompute every statistic the slow way, for comparison."""
+    return {
+        "status": {
+            (document, status): count
+            for document, status, count in connection.execute(
+                "SELECT COALESCE(document_id, ''), status, COUNT(*) "
+                "FROM idea_fragments GROUP BY 1, 2"
+            )
+        },
+        "session": dict(
+            connection.execute(
+                "SELECT session_id, COUNT(*) FROM idea_fragments "
+                "WHERE session_id IS NOT NULL GROUP BY 1"
+            ).fetchall()
+        ),
+        "day": dict(
+            connection.execute(
+                "SELECT substr(captured_at, 1, 10), COUNT(*) "
+                "FROM idea_fragments GROUP BY 1"
+            ).fetchall()
+        ),
+    }
+
+
+def materialized_counts(connection):
+    return {
+        "status": {
+            (document, status): count
+            for document, status, count in connection.execute(
+                "SELECT document_id, status, fragments FROM fragment_status_counts "
+                "WHERE fragments > 0"
+            )
+        },
+        "session": dict(
+            connection.execute(
+                "SELECT session_id, fragments FROM session_fragment_counts "
+                "WHERE fragments > 0"
+            ).fetchall()
+        ),
+        "day": dict(
+            connection.execute(
+                "SELECT day, fragments FROM daily_capture_counts WHERE fragments > 0"
+            ).fetchall()
+        ),
+    }
+
+
+@pytest.fixture
+def library(repository):
+    paper, book = Document(title="Paper"), Document(title="Book")
+    repository.upsert_documents_many([paper, book])
+    session = BranchSession(document_id=paper.id)
+    repository.upsert_session(session)
+    fragments = [
+        IdeaFragment(
+            content="First",
+            document_id=paper.id,
+            session_id=session.id,
+            captured_at=datetime(2024, 5, 1, 9),
+        ),
+        IdeaFragment(
+            content="Second",
+            document_id=paper.id,
+            session_id=session.id,
+            captured_at=datetime(2024, 5, 1, 23),
+        ),
+        IdeaFragment(
+            content="Third", document_id=book.id, captured_at=datetime(2024, 5, 3, 8)
+        ),
+        IdeaFragment(content="Loose", captured_at=datetime(2024, 5, 3, 10)),
+    ]
+    repository.upsert_fragments_many(fragments)
+    return paper, book, session, fragments
+
+
+def test_counts_are_maintained_on_insert(repository, library):
+    paper, _, session, _ = library
+
+    assert repository.count_fragments_by_status(paper.id) == {
+        FragmentStatus.CAPTURED: 2
+    }
+    assert repository.count_fragments_by_status() == {FragmentStatus.CAPTURED: 4}
+    assert repository.count_session_fragments(session.id) == 2
+    assert repository.daily_capture_counts() == {
+        date(2024, 5, 1): 2,
+        date(2024, 5, 3): 2,
+    }
+    assert repository.daily_capture_counts(start=date(2024, 5, 2)) == {
+        date(2024, 5, 3): 2
+    }
+
+
+def test_counts_follow_every_kind_of_write(repository, library):
+    paper, book, session, fragments = library
+    first, second, third, loose = fragments
+
+    repository.update_fragment_statuses(
+        [(first.id, FragmentStatus.REVIEWED, datetime.utcnow())]
+    )
+    repository.upsert_fragment(
+        second.model_copy(
+            update={"document_id": book.id, "session_id": None, "content": "Moved"}
+        )
+    )
+    repository.upsert_fragment(
+        third.model_copy(update={"captured_at": datetime(2024, 5, 2, 12)})
+    )
+    repository.upsert_fragment(loose)
+    repository.connection.execute(
+        "DELETE FROM idea_fragments WHERE id = ?", (str(loose.id),)
+    )
+    repository.connection.execute(
+        "DELETE FROM documents WHERE id = ?", (str(paper.id),)
+    )
+
+    connection = repository.connection
+    assert materialized_counts(connection) == grouped_counts(connection)
+    assert repository.count_fragments_by_status(book.id) == {FragmentStatus.CAPTURED: 2}
+    assert repository.count_session_fragments(session.id) == 0
+
+
+def test_unchanged_upserts_do_not_touch_the_stats(repository, library):
+    _, _, _, fragments = library
+    statements = []
+    repository.connection.set_trace_callback(statements.append)
+
+    repository.upsert_fragment(fragments[0])
+
+    repository.connection.set_trace_callback(None)
+    assert not any("_counts" in statement for statement in statements)
+
+
+def test_dashboard_counts_do_not_scan_fragments(repository, library):
+    paper, _, _, _ = library
+    plan = repository.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT status, fragments FROM fragment_status_counts "
+        "WHERE document_id = ? AND fragments > 0",
+        (str(paper.id),),
+    ).fetchall()
+    assert "idea_fragments" not in " ".join(row[-1] for row in plan)
+
+
+def test_upgrade_backfills_existing_fragments(tmp_path):
+    path = tmp_path / "old.db"
+    connection = sqlite3.connect(path)
+    migrate(connection, MIGRATIONS, target=4)
+    connection.executemany(
+        "INSERT INTO idea_fragments (id, content, status, captured_at) "
+        "VALUES (?, ?, ?, ?)",
+        [
+            ("a", "one", "captured", "2024-01-01T10:00:00.000000"),
+            ("b", "two", "archived", "2024-01-02T10:00:00.000000"),
+        ],
+    )
+    connection.commit()
+    apply_schema(connection)
+    connection.close()
+
+    with SQLiteRepository.open(path) as repository:
+        assert repository.count_fragments_by_status() == {
+            FragmentStatus.CAPTURED: 1,
+            FragmentStatus.ARCHIVED: 1,
+        }
+        assert repository.daily_capture_counts() == {
+            date(2024, 1, 1): 1,
+            date(2024, 1, 2): 1,
+        }
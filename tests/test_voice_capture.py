@@ -0,0 +1,196 @@
+"""Tests for background voice transcription."""
+
+from __future__ import annotations
+
+import sys
+import threading
+import types
+from datetime import datetime
+
+import pytest
+
+from branch.capture import CaptureQueue, VoiceCapture, WhisperTranscriber
+from branch.capture.voice import PENDING_CONTENT
+from branch.models import FragmentStatus
+from branch.storage import StorageError
+
+
+class GatedTranscriber:
+    """Returns the audio bytes as text once the gate opens."""
+
+    def __init__(self, *, fail=False):
+        self.gate = threading.Event()
+        self.fail = fail
+        self.calls = 0
+
+    def transcribe(self, audio):
+        self.calls += 1
+        self.gate.wait(5)
+        if self.fail:
+            msg = "decoder crashed"
+            raise RuntimeError(msg)
+        return audio.read_bytes().decode()
+
+
+@pytest.fixture
+def transcriber():
+    return GatedTranscriber()
+
+
+@pytest.fixture
+def voice(repository, tmp_path, transcriber):
+    with VoiceCapture(repository, tmp_path / "voice", transcriber) as pipeline:
+        yield pipeline
+
+
+def test_capture_stores_placeholder_before_transcribing(
+    voice, repository, transcriber, tmp_path
+):
+    fragment = voice.capture(b"entropy is surprise")
+
+    stored = repository.get_fragment(fragment.id)
+    assert (stored.content, stored.capture_type) == (PENDING_CONTENT, "voice")
+    assert (tmp_path / "voice" / f"{fragment.id}.wav").exists()
+    assert voice.pending == 1
+
+    transcriber.gate.set()
+    assert voice.drain(timeout=5)
+    assert repository.get_fragment(fragment.id).content == "entropy is surprise"
+    assert voice.stats() == {"pending": 0, "transcribed": 1, "failed": 0}
+
+
+def test_transcription_keeps_a_review_made_meanwhile(voice, repository, transcriber):
+    fragment = voice.capture(b"later text")
+    repository.update_fragment_statuses(
+        [(fragment.id, FragmentStatus.REVIEWED, datetime.utcnow())]
+    )
+
+    transcriber.gate.set()
+    voice.drain(timeout=5)
+
+    stored = repository.get_fragment(fragment.id)
+    assert (stored.content, stored.status) == ("later text", FragmentStatus.REVIEWED)
+    assert repository.search_fragments("later")
+
+
+def test_failed_transcription_is_retried_on_next_start(repository, tmp_path):
+    failing = GatedTranscriber(fail=True)
+    failing.gate.set()
+    with VoiceCapture(repository, tmp_path, failing) as pipeline:
+        fragment = pipeline.capture(b"second try")
+        pipeline.drain(timeout=5)
+        assert pipeline.stats()["failed"] == 1
+    assert repository.get_fragment(fragment.id).content == PENDING_CONTENT
+
+    working = GatedTranscriber()
+    working.gate.set()
+    with VoiceCapture(repository, tmp_path, working) as pipeline:
+        pipeline.drain(timeout=5)
+    assert repository.get_fragment(fragment.id).content == "second try"
+
+
+def test_transcript_without_a_placeholder_is_a_failure(voice, repository, transcriber):
+    fragment = voice.capture(b"nowhere to go")
+    repository.connection.execute(
+        "DELETE FROM idea_fragments WHERE id = ?;", (str(fragment.id),)
+    )
+    repository.connection.commit()
+
+    transcriber.gate.set()
+    voice.drain(timeout=5)
+
+    assert voice.stats() == {"pending": 0, "transcribed": 0, "failed": 1}
+
+
+def test_recover_queries_placeholders_not_audio_files(
+    repository, tmp_path, monkeypatch
+):
+    transcriber = GatedTranscriber()
+    transcriber.gate.set()
+    with VoiceCapture(repository, tmp_path, transcriber) as pipeline:
+        done = [pipeline.capture(f"note {i}".encode()) for i in range(3)]
+        pipeline.drain(timeout=5)
+    pending = done[0].model_copy(update={"content": PENDING_CONTENT})
+    repository.upsert_fragment(pending)
+
+    def no_point_lookups(fragment_id):
+        raise AssertionError(fragment_id)
+
+    monkeypatch.setattr(repository, "get_fragment", no_point_lookups)
+    retry = GatedTranscriber()
+    retry.gate.set()
+    with VoiceCapture(repository, tmp_path, retry) as pipeline:
+        pipeline.drain(timeout=5)
+        assert pipeline.stats()["transcribed"] == 1
+
+    assert retry.calls == 1
+    monkeypatch.undo()
+    assert repository.get_fragment(pending.id).content == "note 0"
+
+
+def test_capture_through_write_behind_queue(repository, tmp_path, transcriber):
+    transcriber.gate.set()
+    with (
+        CaptureQueue(repository, max_delay=60) as queue,
+        VoiceCapture(repository, tmp_path, transcriber, capture_queue=queue) as voice,
+    ):
+        fragment = voice.capture(b"queued note")
+        voice.drain(timeout=5)
+
+    assert repository.get_fragment(fragment.id).content == "queued note"
+
+
+def test_uncommitted_placeholder_fails_instead_of_blocking(
+    repository, tmp_path, transcriber, monkeypatch
+):
+    def locked(fragments):
+        msg = "database is locked"
+        raise StorageError(msg)
+
+    monkeypatch.setattr(repository, "upsert_fragments_many", locked)
+    transcriber.gate.set()
+    with (
+        CaptureQueue(repository, max_delay=0) as queue,
+        VoiceCapture(
+            repository, tmp_path, transcriber, capture_queue=queue, flush_timeout=0.05
+        ) as voice,
+    ):
+        fragment = voice.capture(b"stuck behind a lock")
+        assert voice.drain(timeout=5)
+        assert voice.stats()["failed"] == 1
+
+    assert (tmp_path / f"{fragment.id}.wav").exists()
+
+
+def test_capture_requires_a_running_pipeline(repository, tmp_path, transcriber):
+    with pytest.raises(StorageError, match="not running"):
+        VoiceCapture(repository, tmp_path, transcriber).capture(b"")
+
+
+def test_whisper_model_is_loaded_once_and_shared(monkeypatch, tmp_path):
+    loads = []
+
+    class Model:
+        def transcribe(self, samples):
+            return {"text": f" {samples} "}
+
+    def load_model(size):
+        loads.append(size)
+        return Model()
+
+    fake = types.SimpleNamespace(load_model=load_model, load_audio=lambda p: "hello")
+    monkeypatch.setitem(sys.modules, "whisper", fake)
+    transcriber = WhisperTranscriber("tiny")
+    audio = tmp_path / "note.wav"
+    audio.write_bytes(b"")
+
+    threads = [
+        threading.Thread(target=transcriber.transcribe, args=(audio,)) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["tiny"]
+    assert transcriber.transcribe(audio) == "hello"